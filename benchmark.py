@@ -0,0 +1,485 @@
+#!/usr/bin/env python3
+"""
+Benchmarks sqlite-clone: generates a table of synthetic rows for each storage
+engine and times standard workloads against it (bulk insert, point and range
+selects, UPDATE and DELETE of single rows and of large parts of the table,
+ALTER TABLE and the parsing of statements). The throughput and latency
+percentiles of each workload are reported as JSON, so runs on different
+commits can be compared (see --compare).
+
+Usage:
+    ./benchmark.py --rows 20000 --output before.json
+    ./benchmark.py --rows 20000 --output after.json --compare before.json
+"""
+
+import argparse  # for parsing the command line
+import contextlib  # for discarding the output of statements
+import importlib.util  # for loading sqlite_clone.py as a module
+import io  # for capturing the output of statements
+import json  # for writing the results
+import os  # for working in a temporary directory
+import platform  # for recording the machine the benchmark ran on
+import random  # for generating rows
+import re  # for reading string lengths from column definitions
+import shutil  # for removing the temporary directory
+import string  # for generating strings
+import subprocess  # for recording the commit the benchmark ran on
+import sys  # for reporting comparisons on stderr
+import tempfile  # for the temporary directory the databases are created in
+import time  # for timing statements
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sqlite_clone.py')
+DEFAULT_SCHEMA = 'id int, name varchar(20), price float, active bool'
+ENGINES = ('csv', 'paged', 'columnar', 'compressed')
+TABLE = 'bench'
+HIGH_SELECTIVITY = 0.1  # fraction of the rows a high selectivity UPDATE or DELETE changes
+HIGH_ROUNDS = 5  # high selectivity UPDATEs and DELETEs run per workload
+RANGE_FRACTION = 0.01  # fraction of the rows a range select returns
+PERCENTILES = (50, 90, 95, 99)
+LENGTH_REGEX = re.compile('\\( *([0-9]+) *\\)')
+
+
+# Helper functions
+
+def load_sqlite_clone():
+    """
+    Loads sqlite_clone.py as a module
+
+    :return: The module
+    """
+    spec = importlib.util.spec_from_file_location('sqlite_clone', SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def run_statement(sc, statement):
+    """
+    Runs a statement as the command prompt does (see `run_statement` of
+    sqlite-clone), discarding its output
+
+    :param sc: The sqlite-clone module
+    :param statement: The statement (ending with ';') to run
+    :return: The number of seconds it took
+    :raises RuntimeError: if the statement failed
+    """
+    with contextlib.redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        try:
+            key, plan = sc.compile_statement(statement)
+            if plan is not None:
+                sc.cache_plan(key, sc.execute_plan(plan))
+        except sc.Error as error:
+            raise RuntimeError('%s failed: %s' % (statement, error))
+        return time.perf_counter() - started
+
+
+def parse_schema(sc, schema):
+    """
+    Parses the schema of the benchmark table with the table model parser of
+    sqlite-clone
+
+    :param sc: The sqlite-clone module
+    :param schema: The column definitions (e.g. "id int, name varchar(20)");
+    the first column has to be an int, which is used as the key
+    :return: The header (string) and model (list of dicts) of the table
+    """
+    header = ','.join(col.strip() for col in schema.split(','))
+    try:
+        model = sc.extract_model_from(header)
+    except sc.DatabaseError as error:
+        raise ValueError('invalid schema "%s": %s' % (schema, error))
+    if model[0]['data_type'] != 'int':
+        raise ValueError('the first column of the schema has to be an int key')
+    return header, model
+
+
+def generate_value(col, rng):
+    """
+    Generates a random value of a column as an SQL literal
+
+    :param col: The model column (dict)
+    :param rng: The random number generator
+    :return: The literal (string)
+    """
+    data_type = col['data_type']
+    if data_type == 'int':
+        return str(rng.randint(-1000000, 1000000))
+    if data_type in ('float', 'double'):
+        return '%.2f' % rng.uniform(0, 1000)
+    if data_type in ('bool', 'boolean'):
+        return rng.choice(('true', 'false'))
+    match = LENGTH_REGEX.search(col['definition'])
+    length = int(match.group(1)) if match is not None else 20
+    return "'%s'" % ''.join(rng.choice(string.ascii_letters) for _ in range(rng.randint(1, length)))
+
+
+def generate_rows(model, count, rng):
+    """
+    Generates rows of the benchmark table, keyed by ascending ids from 1
+
+    :param model: The table model
+    :param count: The number of rows
+    :param rng: The random number generator
+    :return: A generator of rows (lists of SQL literals)
+    """
+    for key in range(1, count + 1):
+        yield [str(key)] + [generate_value(col, rng) for col in model[1:]]
+
+
+def percentile(latencies, pct):
+    """
+    Returns a percentile of sorted latencies (nearest rank)
+    """
+    rank = max(0, -(-len(latencies) * pct // 100) - 1)
+    return latencies[min(rank, len(latencies) - 1)]
+
+
+def summarize(engine, workload, latencies, rows, seconds):
+    """
+    Summarizes the timings of a workload
+
+    :param engine: The storage engine
+    :param workload: The name of the workload
+    :param latencies: The seconds each operation took
+    :param rows: The number of rows the workload inserted, read or changed
+    :param seconds: The total number of seconds the workload took
+    :return: The result (dict)
+    """
+    latencies = sorted(latencies)
+    result = {
+        'engine': engine,
+        'workload': workload,
+        'operations': len(latencies),
+        'rows': rows,
+        'seconds': round(seconds, 6),
+        'ops_per_second': round(len(latencies) / seconds, 3) if seconds else None,
+        'rows_per_second': round(rows / seconds, 3) if seconds else None,
+        'latency_ms': {}
+    }
+    if latencies:
+        result['latency_ms']['mean'] = round(sum(latencies) / len(latencies) * 1000, 4)
+        for pct in PERCENTILES:
+            result['latency_ms']['p%i' % pct] = round(percentile(latencies, pct) * 1000, 4)
+        result['latency_ms']['max'] = round(latencies[-1] * 1000, 4)
+    return result
+
+
+def git_commit():
+    """
+    Returns the commit of the working tree, or None if it isn't known
+    """
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(SCRIPT_PATH),
+                                       stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Workloads
+#
+# Each workload runs against the benchmark table of an engine and returns
+# the seconds each of its operations took, the number of rows it inserted,
+# read or changed, and its total seconds. They run in the order of
+# WORKLOADS; the DELETE workloads come last since they shrink the table.
+
+def bench_bulk_insert(bench):
+    """
+    Inserts the rows of the table, --batch rows per INSERT, and applies them
+    to the table (the write-ahead log checkpoint counts towards the total)
+    """
+    sc, args = bench['sc'], bench['args']
+    latencies = []
+    batch = []
+    started = time.perf_counter()
+    for row in generate_rows(bench['model'], args.rows, bench['rng']):
+        batch.append('(%s)' % ', '.join(row))
+        if len(batch) == args.batch:
+            latencies.append(run_statement(sc, 'INSERT INTO %s VALUES %s;' % (TABLE, ', '.join(batch))))
+            batch = []
+    if batch:
+        latencies.append(run_statement(sc, 'INSERT INTO %s VALUES %s;' % (TABLE, ', '.join(batch))))
+    with contextlib.redirect_stdout(io.StringIO()):
+        sc.wal_checkpoint()
+    return latencies, args.rows, time.perf_counter() - started
+
+
+def bench_point_select(bench):
+    """
+    Selects --queries single rows by key
+    """
+    sc, args, rng = bench['sc'], bench['args'], bench['rng']
+    latencies = [run_statement(sc, 'SELECT * FROM %s WHERE %s = %i;' % (TABLE, bench['key'], rng.randint(1, args.rows)))
+                 for _ in range(args.queries)]
+    return latencies, len(latencies), sum(latencies)
+
+
+def bench_range_select(bench):
+    """
+    Selects ranges of RANGE_FRACTION of the rows by key, --queries / 10 times
+    """
+    sc, args, rng = bench['sc'], bench['args'], bench['rng']
+    width = max(1, int(args.rows * RANGE_FRACTION))
+    latencies = []
+    for _ in range(max(1, args.queries // 10)):
+        low = rng.randint(1, max(1, args.rows - width + 1))
+        latencies.append(run_statement(sc, 'SELECT * FROM %s WHERE %s BETWEEN %i AND %i;'
+                                       % (TABLE, bench['key'], low, low + width - 1)))
+    return latencies, len(latencies) * width, sum(latencies)
+
+
+def bench_update_low(bench):
+    """
+    Updates --queries / 10 single rows by key
+    """
+    sc, args, rng = bench['sc'], bench['args'], bench['rng']
+    col = bench['model'][-1]
+    latencies = [run_statement(sc, 'UPDATE %s SET %s = %s WHERE %s = %i;' % (
+        TABLE, col['col_name'], generate_value(col, rng), bench['key'], rng.randint(1, args.rows)))
+                 for _ in range(max(1, args.queries // 10))]
+    return latencies, len(latencies), sum(latencies)
+
+
+def bench_update_high(bench):
+    """
+    Updates HIGH_SELECTIVITY of the rows by a key range, HIGH_ROUNDS times
+    """
+    sc, args, rng = bench['sc'], bench['args'], bench['rng']
+    col = bench['model'][-1]
+    width = max(1, int(args.rows * HIGH_SELECTIVITY))
+    latencies = []
+    for _ in range(HIGH_ROUNDS):
+        low = rng.randint(1, max(1, args.rows - width + 1))
+        latencies.append(run_statement(sc, 'UPDATE %s SET %s = %s WHERE %s BETWEEN %i AND %i;' % (
+            TABLE, col['col_name'], generate_value(col, rng), bench['key'], low, low + width - 1)))
+    return latencies, len(latencies) * width, sum(latencies)
+
+
+def bench_alter(bench):
+    """
+    Adds, renames and drops a column, --alter-rounds times
+    """
+    sc, args = bench['sc'], bench['args']
+    latencies = []
+    for i in range(args.alter_rounds):
+        latencies.append(run_statement(sc, 'ALTER TABLE %s ADD COLUMN extra%i int DEFAULT 0;' % (TABLE, i)))
+        latencies.append(run_statement(sc, 'ALTER TABLE %s RENAME COLUMN extra%i TO renamed%i;' % (TABLE, i, i)))
+        latencies.append(run_statement(sc, 'ALTER TABLE %s DROP COLUMN renamed%i;' % (TABLE, i)))
+    return latencies, 0, sum(latencies)
+
+
+def bench_parse(bench):
+    """
+    Reads, parses and plans --queries SELECT, INSERT, UPDATE and DELETE
+    statements without running them, as the command prompt does with a
+    script before the plan cache has them: the script is split into its
+    statements (see `script_statements` of sqlite-clone), which are then
+    normalized and planned
+    """
+    sc, args, rng = bench['sc'], bench['args'], bench['rng']
+    model, key = bench['model'], bench['key']
+    cols = ', '.join(col['col_name'] for col in model)
+    templates = [
+        lambda: 'SELECT %s FROM %s WHERE %s = %i;' % (cols, TABLE, key, rng.randint(1, args.rows)),
+        lambda: 'INSERT INTO %s VALUES (%s);' % (TABLE, ', '.join(next(generate_rows(model, 1, rng)))),
+        lambda: 'UPDATE %s SET %s = %s WHERE %s > %i;' % (TABLE, model[-1]['col_name'],
+                                                          generate_value(model[-1], rng), key, rng.randint(1, args.rows)),
+        lambda: 'DELETE FROM %s WHERE %s < %i;' % (TABLE, key, rng.randint(1, args.rows))
+    ]
+    latencies = []
+    for i in range(args.queries):
+        script = io.TextIOWrapper(io.BytesIO(templates[i % len(templates)]().encode()), encoding='utf-8')
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            is_dot_command, statement = next(sc.script_statements(script))
+            sc.normalize_statement(statement)
+            groups = [group for group in sc.QUERY_COMMAND_REGEX.match(statement).groups() if group]
+            try:
+                plan = sc.plan_compilers[groups[0].lower()](groups[1])
+            except sc.Error as error:
+                raise RuntimeError('%s could not be planned: %s' % (statement, error))
+            latencies.append(time.perf_counter() - started)
+        if plan is None:
+            raise RuntimeError('%s could not be planned' % statement)
+    return latencies, 0, sum(latencies)
+
+
+def bench_delete_low(bench):
+    """
+    Deletes --queries / 10 single rows by key
+    """
+    sc, args, rng = bench['sc'], bench['args'], bench['rng']
+    keys = rng.sample(range(1, args.rows + 1), min(args.rows, max(1, args.queries // 10)))
+    latencies = [run_statement(sc, 'DELETE FROM %s WHERE %s = %i;' % (TABLE, bench['key'], key)) for key in keys]
+    return latencies, len(latencies), sum(latencies)
+
+
+def bench_delete_high(bench):
+    """
+    Deletes HIGH_SELECTIVITY of the rows by a key range, HIGH_ROUNDS times
+    (ranges which don't overlap, from the end of the table)
+    """
+    sc, args = bench['sc'], bench['args']
+    width = max(1, int(args.rows * HIGH_SELECTIVITY))
+    latencies = []
+    for i in range(HIGH_ROUNDS):
+        high = args.rows - i * width
+        latencies.append(run_statement(sc, 'DELETE FROM %s WHERE %s BETWEEN %i AND %i;'
+                                       % (TABLE, bench['key'], high - width + 1, high)))
+    return latencies, len(latencies) * width, sum(latencies)
+
+
+# the workloads in the order they run
+WORKLOADS = [
+    ('bulk_insert', bench_bulk_insert),
+    ('point_select', bench_point_select),
+    ('range_select', bench_range_select),
+    ('update_low', bench_update_low),
+    ('update_high', bench_update_high),
+    ('alter', bench_alter),
+    ('parse', bench_parse),
+    ('delete_low', bench_delete_low),
+    ('delete_high', bench_delete_high)
+]
+
+
+# Benchmark functions
+
+def run_benchmark(args):
+    """
+    Runs the chosen workloads against each chosen storage engine, each in a
+    database of its own in a temporary directory
+
+    :param args: The parsed command line
+    :return: The report (dict)
+    """
+    workloads = [(name, bench) for name, bench in WORKLOADS if name in args.workloads]
+    work_dir = tempfile.mkdtemp(prefix='sqlite-clone-bench-')
+    cwd = os.getcwd()
+    results = []
+    try:
+        os.chdir(work_dir)  # sqlite-clone keeps its databases in ./dbs
+        sc = load_sqlite_clone()
+        sc.init()
+        header, model = parse_schema(sc, args.schema)
+        for engine in args.engines:
+            run_statement(sc, 'CREATE DATABASE bench_%s;' % engine)
+            run_statement(sc, 'USE bench_%s;' % engine)
+            run_statement(sc, 'CREATE TABLE %s (%s) USING %s;' % (TABLE, ', '.join(header.split(',')), engine))
+            if args.index:
+                run_statement(sc, 'CREATE INDEX %s_key ON %s(%s);' % (TABLE, TABLE, model[0]['col_name']))
+            bench = {
+                'sc': sc,
+                'args': args,
+                'model': model,
+                'key': model[0]['col_name'],
+                'rng': random.Random(args.seed)  # every engine gets the same rows and statements
+            }
+            for name, workload in workloads:
+                latencies, rows, seconds = workload(bench)
+                results.append(summarize(engine, name, latencies, rows, seconds))
+                print('%-10s %-13s %10.1f ops/s  p50 %8.3f ms  p99 %8.3f ms' % (
+                    engine, name, results[-1]['ops_per_second'] or 0, results[-1]['latency_ms'].get('p50', 0),
+                    results[-1]['latency_ms'].get('p99', 0)), file=sys.stderr)
+            with contextlib.redirect_stdout(io.StringIO()):
+                sc.wal_checkpoint()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        'benchmark': 'sqlite-clone',
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': {
+            'rows': args.rows,
+            'schema': args.schema,
+            'engines': args.engines,
+            'workloads': [name for name, bench in workloads],
+            'batch': args.batch,
+            'queries': args.queries,
+            'alter_rounds': args.alter_rounds,
+            'index': args.index,
+            'seed': args.seed
+        },
+        'results': results
+    }
+
+
+def compare(report, baseline):
+    """
+    Prints the change in throughput and median latency of each workload
+    from a baseline report on stderr
+
+    :param report: The report of this run
+    :param baseline: The baseline report (e.g. of an earlier commit)
+    """
+    before = {(result['engine'], result['workload']): result for result in baseline['results']}
+    print('%-10s %-13s %12s %12s' % ('engine', 'workload', 'throughput', 'p50 latency'), file=sys.stderr)
+    for result in report['results']:
+        old = before.get((result['engine'], result['workload']))
+        if old is None or not old['ops_per_second'] or not old['latency_ms'].get('p50'):
+            continue
+        throughput = (result['ops_per_second'] / old['ops_per_second'] - 1) * 100
+        latency = (result['latency_ms']['p50'] / old['latency_ms']['p50'] - 1) * 100
+        print('%-10s %-13s %+11.1f%% %+11.1f%%' % (result['engine'], result['workload'], throughput, latency),
+              file=sys.stderr)
+
+
+def parse_args(argv):
+    """
+    Parses the command line
+    """
+    parser = argparse.ArgumentParser(description='Benchmark sqlite-clone on synthetic tables.')
+    parser.add_argument('--rows', type=int, default=10000, help='rows of the benchmark table (default 10000)')
+    parser.add_argument('--schema', default=DEFAULT_SCHEMA,
+                        help='column definitions of the table, the first one an int key (default "%s")'
+                             % DEFAULT_SCHEMA)
+    parser.add_argument('--engines', default=','.join(ENGINES),
+                        help='comma-separated storage engines to benchmark (default all)')
+    parser.add_argument('--workloads', default=','.join(name for name, bench in WORKLOADS),
+                        help='comma-separated workloads to run (default all: %s)'
+                             % ', '.join(name for name, bench in WORKLOADS))
+    parser.add_argument('--batch', type=int, default=100, help='rows per INSERT of bulk_insert (default 100)')
+    parser.add_argument('--queries', type=int, default=1000,
+                        help='statements of point_select and parse; other workloads run a tenth (default 1000)')
+    parser.add_argument('--alter-rounds', type=int, default=5,
+                        help='ADD/RENAME/DROP COLUMN rounds of alter (default 5)')
+    parser.add_argument('--index', action='store_true', help='create an index on the key column')
+    parser.add_argument('--seed', type=int, default=42, help='seed of the generated rows and statements')
+    parser.add_argument('--output', help='file to write the JSON report to (default stdout)')
+    parser.add_argument('--compare', help='JSON report of an earlier run to compare this one with')
+    args = parser.parse_args(argv)
+    args.engines = [engine.strip().lower() for engine in args.engines.split(',') if engine.strip()]
+    args.workloads = [name.strip().lower() for name in args.workloads.split(',') if name.strip()]
+    for engine in args.engines:
+        if engine not in ENGINES:
+            parser.error('unknown engine "%s"' % engine)
+    for name in args.workloads:
+        if name not in dict(WORKLOADS):
+            parser.error('unknown workload "%s"' % name)
+    if args.rows < 1 or args.batch < 1 or args.queries < 1 or args.alter_rounds < 1:
+        parser.error('--rows, --batch, --queries and --alter-rounds must be positive')
+    return args
+
+
+def main(argv=None):
+    """
+    Runs the benchmark and writes its report
+    """
+    args = parse_args(argv)
+    report = run_benchmark(args)
+    if args.output:
+        with open(args.output, 'w') as report_file:
+            json.dump(report, report_file, indent=2)
+            report_file.write('\n')
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            compare(report, json.load(baseline_file))
+
+
+if __name__ == '__main__':
+    main()
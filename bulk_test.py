@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Bulk loading and large tables
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import sqlite_clone
+
+connection = sqlite_clone.connect('dbs', autocommit=True)
+connection.execute('CREATE DATABASE db_bulk')
+connection.execute('USE db_bulk')
+directory = tempfile.TemporaryDirectory()
+
+
+def write_file(file_name, text):
+    file_path = os.path.join(directory.name, file_name)
+    with open(file_path, 'w') as file:
+        file.write(text)
+    return file_path
+
+
+# multi-row INSERTs and .import of a CSV file with a header row and a TSV
+# file without one; files with a line of too few values or a value of the
+# wrong type are rejected, and so is a field holding a line break by a CSV
+# table
+for engine in ('csv', 'paged', 'columnar', 'compressed'):
+    tbl_name = 'tbl_import_' + engine
+    connection.execute('CREATE TABLE %s (a1 int, a2 varchar(20), a3 float) USING %s' % (tbl_name, engine))
+    connection.execute("INSERT INTO %s VALUES (1, 'Gizmo', 19.99), (2, 'it''s, a comma', 29.99)" % tbl_name)
+    sqlite_clone.import_file(write_file('rows.csv', 'a1,a2,a3\n3,SingleTouch,149.99\n4,"Multi, Touch",199.99\n'), tbl_name)
+    sqlite_clone.import_file(write_file('rows.tsv', '5\tSuperGizmo\t49.99\n\n6\tWidget\t5.5\n'), tbl_name)
+    sqlite_clone.import_file(write_file('bad.csv', '7,Gadget,1.5\n8,Gadget\n9,Gadget,2.5\n'), tbl_name)
+    sqlite_clone.import_file(write_file('types.csv', '10,Gadget,cheap\n'), tbl_name)
+    sqlite_clone.import_file(write_file('lines.csv', '11,"two\nlines",1.5\n'), tbl_name)
+    sqlite_clone.wal_checkpoint('db_bulk')
+    print(connection.execute('SELECT * FROM %s' % tbl_name).fetchall())
+sqlite_clone.import_file('no_such_file.csv', 'tbl_import_csv')
+sqlite_clone.import_file(os.path.join(directory.name, 'rows.tsv'), 'tbl_none')
+
+# parallel scans of a CSV table return the rows a serial scan does, in the
+# same order, also after the table is written to (PARALLEL_MIN_BYTES is
+# lowered so that a small table is scanned in parallel)
+min_bytes, sqlite_clone.PARALLEL_MIN_BYTES = sqlite_clone.PARALLEL_MIN_BYTES, 1
+connection.execute('CREATE TABLE tbl_parallel (a1 int, a2 varchar(20), a3 float)')
+connection.executemany('INSERT INTO tbl_parallel VALUES (?, ?, ?)',
+                       [(i, 'name, %i' % i if i % 7 else 'seven', i / 4) for i in range(1, 5001)])
+queries = ['SELECT * FROM tbl_parallel',
+           'SELECT a3, a1 FROM tbl_parallel WHERE a1 > 4996',
+           "SELECT COUNT(*) FROM tbl_parallel WHERE a2 = 'seven'",
+           'SELECT a2, SUM(a3) FROM tbl_parallel WHERE a1 BETWEEN 4990 AND 5000 GROUP BY a2 ORDER BY a2 LIMIT 3']
+for step in range(2):
+    results = []
+    for workers in ('1', '4'):
+        sqlite_clone.set_parallel(workers)
+        sqlite_clone.wal_checkpoint('db_bulk')  # scan the table file itself
+        results.append([connection.execute(query).fetchall() for query in queries])
+    print(sqlite_clone.scan_pool is not None, results[0] == results[1], len(results[1][0]), results[1][1:])
+    connection.execute("UPDATE tbl_parallel SET a2 = 'seven' WHERE a1 BETWEEN 4995 AND 4997")
+    connection.execute('DELETE FROM tbl_parallel WHERE a1 < 2500')
+sqlite_clone.set_parallel('1')
+sqlite_clone.PARALLEL_MIN_BYTES = min_bytes
+
+# a range of ids which grow as rows are inserted is read from one block of the
+# zone map, and the rows read stay the same after rows are updated out of
+# their block's range and deleted (where an updated row is read depends on
+# the storage engine, so the rows are sorted)
+for engine in ('csv', 'paged', 'columnar', 'compressed'):
+    tbl_name = 'tbl_zone_' + engine
+    connection.execute('CREATE TABLE %s (a1 int, a2 varchar(20), a3 float) USING %s' % (tbl_name, engine))
+    connection.executemany('INSERT INTO %s VALUES (?, ?, ?)' % tbl_name,
+                           [(i, 'name%i' % i, i % 100) for i in range(1, 100001)])
+    sqlite_clone.wal_checkpoint('db_bulk')
+    sqlite_clone.explain('SELECT a2 FROM %s WHERE a1 > 99990' % tbl_name)
+    print(connection.execute('SELECT a2 FROM %s WHERE a1 > 99997' % tbl_name).fetchall())
+    connection.execute('UPDATE %s SET a1 = 200000 WHERE a1 = 5' % tbl_name)
+    connection.execute('DELETE FROM %s WHERE a1 BETWEEN 99990 AND 99999' % tbl_name)
+    sqlite_clone.wal_checkpoint('db_bulk')
+    print(sorted(connection.execute('SELECT a1, a2 FROM %s WHERE a1 > 99985' % tbl_name).fetchall()))
+    print(connection.execute('SELECT COUNT(*) FROM %s WHERE a1 < 10' % tbl_name).fetchall())
+    print(connection.execute('SELECT COUNT(*) FROM %s' % tbl_name).fetchall())
+
+# a small run of every workload of benchmark.py against every storage engine,
+# twice with the same seed (the second run compared with the first), does the
+# same work both times (the timings differ, so only the work is printed)
+reports = []
+for run in ('before', 'after'):
+    report_path = os.path.join(directory.name, run + '.json')
+    command = [sys.executable, 'benchmark.py', '--rows', '300', '--queries', '30', '--alter-rounds', '1',
+               '--index', '--output', report_path]
+    if reports:
+        command += ['--compare', os.path.join(directory.name, 'before.json')]
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    with open(report_path) as report_file:
+        reports.append(json.load(report_file))
+for result in reports[1]['results']:
+    print(result['engine'], result['workload'], result['operations'], result['rows'])
+print([result['rows'] for result in reports[0]['results']] == [result['rows'] for result in reports[1]['results']])
+
+# the same rows, whose columns suit each of the encodings of compressed
+# segments (growing ids, a few distinct strings, runs of bools, floats), are
+# read alike from a compressed and a CSV table, also after rows are updated
+# and deleted and after VACUUM compresses the table again
+colors = ['red', 'green', 'blue']
+rows = [(i, colors[i % 3], i // 1000 % 2 == 0, i / 8) for i in range(1, 10001)]
+queries = ['SELECT * FROM %s WHERE a1 BETWEEN 4094 AND 4098',
+           "SELECT COUNT(*) FROM %s WHERE a2 = 'green'",
+           'SELECT COUNT(*) FROM %s WHERE a3 = false',
+           'SELECT a2, SUM(a4) FROM %s GROUP BY a2 ORDER BY a2',
+           'SELECT a1, a2 FROM %s WHERE a1 BETWEEN 8990 AND 9005']
+for engine in ('csv', 'compressed'):
+    connection.execute('CREATE TABLE tbl_segments_%s (a1 int, a2 varchar(10), a3 bool, a4 float) USING %s'
+                       % (engine, engine))
+    connection.executemany('INSERT INTO tbl_segments_%s VALUES (?, ?, ?, ?)' % engine, rows)
+for step in ('inserted', 'changed', 'vacuumed'):
+    if step == 'changed':
+        for engine in ('csv', 'compressed'):
+            tbl_name = 'tbl_segments_' + engine
+            connection.execute("UPDATE %s SET a2 = 'yellow' WHERE a1 BETWEEN 4095 AND 4097" % tbl_name)
+            connection.execute('DELETE FROM %s WHERE a1 > 9997' % tbl_name)
+            connection.execute('DELETE FROM %s WHERE a3 = false' % tbl_name)
+    elif step == 'vacuumed':
+        connection.execute('VACUUM tbl_segments_compressed')
+    sqlite_clone.wal_checkpoint('db_bulk')
+    for query in queries:
+        expected = sorted(connection.execute(query % 'tbl_segments_csv').fetchall())
+        result = sorted(connection.execute(query % 'tbl_segments_compressed').fetchall())
+        print(result == expected, result[:3])
+
+directory.cleanup()
+connection.execute('DROP DATABASE db_bulk')
+connection.close()
+
+# Expected output
+#
+# 2 new records inserted.
+# 2 new records inserted.
+# Error: line 2 has 2 values but table tbl_import_csv has 3 columns
+# 0 new records inserted.
+# Error: line 1: could not convert string to float: 'cheap'
+# 0 new records inserted.
+# Error: line 2: column a2 of a CSV table cannot hold a line break
+# 0 new records inserted.
+# [(1, 'Gizmo', 19.99), (2, "it's, a comma", 29.99), (3, 'SingleTouch', 149.99), (4, 'Multi, Touch', 199.99), (5, 'SuperGizmo', 49.99), (6, 'Widget', 5.5)]
+# 2 new records inserted.
+# 2 new records inserted.
+# Error: line 2 has 2 values but table tbl_import_paged has 3 columns
+# 0 new records inserted.
+# Error: line 1: could not convert string to float: 'cheap'
+# 0 new records inserted.
+# 1 new record inserted.
+# [(1, 'Gizmo', 19.99), (2, "it's, a comma", 29.99), (3, 'SingleTouch', 149.99), (4, 'Multi, Touch', 199.99), (5, 'SuperGizmo', 49.99), (6, 'Widget', 5.5), (11, 'two\nlines', 1.5)]
+# 2 new records inserted.
+# 2 new records inserted.
+# Error: line 2 has 2 values but table tbl_import_columnar has 3 columns
+# 0 new records inserted.
+# Error: line 1: could not convert string to float: 'cheap'
+# 0 new records inserted.
+# 1 new record inserted.
+# [(1, 'Gizmo', 19.99), (2, "it's, a comma", 29.99), (3, 'SingleTouch', 149.99), (4, 'Multi, Touch', 199.99), (5, 'SuperGizmo', 49.99), (6, 'Widget', 5.5), (11, 'two\nlines', 1.5)]
+# 2 new records inserted.
+# 2 new records inserted.
+# Error: line 2 has 2 values but table tbl_import_compressed has 3 columns
+# 0 new records inserted.
+# Error: line 1: could not convert string to float: 'cheap'
+# 0 new records inserted.
+# 1 new record inserted.
+# [(1, 'Gizmo', 19.99), (2, "it's, a comma", 29.99), (3, 'SingleTouch', 149.99), (4, 'Multi, Touch', 199.99), (5, 'SuperGizmo', 49.99), (6, 'Widget', 5.5), (11, 'two\nlines', 1.5)]
+# !Failed to import no_such_file.csv because it could not be read.
+# !Failed to import into table tbl_none because it does not exist.
+# Parallel scans turned off.
+# Large tables will be scanned by 4 processes.
+# True True 5000 [[(1249.25, 4997), (1249.5, 4998), (1249.75, 4999), (1250.0, 5000)], [(714,)], [('name, 4990', 1247.5), ('name, 4992', 1248.0), ('name, 4993', 1248.25)]]
+# Parallel scans turned off.
+# Large tables will be scanned by 4 processes.
+# True True 2501 [[(1249.25, 4997), (1249.5, 4998), (1249.75, 4999), (1250.0, 5000)], [(360,)], [('name, 4990', 1247.5), ('name, 4992', 1248.0), ('name, 4993', 1248.25)]]
+# Parallel scans turned off.
+# SCAN tbl_zone_csv (WHERE a1 >, zone map: 1 of 32 blocks, ~10 rows)
+# [('name99998',), ('name99999',), ('name100000',)]
+# [(99986, 'name99986'), (99987, 'name99987'), (99988, 'name99988'), (99989, 'name99989'), (100000, 'name100000'), (200000, 'name5')]
+# [(8,)]
+# [(99990,)]
+# SCAN tbl_zone_paged (WHERE a1 >, zone map: 1 of 53 blocks, ~10 rows)
+# [('name99998',), ('name99999',), ('name100000',)]
+# [(99986, 'name99986'), (99987, 'name99987'), (99988, 'name99988'), (99989, 'name99989'), (100000, 'name100000'), (200000, 'name5')]
+# [(8,)]
+# [(99990,)]
+# SCAN tbl_zone_columnar (WHERE a1 >, zone map: 1 of 2 blocks, ~10 rows)
+# [('name99998',), ('name99999',), ('name100000',)]
+# [(99986, 'name99986'), (99987, 'name99987'), (99988, 'name99988'), (99989, 'name99989'), (100000, 'name100000'), (200000, 'name5')]
+# [(8,)]
+# [(99990,)]
+# SCAN tbl_zone_compressed (WHERE a1 >, zone map: 1 of 25 blocks, ~10 rows)
+# [('name99998',), ('name99999',), ('name100000',)]
+# [(99986, 'name99986'), (99987, 'name99987'), (99988, 'name99988'), (99989, 'name99989'), (100000, 'name100000'), (200000, 'name5')]
+# [(8,)]
+# [(99990,)]
+# csv bulk_insert 3 300
+# csv point_select 30 30
+# csv range_select 3 9
+# csv update_low 3 3
+# csv update_high 5 150
+# csv alter 3 0
+# csv parse 30 0
+# csv delete_low 3 3
+# csv delete_high 5 150
+# paged bulk_insert 3 300
+# paged point_select 30 30
+# paged range_select 3 9
+# paged update_low 3 3
+# paged update_high 5 150
+# paged alter 3 0
+# paged parse 30 0
+# paged delete_low 3 3
+# paged delete_high 5 150
+# columnar bulk_insert 3 300
+# columnar point_select 30 30
+# columnar range_select 3 9
+# columnar update_low 3 3
+# columnar update_high 5 150
+# columnar alter 3 0
+# columnar parse 30 0
+# columnar delete_low 3 3
+# columnar delete_high 5 150
+# compressed bulk_insert 3 300
+# compressed point_select 30 30
+# compressed range_select 3 9
+# compressed update_low 3 3
+# compressed update_high 5 150
+# compressed alter 3 0
+# compressed parse 30 0
+# compressed delete_low 3 3
+# compressed delete_high 5 150
+# True
+# True [(4094, 'blue', True, 511.75), (4095, 'red', True, 511.875), (4096, 'green', True, 512.0)]
+# True [(3334,)]
+# True [(5000,)]
+# True [('blue', 2083125.0), ('green', 2083958.375), ('red', 2083541.625)]
+# True [(8990, 'blue'), (8991, 'red'), (8992, 'green')]
+# True [(4094, 'blue', True, 511.75), (4095, 'yellow', True, 511.875), (4096, 'yellow', True, 512.0)]
+# True [(1665,)]
+# True [(0,)]
+# True [('blue', 937342.0), ('green', 936508.875), ('red', 936800.625)]
+# True [(8990, 'blue'), (8991, 'red'), (8992, 'green')]
+# True [(4094, 'blue', True, 511.75), (4095, 'yellow', True, 511.875), (4096, 'yellow', True, 512.0)]
+# True [(1665,)]
+# True [(0,)]
+# True [('blue', 937342.0), ('green', 936508.875), ('red', 936800.625)]
+# True [(8990, 'blue'), (8991, 'red'), (8992, 'green')]
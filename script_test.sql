@@ -0,0 +1,771 @@
+--sqlite-clone test script
+
+CREATE DATABASE db_script;
+USE db_script;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(40));
+INSERT INTO tbl_1 VALUES (1, 'multi
+line');
+INSERT INTO tbl_1 VALUES (2, 'it''s');
+INSERT INTO tbl_1 VALUES (3, 'a;b'), (4, 'x -- not a comment'), (5, '/* not a comment */');
+INSERT INTO tbl_1 VALUES (6, "say ""hi""; bye");
+INSERT INTO tbl_1 VALUES (7, 'a,b'); -- a comment; with a ';'
+/* a comment; with a ';'
+   over two lines */
+SELECT *
+  FROM tbl_1;
+SELECT * FROM tbl_1 WHERE a2 = 'it''s';
+UPDATE tbl_1 SET a2 = 'x = y, z''s' WHERE a1 = 7;
+SELECT * FROM tbl_1 WHERE a1 = 7;
+DROP DATABASE db_script;
+
+CREATE DATABASE db_paged;
+USE db_paged;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(20), a3 float) USING paged;
+INSERT INTO tbl_1 VALUES (1, 'Gizmo', 19.99), (2, 'PowerGizmo', 29.99), (3, 'SingleTouch', 149.99);
+INSERT INTO tbl_1 VALUES (4, 'MultiTouch', 199.99), (5, 'SuperGizmo', 49.99);
+SELECT * FROM tbl_1;
+UPDATE tbl_1 SET a2 = 'a longer name, moved' WHERE a1 = 1;
+UPDATE tbl_1 SET a3 = 9.5 WHERE a2 = 'Gizmo';
+DELETE FROM tbl_1 WHERE a3 > 150;
+SELECT * FROM tbl_1;
+VACUUM tbl_1;
+SELECT a2, a3 FROM tbl_1 WHERE a1 <= 2;
+ALTER TABLE tbl_1 ADD a4 int;
+INSERT INTO tbl_1 VALUES (6, 'Widget', 5.5, 60);
+SELECT a1, a4, a2 FROM tbl_1 WHERE a1 > 4;
+DROP DATABASE db_paged;
+
+CREATE DATABASE db_index;
+USE db_index;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(20), a3 float);
+INSERT INTO tbl_1 VALUES (1, 'Gizmo', 19.99), (2, 'PowerGizmo', 29.99), (3, 'SingleTouch', 149.99);
+INSERT INTO tbl_1 VALUES (4, 'MultiTouch', 199.99), (5, 'SuperGizmo', 49.99);
+CREATE INDEX tbl_1_a1 ON tbl_1(a1);
+CREATE INDEX tbl_1_a2 ON tbl_1(a2);
+EXPLAIN SELECT * FROM tbl_1 WHERE a1 = 3;
+SELECT * FROM tbl_1 WHERE a1 = 3;
+SELECT * FROM tbl_1 WHERE a1 BETWEEN 2 AND 4;
+SELECT a1, a3 FROM tbl_1 WHERE a2 LIKE 'S%';
+UPDATE tbl_1 SET a1 = 10 WHERE a1 = 2;
+DELETE FROM tbl_1 WHERE a2 = 'SingleTouch';
+INSERT INTO tbl_1 VALUES (6, 'Widget', 5.5);
+SELECT * FROM tbl_1 WHERE a1 > 3;
+SELECT a1 FROM tbl_1 WHERE a2 = 'SingleTouch';
+DROP INDEX tbl_1_a1;
+EXPLAIN SELECT * FROM tbl_1 WHERE a1 = 3;
+SELECT * FROM tbl_1 WHERE a1 >= 5;
+DROP DATABASE db_index;
+
+CREATE DATABASE db_catalog_1;
+CREATE DATABASE db_catalog_2;
+USE db_catalog_1;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(20));
+INSERT INTO tbl_1 VALUES (1, 'one'), (2, 'two');
+SELECT * FROM tbl_1;
+USE db_catalog_2;
+CREATE TABLE tbl_1 (b1 float, b2 int);
+INSERT INTO tbl_1 VALUES (1.5, 3);
+SELECT * FROM tbl_1;
+USE db_catalog_1;
+SELECT * FROM tbl_1 WHERE a1 = 2;
+ALTER TABLE tbl_1 ADD a3 int DEFAULT 7;
+SELECT * FROM tbl_1;
+ALTER TABLE tbl_1 RENAME COLUMN a2 TO name;
+SELECT name FROM tbl_1 WHERE a1 = 1;
+DROP TABLE tbl_1;
+SELECT * FROM tbl_1;
+CREATE TABLE tbl_1 (c1 varchar(5));
+INSERT INTO tbl_1 VALUES ('new');
+SELECT * FROM tbl_1;
+DROP DATABASE db_catalog_2;
+USE db_catalog_2;
+SELECT * FROM tbl_1;
+DROP DATABASE db_catalog_1;
+
+CREATE DATABASE db_prepare;
+USE db_prepare;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(20), a3 float);
+PREPARE add_row AS INSERT INTO tbl_1 VALUES (?, ?, ?);
+EXECUTE add_row (1, 'Gizmo', 19.99);
+EXECUTE add_row (2, 'PowerGizmo', 29.99);
+EXECUTE add_row (3, 'it''s', 149.99);
+PREPARE find_row AS SELECT a2, a3 FROM tbl_1 WHERE a1 = ?;
+EXECUTE find_row (2);
+EXECUTE find_row (3);
+PREPARE set_price AS UPDATE tbl_1 SET a3 = ? WHERE a2 = ?;
+EXECUTE set_price (9.5, 'Gizmo');
+PREPARE drop_rows AS DELETE FROM tbl_1 WHERE a3 > ?;
+EXECUTE drop_rows (100);
+SELECT * FROM tbl_1;
+EXECUTE find_row (1, 2);
+DEALLOCATE find_row;
+EXECUTE find_row (1);
+SELECT * FROM tbl_1 WHERE a1 = 1;
+SELECT * FROM tbl_1 WHERE a1 = 2;
+DROP DATABASE db_prepare;
+
+CREATE DATABASE db_vacuum;
+USE db_vacuum;
+CREATE TABLE tbl_csv (a1 int, a2 varchar(20));
+CREATE TABLE tbl_paged (a1 int, a2 varchar(20)) USING paged;
+CREATE TABLE tbl_columnar (a1 int, a2 varchar(20)) USING columnar;
+CREATE TABLE tbl_compressed (a1 int, a2 varchar(20)) USING compressed;
+INSERT INTO tbl_csv VALUES (1, 'one'), (2, 'two'), (3, 'three'), (4, 'four');
+INSERT INTO tbl_paged VALUES (1, 'one'), (2, 'two'), (3, 'three'), (4, 'four');
+INSERT INTO tbl_columnar VALUES (1, 'one'), (2, 'two'), (3, 'three'), (4, 'four');
+INSERT INTO tbl_compressed VALUES (1, 'one'), (2, 'two'), (3, 'three'), (4, 'four');
+DELETE FROM tbl_csv WHERE a1 = 2;
+UPDATE tbl_csv SET a2 = 'a much longer three' WHERE a1 = 3;
+DELETE FROM tbl_paged WHERE a1 = 2;
+UPDATE tbl_paged SET a2 = 'a much longer three' WHERE a1 = 3;
+DELETE FROM tbl_columnar WHERE a1 = 2;
+UPDATE tbl_columnar SET a2 = 'a much longer three' WHERE a1 = 3;
+DELETE FROM tbl_compressed WHERE a1 = 2;
+UPDATE tbl_compressed SET a2 = 'a much longer three' WHERE a1 = 3;
+SELECT COUNT(*) FROM tbl_csv;
+VACUUM tbl_csv;
+SELECT * FROM tbl_csv WHERE a1 >= 3;
+DELETE FROM tbl_csv WHERE a1 = 4;
+VACUUM;
+SELECT * FROM tbl_csv;
+SELECT * FROM tbl_paged WHERE a1 <> 3;
+SELECT * FROM tbl_columnar WHERE a2 = 'a much longer three';
+SELECT COUNT(*) FROM tbl_compressed;
+VACUUM tbl_2;
+DROP DATABASE db_vacuum;
+
+CREATE DATABASE db_columnar;
+USE db_columnar;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(20), a3 float, a4 bool) USING columnar;
+INSERT INTO tbl_1 VALUES (1, 'red', 1.5, true), (2, 'green', 2.5, false), (3, 'red', 3.5, true);
+INSERT INTO tbl_1 VALUES (4, 'blue', 4.5, false), (5, 'blue', 5.5, true), (6, 'red', 6.5, false);
+SELECT * FROM tbl_1 WHERE a1 <= 2;
+SELECT a1 FROM tbl_1 WHERE a2 = 'red';
+SELECT a3, a1 FROM tbl_1 WHERE a4 = true;
+SELECT a2, COUNT(*), SUM(a3) FROM tbl_1 GROUP BY a2 ORDER BY a2;
+UPDATE tbl_1 SET a2 = 'yellow' WHERE a1 = 2;
+DELETE FROM tbl_1 WHERE a3 > 5;
+SELECT a1, a2 FROM tbl_1 WHERE a1 > 1;
+VACUUM tbl_1;
+SELECT a4, a1 FROM tbl_1 WHERE a2 LIKE 'ye%';
+ALTER TABLE tbl_1 ADD a5 int DEFAULT 0;
+SELECT a5, a2 FROM tbl_1 WHERE a2 IN ('red', 'blue');
+SELECT COUNT(*), MIN(a3), MAX(a3) FROM tbl_1;
+DROP DATABASE db_columnar;
+
+CREATE DATABASE db_csv;
+USE db_csv;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(30), a3 float, a4 varchar(10)) USING csv;
+INSERT INTO tbl_1 VALUES (1, 'plain', 1.5, 'x'), (2, 'a, comma', 2.5, 'y');
+INSERT INTO tbl_1 VALUES (3, 'a "quoted" word', 3.5, 'z'), (4, 'it''s', 4.5, 'w');
+VACUUM tbl_1;
+SELECT * FROM tbl_1;
+SELECT a4 FROM tbl_1 WHERE a3 > 2;
+SELECT a3, a1 FROM tbl_1 WHERE a2 = 'a, comma';
+SELECT a1 FROM tbl_1 WHERE a2 LIKE '%"quoted"%';
+INSERT INTO tbl_1 VALUES (5, 'appended', 5.5, 'v');
+UPDATE tbl_1 SET a2 = 'changed, again' WHERE a1 = 1;
+SELECT a1, a2 FROM tbl_1 WHERE a1 IN (1, 5);
+DELETE FROM tbl_1 WHERE a4 = 'y';
+VACUUM tbl_1;
+SELECT a2, a4 FROM tbl_1;
+DROP DATABASE db_csv;
+
+CREATE DATABASE db_alter;
+USE db_alter;
+CREATE TABLE tbl_1 (a1 int, a2 varchar(20), a3 float);
+CREATE TABLE tbl_2 (a1 int, a2 varchar(20), a3 float) USING paged;
+INSERT INTO tbl_1 VALUES (1, 'Gizmo', 19.99), (2, 'PowerGizmo', 29.99);
+INSERT INTO tbl_2 VALUES (1, 'Gizmo', 19.99), (2, 'PowerGizmo', 29.99);
+CREATE INDEX tbl_1_a3 ON tbl_1(a3);
+ALTER TABLE tbl_1 ADD COLUMN qty int DEFAULT 5;
+ALTER TABLE tbl_1 ADD note varchar(10);
+INSERT INTO tbl_1 VALUES (3, 'SingleTouch', 149.99, 1, 'new');
+SELECT a1, note, qty FROM tbl_1;
+ALTER TABLE tbl_1 RENAME COLUMN a1 TO pid;
+SELECT pid, a2 FROM tbl_1 WHERE pid >= 2;
+ALTER TABLE tbl_1 DROP COLUMN a3;
+SELECT note, pid, a2 FROM tbl_1 WHERE qty = 5;
+DROP INDEX tbl_1_a3;
+UPDATE tbl_1 SET qty = 7 WHERE pid = 1;
+VACUUM tbl_1;
+SELECT pid, qty, a2 FROM tbl_1;
+ALTER TABLE tbl_1 DROP COLUMN a3;
+ALTER TABLE tbl_1 ADD pid int;
+ALTER TABLE tbl_2 ADD a4 bool DEFAULT true;
+ALTER TABLE tbl_2 DROP COLUMN a2;
+ALTER TABLE tbl_2 RENAME COLUMN a4 TO ok;
+SELECT * FROM tbl_2;
+DROP DATABASE db_alter;
+
+CREATE DATABASE db_join;
+USE db_join;
+CREATE TABLE Employee (id int, name varchar(10));
+CREATE TABLE Sales (employeeID int, productID int, qty int) USING paged;
+CREATE TABLE Product (pid int, pname varchar(20)) USING columnar;
+INSERT INTO Employee VALUES (1, 'Joe'), (2, 'Jack'), (3, 'Gill');
+INSERT INTO Sales VALUES (1, 344, 2), (1, 355, 1), (2, 544, 5), (4, 344, 1);
+INSERT INTO Product VALUES (344, 'Gizmo'), (355, 'PowerGizmo'), (544, 'Widget');
+SELECT * FROM Employee E, Sales S WHERE E.id = S.employeeID;
+SELECT * FROM Employee E INNER JOIN Sales S ON E.id = S.employeeID;
+SELECT S.productID, E.name FROM Employee E LEFT OUTER JOIN Sales S ON E.id = S.employeeID;
+SELECT name, pname, qty FROM Employee E JOIN Sales S ON E.id = S.employeeID JOIN Product P ON S.productID = P.pid WHERE qty > 1;
+CREATE INDEX employee_id ON Employee(id);
+EXPLAIN SELECT E.name, S.qty FROM Sales S JOIN Employee E ON S.employeeID = E.id WHERE S.productID = 355;
+SELECT E.name, S.qty FROM Sales S JOIN Employee E ON S.employeeID = E.id WHERE S.productID = 355;
+SELECT name, id FROM Employee E JOIN Sales S ON E.id = S.employeeID WHERE E.id = 9;
+DROP DATABASE db_join;
+
+CREATE DATABASE db_aggregate;
+USE db_aggregate;
+CREATE TABLE Employee (id int, name varchar(10));
+CREATE TABLE Sales (employeeID int, productID int, qty int, price float);
+INSERT INTO Employee VALUES (1, 'Joe'), (2, 'Jack'), (3, 'Gill');
+INSERT INTO Sales VALUES (1, 344, 2, 1.5), (1, 355, 1, 2.5), (2, 544, 5, 10.0), (3, 344, 1, 1.5);
+INSERT INTO Sales VALUES (1, 544, 3, 10.0), (3, 355, 4, 2.5);
+SELECT COUNT(*) FROM Sales;
+SELECT COUNT(*), SUM(qty), AVG(price), MIN(productID), MAX(price) FROM Sales WHERE qty > 1;
+SELECT productID, COUNT(*), SUM(qty) FROM Sales GROUP BY productID ORDER BY productID;
+SELECT E.name, COUNT(*), SUM(S.qty) FROM Employee E JOIN Sales S ON E.id = S.employeeID GROUP BY E.name HAVING COUNT(*) > 1 ORDER BY E.name;
+SELECT COUNT(*) FROM Sales WHERE qty > 10;
+.memory 2
+SELECT employeeID, MAX(qty), MIN(price) FROM Sales GROUP BY employeeID ORDER BY employeeID;
+DELETE FROM Sales WHERE employeeID = 1;
+SELECT COUNT(*), SUM(qty) FROM Sales;
+DROP DATABASE db_aggregate;
+
+CREATE DATABASE db_order;
+USE db_order;
+CREATE TABLE Product (pid int, name varchar(20), price float);
+INSERT INTO Product VALUES (1, 'Gizmo', 19.99), (2, 'PowerGizmo', 29.99), (3, 'SingleTouch', 149.99);
+INSERT INTO Product VALUES (4, 'MultiTouch', 199.99), (5, 'SuperGizmo', 49.99), (6, 'Gizmo', 9.99);
+SELECT name, price FROM Product ORDER BY price DESC;
+SELECT pid, name FROM Product ORDER BY name, pid DESC;
+SELECT name, price FROM Product ORDER BY price DESC LIMIT 2 OFFSET 1;
+SELECT pid FROM Product LIMIT 3;
+SELECT pid FROM Product ORDER BY pid LIMIT 2 OFFSET 5;
+SELECT name, COUNT(*) FROM Product GROUP BY name ORDER BY COUNT(*) DESC, name LIMIT 2;
+.memory 2
+SELECT pid, price FROM Product WHERE pid > 1 ORDER BY price;
+SELECT pid FROM Product ORDER BY price DESC LIMIT 0;
+DROP DATABASE db_order;
+
+CREATE DATABASE db_condition;
+USE db_condition;
+CREATE TABLE Product (pid int, name varchar(20), price float);
+INSERT INTO Product VALUES (1, 'Gizmo', 19.99), (2, 'PowerGizmo', 29.99), (3, 'SingleTouch', 149.99);
+INSERT INTO Product VALUES (4, 'MultiTouch', 199.99), (5, 'SuperGizmo', 49.99), (6, 'gizmo_2%', 9.99);
+SELECT pid FROM Product WHERE price BETWEEN 19.99 AND 49.99;
+SELECT pid FROM Product WHERE name BETWEEN 'Multi AND Gizmo' AND 'Single';
+SELECT pid FROM Product WHERE pid IN (1, 3, 5, 7);
+SELECT pid FROM Product WHERE name IN ('Gizmo', 'MultiTouch');
+SELECT name FROM Product WHERE name LIKE 'Gizmo%';
+SELECT name FROM Product WHERE name LIKE '%Gizmo';
+SELECT name FROM Product WHERE name LIKE '_izmo%';
+SELECT name FROM Product WHERE name LIKE '%Touch%';
+SELECT pid FROM Product WHERE name <> 'Gizmo';
+SELECT pid FROM Product WHERE price >= 49.99;
+UPDATE Product SET price = 0.5 WHERE name LIKE 'Super%';
+DELETE FROM Product WHERE pid IN (2, 4);
+SELECT pid, price FROM Product WHERE price BETWEEN 0 AND 20;
+DROP DATABASE db_condition;
+
+CREATE DATABASE db_explain;
+USE db_explain;
+CREATE TABLE Employee (id int, name varchar(10));
+CREATE TABLE Sales (employeeID int, productID int, qty int) USING compressed;
+INSERT INTO Employee VALUES (1, 'Joe'), (2, 'Jack'), (3, 'Gill');
+INSERT INTO Sales VALUES (1, 344, 2), (1, 355, 1), (2, 544, 5);
+VACUUM;
+CREATE INDEX employee_id ON Employee(id);
+EXPLAIN SELECT * FROM Employee WHERE id = 2;
+EXPLAIN SELECT name FROM Employee WHERE name LIKE 'J%' ORDER BY name LIMIT 1;
+EXPLAIN SELECT E.name, S.productID FROM Employee E JOIN Sales S ON E.id = S.employeeID WHERE E.id < 100;
+EXPLAIN SELECT employeeID, SUM(qty) FROM Sales GROUP BY employeeID;
+EXPLAIN INSERT INTO Sales VALUES (3, 344, 1);
+EXPLAIN UPDATE Employee SET name = 'Jill' WHERE id = 3;
+INSERT INTO Employee VALUES (4, 'Ann');
+EXPLAIN DELETE FROM Employee WHERE name = 'Joe';
+EXPLAIN CREATE TABLE tbl_1 (a1 int);
+.timer maybe
+.stats maybe
+SELECT COUNT(*) FROM Employee;
+DROP DATABASE db_explain;
+
+.EXIT
+
+-- Expected output
+--
+-- Database db_script created.
+-- Using database db_script.
+-- Table tbl_1 created.
+-- 1 new record inserted.
+-- 1 new record inserted.
+-- 3 new records inserted.
+-- 1 new record inserted.
+-- 1 new record inserted.
+-- a1 int | a2 varchar(40)
+-- 1 | multi line
+-- 2 | it's
+-- 3 | a;b
+-- 4 | x -- not a comment
+-- 5 | /* not a comment */
+-- 6 | say "hi"; bye
+-- 7 | a,b
+-- a1 int | a2 varchar(40)
+-- 2 | it's
+-- 1 records modified.
+-- a1 int | a2 varchar(40)
+-- 7 | x = y, z's
+-- Database db_script deleted.
+-- Database db_paged created.
+-- Using database db_paged.
+-- Table tbl_1 created.
+-- 3 new records inserted.
+-- 2 new records inserted.
+-- a1 int | a2 varchar(20) | a3 float
+-- 1 | Gizmo | 19.99
+-- 2 | PowerGizmo | 29.99
+-- 3 | SingleTouch | 149.99
+-- 4 | MultiTouch | 199.99
+-- 5 | SuperGizmo | 49.99
+-- 1 records modified.
+-- 0 records modified.
+-- 1 records deleted.
+-- a1 int | a2 varchar(20) | a3 float
+-- 1 | a longer name, moved | 19.99
+-- 2 | PowerGizmo | 29.99
+-- 3 | SingleTouch | 149.99
+-- 5 | SuperGizmo | 49.99
+-- Table tbl_1 vacuumed.
+-- a2 varchar(20) | a3 float
+-- a longer name, moved | 19.99
+-- PowerGizmo | 29.99
+-- Table tbl_1 modified
+-- 1 new record inserted.
+-- a1 int | a4 int | a2 varchar(20)
+-- 5 |  | SuperGizmo
+-- 6 | 60 | Widget
+-- Database db_paged deleted.
+-- Database db_index created.
+-- Using database db_index.
+-- Table tbl_1 created.
+-- 3 new records inserted.
+-- 2 new records inserted.
+-- Index tbl_1_a1 created.
+-- Index tbl_1_a2 created.
+-- SEARCH tbl_1 USING INDEX tbl_1_a1 (WHERE a1 =, ~5 rows)
+-- a1 int | a2 varchar(20) | a3 float
+-- 3 | SingleTouch | 149.99
+-- a1 int | a2 varchar(20) | a3 float
+-- 2 | PowerGizmo | 29.99
+-- 3 | SingleTouch | 149.99
+-- 4 | MultiTouch | 199.99
+-- a1 int | a3 float
+-- 3 | 149.99
+-- 5 | 49.99
+-- 1 records modified.
+-- 1 records deleted.
+-- 1 new record inserted.
+-- a1 int | a2 varchar(20) | a3 float
+-- 10 | PowerGizmo | 29.99
+-- 4 | MultiTouch | 199.99
+-- 5 | SuperGizmo | 49.99
+-- 6 | Widget | 5.5
+-- a1 int
+-- Index tbl_1_a1 deleted.
+-- SCAN tbl_1 (WHERE a1 =, zone map: 1 of 1 blocks, ~5 rows)
+-- a1 int | a2 varchar(20) | a3 float
+-- 5 | SuperGizmo | 49.99
+-- 10 | PowerGizmo | 29.99
+-- 6 | Widget | 5.5
+-- Database db_index deleted.
+-- Database db_catalog_1 created.
+-- Database db_catalog_2 created.
+-- Using database db_catalog_1.
+-- Table tbl_1 created.
+-- 2 new records inserted.
+-- a1 int | a2 varchar(20)
+-- 1 | one
+-- 2 | two
+-- Using database db_catalog_2.
+-- Table tbl_1 created.
+-- 1 new record inserted.
+-- b1 float | b2 int
+-- 1.5 | 3
+-- Using database db_catalog_1.
+-- a1 int | a2 varchar(20)
+-- 2 | two
+-- Table tbl_1 modified
+-- a1 int | a2 varchar(20) | a3 int
+-- 1 | one | 7
+-- 2 | two | 7
+-- Table tbl_1 modified
+-- name varchar(20)
+-- one
+-- Table tbl_1 deleted.
+-- !Failed to query table tbl_1 because it does not exist.
+-- Table tbl_1 created.
+-- 1 new record inserted.
+-- c1 varchar(5)
+-- new
+-- Database db_catalog_2 deleted.
+-- !Failed to use database db_catalog_2 because it does not exist.
+-- c1 varchar(5)
+-- new
+-- Database db_catalog_1 deleted.
+-- Database db_prepare created.
+-- Using database db_prepare.
+-- Table tbl_1 created.
+-- Statement add_row prepared.
+-- 1 new record inserted.
+-- 1 new record inserted.
+-- 1 new record inserted.
+-- Statement find_row prepared.
+-- a2 varchar(20) | a3 float
+-- PowerGizmo | 29.99
+-- a2 varchar(20) | a3 float
+-- it's | 149.99
+-- Statement set_price prepared.
+-- 1 records modified.
+-- Statement drop_rows prepared.
+-- 1 records deleted.
+-- a1 int | a2 varchar(20) | a3 float
+-- 1 | Gizmo | 9.5
+-- 2 | PowerGizmo | 29.99
+-- Error: statement needs 1 parameters but 2 were supplied
+-- Statement find_row deallocated.
+-- !Failed to execute statement find_row because it does not exist.
+-- a1 int | a2 varchar(20) | a3 float
+-- 1 | Gizmo | 9.5
+-- a1 int | a2 varchar(20) | a3 float
+-- 2 | PowerGizmo | 29.99
+-- Database db_prepare deleted.
+-- Database db_vacuum created.
+-- Using database db_vacuum.
+-- Table tbl_csv created.
+-- Table tbl_paged created.
+-- Table tbl_columnar created.
+-- Table tbl_compressed created.
+-- 4 new records inserted.
+-- 4 new records inserted.
+-- 4 new records inserted.
+-- 4 new records inserted.
+-- 1 records deleted.
+-- 1 records modified.
+-- 1 records deleted.
+-- 1 records modified.
+-- 1 records deleted.
+-- 1 records modified.
+-- 1 records deleted.
+-- 1 records modified.
+-- COUNT(*) int
+-- 3
+-- Table tbl_csv vacuumed.
+-- a1 int | a2 varchar(20)
+-- 3 | a much longer three
+-- 4 | four
+-- 1 records deleted.
+-- Table tbl_columnar vacuumed.
+-- Table tbl_compressed vacuumed.
+-- Table tbl_csv vacuumed.
+-- Table tbl_paged vacuumed.
+-- a1 int | a2 varchar(20)
+-- 1 | one
+-- 3 | a much longer three
+-- a1 int | a2 varchar(20)
+-- 1 | one
+-- 4 | four
+-- a1 int | a2 varchar(20)
+-- 3 | a much longer three
+-- COUNT(*) int
+-- 3
+-- !Failed to vacuum table tbl_2 because it does not exist.
+-- Database db_vacuum deleted.
+-- Database db_columnar created.
+-- Using database db_columnar.
+-- Table tbl_1 created.
+-- 3 new records inserted.
+-- 3 new records inserted.
+-- a1 int | a2 varchar(20) | a3 float | a4 bool
+-- 1 | red | 1.5 | True
+-- 2 | green | 2.5 | False
+-- a1 int
+-- 1
+-- 3
+-- 6
+-- a3 float | a1 int
+-- 1.5 | 1
+-- 3.5 | 3
+-- 5.5 | 5
+-- a2 varchar(20) | COUNT(*) int | SUM(a3) float
+-- blue | 2 | 10.0
+-- green | 1 | 2.5
+-- red | 3 | 11.5
+-- 1 records modified.
+-- 2 records deleted.
+-- a1 int | a2 varchar(20)
+-- 2 | yellow
+-- 3 | red
+-- 4 | blue
+-- Table tbl_1 vacuumed.
+-- a4 bool | a1 int
+-- False | 2
+-- Table tbl_1 modified
+-- a5 int | a2 varchar(20)
+-- 0 | red
+-- 0 | red
+-- 0 | blue
+-- COUNT(*) int | MIN(a3) float | MAX(a3) float
+-- 4 | 1.5 | 4.5
+-- Database db_columnar deleted.
+-- Database db_csv created.
+-- Using database db_csv.
+-- Table tbl_1 created.
+-- 2 new records inserted.
+-- 2 new records inserted.
+-- Table tbl_1 vacuumed.
+-- a1 int | a2 varchar(30) | a3 float | a4 varchar(10)
+-- 1 | plain | 1.5 | x
+-- 2 | a, comma | 2.5 | y
+-- 3 | a "quoted" word | 3.5 | z
+-- 4 | it's | 4.5 | w
+-- a4 varchar(10)
+-- y
+-- z
+-- w
+-- a3 float | a1 int
+-- 2.5 | 2
+-- a1 int
+-- 3
+-- 1 new record inserted.
+-- 1 records modified.
+-- a1 int | a2 varchar(30)
+-- 1 | changed, again
+-- 5 | appended
+-- 1 records deleted.
+-- Table tbl_1 vacuumed.
+-- a2 varchar(30) | a4 varchar(10)
+-- a "quoted" word | z
+-- it's | w
+-- changed, again | x
+-- appended | v
+-- Database db_csv deleted.
+-- Database db_alter created.
+-- Using database db_alter.
+-- Table tbl_1 created.
+-- Table tbl_2 created.
+-- 2 new records inserted.
+-- 2 new records inserted.
+-- Index tbl_1_a3 created.
+-- Table tbl_1 modified
+-- Table tbl_1 modified
+-- 1 new record inserted.
+-- a1 int | note varchar(10) | qty int
+-- 1 |  | 5
+-- 2 |  | 5
+-- 3 | new | 1
+-- Table tbl_1 modified
+-- pid int | a2 varchar(20)
+-- 2 | PowerGizmo
+-- 3 | SingleTouch
+-- Table tbl_1 modified
+-- note varchar(10) | pid int | a2 varchar(20)
+--  | 1 | Gizmo
+--  | 2 | PowerGizmo
+-- !Failed to delete index tbl_1_a3 because it does not exist.
+-- 1 records modified.
+-- Table tbl_1 vacuumed.
+-- pid int | qty int | a2 varchar(20)
+-- 2 | 5 | PowerGizmo
+-- 3 | 1 | SingleTouch
+-- 1 | 7 | Gizmo
+-- Error: column a3 does not exist
+-- Error: column pid already exists
+-- Table tbl_2 modified
+-- Table tbl_2 modified
+-- Table tbl_2 modified
+-- a1 int | a3 float | ok bool
+-- 1 | 19.99 | True
+-- 2 | 29.99 | True
+-- Database db_alter deleted.
+-- Database db_join created.
+-- Using database db_join.
+-- Table employee created.
+-- Table sales created.
+-- Table product created.
+-- 3 new records inserted.
+-- 4 new records inserted.
+-- 3 new records inserted.
+-- id int | name varchar(10) | employeeID int | productID int | qty int
+-- 1 | Joe | 1 | 344 | 2
+-- 1 | Joe | 1 | 355 | 1
+-- 2 | Jack | 2 | 544 | 5
+-- id int | name varchar(10) | employeeID int | productID int | qty int
+-- 1 | Joe | 1 | 344 | 2
+-- 1 | Joe | 1 | 355 | 1
+-- 2 | Jack | 2 | 544 | 5
+-- productID int | name varchar(10)
+-- 344 | Joe
+-- 355 | Joe
+-- 544 | Jack
+--  | Gill
+-- name varchar(10) | pname varchar(20) | qty int
+-- Joe | Gizmo | 2
+-- Jack | Widget | 5
+-- Index employee_id created.
+-- SCAN sales AS s (WHERE productID =, zone map: 1 of 1 blocks, ~4 rows)
+-- HASH JOIN employee AS e ON s.employeeID = e.id (hash table of e)
+--   SCAN employee AS e (~3 rows)
+-- name varchar(10) | qty int
+-- Joe | 1
+-- name varchar(10) | id int
+-- Database db_join deleted.
+-- Database db_aggregate created.
+-- Using database db_aggregate.
+-- Table employee created.
+-- Table sales created.
+-- 3 new records inserted.
+-- 4 new records inserted.
+-- 2 new records inserted.
+-- COUNT(*) int
+-- 6
+-- COUNT(*) int | SUM(qty) int | AVG(price) float | MIN(productID) int | MAX(price) float
+-- 4 | 14 | 6.0 | 344 | 10.0
+-- productID int | COUNT(*) int | SUM(qty) int
+-- 344 | 2 | 3
+-- 355 | 2 | 5
+-- 544 | 2 | 8
+-- name varchar(10) | COUNT(*) int | SUM(S.qty) int
+-- Gill | 2 | 5
+-- Joe | 3 | 6
+-- COUNT(*) int
+-- 0
+-- Sorts and aggregations will keep up to 2 rows in memory.
+-- employeeID int | MAX(qty) int | MIN(price) float
+-- 1 | 3 | 1.5
+-- 2 | 5 | 10.0
+-- 3 | 4 | 1.5
+-- 3 records deleted.
+-- COUNT(*) int | SUM(qty) int
+-- 3 | 10
+-- Database db_aggregate deleted.
+-- Database db_order created.
+-- Using database db_order.
+-- Table product created.
+-- 3 new records inserted.
+-- 3 new records inserted.
+-- name varchar(20) | price float
+-- MultiTouch | 199.99
+-- SingleTouch | 149.99
+-- SuperGizmo | 49.99
+-- PowerGizmo | 29.99
+-- Gizmo | 19.99
+-- Gizmo | 9.99
+-- pid int | name varchar(20)
+-- 6 | Gizmo
+-- 1 | Gizmo
+-- 4 | MultiTouch
+-- 2 | PowerGizmo
+-- 3 | SingleTouch
+-- 5 | SuperGizmo
+-- name varchar(20) | price float
+-- SingleTouch | 149.99
+-- SuperGizmo | 49.99
+-- pid int
+-- 1
+-- 2
+-- 3
+-- pid int
+-- 6
+-- name varchar(20) | COUNT(*) int
+-- Gizmo | 2
+-- MultiTouch | 1
+-- Sorts and aggregations will keep up to 2 rows in memory.
+-- pid int | price float
+-- 6 | 9.99
+-- 2 | 29.99
+-- 5 | 49.99
+-- 3 | 149.99
+-- 4 | 199.99
+-- pid int
+-- Database db_order deleted.
+-- Database db_condition created.
+-- Using database db_condition.
+-- Table product created.
+-- 3 new records inserted.
+-- 3 new records inserted.
+-- pid int
+-- 1
+-- 2
+-- 5
+-- pid int
+-- 2
+-- 4
+-- pid int
+-- 1
+-- 3
+-- 5
+-- pid int
+-- 1
+-- 4
+-- name varchar(20)
+-- Gizmo
+-- name varchar(20)
+-- Gizmo
+-- PowerGizmo
+-- SuperGizmo
+-- name varchar(20)
+-- Gizmo
+-- gizmo_2%
+-- name varchar(20)
+-- SingleTouch
+-- MultiTouch
+-- pid int
+-- 2
+-- 3
+-- 4
+-- 5
+-- 6
+-- pid int
+-- 3
+-- 4
+-- 5
+-- 1 records modified.
+-- 2 records deleted.
+-- pid int | price float
+-- 1 | 19.99
+-- 5 | 0.5
+-- 6 | 9.99
+-- Database db_condition deleted.
+-- Database db_explain created.
+-- Using database db_explain.
+-- Table employee created.
+-- Table sales created.
+-- 3 new records inserted.
+-- 3 new records inserted.
+-- Table employee vacuumed.
+-- Table sales vacuumed.
+-- Index employee_id created.
+-- SEARCH employee USING INDEX employee_id (WHERE id =, ~3 rows)
+-- SCAN employee (WHERE name LIKE, zone map: 1 of 1 blocks, ~3 rows)
+-- SORT (top 1 rows in a heap)
+-- LIMIT 1
+-- SEARCH employee AS e USING INDEX employee_id (WHERE id <, ~3 rows)
+-- HASH JOIN sales AS s ON e.id = s.employeeID (hash table of s)
+--   SCAN sales AS s (~3 rows)
+-- SCAN sales (~3 rows)
+-- HASH AGGREGATE BY sales.employeeID
+-- INSERT INTO sales (1 row, into the write-ahead log)
+-- SEARCH employee USING INDEX employee_id (WHERE id =, ~3 rows)
+-- UPDATE employee
+-- 1 new record inserted.
+-- SCAN employee (WHERE name =, zone map: 1 of 1 blocks, ~4 rows, merged with the write-ahead log)
+-- DELETE FROM employee
+-- Error: EXPLAIN needs a SELECT, INSERT, UPDATE or DELETE command
+-- Error: the setting must be "on" or "off"
+-- Error: the setting must be "on" or "off"
+-- COUNT(*) int
+-- 4
+-- Database db_explain deleted.
+-- All done.
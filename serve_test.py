@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# Server: reads see the writes of other sessions
+#
+# Starts the server on a Unix socket, then has one session write to a table
+# of each engine while several sessions read it, which the read workers run
+# with what they cached of the table before.
+
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SOCKET = os.path.join(tempfile.gettempdir(), 'sqlite-clone-test.sock')
+PROMPT = b'> '
+
+
+async def session(statements):
+    reader, writer = await asyncio.open_unix_connection(SOCKET)
+    output = []
+    await reader.readuntil(PROMPT)
+    for statement in statements:
+        writer.write((statement + '\n').encode())
+        output.append((await reader.readuntil(b'\n' + PROMPT))[:-len(PROMPT)].decode())
+    writer.close()
+    return output
+
+
+async def reads(statements, sessions=8):
+    outputs = await asyncio.gather(*[session(['USE db_serve;'] + statements) for _ in range(sessions)])
+    for output in sorted(set(tuple(output[1:]) for output in outputs)):
+        print(''.join(output), end='')
+
+
+async def main():
+    await session(['CREATE DATABASE db_serve;'])
+    for engine in ('csv', 'paged', 'columnar', 'compressed'):
+        tbl_name = 'tbl_' + engine
+        select = 'SELECT * FROM %s WHERE a1 = 2;' % tbl_name
+        await session(['USE db_serve;', 'CREATE TABLE %s (a1 int, a2 varchar(20)) USING %s;' % (tbl_name, engine),
+                       "INSERT INTO %s VALUES (1, 'name1'), (2, 'name2'), (3, 'name3');" % tbl_name])
+        await reads([select])
+        await session(['USE db_serve;', "UPDATE %s SET a2 = 'b' WHERE a1 = 2;" % tbl_name])
+        await reads([select])
+        await session(['USE db_serve;', 'DELETE FROM %s WHERE a1 = 1;' % tbl_name, 'VACUUM %s;' % tbl_name])
+        await reads([select, 'SELECT COUNT(*) FROM %s;' % tbl_name])
+        await session(['USE db_serve;', 'ALTER TABLE %s ADD a3 int;' % tbl_name,
+                       'CREATE INDEX idx_%s ON %s (a1);' % (engine, tbl_name)])
+        await reads(['EXPLAIN ' + select, select])
+        await session(['USE db_serve;', 'DROP TABLE %s;' % tbl_name,
+                       'CREATE TABLE %s (a1 int, a4 varchar(5)) USING %s;' % (tbl_name, engine),
+                       "INSERT INTO %s VALUES (2, 'new');" % tbl_name])
+        await reads([select])
+    await session(['DROP DATABASE db_serve;'])
+
+
+server = subprocess.Popen([sys.executable, 'sqlite-clone.py', '--serve', SOCKET, '--workers', '3'],
+                          stdout=subprocess.DEVNULL)
+try:
+    while not os.path.exists(SOCKET):
+        time.sleep(0.1)
+    asyncio.get_event_loop().run_until_complete(main())
+finally:
+    server.terminate()
+    server.wait()
+
+# Expected output
+#
+# a1 int | a2 varchar(20)
+# 2 | name2
+# a1 int | a2 varchar(20)
+# 2 | b
+# a1 int | a2 varchar(20)
+# 2 | b
+# COUNT(*) int
+# 2
+# SEARCH tbl_csv USING INDEX idx_csv (WHERE a1 =, ~2 rows)
+# a1 int | a2 varchar(20) | a3 int
+# 2 | b |
+# a1 int | a4 varchar(5)
+# 2 | new
+# a1 int | a2 varchar(20)
+# 2 | name2
+# a1 int | a2 varchar(20)
+# 2 | b
+# a1 int | a2 varchar(20)
+# 2 | b
+# COUNT(*) int
+# 2
+# SEARCH tbl_paged USING INDEX idx_paged (WHERE a1 =, ~2 rows)
+# a1 int | a2 varchar(20) | a3 int
+# 2 | b |
+# a1 int | a4 varchar(5)
+# 2 | new
+# a1 int | a2 varchar(20)
+# 2 | name2
+# a1 int | a2 varchar(20)
+# 2 | b
+# a1 int | a2 varchar(20)
+# 2 | b
+# COUNT(*) int
+# 2
+# SEARCH tbl_columnar USING INDEX idx_columnar (WHERE a1 =, ~2 rows)
+# a1 int | a2 varchar(20) | a3 int
+# 2 | b |
+# a1 int | a4 varchar(5)
+# 2 | new
+# a1 int | a2 varchar(20)
+# 2 | name2
+# a1 int | a2 varchar(20)
+# 2 | b
+# a1 int | a2 varchar(20)
+# 2 | b
+# COUNT(*) int
+# 2
+# SEARCH tbl_compressed USING INDEX idx_compressed (WHERE a1 =, ~2 rows)
+# a1 int | a2 varchar(20) | a3 int
+# 2 | b |
+# a1 int | a4 varchar(5)
+# 2 | new
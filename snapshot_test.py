@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# Snapshot reads: reading a table while another process writes to it
+#
+# A child process logs an UPDATE, a DELETE and an INSERT, then holds the
+# write-ahead log as a writer (or a checkpoint applying the log) does. The
+# parent reads the table meanwhile without waiting for the child: it sees
+# the stored rows with the writes logged so far merged in. A table whose rows
+# the parent keeps in its buffer pool is read from its files again once the
+# child wrote to it. `.stats` counts the rows read from the log as scanned.
+
+import contextlib
+import io
+import multiprocessing
+import sqlite_clone
+
+connection = sqlite_clone.connect('dbs', autocommit=True)
+connection.execute('CREATE DATABASE db_snapshot')
+connection.execute('USE db_snapshot')
+context = multiprocessing.get_context('fork')
+
+
+def write(tbl_name, logged, done):
+    child = sqlite_clone.connect('dbs', autocommit=True)
+    child.execute('USE db_snapshot')
+    child.execute("UPDATE %s SET a2 = 'changed' WHERE a1 = 2" % tbl_name)
+    child.execute('DELETE FROM %s WHERE a1 = 3' % tbl_name)
+    child.execute("INSERT INTO %s VALUES (6, 'inserted')" % tbl_name)
+    with sqlite_clone.wal_lock('db_snapshot'):
+        logged.set()
+        done.wait()
+
+
+def update(tbl_name):
+    child = sqlite_clone.connect('dbs', autocommit=True)
+    child.execute('USE db_snapshot')
+    child.execute("UPDATE %s SET a2 = 'changed' WHERE a1 = 2" % tbl_name)
+    sqlite_clone.wal_checkpoint('db_snapshot')
+    child.close()
+
+
+def scan(tbl_name):
+    hits, misses = sqlite_clone.cache_hits, sqlite_clone.cache_misses
+    rows = connection.execute('SELECT * FROM %s' % tbl_name).fetchall()
+    print(rows, sqlite_clone.cache_hits - hits, sqlite_clone.cache_misses - misses)
+
+
+def stats(statement):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        sqlite_clone.run_measured(connection.cursor(), statement)
+    print([line for line in output.getvalue().splitlines() if line.startswith(('Rows', 'Bytes'))])
+
+
+for engine in ('csv', 'paged', 'columnar', 'compressed'):
+    tbl_name = 'tbl_' + engine
+    connection.execute('CREATE TABLE %s (a1 int, a2 varchar(20)) USING %s' % (tbl_name, engine))
+    connection.executemany('INSERT INTO %s VALUES (?, ?)' % tbl_name, [(i, 'name%i' % i) for i in range(1, 6)])
+    sqlite_clone.wal_checkpoint('db_snapshot')
+
+    logged, done = context.Event(), context.Event()
+    writer = context.Process(target=write, args=(tbl_name, logged, done))
+    writer.start()
+    logged.wait()
+    print(connection.execute('SELECT * FROM %s' % tbl_name).fetchall())
+    print(connection.execute('SELECT COUNT(*) FROM %s' % tbl_name).fetchone())
+    done.set()
+    writer.join()
+
+    # applying the log doesn't change which rows are read (it may move them)
+    sqlite_clone.wal_checkpoint('db_snapshot')
+    print(sorted(connection.execute('SELECT * FROM %s WHERE a1 > 1' % tbl_name).fetchall()))
+
+# the second scan reads the buffer pool, the scan after the child's write the
+# table's files
+for engine in ('csv', 'paged', 'columnar', 'compressed'):
+    tbl_name = 'tbl_pool_' + engine
+    connection.execute('CREATE TABLE %s (a1 int, a2 varchar(20)) USING %s' % (tbl_name, engine))
+    connection.executemany('INSERT INTO %s VALUES (?, ?)' % tbl_name, [(i, 'name%i' % i) for i in range(1, 4)])
+    sqlite_clone.wal_checkpoint('db_snapshot')
+    scan(tbl_name)
+    scan(tbl_name)
+    writer = context.Process(target=update, args=(tbl_name,))
+    writer.start()
+    writer.join()
+    scan(tbl_name)
+
+# a pool too small for a table's rows doesn't keep them
+sqlite_clone.set_cache_size('10')
+scan('tbl_pool_csv')
+scan('tbl_pool_csv')
+sqlite_clone.set_cache_size('64MB')
+
+# rows logged and not yet applied are scanned too
+sqlite_clone.set_stats('on')
+for engine in ('csv', 'paged', 'columnar', 'compressed'):
+    tbl_name = 'tbl_stats_' + engine
+    connection.execute('CREATE TABLE %s (a1 int, a2 varchar(20)) USING %s' % (tbl_name, engine))
+    connection.executemany('INSERT INTO %s VALUES (?, ?)' % tbl_name, [(i, 'name%i' % i) for i in range(1, 4)])
+    stats('SELECT * FROM %s WHERE a1 = 2;' % tbl_name)
+    sqlite_clone.wal_checkpoint('db_snapshot')
+    stats('SELECT * FROM %s WHERE a1 = 2;' % tbl_name)
+sqlite_clone.set_stats('off')
+
+connection.execute('DROP DATABASE db_snapshot')
+connection.close()
+
+# Expected output
+#
+# [(1, 'name1'), (2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# (5,)
+# [(2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# [(1, 'name1'), (2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# (5,)
+# [(2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# [(1, 'name1'), (2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# (5,)
+# [(2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# [(1, 'name1'), (2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# (5,)
+# [(2, 'changed'), (4, 'name4'), (5, 'name5'), (6, 'inserted')]
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 1 0
+# [(1, 'name1'), (3, 'name3'), (2, 'changed')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 1 0
+# [(1, 'name1'), (2, 'changed'), (3, 'name3')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 1 0
+# [(1, 'name1'), (2, 'changed'), (3, 'name3')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 0 1
+# [(1, 'name1'), (2, 'name2'), (3, 'name3')] 1 0
+# [(1, 'name1'), (3, 'name3'), (2, 'changed')] 0 1
+# The buffer pool will keep up to 10 bytes of rows.
+# [(1, 'name1'), (3, 'name3'), (2, 'changed')] 0 0
+# [(1, 'name1'), (3, 'name3'), (2, 'changed')] 0 0
+# The buffer pool will keep up to 67108864 bytes of rows.
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     51']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     23']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     51']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     8192']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     51']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     39']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     51']
+# ['Rows scanned:   3', 'Rows returned:  1', 'Bytes read:     39']
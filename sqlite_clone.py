@@ -0,0 +1,8654 @@
+#!/usr/bin/env python3
+
+# Programming Assignment 2 - Data Manipulation
+#
+# Author: Adam Landis
+# Date: 03/12/2020
+# History:
+# - 02/20/2020 -- Completed implementation of all metadata functionality (e.g.
+#   creating and dropping databases and tables, using, altering, and querying
+#   tables, etc.)
+
+import os  # for writing directories and files
+import shutil  # for writing directories and files
+import re  # for using regular expressions
+import csv  # for working with comma-delimited files
+import io  # for capturing the output of statements
+import struct  # for packing typed values into binary records
+import bisect  # for searching sorted index entries
+import marshal  # for serializing index nodes
+import time  # for timing out cached catalog entries
+import collections  # for the LRU plan cache
+import zlib  # for checksumming write-ahead log records and compressing table segments
+import lzma  # for compressing the segments of vacuumed compressed tables
+import heapq  # for merging the writes of a transaction into table scans
+import array  # for the typed column vectors of columnar tables
+import itertools  # for selecting rows of column chunks
+import mmap  # for scanning CSV tables without copying their lines
+import multiprocessing  # for scanning large CSV tables in parallel
+import tempfile  # for spilling the groups of large aggregations to disk
+import cProfile  # for profiling a statement (see `set_profile`)
+import pstats  # for reporting the profile of a statement
+import tracemalloc  # for tracing the memory allocations of a statement
+import argparse  # for parsing the command line arguments
+import contextlib  # for capturing the output of the statements of server sessions
+import asyncio  # for serving client sessions over sockets
+import signal  # for stopping the server
+import concurrent.futures  # for the thread running the writes of server sessions
+import fcntl  # for locking tables against other processes
+import operator  # for picking the selected columns out of rows
+import threading  # for running the statements of connections one at a time
+import weakref  # for tracking the open connections
+import sys  # for reading scripts from the standard input
+import codecs  # for decoding scripts as they are read
+
+# Global Constants
+
+DB_DIR = 'dbs'
+INIT_DB = 'main'
+DOT_COMMAND_REGEX = re.compile('^\.([a-z_]*)( +.*)? *$', re.I)
+QUERY_COMMAND_REGEX = re.compile(
+    '^(CREATE|DROP|USE|SELECT|ALTER|INSERT|UPDATE|DELETE|PREPARE|EXECUTE|DEALLOCATE|VACUUM|BEGIN|COMMIT|ROLLBACK|EXPLAIN)'
+    ' *((?:[^;\'"]+|\'[^\']*\'|"[^"]*")*)[ ;]*|^[ ;]*(;)$', re.I)
+CREATE_REGEX = re.compile('^(DATABASE|TABLE|INDEX) *(.+)$', re.I)
+DROP_REGEX = re.compile('^(DATABASE|TABLE|INDEX) *(.+)$', re.I)
+USE_REGEX = re.compile('^[a-z0-9_-]+$', re.I)
+SELECT_REGEX = re.compile('^([a-z0-9_*, -]+) +FROM +([a-z0-9_-]+)( +WHERE +(.+))?$', re.I)
+JOIN_SELECT_REGEX = re.compile('^(.+?) +FROM +(.+?)(?: +WHERE +(.+))?$', re.I)
+JOIN_REGEX = re.compile('(?: *(,) *| +(INNER +|LEFT +(?:OUTER +)?)?JOIN +)', re.I)  # splits a FROM clause into tables
+JOIN_ON_REGEX = re.compile(' +ON +', re.I)
+TABLE_REF_REGEX = re.compile('^([a-z0-9_-]+)(?: +(?:AS +)?([a-z0-9_-]+))?$', re.I)  # a table and its alias
+SELECT_CLAUSES_REGEX = re.compile(  # splits GROUP BY, HAVING, ORDER BY, LIMIT and OFFSET off a SELECT
+    '^((?:\'[^\']*\'|"[^"]*"|[^\'"])+?)(?: +GROUP +BY +(.+?))?(?: +HAVING +(.+?))?(?: +ORDER +BY +(.+?))?'
+    '(?: +LIMIT +([0-9]+|\\?))?(?: +OFFSET +([0-9]+|\\?))?$', re.I)
+ORDER_ITEM_REGEX = re.compile('^(.+?)(?: +(ASC|DESC))?$', re.I)  # a column of an ORDER BY clause
+AGGREGATE_REGEX = re.compile('^(COUNT|SUM|AVG|MIN|MAX) *\\( *(\\*|[a-z0-9_.-]+) *\\)$', re.I)
+INSERT_REGEX = re.compile('^INTO +([a-zA-Z0-9_-]+) +VALUES *(\\(.*\\))$', re.I)
+VALUE_REGEX = re.compile(  # one value of a value list (or key/value pair of a SET clause)
+    '\\s*([^,\'"]*(?:(?:\'[^\']*\'|"[^"]*")[^,\'"]*)*|[^,]*)\\s*(,|$)')
+CSV_FIELD_REGEX = re.compile('(?:^|,)(?:"((?:[^"]|"")*)"|([^,]*))')  # one field of a line of a CSV table
+VALUE_LIST_REGEX = re.compile('\\s*\\(((?:\'[^\']*\'|"[^"]*"|[^()\'"])*)\\)\\s*(,|$)')  # one (...) of a VALUES clause
+UPDATE_REGEX = re.compile('^([a-zA-Z0-9_-]+) +SET +(.*) +WHERE +(.*)$', re.I)
+DELETE_REGEX = re.compile('^FROM ([a-z0-9_-]+) WHERE (.+)$', re.I)
+ALTER_REGEX = re.compile('^(TABLE) *(.+)$', re.I)
+ALTER_TABLE_REGEX = re.compile('^([a-z0-9_-]+) *(ADD|DROP|RENAME) +(?:COLUMN +)?(.+)$', re.I)
+COLUMN_DEFAULT_REGEX = re.compile('^(.+?) +DEFAULT +(.+)$', re.I)
+RENAME_COLUMN_REGEX = re.compile('^([^ ]+) +TO +([^ ]+)$', re.I)
+TABLE_REGEX = re.compile('^([a-z0-9_-]+) *\\((.*)\\)( +USING +([a-z]+))?$', re.I)
+INDEX_REGEX = re.compile('^([a-z0-9_-]+) +ON +([a-z0-9_-]+) *\\( *([a-z0-9_-]+) *\\)$', re.I)
+PREPARE_REGEX = re.compile('^([a-z0-9_-]+) +AS +(SELECT|INSERT|UPDATE|DELETE) +(.+)$', re.I)
+EXECUTE_REGEX = re.compile('^([a-z0-9_-]+)( *\\((.*)\\))?$', re.I)
+KEYWORD_REGEX = re.compile('[a-z]*', re.I)  # the command keyword a statement starts with
+WHERE_REGEX = re.compile('^(.+?) +(=|>|<|>=|<=|<>|!=|LIKE|IN|BETWEEN) +(.*)$', re.I)
+BETWEEN_REGEX = re.compile('(\'[^\']*\'|"[^"]*")| +AND +', re.I)  # the AND of a BETWEEN outside of quotes
+LIKE_WILDCARD_REGEX = re.compile('[%_]')  # '%' matches any run of characters, '_' any single character
+WHITESPACE_REGEX = re.compile('(\'[^\']*\'|"[^"]*")|\\s+')  # whitespace outside of quotes
+SCRIPT_SKIP_REGEX = re.compile('(?:\\s|--[^\\n]*\\n|/\\*.*?\\*/)*', re.S)  # whitespace and comments between statements
+SCRIPT_STATEMENT_REGEX = re.compile(  # a statement of a script, up to the ';' outside of quotes and comments
+    '[^\'";/-]*(?:(?:\'[^\']*\'|"[^"]*"|--[^\\n]*\\n|/\\*.*?\\*/|/(?!\\*)|-(?!-))[^\'";/-]*)*;', re.S)
+LINE_BREAK_REGEX = re.compile('[ \\t]*(?:\\r\\n?|\\n)')  # a line break and the whitespace before it
+SCRIPT_CLEAN_REGEX = re.compile('(\'[^\']*\'|"[^"]*")|(?:\\s|--[^\\n]*(?:\\n|$)|/\\*.*?\\*/)+', re.S)  # comments and whitespace outside of quotes
+CACHE_SIZE_REGEX = re.compile('^([0-9]+)(B|KB|MB|GB)?$', re.I)  # the size given to .cache_size, e.g. 256MB
+WAL_SYNC_REGEX = re.compile('^[0-9]*\\.?[0-9]+$')  # the interval given to .wal_sync, e.g. 0.5
+PARAMETER = '?'  # placeholder for a parameter of a prepared statement
+PLAN_CACHE_SIZE = 256  # number of compiled statements kept in the plan cache
+FETCH_ROWS = 1024  # number of rows a cursor reads ahead (see `Cursor.fetchmany`)
+SCRIPT_CHUNK = 1 << 20  # number of bytes of a script read at a time (see `script_statements`)
+TRANSACTION_COMMANDS = ('begin', 'commit', 'rollback', 'prepare', 'execute', 'deallocate', 'explain')  # allowed besides DML
+CHECKPOINT_COMMANDS = ('create', 'drop', 'alter', 'vacuum')  # apply the write-ahead log before they run
+DEFAULT_ENGINE = 'csv'  # storage engine used by CREATE TABLE when none is given
+CATALOG_TTL = 1.0  # seconds cached table metadata is trusted before its files are checked again
+AUTO_VACUUM_THRESHOLD = 0.5  # fraction of dead space at which UPDATE and DELETE vacuum a table
+TOMBSTONE_EXT = '.del'  # tombstone files of CSV tables are named <table>.del
+SCHEMA_EXT = '.schema'  # the headers of altered tables are stored in <table>.schema
+TOMBSTONE = struct.Struct('<QI')  # row id, line length of a dead row of a CSV table
+
+# DB-API 2.0 module globals (see `connect`)
+apilevel = '2.0'
+threadsafety = 1  # threads may share the module, but not connections
+paramstyle = 'qmark'  # parameters are `?`s, as in prepared statements
+
+# Paged storage engine constants
+PAGE_SIZE = 4096  # size in bytes of every page in a paged table file
+PAGED_MAGIC = b'SQLCPAGE'  # magic number identifying a paged table file
+PAGED_VERSION = 2  # on-disk format version of paged table files
+PAGED_HEADER = struct.Struct('<8sHHQQH')  # magic, version, page size, row count, dead row count, schema length
+DATA_PAGE_HEADER = struct.Struct('<BBHHH')  # page type, flags, slot count, free start, free end
+SLOT = struct.Struct('<HH')  # record offset, record length
+SLOT_DEAD = 0x8000  # flag set in the record length of a slot whose row was deleted
+VARLEN = struct.Struct('<H')  # length prefix of variable-length fields
+DATA_PAGE = 1  # page type of pages holding row records
+FSM_GROUP = PAGE_SIZE + 1  # a free-space map page followed by the data pages it tracks
+FSM_UNIT = 16  # granularity in bytes of free-space map entries
+READ_AHEAD = 64  # number of pages read at a time when scanning
+
+# Columnar storage engine constants
+COLUMNAR_MAGIC = b'SQLCCOLS'  # magic number identifying a columnar table file
+COLUMNAR_VERSION = 1  # on-disk format version of columnar table files
+COLUMNAR_HEADER = struct.Struct('<8sHIH')  # magic, version, file generation, schema length
+LIVE_EXT = '.live'  # live row maps are named <table>.<generation>.live
+COLUMN_EXT = '.col'  # column files are named <table>.<generation>.<column number>.col
+DICT_EXT = '.dict'  # string dictionaries are named <table>.<generation>.<column number>.dict
+DICT_ENTRY = struct.Struct('<I')  # length prefix of the strings of a dictionary
+COLUMN_CHUNK = 1 << 16  # number of rows filtered and decoded at a time by scans
+INT_NULL = -2 ** 63  # stored value of NULL in int columns
+
+# Compressed storage engine constants
+COMPRESSED_MAGIC = b'SQLCCMPR'  # magic number identifying a compressed table file
+COMPRESSED_VERSION = 1  # on-disk format version of compressed table files
+COMPRESSED_HEADER = struct.Struct('<8sHH')  # magic, version, schema length
+SEGMENT_HEADER = struct.Struct('<QIIBH')  # first row id, row count, length of the rest, codec, column count
+SEGMENT_COLUMN = struct.Struct('<IB')  # compressed length and encoding of a column of a segment
+SEGMENT_ZLIB = 1  # codec of the segments written by INSERT and UPDATE
+SEGMENT_LZMA = 2  # codec of the segments written by VACUUM (slower, but smaller for cold tables)
+ENCODING_PLAIN = 0  # a column's values serialized with marshal
+ENCODING_DELTA = 1  # ints without NULLs as the first value and the differences between neighbours
+ENCODING_RLE = 2  # (value, run length) pairs
+ENCODING_DICT = 3  # the distinct values and an array of codes into them
+RLE_RATIO = 8  # columns with at most one run of equal values per RLE_RATIO values are run-length encoded
+DICT_RATIO = 4  # string columns with at most one distinct value per DICT_RATIO values are dictionary encoded
+
+# Zone map constants
+ZONE_EXT = '.zone'  # zone maps are named <table>.zone
+CSV_ZONE_SHIFT = 16  # a zone map block of a CSV table holds the rows starting in 64 KB of the file
+PAGED_ZONE_SHIFT = 20  # a zone map block of a paged table holds the rows of 16 pages
+COLUMNAR_ZONE_SHIFT = 16  # a zone map block of a columnar table is a chunk (COLUMN_CHUNK rows)
+COMPRESSED_ZONE_SHIFT = 12  # a zone map block of a compressed table holds 4096 rows, compressed together
+
+# B-tree index constants
+INDEX_MAGIC = b'SQLCBTRE'  # magic number identifying an index file
+INDEX_VERSION = 1  # on-disk format version of index files
+INDEX_HEADER = struct.Struct('<8sHHII')  # magic, version, page size, root page, page count
+INDEX_EXT = '.idx'  # index files are named <table>.<index>.idx
+LEAF_NODE = 1  # node type of B-tree leaves, which hold (key, row id) entries
+INTERNAL_NODE = 2  # node type of B-tree nodes which point to child nodes
+INDEX_FILL = PAGE_SIZE * 3 // 4  # how full CREATE INDEX packs its nodes
+MAX_INDEX_KEY = PAGE_SIZE // 8  # longest (serialized) key an index can hold
+
+# Write-ahead log constants
+WAL_FILE = '.wal'  # name of the write-ahead log in each database directory
+WAL_RECORD = struct.Struct('<IIB')  # body length, CRC-32 of the body, record type
+WAL_INSERT = 1  # (table, row) of a row inserted into a table (logged by earlier versions)
+WAL_BEGIN = 2  # (table, file size or None, logged writes applied or None) before a table is written to
+WAL_PAGES = 3  # (table, [(page number, page)]) of pages about to be written to a table
+WAL_DONE = 4  # (table, whether the write was finished) after a table was written to
+WAL_WRITES = 5  # ((table, [inserted row], [(row id, new row)], [deleted row id]), ...) of a statement or COMMIT
+WAL_ROWID = 1 << 56  # row ids of the rows inserted into the log start here, after those of stored rows
+WAL_SYNC_ROWS = 1000  # committed rows after which the log is fsynced by default (see `set_wal_sync`)
+WAL_SYNC_INTERVAL = 0.5  # seconds after which the log is fsynced by default (see `set_wal_sync`)
+WAL_CHECKPOINT_ROWS = 50000  # logged rows after which they are applied to their tables
+TMP_EXT = '.tmp'  # tables and indexes are rewritten to <file>.tmp, then renamed
+LOCK_FILE = '.lock'  # name of the lock file in each database directory (see `table_lock`)
+LOCK_SLOTS = 1 << 30  # bytes of the lock file the tables' locks are spread over
+LOCK_HEADER = struct.Struct('<QQ')  # times the write-ahead log was emptied and writes pending in it (see `wal_read`)
+TABLE_VERSION = struct.Struct('<Q')  # writes to a table, kept in the lock file after its header (see `table_version`)
+TABLE_VERSION_SLOTS = 1 << 12  # table versions in the lock file (tables whose names hash alike share one)
+CACHE_SIZE = 1 << 26  # default bytes of decoded rows the buffer pool keeps (see `pool_scan`)
+IMPORT_BUFFER = 1 << 20  # bytes read from a file at a time by .import
+IMPORT_BATCH_ROWS = 10000  # rows .import writes to a table at a time
+PARALLEL_MIN_BYTES = 1 << 23  # CSV tables smaller than this are scanned serially
+INDEX_JOIN_RATIO = 8  # joins look rows up in an index if the inner table has this many times the outer rows
+INDEX_JOIN_BATCH = 1000  # outer rows whose matches an index join looks up and fetches at a time
+AGGREGATE_PARTITIONS = 16  # temporary files the rows of the groups which don't fit in memory are spilled to
+AGGREGATE_MAX_DEPTH = 4  # times spilled rows are partitioned again before they are aggregated in memory anyway
+SPILL_BATCH = 1000  # records written to a temporary file at a time
+ROW_COUNT = {'cast': int}  # the model column LIMIT and OFFSET values are cast with
+PROFILE_LINES = 20  # functions .profile reports, the ones with the most cumulative time first
+TRACEMALLOC_LINES = 10  # lines of code .profile memory reports, the ones which allocated the most first
+SERVE_LOCK = '*'  # the lock every statement of a server session holds (exclusively to change the schema)
+SERVE_PROMPT = '> '  # sent to server clients whenever the server waits for their next line
+SERVE_LINE_LIMIT = 1 << 24  # longest line (in bytes) a server client can send
+
+# maps the magic number at the start of a table file to its storage engine
+FORMAT_MAGIC = {
+    PAGED_MAGIC: 'paged',
+    COLUMNAR_MAGIC: 'columnar',
+    COMPRESSED_MAGIC: 'compressed'
+}
+
+# maps the codecs of the segments of compressed tables to their (compress,
+# decompress) functions
+SEGMENT_CODECS = {
+    SEGMENT_ZLIB: (zlib.compress, zlib.decompress),
+    SEGMENT_LZMA: (lzma.compress, lzma.decompress)
+}
+
+# maps the operators of WHERE clauses to their condition functions
+CONDITION_FUNCS = {
+    '=': lambda x, y: x == y,
+    '>': lambda x, y: x > y,
+    '<': lambda x, y: x < y,
+    '>=': lambda x, y: x >= y,
+    '<=': lambda x, y: x <= y,
+    '<>': lambda x, y: x != y,
+    '!=': lambda x, y: x != y,
+    'like': lambda x, y: y(x) is not None,  # y is a compiled pattern (see `compile_like`)
+    'in': lambda x, y: x in y,
+    'between': lambda x, y: y[0] <= x <= y[1]
+}
+
+# maps aggregate functions to their (initial state, step, final value)
+# functions; steps are only applied to non-NULL values, and a final value
+# function of None leaves the state as it is
+AGGREGATE_FUNCS = {
+    'count': (0, lambda state, value: state + 1, None),
+    'sum': (None, lambda state, value: value if state is None else state + value, None),
+    'avg': ((0, 0), lambda state, value: (state[0] + value, state[1] + 1),
+            lambda state: state[0] / state[1] if state[1] else None),
+    'min': (None, lambda state, value: value if state is None or value < state else state, None),
+    'max': (None, lambda state, value: value if state is None or value > state else state, None)
+}
+
+# maps data type names to their struct format code in binary records (None
+# means the value is stored as a length-prefixed UTF-8 string)
+RECORD_TYPE_CODES = {
+    'int': 'q',
+    'float': 'd',
+    'double': 'd',
+    'varchar': None,
+    'char': None,
+    'bool': '?',
+    'boolean': '?'
+}
+
+# maps data type names to the array type code of their columns in columnar
+# tables (strings are stored as codes into a dictionary of the column's values)
+COLUMN_TYPE_CODES = {
+    'int': 'q',
+    'float': 'd',
+    'double': 'd',
+    'varchar': 'I',
+    'char': 'I',
+    'bool': 'B',
+    'boolean': 'B'
+}
+
+# maps the array type codes of columns to the stored value of NULL
+COLUMN_NULLS = {
+    'q': INT_NULL,
+    'd': float('nan'),
+    'B': 0,
+    'I': 0
+}
+
+# maps the operators of WHERE clauses to the method of the compared value
+# which applies them with the operands swapped (e.g. x > 5 is 5.__lt__(x))
+REFLECTED_OPS = {
+    '=': '__eq__',
+    '<>': '__ne__',
+    '!=': '__ne__',
+    '>': '__lt__',
+    '<': '__gt__',
+    '>=': '__le__',
+    '<=': '__ge__'
+}
+
+# the statistics .stats reports for each statement, as (key, label) tuples;
+# the keys ending in '_time' are seconds
+STATEMENT_STATS = [
+    ('rows_scanned', 'Rows scanned'),
+    ('rows_returned', 'Rows returned'),
+    ('bytes_read', 'Bytes read'),
+    ('cache_hits', 'Cache hits'),
+    ('cache_misses', 'Cache misses'),
+    ('parse_time', 'Parse time'),
+    ('plan_time', 'Plan time'),
+    ('io_time', 'I/O time'),
+    ('print_time', 'Print time')
+]
+
+# Global vars
+
+active_database = 'main'  # set the initial active database to 'main'
+record_codecs = {}  # compiled record encoders/decoders keyed by column data types
+catalog = {}  # cached metadata of the tables of each database (see `catalog_table`)
+plan_cache = collections.OrderedDict()  # compiled plans keyed by (database, normalized statement)
+prepared_statements = {}  # plans of prepared statements keyed by name
+wal_logs = {}  # open write-ahead logs keyed by database (see `wal_open`)
+wal_sync_rows = WAL_SYNC_ROWS  # committed rows after which the logs are fsynced (see `set_wal_sync`)
+wal_sync_interval = WAL_SYNC_INTERVAL  # seconds after which the logs are fsynced (see `set_wal_sync`)
+wal_flush_timer = None  # fsyncs the rows left unsynced in the logs after an idle interval (see `wal_flush`)
+page_journal = None  # called with the dirty pages of a pager before they are written (see `wal_begin`)
+transaction = None  # the writes of the open transaction (see `begin`)
+column_dictionaries = {}  # string dictionaries of columnar tables keyed by file path (see `column_dictionary`)
+table_maps = {}  # memory maps of CSV tables keyed by file path (see `csv_map`)
+segment_maps = {}  # segment maps of compressed tables keyed by file path (see `compressed_segments`)
+zone_maps = {}  # zone maps of tables keyed by file path, with the table version read (see `pool_zone_map`)
+buffer_pool = collections.OrderedDict()  # decoded blocks of tables keyed by (file path, block) (see `pool_scan`)
+cache_size = CACHE_SIZE  # bytes of decoded rows the buffer pool keeps (see `set_cache_size`)
+cache_used = 0  # estimated bytes of the rows in the buffer pool
+cache_hits = 0  # blocks scans found in the buffer pool
+cache_misses = 0  # blocks scans decoded because they weren't in the buffer pool
+lock_files = {}  # (inode, file descriptor) of the open lock files keyed by database (see `lock_file`)
+held_locks = {}  # whether the locks this process holds are exclusive, keyed by (database, lock byte)
+parallel_workers = 1  # number of processes scanning large CSV tables (see `set_parallel`)
+scan_pool = None  # the pool of worker processes for parallel scans (see `parallel_pool`)
+memory_rows = 1 << 17  # rows (or groups) sorts and aggregations keep in memory (see `set_memory`)
+timer_on = False  # whether the run time of each statement is printed (see `set_timer`)
+stats_on = False  # whether the statistics of each statement are printed (see `set_stats`)
+statement_stats = None  # the statistics of the running statement while .stats is on (see `run_measured`)
+profile_next = None  # 'cpu' or 'memory' to profile the next statement (see `set_profile`)
+served_versions = {}  # versions of the tables a read worker of the server has cached, keyed by (database, table)
+connections = weakref.WeakSet()  # the open connections (see `connect`)
+connection_lock = threading.RLock()  # held by the connection running a statement (see `Connection.session`)
+session_owner = None  # the connection whose state is in the globals (see `activate_connection`)
+open_dir = None  # the directory of databases the connections use (see `open_directory`)
+echo = True  # whether statements print their outcome (see `report`)
+
+
+# Function definitions
+
+def init():
+    global DB_DIR, INIT_DB
+    db_path = os.path.join(DB_DIR, INIT_DB)
+    if not os.path.isdir(DB_DIR):
+        os.makedirs(db_path)
+    else:
+        if not os.path.isdir(db_path):
+            os.mkdir(db_path)
+
+    # recover from a crash: finish or undo interrupted writes (see
+    # `wal_lock`) and apply the writes left in the write-ahead log of each
+    # database
+    for db_name in sorted(os.listdir(DB_DIR)):
+        if os.path.isdir(os.path.join(DB_DIR, db_name)):
+            with wal_lock(db_name):
+                recover_files(db_name)
+                wal_checkpoint(db_name)
+
+
+# helper functions
+
+def join_l(l, sep):
+    """
+    Joins a list (l) by some delimiter string (sep) into a new string.
+    Credit: https://codereview.stackexchange.com/a/162814
+
+    l -- The list to join into a string
+    sep -- The string to "glue" the list elements together with
+    """
+    li = iter(l)
+    string = str(next(li))
+    for i in li:
+        string += str(sep) + str(i)
+    return string
+
+
+def cast_bool(value):
+    """
+    Casts a string (or other value) to a bool. Unlike `bool()`, strings such as
+    'false' and '0' are cast to False.
+
+    :param value: The value to cast
+    :return: The value as a bool
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 't', 'true', 'y', 'yes')
+    return bool(value)
+
+
+def cast_value(col, value):
+    """
+    Casts a raw (string) value to the data type of the given model column. An
+    empty value in a non-string column is treated as NULL (None).
+
+    :param col: The model column (dict) the value belongs to
+    :param value: The raw value to cast
+    :return: The typed value, or None for NULL
+    """
+    if value is None or (value == '' and col['cast'] is not str):
+        return None
+    return col['cast'](value)
+
+
+def format_value(value):
+    """
+    Formats a typed value for output or for writing to a CSV table.
+
+    :param value: The value to format
+    :return: The value as a string ('' for NULL)
+    """
+    if value is None:
+        return ''
+    return str(value)
+
+
+def fsync_file(path):
+    """
+    Forces the written contents of a file to disk
+
+    :param path: The path to the file
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replace_file(tmp_path, path):
+    """
+    Replaces a file with a (completely written) temporary file. The rename is
+    atomic, so a crash leaves either the old or the new file behind.
+
+    :param tmp_path: The path to the temporary file
+    :param path: The path to the file to replace
+    """
+    fsync_file(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def parse_kv_pair_str(kv_pair_str):
+    """
+    Parses a key/value pair string (e.g. "key1 = val1, key2 = val2, ...") into
+    a list of dictionaries consisting of each key/value pair.
+
+    kv_pair_str -- The string of key value pairs to parse
+
+    Returns a list dictionaries consisting of the key value pairs
+    """
+    kv_pairs_lst = parse_value_list(kv_pair_str)  # split the string on the commas outside of quotes
+    kv_tuples_lst = [tuple(re.split(' *= *', pair, 1)) for pair in kv_pairs_lst]
+    kv_tuples_lst = [(key, unquote(value)) for (key, value) in kv_tuples_lst]  # remove quotation marks
+    return [{'key': key, 'value': value} for (key, value) in kv_tuples_lst]
+
+
+def parse_where_clause(clause):
+    """
+    Parses a WHERE clause in a query string into a dictionary and returns it
+    :param clause: The portion of the query relating to the WHERE clause
+    :return: The dictionary containing the parsed WHERE clause
+    """
+    groups = WHERE_REGEX.match(clause).groups()
+    value = groups[2].strip()
+    if groups[1].lower() not in ('in', 'between'):
+        value = unquote(value)  # the values of lists and ranges are unquoted as they are compiled
+    return {
+        'key': groups[0],
+        'operator': groups[1],
+        'value': value
+    }
+
+
+def unquote(value):
+    """
+    Strips the quotes around a literal (e.g. "'Gizmo'" becomes "Gizmo"), if
+    it has any. A doubled quote inside the literal stands for one quote (e.g.
+    "'it''s'" becomes "it's").
+
+    :param value: The raw literal
+    :return: The literal without its quotes
+    """
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '\'"':
+        return value[1:-1].replace(value[0] * 2, value[0])
+    return value
+
+
+def table_format(tbl_path):
+    """
+    Determines which storage engine a table file uses by sniffing its magic
+    number. Files without a known magic number are legacy CSV tables.
+
+    :param tbl_path: The file path to the table
+    :return: The name of the storage engine (a key of `storage_engines`)
+    """
+    with open(tbl_path, 'rb') as table_file:
+        magic = table_file.read(len(PAGED_MAGIC))
+    return FORMAT_MAGIC.get(magic, 'csv')
+
+
+def extract_model_from(header):
+    """
+    Extracts the model from a given table header. Besides its name and data
+    type, a column of the header may have a default value (e.g. "qty int
+    DEFAULT 0"), which rows written before the column was added read it as,
+    and may be marked as dropped (e.g. "price float DROPPED"): dropped
+    columns keep their place in the stored rows but can't be queried.
+
+    :param header: The table header to extract the model from (string)
+    :return: A list of dicts representing the table model
+    :raises DatabaseError: if the header is invalid
+    """
+    try:
+        assert len(header) > 0
+    except AssertionError:
+        raise DatabaseError('header must not be empty!')
+    model = []
+
+    # map data type names to their python cast function
+    cast_func = {
+        'int': int,
+        'float': float,
+        'double': float,
+        'varchar': str,
+        'char': str,
+        'bool': cast_bool,
+        'boolean': cast_bool
+    }
+
+    for col in header.split(','):
+        dropped = col.endswith(' DROPPED')
+        if dropped:
+            col = col[:-len(' DROPPED')]
+        default = None
+        if ' DEFAULT ' in col:
+            col, default = col.split(' DEFAULT ', 1)
+        try:
+            col_split = col.split(' ', 1)  # 'name varchar(20)' => ['name', 'varchar(20)']
+            col_name = col_split[0]
+            data_type = col_split[1].split('(')[0]  # [..., 'varchar(20)'] => 'varchar'
+        except IndexError:
+            raise DatabaseError('header is not in proper format!')
+        try:
+            cast = cast_func[data_type]  # get the cast function based on the data type
+        except KeyError:
+            raise DatabaseError('cast function not found for data_type "%s"!' % data_type)
+        model_col = {
+            'col_name': col_name,
+            'data_type': data_type,
+            'cast': cast,
+            'definition': col,
+            'default': None,
+            'dropped': dropped
+        }
+        try:
+            model_col['default'] = cast_value(model_col, default)
+        except ValueError:
+            raise DatabaseError('invalid default value "%s" for column "%s"!' % (default, col_name))
+        model.append(model_col)
+    return model
+
+
+def cond_func(operator):
+    """
+    Returns the appropriate condition function given the operator in a WHERE
+    clause.
+
+    e.g. If a query contains the '... WHERE age <= 32 ...' Then, the '<=' would
+    be passed to this function and `lambda x, y: x <= y` would be returned for
+    use outside the function.
+
+    :param operator: A string representing the operator in the WHERE clause
+    :return: The condition function
+    """
+    return CONDITION_FUNCS[operator]
+
+
+# catalog functions
+#
+# The catalog caches the metadata of every table used so far: its storage
+# engine, header, model, column numbers and indexes. Statements look their
+# table up in the catalog instead of stat'ing and reading the table file.
+# Statements which change metadata invalidate the affected entries, and every
+# CATALOG_TTL seconds the files are stat'ed once to pick up changes made by
+# other processes. Once a statement locked its tables, it checks their
+# versions in the lock file right away (see `locked_plan`): every write locks
+# its table exclusively, which changes the version, so the files are only
+# stat'ed again when the version did.
+
+def load_table(db_name, tbl_name):
+    """
+    Reads the metadata of a table from its files
+
+    :param db_name: The name of the database the table is in
+    :param tbl_name: The name of the table
+    :return: The catalog entry of the table (see `catalog_table`), or None if
+    the table doesn't exist
+    """
+    tbl_path = os.path.join(DB_DIR, db_name, tbl_name)
+    try:
+        version = table_version(db_name, tbl_name)  # before reading, so a write meanwhile changes it
+        stat = os.stat(tbl_path)
+    except OSError:
+        return None
+    engine_name = table_format(tbl_path)
+    schema_version, header = read_schema(tbl_path, storage_engines[engine_name])
+    model = extract_model_from(header) if header else []
+    columns = [i for i, col in enumerate(model) if not col['dropped']]
+    return {
+        'name': tbl_name,
+        'path': tbl_path,
+        'format': engine_name,
+        'engine': storage_engines[engine_name],
+        'header': header,
+        'schema_version': schema_version,
+        'model': model,
+        'columns': columns,
+        'col_names': [model[i]['col_name'] for i in columns],
+        'col_index': {model[i]['col_name']: i for i in columns},
+        'indexes': table_indexes(tbl_path),
+        'stat': (stat.st_mtime_ns, stat.st_size),
+        'version': version,
+        'checked': time.monotonic()
+    }
+
+
+def read_schema(tbl_path, engine):
+    """
+    Reads the schema of a table. Tables which were never altered have schema
+    version 0 and the header they were created with; ALTER TABLE stores the
+    new header and version in <table>.schema (see `write_schema`), so
+    changing a table's columns never rewrites its rows.
+
+    :param tbl_path: The file path to the table
+    :param engine: The storage engine of the table (see `storage_engines`)
+    :return: A (schema version, table header) tuple
+    """
+    try:
+        with open(tbl_path + SCHEMA_EXT, 'rb') as schema_file:
+            return marshal.loads(schema_file.read())
+    except FileNotFoundError:
+        return 0, engine['read_header'](tbl_path)
+
+
+def write_schema(tbl_path, schema_version, header):
+    """
+    Replaces the schema of a table (see `read_schema`)
+
+    :param tbl_path: The file path to the table
+    :param schema_version: The new schema version
+    :param header: The new table header
+    """
+    with open(tbl_path + SCHEMA_EXT + TMP_EXT, 'wb') as schema_file:
+        schema_file.write(marshal.dumps((schema_version, header)))
+    replace_file(tbl_path + SCHEMA_EXT + TMP_EXT, tbl_path + SCHEMA_EXT)
+
+
+def catalog_table(tbl_name, db_name=None, fresh=False):
+    """
+    Looks up a table in the catalog, loading its metadata on first use.
+
+    :param tbl_name: The name of the table
+    :param db_name: The name of the database (defaults to the active one)
+    :param fresh: Whether to check the table's version in the lock file even
+    if its files were checked less than CATALOG_TTL seconds ago (once the
+    table is locked, as another process may have just changed it); its files
+    are only stat'ed if the version changed
+    :return: A dict with the table's name, file path, storage engine ('format'
+    and 'engine'), header, schema version, model, the column numbers of the
+    columns which weren't dropped ('columns'), their names ('col_names'), column numbers
+    by name ('col_index') and indexes, or None if the table doesn't exist
+    """
+    db_name = db_name or active_database
+    now = time.monotonic()
+    database = catalog.setdefault(db_name, {'tables': {}, 'dir_mtime': None, 'checked': None})
+
+    table = database['tables'].get(tbl_name)
+    if fresh and table is not None:
+        version = table_version(db_name, tbl_name)
+        if version == table['version']:
+            return table  # nothing wrote to the table (or dropped it) since it was loaded
+
+    # tables (and indexes) created or dropped by other processes change the
+    # modification time of the database directory
+    if fresh or database['checked'] is None or now - database['checked'] >= CATALOG_TTL:
+        try:
+            dir_mtime = os.stat(os.path.join(DB_DIR, db_name)).st_mtime_ns
+        except OSError:
+            del catalog[db_name]
+            return None
+        if dir_mtime != database['dir_mtime']:
+            database['tables'].clear()
+            database['dir_mtime'] = dir_mtime
+        database['checked'] = now
+
+    table = database['tables'].get(tbl_name)
+    if table is not None and (fresh or now - table['checked'] >= CATALOG_TTL):
+        try:
+            stat = os.stat(table['path'])
+        except OSError:
+            stat = None
+        if stat is None or (stat.st_mtime_ns, stat.st_size) != table['stat']:
+            table = None  # the file changed, so reload its metadata
+        else:
+            table['checked'] = now
+            if fresh:
+                table['version'] = version
+
+    if table is None:
+        table = load_table(db_name, tbl_name)
+        if table is None:
+            database['tables'].pop(tbl_name, None)
+            return None
+        database['tables'][tbl_name] = table
+    return table
+
+
+def catalog_touch(table):
+    """
+    Records the size and modification time of a table's file in its catalog
+    entry after this process wrote to it, so that the write doesn't make the
+    entry look changed by another process
+
+    :param table: The catalog entry of the table
+    """
+    try:
+        stat = os.stat(table['path'])
+    except OSError:
+        return
+    table['stat'] = (stat.st_mtime_ns, stat.st_size)
+    table['checked'] = time.monotonic()
+
+
+def catalog_invalidate(db_name, tbl_name=None):
+    """
+    Drops cached metadata from the catalog
+
+    :param db_name: The name of the database
+    :param tbl_name: The name of the table, or None for all tables of the
+    database
+    """
+    if tbl_name is None:
+        catalog.pop(db_name, None)
+    elif db_name in catalog:
+        catalog[db_name]['tables'].pop(tbl_name, None)
+
+
+def catalog_forget(db_name, tbl_name):
+    """
+    Drops everything this process cached of a table: its metadata, memory
+    map, segment map, string dictionaries and the blocks of its rows in the
+    buffer pool
+
+    :param db_name: The name of the database
+    :param tbl_name: The name of the table
+    """
+    tbl_path = os.path.join(DB_DIR, db_name, tbl_name)
+    catalog_invalidate(db_name, tbl_name)
+    table_maps.pop(tbl_path, None)
+    segment_maps.pop(tbl_path, None)
+    columnar_forget(tbl_path)
+    pool_invalidate(tbl_path)
+
+
+# CSV storage engine functions
+#
+# A CSV table is a text file whose first line is the table header (e.g.
+# "pid int,name varchar(20)") followed by one comma-delimited line per row.
+# This is the original (legacy) table format. Rows are identified by the byte
+# offset of their line, so row ids only change when VACUUM rewrites the file,
+# and a row can't hold a line break (see `csv_check_row`). NULL is stored as an
+# unquoted empty field and an empty string as a quoted one ("").
+#
+# Rows are never removed from the file by UPDATE and DELETE. An updated row
+# which still fits on its line overwrites it (padded with spaces); otherwise
+# the new version is appended and the old line becomes dead. Dead rows are
+# recorded as tombstones in <table>.del and skipped by scans until VACUUM.
+
+def csv_format_row(row):
+    """
+    Formats a row of typed values as a comma-delimited line (without a line
+    terminator). Empty strings and strings holding commas or quotes are
+    quoted, so only NULL is written as an empty field.
+
+    :param row: The list of values to format
+    :return: The row as a comma-delimited string
+    """
+    fields = []
+    for value in row:
+        field = format_value(value)
+        if value is not None and (not field or ',' in field or '"' in field):
+            field = '"%s"' % field.replace('"', '""')
+        fields.append(field)
+    return ','.join(fields) or ','  # a single NULL can't be a blank line, which is skipped
+
+
+def csv_split_line(line):
+    """
+    Splits a line of a CSV table holding quoted fields into its fields
+
+    :param line: The line to split
+    :return: The list of fields, None for each unquoted empty field (NULL)
+    """
+    fields = []
+    for match in CSV_FIELD_REGEX.finditer(line):
+        quoted, field = match.groups()
+        if quoted is not None:
+            fields.append(quoted.replace('""', '"'))
+        else:
+            fields.append(field or None)
+    return fields
+
+
+def csv_parse_line(line, model):
+    """
+    Parses a (binary) line of a CSV table into a row of typed values
+
+    :param line: The line to parse
+    :param model: The table model (see `extract_model_from`)
+    :return: The row as a list of typed values, or None for a blank line
+    """
+    line = line.decode('utf-8').rstrip('\r\n ')  # rows updated in place are padded with spaces
+    if not line:
+        return None
+    if '"' in line:  # only quoted fields need the full CSV parser
+        fields = csv_split_line(line)
+    else:
+        fields = [field or None for field in line.split(',')]  # an empty field is NULL
+    values = [cast_value(col, value) for col, value in zip(model, fields)]
+    if len(values) < len(model):  # rows written before a column was added
+        values += [col['default'] for col in model[len(values):]]
+    return values
+
+
+def csv_create(tbl_path, header):
+    """
+    Creates an empty CSV table
+
+    :param tbl_path: The file path to the table
+    :param header: The table header (e.g. "pid int,name varchar(20)")
+    """
+    with open(tbl_path, 'w') as table_file:
+        table_file.write(header)  # write the first line as the columns of the table
+
+
+def csv_read_header(tbl_path):
+    """
+    Reads the header (first line) of a CSV table
+
+    :param tbl_path: The file path to the table
+    :return: The table header as a string
+    """
+    with open(tbl_path, 'r') as table_file:
+        return table_file.readline().rstrip('\r\n')
+
+
+def csv_map(tbl_path):
+    """
+    Maps a CSV table file into memory. The map is shared with the file, so
+    rows updated in place show through it, and it is reused by later
+    statements until the file grows or is replaced.
+
+    :param tbl_path: The file path to the table
+    :return: The read-only map (an empty bytes object for an empty file)
+    """
+    stat = os.stat(tbl_path)
+    key = (stat.st_ino, stat.st_size)
+    cached = table_maps.get(tbl_path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    if not stat.st_size:
+        return b''  # empty files can't be mapped
+    with open(tbl_path, 'rb') as table_file:
+        buf = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+    table_maps[tbl_path] = (key, buf)  # an old map is closed once no scan uses it
+    return buf
+
+
+def csv_decode_fields(view, find, pos, end, model, needed, row):
+    """
+    Decodes fields of an unquoted line of a CSV table into a row
+
+    :param view: A memoryview of the buffer holding the line
+    :param find: The `find` method of the buffer
+    :param pos: The position of the start of the line
+    :param end: The position of the end of the line
+    :param model: The table model (see `extract_model_from`)
+    :param needed: The sorted list of the column numbers to decode
+    :param row: The row (list) to store the typed values in; fields missing
+    from rows written before a column was added get the column's default
+    """
+    i = 0
+    for n in needed:
+        while i < n and pos:  # skip to the field
+            pos = find(b',', pos, end) + 1
+            i += 1
+        if not pos:
+            row[n] = model[n]['default']
+            continue
+        delim = find(b',', pos, end)
+        if delim < 0:
+            value = str(view[pos:end], 'utf-8').rstrip('\r ')  # rows updated in place are padded with spaces
+        else:
+            value = str(view[pos:delim], 'utf-8')
+        row[n] = cast_value(model[n], value or None)  # an empty field is NULL
+
+
+def csv_scan(tbl_path, model, cols=None, where=None, blocks=None):
+    """
+    Scans a CSV table through a memory map of its file (see `csv_map`). Each
+    line is found in the map and only the fields of the WHERE column and the
+    needed columns are decoded, from memoryview slices of the map, the WHERE
+    field first, so lines which don't match cost next to no allocation.
+    Lines with quoted fields are parsed in full. When PARALLEL_MIN_BYTES or
+    more are to be scanned and parallel scans are on, worker processes scan
+    the table (see `csv_parallel_scan`).
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param cols: The column numbers needed, or None for all of them (the
+    others are None in the rows)
+    :param where: The bound WHERE condition the rows must match, or None
+    :param blocks: The sorted numbers of the zone map blocks to scan (see
+    `zone_blocks`), or None to scan the whole table
+    :return: A generator of (row id, row) tuples
+    """
+    dead = csv_tombstones(tbl_path)
+    buf = csv_map(tbl_path)
+    start = buf.find(b'\n') + 1  # skip the header row
+    if not start:
+        return
+    ranges = csv_block_ranges(buf, start, blocks)
+    if csv_workers(ranges) > 1:
+        yield from csv_parallel_scan(tbl_path, model, cols, where, buf, ranges, dead)
+    else:
+        for range_start, range_stop in ranges:
+            yield from csv_scan_range(tbl_path, model, cols, where, range_start, range_stop, dead)
+
+
+def csv_workers(ranges):
+    """
+    Decides how many processes scan byte ranges of a CSV table: all of the
+    parallel workers if parallel scans are on and PARALLEL_MIN_BYTES or more
+    are to be scanned, otherwise 1
+
+    :param ranges: The list of (start, stop) byte ranges to scan (see
+    `csv_block_ranges`)
+    :return: The number of processes
+    """
+    if parallel_workers > 1 and sum(stop - start for start, stop in ranges) >= PARALLEL_MIN_BYTES:
+        return parallel_workers
+    return 1
+
+
+def csv_scan_workers(tbl_path, blocks):
+    """
+    Returns the number of processes which would scan zone map blocks of a CSV
+    table (see `csv_scan`)
+
+    :param tbl_path: The file path to the table
+    :param blocks: The sorted numbers of the zone map blocks to scan, or None
+    to scan the whole table
+    :return: The number of processes
+    """
+    buf = csv_map(tbl_path)
+    start = buf.find(b'\n') + 1  # skip the header row
+    return csv_workers(csv_block_ranges(buf, start, blocks)) if start else 1
+
+
+def csv_block_ranges(buf, start, blocks):
+    """
+    Translates zone map blocks of a CSV table into the byte ranges of its
+    file to scan, each starting at a row boundary
+
+    :param buf: The memory map of the table (see `csv_map`)
+    :param start: The offset of the first row of the table
+    :param blocks: The sorted numbers of the zone map blocks, or None for
+    the whole table
+    :return: A list of (start, stop) tuples (see `csv_scan_range`)
+    """
+    size = len(buf)
+    if blocks is None:
+        return [(start, size)]
+    ranges = []
+    for block in blocks:
+        block_start = max(start, block << CSV_ZONE_SHIFT)
+        block_stop = min(size, (block + 1) << CSV_ZONE_SHIFT)
+        if block_start >= block_stop:
+            continue
+        if ranges and ranges[-1][1] == block_start:
+            ranges[-1] = (ranges[-1][0], block_stop)
+            continue
+        block_start = buf.find(b'\n', block_start - 1) + 1 or size  # the first row starting in the block
+        if block_start < block_stop:
+            ranges.append((block_start, block_stop))
+    return ranges
+
+
+def csv_scan_range(tbl_path, model, cols, where, start, stop, dead):
+    """
+    Scans the rows of a CSV table which start in a byte range of its file
+    (see `csv_scan`)
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param cols: The column numbers needed, or None for all of them
+    :param where: The bound WHERE condition the rows must match, or None
+    :param start: The offset of the first row of the range
+    :param stop: The offset the range ends at (its last row may run past it)
+    :param dead: The tombstones of the table (see `csv_tombstones`)
+    :return: A generator of (row id, row) tuples
+    """
+    buf = csv_map(tbl_path)
+    view = memoryview(buf)
+    find = buf.find
+    size = len(buf)
+    needed = sorted(range(len(model)) if cols is None else cols)
+    if where is not None:
+        where_col, where_model_col, predicate = where['col'], model[where['col']], where['predicate']
+        cond, value = cond_func(where['operator']), where['value']
+
+    first = pos = start
+    scanned = 0
+    try:
+        while pos < stop:
+            scanned += 1
+            end = find(b'\n', pos)
+            if end < 0:
+                end = size
+            if pos in dead or pos == end:
+                pos = end + 1
+                continue
+            if find(b'"', pos, end) >= 0:  # only quoted fields need the full CSV parser
+                row = csv_parse_line(buf[pos:end], model)
+                if row is not None and (where is None or predicate(row)):
+                    yield pos, row
+                pos = end + 1
+                continue
+
+            if where is not None:
+                # test the WHERE field before decoding any other
+                start = pos
+                for _ in range(where_col):
+                    start = find(b',', start, end) + 1
+                    if not start:
+                        break
+                if start:
+                    delim = find(b',', start, end)
+                    if delim < 0:
+                        field = str(view[start:end], 'utf-8').rstrip('\r ')
+                    else:
+                        field = str(view[start:delim], 'utf-8')
+                    field = cast_value(where_model_col, field or None)  # an empty field is NULL
+                else:
+                    field = where_model_col['default']
+                if field is None or not cond(field, value):
+                    pos = end + 1
+                    continue
+
+            row = [None] * len(model)
+            csv_decode_fields(view, find, pos, end, model, needed, row)
+            yield pos, row
+            pos = end + 1
+    finally:
+        view.release()
+        count_scan(scanned, min(pos, size) - first)
+
+
+def csv_parallel_scan(tbl_path, model, cols, where, buf, ranges, dead):
+    """
+    Scans byte ranges of a CSV table in parallel: they are split into about
+    a range per worker process, aligned to row boundaries, and each worker
+    applies the WHERE condition and projection to its range (see
+    `csv_scan_worker`). The rows of the ranges are merged back in table
+    order.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param cols: The column numbers needed, or None for all of them
+    :param where: The bound WHERE condition the rows must match, or None
+    :param buf: The memory map of the table (see `csv_map`)
+    :param ranges: The list of (start, stop) byte ranges to scan (see
+    `csv_block_ranges`)
+    :param dead: The tombstones of the table (see `csv_tombstones`)
+    :return: A generator of (row id, row) tuples
+    """
+    step = max(1, sum(stop - start for start, stop in ranges) // parallel_workers)
+    pieces = []
+    for range_start, range_stop in ranges:
+        while range_start < range_stop:
+            cut = range_start + step
+            if cut < range_stop:
+                cut = buf.find(b'\n', cut - 1) + 1 or range_stop  # the first row starting after the cut
+            cut = min(cut, range_stop)
+            pieces.append((range_start, cut))
+            range_start = cut
+
+    # the predicate can't be sent to another process, so the worker binds
+    # the condition again
+    condition = None if where is None else (where['col'], where['operator'], where['value'])
+    tasks = []
+    for range_start, range_stop in pieces:
+        range_dead = {rowid: length for rowid, length in dead.items() if range_start <= rowid < range_stop}
+        tasks.append((tbl_path, model, cols, condition, range_start, range_stop, range_dead))
+    for rows, scanned, size in parallel_pool().imap(csv_scan_worker, tasks):
+        count_scan(scanned, size)
+        yield from rows
+
+
+def csv_scan_worker(task):
+    """
+    Scans a byte range of a CSV table in a worker process (see
+    `csv_parallel_scan`)
+
+    :param task: A (table path, table model, column numbers, (WHERE column,
+    operator, value) or None, range start, range stop, tombstones) tuple
+    :return: A (list of (row id, row) tuples of the matching rows, rows
+    scanned, bytes read) tuple
+    """
+    global statement_stats
+    statement_stats = {'rows_scanned': 0, 'bytes_read': 0}  # the worker's own (see `count_scan`)
+    tbl_path, model, cols, condition, start, stop, dead = task
+    where = None
+    if condition is not None:
+        col, operator, value = condition
+        test = cond_func(operator)
+        where = {
+            'col': col,
+            'operator': operator,
+            'value': value,
+            'predicate': lambda row: row[col] is not None and test(row[col], value)
+        }
+    rows = list(csv_scan_range(tbl_path, model, cols, where, start, stop, dead))
+    return rows, statement_stats['rows_scanned'], statement_stats['bytes_read']
+
+
+def parallel_pool():
+    """
+    Returns the pool of worker processes for parallel scans, starting it on
+    first use
+    """
+    global scan_pool
+    if scan_pool is None:
+        scan_pool = multiprocessing.Pool(parallel_workers)
+    return scan_pool
+
+
+def csv_fetch(tbl_path, model, rowids, cols=None):
+    """
+    Reads rows of a CSV table by row id through a memory map of its file (see
+    `csv_map`)
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: An iterable of row ids
+    :param cols: The column numbers needed (all of them are read)
+    :return: A generator of (row id, row) tuples
+    """
+    dead = csv_tombstones(tbl_path)
+    buf = csv_map(tbl_path)
+    for rowid in rowids:
+        if rowid in dead:
+            continue
+        end = buf.find(b'\n', rowid)
+        line = buf[rowid:end if end >= 0 else len(buf)]
+        count_scan(1, len(line))
+        row = csv_parse_line(line, model)
+        if row is not None:
+            yield rowid, row
+
+
+def csv_insert(tbl_path, model, rows):
+    """
+    Appends rows to a CSV table
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rows: The list of rows (lists of typed values) to insert
+    :return: The list of row ids of the inserted rows
+    """
+    with open(tbl_path, 'ab') as table_file:
+        offset = table_file.seek(0, os.SEEK_END)
+        rowids = []
+        lines = []
+        for row in rows:
+            line = ('\n%s' % csv_format_row(row)).encode('utf-8')
+            rowids.append(offset + 1)  # the row starts after the '\n'
+            offset += len(line)
+            lines.append(line)
+        table_file.write(b''.join(lines))  # append each line as a new row in the file
+    return rowids
+
+
+def csv_tombstones(tbl_path):
+    """
+    Reads the tombstones of a CSV table
+
+    :param tbl_path: The file path to the table
+    :return: A dict mapping the row ids of dead rows to the lengths of their
+    lines
+    """
+    try:
+        with open(tbl_path + TOMBSTONE_EXT, 'rb') as tomb_file:
+            data = tomb_file.read()
+    except FileNotFoundError:
+        return {}
+    data = data[:len(data) - len(data) % TOMBSTONE.size]  # ignore a torn last entry
+    return dict(TOMBSTONE.iter_unpack(data))
+
+
+def csv_add_tombstones(tbl_path, dead):
+    """
+    Marks rows of a CSV table as dead by appending tombstones for them
+
+    :param tbl_path: The file path to the table
+    :param dead: A dict mapping the row ids of the dead rows to the lengths of
+    their lines
+    """
+    with open(tbl_path + TOMBSTONE_EXT, 'ab') as tomb_file:
+        tomb_file.write(b''.join(TOMBSTONE.pack(rowid, length) for rowid, length in sorted(dead.items())))
+
+
+def csv_update(tbl_path, model, changes):
+    """
+    Replaces rows of a CSV table by row id. A new row which fits on the line of
+    the old one overwrites it in place; any other new row is appended as a new
+    version of the row and the old line is tombstoned.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param changes: A dict mapping row ids to their new rows
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    """
+    moved = {}
+    dead = {}
+    with open(tbl_path, 'r+b') as table_file:
+        for rowid in sorted(changes):
+            table_file.seek(rowid)
+            old_line = table_file.readline()
+            old_len = len(old_line.rstrip(b'\r\n'))
+            line = csv_format_row(changes[rowid]).encode('utf-8')
+            if len(line) <= old_len:
+                table_file.seek(rowid)
+                table_file.write(line.ljust(old_len))  # overwrite the old row in place
+            else:
+                moved[rowid] = changes[rowid]
+                dead[rowid] = len(old_line)
+
+    if not moved:
+        return {}
+    rowids = sorted(moved)
+    new_rowids = csv_insert(tbl_path, model, [moved[rowid] for rowid in rowids])
+    csv_add_tombstones(tbl_path, dead)
+    return dict(zip(rowids, new_rowids))
+
+
+def csv_delete(tbl_path, model, rowids):
+    """
+    Deletes rows of a CSV table by row id by tombstoning their lines
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: A set of the row ids to delete
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    (always empty)
+    """
+    dead = {}
+    with open(tbl_path, 'rb') as table_file:
+        for rowid in sorted(rowids):
+            table_file.seek(rowid)
+            dead[rowid] = len(table_file.readline())
+    csv_add_tombstones(tbl_path, dead)
+    return {}
+
+
+def csv_check_row(model, row):
+    """
+    Checks that a row can be stored in a CSV table, raising a ValueError if
+    one of its strings holds a line break: rows are found by scanning for
+    line breaks, so a row has to be stored on a single line
+    """
+    for col, value in zip(model, row):
+        if isinstance(value, str) and ('\n' in value or '\r' in value):
+            raise ValueError('column %s of a CSV table cannot hold a line break' % col['col_name'])
+
+
+def csv_garbage(tbl_path):
+    """
+    Returns the fraction of a CSV table file taken up by dead rows
+    """
+    dead = csv_tombstones(tbl_path)
+    if not dead:
+        return 0.0
+    return sum(dead.values()) / max(1, os.path.getsize(tbl_path))
+
+
+def csv_vacuum(tbl_path, model):
+    """
+    Rewrites a CSV table without its dead rows (and without the padding of
+    rows updated in place), then drops its tombstones
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :return: None, as all row ids were reassigned
+    """
+    dead = csv_tombstones(tbl_path)
+    with open(tbl_path, 'rb') as table_file:
+        header = table_file.readline()
+        offset = len(header)
+        lines = [header.decode('utf-8').rstrip('\r\n')]  # keep the header row
+        for line in table_file:
+            rowid = offset
+            offset += len(line)
+            line = line.decode('utf-8').rstrip('\r\n ')
+            if line and rowid not in dead:
+                lines.append(line)
+
+    # Write the live rows to a new file which replaces the table. The
+    # tombstones are set aside first, so they are never applied to the new
+    # file (see `recover_files`).
+    with open(tbl_path + TMP_EXT, 'w') as table_file:
+        table_file.write('\n'.join(lines))
+    tomb_path = tbl_path + TOMBSTONE_EXT
+    if os.path.exists(tomb_path):
+        os.replace(tomb_path, tomb_path + TMP_EXT)
+    replace_file(tbl_path + TMP_EXT, tbl_path)
+    if os.path.exists(tomb_path + TMP_EXT):
+        os.remove(tomb_path + TMP_EXT)
+    return None
+
+
+# Paged storage engine functions
+#
+# A paged table is a binary file made of PAGE_SIZE byte pages. Page 0 holds
+# the file header: magic number, format version, page size, row count, dead
+# row count and the table header. The remaining pages come in groups of one free-space map (FSM)
+# page followed by the PAGE_SIZE data pages it tracks; byte i of an FSM page
+# holds the free space (in FSM_UNIT byte units) of the i-th data page after it.
+#
+# Data pages are slotted pages: the page header and an array of slots (record
+# offset and length) grow from the start of the page while the records grow
+# down from its end. A row is identified by its row id, (page number << 16) |
+# slot number, which stays the same as long as the row stays on its page.
+#
+# DELETE only flags the slots of deleted rows as dead, and UPDATE rewrites a
+# row on its own page when there is room for it there and otherwise flags the
+# old slot as dead and places the new version on another page. VACUUM compacts
+# the pages to reclaim the space of dead rows and of old row versions; since
+# rows stay on their pages, it keeps all row ids.
+
+MAX_RECORD = 255 * FSM_UNIT - SLOT.size  # largest record the free-space map can place
+RECORD_COLUMNS = struct.Struct('<H')  # column count at the start of every record
+
+# FSM_MATCH[n] translates an FSM page into a page of 1s (at least n units free)
+# and 0s, so `bytes.find` can search it at C speed
+FSM_MATCH = [bytes(int(free >= units) for free in range(256)) for units in range(256)]
+
+
+class Pager:
+    """
+    Gives page-level access to a paged table file. Pages are read on demand
+    and kept for the lifetime of the pager, and only the pages marked dirty
+    are written back by `flush`.
+    """
+
+    def __init__(self, tbl_path, writable=False):
+        self.path = tbl_path
+        self.file = open(tbl_path, 'r+b' if writable else 'rb')
+        self.page_count = os.fstat(self.file.fileno()).st_size // PAGE_SIZE
+        self.pages = {}
+        self.dirty = set()
+
+    def read(self, page_no):
+        """
+        Returns the page with the given page number as a bytearray
+        """
+        page = self.pages.get(page_no)
+        if page is None:
+            self.file.seek(page_no * PAGE_SIZE)
+            page = self.pages[page_no] = bytearray(self.file.read(PAGE_SIZE))
+        return page
+
+    def mark_dirty(self, page_no):
+        """
+        Marks a page as modified so it gets written back by `flush`
+        """
+        self.dirty.add(page_no)
+
+    def allocate(self):
+        """
+        Appends an empty data page (preceded by a new FSM page when a new
+        group starts) and returns its page number
+        """
+        page_no = self.page_count
+        if is_fsm_page(page_no):
+            self.pages[page_no] = bytearray(PAGE_SIZE)
+            self.dirty.add(page_no)
+            page_no += 1
+        self.pages[page_no] = new_data_page()
+        self.dirty.add(page_no)
+        self.page_count = page_no + 1
+        return page_no
+
+    def update_free_space(self, page_no):
+        """
+        Records the current free space of a data page in its FSM page
+        """
+        fsm_page_no, entry = fsm_location(page_no)
+        fsm_page = self.read(fsm_page_no)
+        units = min(255, page_free_space(self.read(page_no)) // FSM_UNIT)
+        if fsm_page[entry] != units:
+            fsm_page[entry] = units
+            self.dirty.add(fsm_page_no)
+
+    def find_free_page(self, size, hint=None):
+        """
+        Finds a data page with at least `size` bytes of free space, trying the
+        `hint` page first
+
+        :return: The page number, or None if no page has enough free space
+        """
+        units = -(-size // FSM_UNIT)  # round up to whole FSM units
+        if hint is not None:
+            fsm_page_no, entry = fsm_location(hint)
+            if self.read(fsm_page_no)[entry] >= units:
+                return hint
+        for fsm_page_no in range(1, self.page_count, FSM_GROUP):
+            entry = self.read(fsm_page_no).translate(FSM_MATCH[units]).find(1)
+            if entry != -1:
+                return fsm_page_no + 1 + entry
+        return None
+
+    def flush(self):
+        """
+        Writes all dirty pages back to the file (logging them to the page
+        journal first, if there is one)
+        """
+        if page_journal is not None and self.dirty:
+            page_journal(self.path, [(page_no, bytes(self.pages[page_no])) for page_no in sorted(self.dirty)])
+        for page_no in sorted(self.dirty):
+            self.file.seek(page_no * PAGE_SIZE)
+            self.file.write(self.pages[page_no])
+        self.dirty.clear()
+        self.file.flush()
+
+    def evict(self):
+        """
+        Writes all dirty pages back to the file and drops every page read so
+        far, so long passes over a table don't hold all of it in memory
+        """
+        self.flush()
+        self.pages.clear()
+
+    def close(self):
+        self.file.close()
+
+
+def is_fsm_page(page_no):
+    """
+    Returns whether the given page number is that of a free-space map page
+    """
+    return page_no > 0 and (page_no - 1) % FSM_GROUP == 0
+
+
+def fsm_location(page_no):
+    """
+    Locates the free-space map entry of a data page
+
+    :param page_no: The page number of the data page
+    :return: A (FSM page number, entry index) tuple
+    """
+    fsm_page_no = page_no - (page_no - 1) % FSM_GROUP
+    return fsm_page_no, page_no - fsm_page_no - 1
+
+
+def new_data_page():
+    """
+    Returns an empty data page as a bytearray
+    """
+    page = bytearray(PAGE_SIZE)
+    DATA_PAGE_HEADER.pack_into(page, 0, DATA_PAGE, 0, 0, DATA_PAGE_HEADER.size, PAGE_SIZE)
+    return page
+
+
+def page_free_space(page):
+    """
+    Returns the number of contiguous free bytes in a data page
+    """
+    free_start, free_end = DATA_PAGE_HEADER.unpack_from(page)[3:]
+    return free_end - free_start
+
+
+def page_records(page):
+    """
+    Iterates over the live records of a data page
+
+    :param page: The page (bytearray or memoryview)
+    :return: A generator of (slot number, record) tuples
+    """
+    page_type, _, slot_count = DATA_PAGE_HEADER.unpack_from(page)[:3]
+    if page_type != DATA_PAGE:
+        return
+    slots = struct.unpack_from('<%iH' % (slot_count * 2), page, DATA_PAGE_HEADER.size)
+    for slot in range(slot_count):
+        offset, length = slots[slot * 2], slots[slot * 2 + 1]
+        if 0 < length < SLOT_DEAD:  # skip empty and dead slots
+            yield slot, page[offset:offset + length]
+
+
+def page_insert(page, record):
+    """
+    Inserts a record into a data page, reusing an empty slot if possible
+
+    :param page: The page (bytearray)
+    :param record: The encoded record
+    :return: The slot number of the record, or None if it doesn't fit
+    """
+    page_type, flags, slot_count, free_start, free_end = DATA_PAGE_HEADER.unpack_from(page)
+    slot = slot_count
+    for empty in range(slot_count):
+        if SLOT.unpack_from(page, DATA_PAGE_HEADER.size + empty * SLOT.size)[1] == 0:
+            slot = empty
+            break
+    needed = len(record) + (SLOT.size if slot == slot_count else 0)
+    if free_end - free_start < needed:
+        return None
+    free_end -= len(record)
+    page[free_end:free_end + len(record)] = record
+    SLOT.pack_into(page, DATA_PAGE_HEADER.size + slot * SLOT.size, free_end, len(record))
+    if slot == slot_count:
+        slot_count += 1
+        free_start += SLOT.size
+    DATA_PAGE_HEADER.pack_into(page, 0, page_type, flags, slot_count, free_start, free_end)
+    return slot
+
+
+def page_replace(page, slot, record):
+    """
+    Replaces the record of a slot. The new record overwrites the old one when
+    it fits in its space and goes to the free space of the page otherwise; if
+    it doesn't fit there either, the slot is marked dead instead.
+
+    :param page: The page (bytearray)
+    :param slot: The slot number
+    :param record: The new encoded record
+    :return: Whether the record was replaced
+    """
+    page_type, flags, slot_count, free_start, free_end = DATA_PAGE_HEADER.unpack_from(page)
+    slot_offset = DATA_PAGE_HEADER.size + slot * SLOT.size
+    offset, length = SLOT.unpack_from(page, slot_offset)
+    if len(record) > length:
+        if free_end - free_start < len(record):
+            page_delete(page, slot)
+            return False
+        free_end -= len(record)
+        offset = free_end
+        DATA_PAGE_HEADER.pack_into(page, 0, page_type, flags, slot_count, free_start, free_end)
+    page[offset:offset + len(record)] = record
+    SLOT.pack_into(page, slot_offset, offset, len(record))
+    return True
+
+
+def page_delete(page, slot):
+    """
+    Marks the record of a slot as dead. The slot isn't reused (so its row id
+    isn't either) until the page is compacted.
+
+    :param page: The page (bytearray)
+    :param slot: The slot number
+    """
+    slot_offset = DATA_PAGE_HEADER.size + slot * SLOT.size
+    offset, length = SLOT.unpack_from(page, slot_offset)
+    SLOT.pack_into(page, slot_offset, offset, length | SLOT_DEAD)
+
+
+def page_compact(page):
+    """
+    Rewrites the live records of a data page contiguously, which empties the
+    slots of dead records and reclaims the space of old record versions
+
+    :param page: The page (bytearray)
+    :return: The number of dead records removed
+    """
+    slot_count = DATA_PAGE_HEADER.unpack_from(page)[2]
+    records = []
+    dead = 0
+    for slot in range(slot_count):
+        offset, length = SLOT.unpack_from(page, DATA_PAGE_HEADER.size + slot * SLOT.size)
+        if length & SLOT_DEAD:
+            dead += 1
+        records.append(bytes(page[offset:offset + length]) if 0 < length < SLOT_DEAD else None)
+    while records and records[-1] is None:  # trailing empty slots can be dropped
+        records.pop()
+
+    new_page = new_data_page()
+    free_end = PAGE_SIZE
+    for slot, record in enumerate(records):
+        if record:
+            free_end -= len(record)
+            new_page[free_end:free_end + len(record)] = record
+            SLOT.pack_into(new_page, DATA_PAGE_HEADER.size + slot * SLOT.size, free_end, len(record))
+    free_start = DATA_PAGE_HEADER.size + len(records) * SLOT.size
+    DATA_PAGE_HEADER.pack_into(new_page, 0, DATA_PAGE, 0, len(records), free_start, free_end)
+    page[:] = new_page
+    return dead
+
+
+def compile_record_codec(data_types):
+    """
+    Compiles an encoder and a decoder for binary records with columns of the
+    given data types.
+
+    A record holds its column count and a NULL bitmap, followed by the int,
+    float and bool values packed by a single struct, followed by each string
+    value as a length-prefixed UTF-8 string.
+
+    :param data_types: A tuple of the data types of the columns
+    :return: An (encode, decode) tuple of functions
+    """
+    col_count = len(data_types)
+    bitmap_len = (col_count + 7) // 8
+    codes = [RECORD_TYPE_CODES[data_type] for data_type in data_types]
+    fixed_cols = [i for i, code in enumerate(codes) if code is not None]
+    var_cols = [i for i, code in enumerate(codes) if code is None]
+    fixed = struct.Struct('<H%is%s' % (bitmap_len, ''.join(codes[i] for i in fixed_cols)))
+    null_values = [{'q': 0, 'd': 0.0, '?': False}[codes[i]] for i in fixed_cols]
+    no_nulls = bytes(bitmap_len)
+
+    def encode(row):
+        bitmap = bytearray(bitmap_len)
+        fixed_values = []
+        for n, i in enumerate(fixed_cols):
+            value = row[i]
+            if value is None:
+                bitmap[i >> 3] |= 1 << (i & 7)
+                value = null_values[n]
+            fixed_values.append(value)
+        var_parts = []
+        for i in var_cols:
+            value = row[i]
+            if value is None:
+                bitmap[i >> 3] |= 1 << (i & 7)
+                value = ''
+            data = value.encode('utf-8')
+            var_parts.append(VARLEN.pack(len(data)))
+            var_parts.append(data)
+        return fixed.pack(col_count, bytes(bitmap), *fixed_values) + b''.join(var_parts)
+
+    def decode(record):
+        values = fixed.unpack_from(record)
+        row = [None] * col_count
+        for n, i in enumerate(fixed_cols):
+            row[i] = values[n + 2]
+        offset = fixed.size
+        for i in var_cols:
+            length = VARLEN.unpack_from(record, offset)[0]
+            offset += VARLEN.size
+            row[i] = str(record[offset:offset + length], 'utf-8')
+            offset += length
+        if values[1] != no_nulls:
+            bitmap = values[1]
+            for i in range(col_count):
+                if bitmap[i >> 3] & (1 << (i & 7)):
+                    row[i] = None
+        return row
+
+    return encode, decode
+
+
+def record_codec(model):
+    """
+    Returns the (cached) record encoder and decoder for a table model. The
+    decoder pads records written before columns were added with the columns'
+    defaults.
+
+    :param model: The table model (see `extract_model_from`)
+    :return: An (encode, decode) tuple of functions
+    """
+    data_types = tuple(col['data_type'] for col in model)
+    defaults = tuple(col['default'] for col in model)
+    codec = record_codecs.get((data_types, defaults))
+    if codec is None:
+        encode, decode = compile_record_codec(data_types)
+        col_count = len(data_types)
+
+        def decode_padded(record):
+            record_cols = RECORD_COLUMNS.unpack_from(record)[0]
+            if record_cols == col_count:
+                return decode(record)
+            row = record_codec(model[:record_cols])[1](record)
+            return row + list(defaults[record_cols:])
+
+        codec = record_codecs[(data_types, defaults)] = (encode, decode_padded)
+    return codec
+
+
+def paged_create(tbl_path, header):
+    """
+    Creates an empty paged table
+
+    :param tbl_path: The file path to the table
+    :param header: The table header (e.g. "pid int,name varchar(20)")
+    """
+    page = bytearray(PAGE_SIZE)
+    paged_write_header(page, header, 0)
+    with open(tbl_path, 'wb') as table_file:
+        table_file.write(page)
+
+
+def paged_write_header(page, header, row_count, dead_count=0):
+    """
+    Packs the file header of a paged table into its first page
+
+    :param page: The first page of the table (bytearray)
+    :param header: The table header (e.g. "pid int,name varchar(20)")
+    :param row_count: The number of rows in the table
+    :param dead_count: The number of dead rows in the table
+    """
+    schema = header.encode('utf-8')
+    if PAGED_HEADER.size + len(schema) > PAGE_SIZE:
+        raise ValueError('table header is too long')
+    page[:] = bytes(PAGE_SIZE)
+    PAGED_HEADER.pack_into(page, 0, PAGED_MAGIC, PAGED_VERSION, PAGE_SIZE, row_count, dead_count, len(schema))
+    page[PAGED_HEADER.size:PAGED_HEADER.size + len(schema)] = schema
+
+
+def paged_read_file_header(page):
+    """
+    Unpacks the file header of a paged table from its first page
+
+    :param page: The first page of the table
+    :return: A (table header, row count, dead row count) tuple
+    """
+    magic, version, page_size, row_count, dead_count, schema_len = PAGED_HEADER.unpack_from(page)
+    if version != PAGED_VERSION or page_size != PAGE_SIZE:
+        raise ValueError('unsupported paged table format')
+    schema = bytes(page[PAGED_HEADER.size:PAGED_HEADER.size + schema_len])
+    return schema.decode('utf-8'), row_count, dead_count
+
+
+def paged_read_header(tbl_path):
+    """
+    Reads the table header of a paged table
+
+    :param tbl_path: The file path to the table
+    :return: The table header as a string
+    """
+    with open(tbl_path, 'rb') as table_file:
+        return paged_read_file_header(table_file.read(PAGE_SIZE))[0]
+
+
+def paged_add_rows(pager, count, dead=0):
+    """
+    Adjusts the row counts in the file header of a paged table
+
+    :param pager: The pager of the table
+    :param count: The number of rows added (negative for removed rows)
+    :param dead: The number of dead rows added (negative for reclaimed ones)
+    """
+    page = pager.read(0)
+    header, row_count, dead_count = paged_read_file_header(page)
+    paged_write_header(page, header, row_count + count, dead_count + dead)
+    pager.mark_dirty(0)
+
+
+def paged_place(pager, record, hint=None):
+    """
+    Stores a record on the first data page with room for it, allocating a new
+    page if none has
+
+    :param pager: The pager of the table
+    :param record: The encoded record
+    :param hint: A page number to try first (e.g. where the last row went)
+    :return: The row id of the record
+    """
+    if len(record) > MAX_RECORD:
+        raise ValueError('row is too large for a %i byte page' % PAGE_SIZE)
+    page_no = pager.find_free_page(len(record) + SLOT.size, hint)
+    if page_no is None:
+        page_no = pager.allocate()
+    page = pager.read(page_no)
+    slot = page_insert(page, record)
+    pager.mark_dirty(page_no)
+    pager.update_free_space(page_no)
+    return page_no << 16 | slot
+
+
+def paged_last_page(pager):
+    """
+    Returns the page number of the last data page, or None if there is none
+    """
+    page_no = pager.page_count - 1
+    return page_no if page_no > 0 and not is_fsm_page(page_no) else None
+
+
+def paged_scan(tbl_path, model, cols=None, where=None, blocks=None):
+    """
+    Scans a paged table, reading READ_AHEAD pages at a time and decoding the
+    records straight out of the read buffer
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param cols: The column numbers needed (all of them are decoded)
+    :param where: The bound WHERE condition the rows must match, or None
+    :param blocks: The sorted numbers of the zone map blocks to scan (see
+    `zone_blocks`), or None to scan the whole table
+    :return: A generator of (row id, row) tuples
+    """
+    predicate = where['predicate'] if where is not None else None
+    decode = record_codec(model)[1]
+    scanned = read = 0
+    try:
+        with open(tbl_path, 'rb') as table_file:
+            page_count = -(-table_file.seek(0, os.SEEK_END) // PAGE_SIZE)
+            if blocks is None:
+                runs = [(1, page_count)]  # skip the file header
+            else:
+                block_pages = 1 << (PAGED_ZONE_SHIFT - 16)
+                runs = [(max(1, block * block_pages), min(page_count, (block + 1) * block_pages)) for block in blocks]
+            for page_no, stop in runs:
+                table_file.seek(page_no * PAGE_SIZE)
+                while page_no < stop:
+                    chunk = table_file.read(PAGE_SIZE * min(READ_AHEAD, stop - page_no))
+                    if not chunk:
+                        break
+                    read += len(chunk)
+                    view = memoryview(chunk)
+                    for start in range(0, len(chunk), PAGE_SIZE):
+                        if not is_fsm_page(page_no):
+                            for slot, record in page_records(view[start:start + PAGE_SIZE]):
+                                scanned += 1
+                                row = decode(record)
+                                if predicate is None or predicate(row):
+                                    yield page_no << 16 | slot, row
+                        page_no += 1
+    finally:
+        count_scan(scanned, read)
+
+
+def paged_fetch(tbl_path, model, rowids, cols=None):
+    """
+    Reads rows of a paged table by row id. Row ids in ascending order read
+    each page only once.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: An iterable of row ids
+    :param cols: The column numbers needed (all of them are decoded)
+    :return: A generator of (row id, row) tuples
+    """
+    decode = record_codec(model)[1]
+    scanned = read = 0
+    try:
+        with open(tbl_path, 'rb') as table_file:
+            page_no, page = None, None
+            for rowid in rowids:
+                if rowid >> 16 != page_no:
+                    page_no = rowid >> 16
+                    table_file.seek(page_no * PAGE_SIZE)
+                    page = memoryview(table_file.read(PAGE_SIZE))
+                    read += len(page)
+                slot = rowid & 0xFFFF
+                if len(page) < PAGE_SIZE or slot >= DATA_PAGE_HEADER.unpack_from(page)[2]:
+                    continue
+                offset, length = SLOT.unpack_from(page, DATA_PAGE_HEADER.size + slot * SLOT.size)
+                if 0 < length < SLOT_DEAD:  # skip empty and dead slots
+                    scanned += 1
+                    yield rowid, decode(page[offset:offset + length])
+    finally:
+        count_scan(scanned, read)
+
+
+def paged_insert(tbl_path, model, rows):
+    """
+    Inserts rows into a paged table, writing only the pages that change
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rows: The list of rows (lists of typed values) to insert
+    :return: The list of row ids of the inserted rows
+    """
+    encode = record_codec(model)[0]
+    records = [encode(row) for row in rows]  # encode everything before writing anything
+    pager = Pager(tbl_path, writable=True)
+    try:
+        rowids = []
+        hint = paged_last_page(pager)
+        for record in records:
+            rowid = paged_place(pager, record, hint)
+            rowids.append(rowid)
+            hint = rowid >> 16
+        paged_add_rows(pager, len(rows))
+        pager.flush()
+    finally:
+        pager.close()
+    return rowids
+
+
+def paged_update(tbl_path, model, changes):
+    """
+    Replaces rows of a paged table by row id. Rows are rewritten on their own
+    page when there is room for them and otherwise appended to another page as
+    a new version, leaving a dead slot behind.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param changes: A dict mapping row ids to their new rows
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    """
+    encode = record_codec(model)[0]
+    records = [(rowid, encode(changes[rowid])) for rowid in sorted(changes)]  # encode everything first
+
+    pager = Pager(tbl_path, writable=True)
+    try:
+        moved = []
+        for rowid, record in records:
+            page_no = rowid >> 16
+            if not page_replace(pager.read(page_no), rowid & 0xFFFF, record):
+                moved.append((rowid, record))
+            pager.mark_dirty(page_no)
+            pager.update_free_space(page_no)
+
+        relocated = {}
+        for rowid, record in moved:
+            relocated[rowid] = paged_place(pager, record, paged_last_page(pager))
+        if moved:
+            paged_add_rows(pager, 0, len(moved))
+        pager.flush()
+    finally:
+        pager.close()
+    return relocated
+
+
+def paged_delete(tbl_path, model, rowids):
+    """
+    Deletes rows of a paged table by row id by marking their slots dead
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: A set of the row ids to delete
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    (always empty)
+    """
+    pager = Pager(tbl_path, writable=True)
+    try:
+        for rowid in sorted(rowids):
+            page_delete(pager.read(rowid >> 16), rowid & 0xFFFF)
+            pager.mark_dirty(rowid >> 16)
+        paged_add_rows(pager, -len(rowids), len(rowids))
+        pager.flush()
+    finally:
+        pager.close()
+    return {}
+
+
+def paged_check_row(model, row):
+    """
+    Checks that a row can be stored in a paged table, raising a ValueError if
+    its record wouldn't fit on a page
+    """
+    if len(record_codec(model)[0](row)) > MAX_RECORD:
+        raise ValueError('row is too large for a %i byte page' % PAGE_SIZE)
+
+
+def paged_garbage(tbl_path):
+    """
+    Returns the fraction of the rows of a paged table which are dead
+    """
+    with open(tbl_path, 'rb') as table_file:
+        row_count, dead_count = paged_read_file_header(table_file.read(PAGE_SIZE))[1:]
+    return dead_count / max(1, row_count + dead_count)
+
+
+def paged_vacuum(tbl_path, model):
+    """
+    Compacts every data page of a paged table, reclaiming the space of dead
+    rows and old row versions. Pages are processed a group at a time, so only
+    one group is held in memory.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    (always empty, as rows stay on their pages)
+    """
+    pager = Pager(tbl_path, writable=True)
+    try:
+        reclaimed = 0
+        for page_no in range(1, pager.page_count):
+            if is_fsm_page(page_no):
+                pager.evict()
+                continue
+            page = pager.read(page_no)
+            compacted = bytearray(page)
+            reclaimed += page_compact(compacted)
+            if compacted != page:
+                page[:] = compacted
+                pager.mark_dirty(page_no)
+                pager.update_free_space(page_no)
+        paged_add_rows(pager, 0, -reclaimed)
+        pager.flush()
+    finally:
+        pager.close()
+    return {}
+
+
+# Columnar storage engine functions
+#
+# A columnar table keeps each column in a file of its own, so a query reads
+# only the columns it needs. The table file holds just the magic number,
+# format version, file generation and table header; the data lives in files
+# named after the table and its generation:
+#
+# - <table>.<generation>.live holds a byte per row, 1 for live rows and 0 for
+#   deleted ones; its size is the number of rows
+# - <table>.<generation>.<column number>.col holds the values of a column as
+#   a packed array (see COLUMN_TYPE_CODES): ints, floats and bools as they
+#   are and strings as codes into the column's dictionary
+# - <table>.<generation>.<column number>.dict holds the distinct strings of a
+#   string column, each prefixed with its length; code n is the n-th string
+#
+# Column files end early when rows were added before the column was; those
+# rows read the column's default, which is also stored for them once later
+# rows are written to the column.
+#
+# NULL is stored as INT_NULL, NaN, bool code 0 or string code 0. A row id is
+# the row number, so rows never move: UPDATE overwrites values in place and
+# DELETE clears the row's live byte. VACUUM writes the live rows to the files
+# of the next generation and then switches the table file over to them.
+#
+# Scans filter COLUMN_CHUNK rows at a time. The WHERE condition turns a chunk
+# of its column into a selection (a byte per row, 1 where the row matches)
+# using C-level `map`s over the compared value's comparison methods or, for
+# strings and bools, a lookup table of the results for each distinct value.
+# Only chunks with selected rows are read from the other columns.
+
+def columnar_path(tbl_path, generation, ext, col=None):
+    """
+    Returns the path to a data file of a columnar table
+
+    :param tbl_path: The file path to the table
+    :param generation: The file generation of the table
+    :param ext: The kind of file (LIVE_EXT, COLUMN_EXT or DICT_EXT)
+    :param col: The column number (for column files and dictionaries)
+    :return: The path to the file
+    """
+    if col is None:
+        return '%s.%i%s' % (tbl_path, generation, ext)
+    return '%s.%i.%i%s' % (tbl_path, generation, col, ext)
+
+
+def columnar_files(tbl_path, generation):
+    """
+    Lists the data files of a generation of a columnar table
+
+    :param tbl_path: The file path to the table
+    :param generation: The file generation
+    :return: The list of file paths
+    """
+    db_path, tbl_name = os.path.split(tbl_path)
+    prefix = '%s.%i.' % (tbl_name, generation)
+    return [os.path.join(db_path, file_name) for file_name in os.listdir(db_path)
+            if file_name.startswith(prefix) and file_name.endswith((LIVE_EXT, COLUMN_EXT, DICT_EXT))]
+
+
+def columnar_file_header(tbl_path):
+    """
+    Reads the file header of a columnar table
+
+    :param tbl_path: The file path to the table
+    :return: A (table header, file generation) tuple
+    """
+    with open(tbl_path, 'rb') as table_file:
+        data = table_file.read()
+    magic, version, generation, schema_len = COLUMNAR_HEADER.unpack_from(data)
+    if version != COLUMNAR_VERSION:
+        raise ValueError('unsupported columnar table format')
+    schema = data[COLUMNAR_HEADER.size:COLUMNAR_HEADER.size + schema_len]
+    return schema.decode('utf-8'), generation
+
+
+def columnar_write_header(tbl_path, header, generation):
+    """
+    Replaces the file header of a columnar table
+
+    :param tbl_path: The file path to the table
+    :param header: The table header (e.g. "pid int,name varchar(20)")
+    :param generation: The file generation of the table
+    """
+    schema = header.encode('utf-8')
+    with open(tbl_path + TMP_EXT, 'wb') as table_file:
+        table_file.write(COLUMNAR_HEADER.pack(COLUMNAR_MAGIC, COLUMNAR_VERSION, generation, len(schema)))
+        table_file.write(schema)
+    replace_file(tbl_path + TMP_EXT, tbl_path)
+
+
+def column_dictionary(dict_path):
+    """
+    Returns the (cached) dictionary of a string column. Strings appended to
+    the dictionary file since it was cached are read on the next call.
+
+    :param dict_path: The path to the dictionary file
+    :return: A dict with the strings by code ('values', with None as code 0),
+    the codes by string ('codes', None until `column_encode` needs them) and
+    the number of bytes of the file read so far ('size')
+    """
+    try:
+        stat = os.stat(dict_path)
+        size, inode = stat.st_size, stat.st_ino
+    except OSError:
+        size, inode = 0, None
+    dictionary = column_dictionaries.get(dict_path)
+    if dictionary is None or dictionary['inode'] != inode or dictionary['size'] > size:
+        dictionary = column_dictionaries[dict_path] = {'values': [None], 'codes': None, 'size': 0, 'inode': inode}
+    if dictionary['size'] < size:
+        with open(dict_path, 'rb') as dict_file:
+            dict_file.seek(dictionary['size'])
+            data = dict_file.read(size - dictionary['size'])
+        values = dictionary['values']
+        offset = 0
+        while offset + DICT_ENTRY.size <= len(data):
+            end = offset + DICT_ENTRY.size + DICT_ENTRY.unpack_from(data, offset)[0]
+            if end > len(data):
+                break  # a torn entry, which the next string appended overwrites
+            values.append(str(data[offset + DICT_ENTRY.size:end], 'utf-8'))
+            offset = end
+        dictionary['size'] += offset
+        if dictionary['codes'] is not None:
+            dictionary['codes'].update((values[code], code) for code in range(len(dictionary['codes']) + 1, len(values)))
+    return dictionary
+
+
+def columnar_forget(tbl_path):
+    """
+    Drops the cached dictionaries of a columnar table (e.g. when it is
+    created again or vacuumed)
+    """
+    prefix = tbl_path + '.'
+    for dict_path in [path for path in column_dictionaries if path.startswith(prefix)]:
+        del column_dictionaries[dict_path]
+
+
+def column_encode(code, values, dict_path):
+    """
+    Encodes typed values as the stored values of a column, adding new
+    strings to the column's dictionary
+
+    :param code: The array type code of the column
+    :param values: The list of values
+    :param dict_path: The path to the dictionary of the column
+    :return: The stored values as an array
+    """
+    if code == 'B':
+        return array.array(code, [0 if value is None else 2 if value else 1 for value in values])
+    if code != 'I':
+        null = COLUMN_NULLS[code]
+        return array.array(code, [null if value is None else value for value in values])
+
+    dictionary = column_dictionary(dict_path)
+    strings = dictionary['values']
+    if dictionary['codes'] is None:
+        dictionary['codes'] = {value: code for code, value in enumerate(strings) if code}
+    codes = dictionary['codes']
+    encoded = array.array(code)
+    new_strings = []
+    for value in values:
+        if value is None:
+            encoded.append(0)
+            continue
+        string_code = codes.get(value)
+        if string_code is None:
+            string_code = codes[value] = len(strings)
+            strings.append(value)
+            new_strings.append(value.encode('utf-8'))
+        encoded.append(string_code)
+
+    if new_strings:
+        data = b''.join(DICT_ENTRY.pack(len(string)) + string for string in new_strings)
+        with open(dict_path, 'r+b' if os.path.exists(dict_path) else 'wb') as dict_file:
+            dict_file.seek(dictionary['size'])
+            dict_file.write(data)
+            dict_file.truncate()
+        dictionary['size'] += len(data)
+        dictionary['inode'] = os.stat(dict_path).st_ino
+    return encoded
+
+
+def column_decoder(code, dict_path):
+    """
+    Returns a function which decodes a stored value of a column into its
+    typed value (None for NULL)
+
+    :param code: The array type code of the column
+    :param dict_path: The path to the dictionary of the column
+    """
+    if code == 'I':
+        return column_dictionary(dict_path)['values'].__getitem__
+    if code == 'B':
+        return (None, False, True).__getitem__
+    if code == 'q':
+        return lambda value: None if value == INT_NULL else value
+    return lambda value: None if value != value else value  # NaN is NULL
+
+
+def column_default(code, col, dict_path):
+    """
+    Returns the stored value of the default of a column (see `column_read`)
+
+    :param code: The array type code of the column
+    :param col: The model column
+    :param dict_path: The path to the dictionary of the column
+    """
+    return column_encode(code, [col['default']], dict_path)[0]
+
+
+def column_read(column_file, code, start, count, pad):
+    """
+    Reads a chunk of the stored values of a column. Rows added before the
+    column was (which are missing from its file) read as the given value.
+
+    :param column_file: The open column file, or None if it doesn't exist
+    :param code: The array type code of the column
+    :param start: The number of the first row to read
+    :param count: The number of rows to read
+    :param pad: The stored value of the column's default (see
+    `column_default`)
+    :return: The stored values as an array
+    """
+    values = array.array(code)
+    if column_file is not None:
+        column_file.seek(start * values.itemsize)
+        data = column_file.read(count * values.itemsize)
+        count_scan(0, len(data))
+        values.frombytes(data[:len(data) - len(data) % values.itemsize])
+    if len(values) < count:
+        values.extend(array.array(code, [pad]) * (count - len(values)))
+    return values
+
+
+def column_write(col_path, start, values, pad):
+    """
+    Writes stored values to a column file starting at the given row, padding
+    the file with the column's default first if it ends before that row
+
+    :param col_path: The path to the column file
+    :param start: The number of the row to write the first value to
+    :param values: The stored values (an array)
+    :param pad: The stored value of the column's default (see
+    `column_default`)
+    """
+    with open(col_path, 'r+b' if os.path.exists(col_path) else 'wb') as column_file:
+        size = column_file.seek(0, os.SEEK_END) // values.itemsize
+        if size < start:
+            column_file.write(array.array(values.typecode, [pad]).tobytes() * (start - size))
+        column_file.seek(start * values.itemsize)
+        column_file.write(values.tobytes())
+
+
+def column_filter(where, code, dict_path):
+    """
+    Compiles a bound WHERE condition on a column into a function which turns
+    a chunk of the column's stored values into a selection: bytes holding 1
+    for each value which matches and 0 for the others. As in `bind_condition`,
+    NULL never matches.
+
+    :param where: The bound WHERE condition (see `bind_condition`)
+    :param code: The array type code of the column
+    :param dict_path: The path to the dictionary of the column
+    :return: The filter function
+    """
+    operator, value = where['operator'], where['value']
+    cond = cond_func(operator)
+    test = lambda x: x is not None and cond(x, value)
+
+    if code in ('I', 'B'):
+        # test each distinct value once and look the stored codes up in the
+        # results
+        distinct = column_dictionary(dict_path)['values'] if code == 'I' else (None, False, True)
+        results = bytes(bool(test(x)) for x in distinct)
+        return lambda chunk: bytes(map(results.__getitem__, chunk))
+
+    # NULLs are left out explicitly where the comparison itself would select
+    # them: INT_NULL is less than any int and NaN is unequal to everything
+    if code == 'q':
+        needs_mask = operator in ('<', '<=', '<>', '!=', 'between') or (operator == 'in' and INT_NULL in value)
+        not_null = lambda chunk: bytes(map(INT_NULL.__ne__, chunk))
+    else:
+        needs_mask = operator in ('<>', '!=')
+        not_null = lambda chunk: bytes(map(float.__eq__, chunk, chunk))
+
+    if value is not None and operator in REFLECTED_OPS:
+        method = getattr(value, REFLECTED_OPS[operator])
+        if needs_mask:
+            return lambda chunk: and_selections(bytes(map(method, chunk)), not_null(chunk))
+        return lambda chunk: bytes(map(method, chunk))
+    if operator == 'between' and None not in value:
+        above, below = value[0].__le__, value[1].__ge__
+        if needs_mask:
+            return lambda chunk: and_selections(and_selections(bytes(map(above, chunk)), bytes(map(below, chunk))),
+                                                not_null(chunk))
+        return lambda chunk: and_selections(bytes(map(above, chunk)), bytes(map(below, chunk)))
+    if operator == 'in':
+        member = value.__contains__
+        if needs_mask:
+            return lambda chunk: and_selections(bytes(map(member, chunk)), not_null(chunk))
+        return lambda chunk: bytes(map(member, chunk))
+
+    decode = column_decoder(code, dict_path)
+    return lambda chunk: bytes(bool(test(x)) for x in map(decode, chunk))
+
+
+def and_selections(a, b):
+    """
+    Combines two selections (see `column_filter`) of the same length into
+    the selection of the rows selected by both
+    """
+    return (int.from_bytes(a, 'little') & int.from_bytes(b, 'little')).to_bytes(len(a), 'little')
+
+
+def columnar_create(tbl_path, header):
+    """
+    Creates an empty columnar table
+
+    :param tbl_path: The file path to the table
+    :param header: The table header (e.g. "pid int,name varchar(20)")
+    """
+    columnar_forget(tbl_path)
+    open(columnar_path(tbl_path, 0, LIVE_EXT), 'wb').close()
+    columnar_write_header(tbl_path, header, 0)
+
+
+def columnar_read_header(tbl_path):
+    """
+    Reads the table header of a columnar table
+
+    :param tbl_path: The file path to the table
+    :return: The table header as a string
+    """
+    return columnar_file_header(tbl_path)[0]
+
+
+def columnar_scan(tbl_path, model, cols=None, where=None, blocks=None):
+    """
+    Scans a columnar table COLUMN_CHUNK rows at a time, filtering each chunk
+    of the WHERE column into a selection and reading only the needed columns
+    of the chunks with selected rows
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param cols: The column numbers needed, or None for all of them (the
+    others are None in the rows)
+    :param where: The bound WHERE condition the rows must match, or None
+    :param blocks: The sorted numbers of the zone map blocks (chunks) to
+    scan (see `zone_blocks`), or None to scan the whole table
+    :return: A generator of (row id, row) tuples
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    with open(columnar_path(tbl_path, generation, LIVE_EXT), 'rb') as live_file:
+        live = live_file.read()
+    count_scan(0, len(live))
+    if blocks is None:
+        starts = range(0, len(live), COLUMN_CHUNK)
+    else:
+        starts = [block << COLUMNAR_ZONE_SHIFT for block in blocks if block << COLUMNAR_ZONE_SHIFT < len(live)]
+    needed = set(range(len(model)) if cols is None else cols)
+    if where is not None:
+        needed.add(where['col'])
+    codes = [COLUMN_TYPE_CODES[col['data_type']] for col in model]
+
+    files = {}
+    scanned = 0
+    try:
+        decoders = {}
+        pads = {}
+        for i in needed:
+            col_path = columnar_path(tbl_path, generation, COLUMN_EXT, i)
+            dict_path = columnar_path(tbl_path, generation, DICT_EXT, i)
+            files[i] = open(col_path, 'rb') if os.path.exists(col_path) else None
+            pads[i] = column_default(codes[i], model[i], dict_path)
+            decoders[i] = column_decoder(codes[i], dict_path)
+        if where is not None:
+            where_col = where['col']
+            select = column_filter(where, codes[where_col], columnar_path(tbl_path, generation, DICT_EXT, where_col))
+
+        for start in starts:
+            count = min(COLUMN_CHUNK, len(live) - start)
+            scanned += count
+            selection = live[start:start + count]
+            chunks = {}
+            if where is not None:
+                chunks[where_col] = column_read(files[where_col], codes[where_col], start, count, pads[where_col])
+                selection = and_selections(selection, select(chunks[where_col]))
+            if 1 not in selection:
+                continue  # skip reading the other columns
+            for i in needed:
+                if i not in chunks:
+                    chunks[i] = column_read(files[i], codes[i], start, count, pads[i])
+
+            columns = [(i, chunks[i], decoders[i]) for i in sorted(needed)]
+            for pos in itertools.compress(range(count), selection):
+                row = [None] * len(model)
+                for i, chunk, decode in columns:
+                    row[i] = decode(chunk[pos])
+                yield start + pos, row
+    finally:
+        count_scan(scanned, 0)
+        for column_file in files.values():
+            if column_file is not None:
+                column_file.close()
+
+
+def columnar_fetch(tbl_path, model, rowids, cols=None):
+    """
+    Reads rows of a columnar table by row id, reading only the needed columns
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: An iterable of row ids
+    :param cols: The column numbers needed, or None for all of them
+    :return: A generator of (row id, row) tuples
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    needed = sorted(range(len(model)) if cols is None else cols)
+    codes = [COLUMN_TYPE_CODES[col['data_type']] for col in model]
+    files = {}
+    scanned = 0
+    try:
+        columns = []
+        for i in needed:
+            col_path = columnar_path(tbl_path, generation, COLUMN_EXT, i)
+            dict_path = columnar_path(tbl_path, generation, DICT_EXT, i)
+            files[i] = open(col_path, 'rb') if os.path.exists(col_path) else None
+            columns.append((i, files[i], codes[i], column_default(codes[i], model[i], dict_path),
+                            column_decoder(codes[i], dict_path)))
+        with open(columnar_path(tbl_path, generation, LIVE_EXT), 'rb') as live_file:
+            for rowid in rowids:
+                live_file.seek(rowid)
+                if live_file.read(1) != b'\x01':
+                    continue
+                scanned += 1
+                row = [None] * len(model)
+                for i, column_file, code, pad, decode in columns:
+                    row[i] = decode(column_read(column_file, code, rowid, 1, pad)[0])
+                yield rowid, row
+    finally:
+        count_scan(scanned, 0)
+        for column_file in files.values():
+            if column_file is not None:
+                column_file.close()
+
+
+def columnar_insert(tbl_path, model, rows):
+    """
+    Appends rows to a columnar table. The values are written to the column
+    files first and the rows only become visible when the live row map is
+    extended, so a partial insert leaves no trace.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rows: The list of rows (lists of typed values) to insert
+    :return: The list of row ids of the inserted rows
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    live_path = columnar_path(tbl_path, generation, LIVE_EXT)
+    start = os.path.getsize(live_path)
+    for i, col in enumerate(model):
+        # the default pads the column for rows added before it was
+        values = column_encode(COLUMN_TYPE_CODES[col['data_type']], [col['default']] + [row[i] for row in rows],
+                               columnar_path(tbl_path, generation, DICT_EXT, i))
+        column_write(columnar_path(tbl_path, generation, COLUMN_EXT, i), start, values[1:], values[0])
+    with open(live_path, 'ab') as live_file:
+        live_file.write(b'\x01' * len(rows))
+    return list(range(start, start + len(rows)))
+
+
+def columnar_update(tbl_path, model, changes):
+    """
+    Replaces rows of a columnar table by row id, overwriting their values in
+    place
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param changes: A dict mapping row ids to their new rows
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    (always empty)
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    rowids = sorted(changes)
+    for i, col in enumerate(model):
+        values = column_encode(COLUMN_TYPE_CODES[col['data_type']], [col['default']] + [
+            changes[rowid][i] for rowid in rowids], columnar_path(tbl_path, generation, DICT_EXT, i))
+        col_path = columnar_path(tbl_path, generation, COLUMN_EXT, i)
+        for n, rowid in enumerate(rowids, 1):
+            column_write(col_path, rowid, values[n:n + 1], values[0])
+    return {}
+
+
+def columnar_delete(tbl_path, model, rowids):
+    """
+    Deletes rows of a columnar table by row id by clearing their live bytes
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: A set of the row ids to delete
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    (always empty)
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    with open(columnar_path(tbl_path, generation, LIVE_EXT), 'r+b') as live_file:
+        for rowid in sorted(rowids):
+            live_file.seek(rowid)
+            live_file.write(b'\x00')
+    return {}
+
+
+def columnar_row_count(tbl_path):
+    """
+    Returns the number of rows (live or deleted) of a columnar table
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    return os.path.getsize(columnar_path(tbl_path, generation, LIVE_EXT))
+
+
+def columnar_truncate(tbl_path, row_count):
+    """
+    Cuts rows appended to a columnar table off its live row map (e.g. a
+    partially appended batch after a crash)
+
+    :param tbl_path: The file path to the table
+    :param row_count: The number of rows to keep
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    with open(columnar_path(tbl_path, generation, LIVE_EXT), 'r+b') as live_file:
+        live_file.truncate(row_count)
+
+
+def columnar_sync(tbl_path):
+    """
+    Flushes the data files of a columnar table to disk
+    """
+    for path in columnar_files(tbl_path, columnar_file_header(tbl_path)[1]):
+        fsync_file(path)
+
+
+def columnar_check_row(model, row):
+    """
+    Checks that a row can be stored in a columnar table, raising a ValueError
+    if an int is out of the range of its column
+    """
+    for col, value in zip(model, row):
+        if COLUMN_TYPE_CODES[col['data_type']] == 'q' and value is not None and not INT_NULL < value < 2 ** 63:
+            raise ValueError('int value %i is out of range' % value)
+
+
+def columnar_garbage(tbl_path):
+    """
+    Returns the fraction of the rows of a columnar table which are deleted
+    """
+    generation = columnar_file_header(tbl_path)[1]
+    with open(columnar_path(tbl_path, generation, LIVE_EXT), 'rb') as live_file:
+        live = live_file.read()
+    return live.count(0) / max(1, len(live))
+
+
+def columnar_vacuum(tbl_path, model):
+    """
+    Writes the live rows of a columnar table (and the strings they use) to
+    the files of the next generation, then switches the table over to them
+    and removes the old files
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :return: None, as all row ids were reassigned
+    """
+    header, generation = columnar_file_header(tbl_path)
+    new_generation = generation + 1
+    with open(columnar_path(tbl_path, generation, LIVE_EXT), 'rb') as live_file:
+        live = live_file.read()
+
+    new_paths = []
+    for i, col in enumerate(model):
+        code = COLUMN_TYPE_CODES[col['data_type']]
+        col_path = columnar_path(tbl_path, generation, COLUMN_EXT, i)
+        new_col_path = columnar_path(tbl_path, new_generation, COLUMN_EXT, i)
+        pad = column_default(code, col, columnar_path(tbl_path, generation, DICT_EXT, i))
+        if code == 'I':
+            strings = column_dictionary(columnar_path(tbl_path, generation, DICT_EXT, i))['values']
+            new_codes = {0: 0}
+            new_strings = []
+        column_file = open(col_path, 'rb') if os.path.exists(col_path) else None
+        try:
+            with open(new_col_path, 'wb') as new_file:
+                for start in range(0, len(live), COLUMN_CHUNK):
+                    count = min(COLUMN_CHUNK, len(live) - start)
+                    values = array.array(code, itertools.compress(
+                        column_read(column_file, code, start, count, pad), live[start:start + count]))
+                    if code == 'I':  # renumber the strings which are still used
+                        for n, string_code in enumerate(values):
+                            new_code = new_codes.get(string_code)
+                            if new_code is None:
+                                new_code = new_codes[string_code] = len(new_strings) + 1
+                                new_strings.append(strings[string_code].encode('utf-8'))
+                            values[n] = new_code
+                    new_file.write(values.tobytes())
+        finally:
+            if column_file is not None:
+                column_file.close()
+        new_paths.append(new_col_path)
+        if code == 'I':
+            new_dict_path = columnar_path(tbl_path, new_generation, DICT_EXT, i)
+            with open(new_dict_path, 'wb') as dict_file:
+                dict_file.write(b''.join(DICT_ENTRY.pack(len(string)) + string for string in new_strings))
+            new_paths.append(new_dict_path)
+    new_live_path = columnar_path(tbl_path, new_generation, LIVE_EXT)
+    with open(new_live_path, 'wb') as live_file:
+        live_file.write(b'\x01' * live.count(1))
+    new_paths.append(new_live_path)
+
+    for path in new_paths:
+        fsync_file(path)
+    columnar_write_header(tbl_path, header, new_generation)  # the switch is atomic
+
+    for path in columnar_files(tbl_path, generation):
+        os.remove(path)
+    columnar_forget(tbl_path)
+    return None
+
+
+# Compressed storage engine functions
+#
+# A compressed table file holds the magic number, format version and table
+# header, followed by segments of rows. A segment holds rows with
+# consecutive row ids (a row id is the row number) of a single zone map
+# block (COMPRESSED_ZONE_SHIFT), column by column: each column is encoded to
+# suit its values (see `segment_encode`) and compressed on its own, and the
+# segment header lists where each column is, so scans read and decompress
+# only the columns they need, and only of the blocks they scan. A scan with a
+# WHERE condition decompresses the other columns of a segment only if some
+# of its rows match.
+#
+# The file is only ever appended to. INSERT appends a segment for the rows
+# of each block it adds to (compressed with zlib), and once a block is full,
+# a segment of all of its rows which supersedes the smaller ones. UPDATE
+# appends the new versions of its rows and tombstones the old ones (in
+# <table>.del, like CSV tables), and DELETE only tombstones rows. VACUUM
+# writes the live rows to a new file compressed with lzma, which is slower
+# but takes less space, suiting tables which are rarely written to.
+
+def compressed_create(tbl_path, header):
+    """
+    Creates an empty compressed table
+
+    :param tbl_path: The file path to the table
+    :param header: The table header (e.g. "pid int,name varchar(20)")
+    """
+    segment_maps.pop(tbl_path, None)
+    schema = header.encode('utf-8')
+    with open(tbl_path, 'wb') as table_file:
+        table_file.write(COMPRESSED_HEADER.pack(COMPRESSED_MAGIC, COMPRESSED_VERSION, len(schema)))
+        table_file.write(schema)
+
+
+def compressed_read_header(tbl_path):
+    """
+    Reads the table header of a compressed table
+
+    :param tbl_path: The file path to the table
+    :return: The table header as a string
+    """
+    with open(tbl_path, 'rb') as table_file:
+        magic, version, schema_len = COMPRESSED_HEADER.unpack(table_file.read(COMPRESSED_HEADER.size))
+        if version != COMPRESSED_VERSION:
+            raise ValueError('unsupported compressed table format')
+        return table_file.read(schema_len).decode('utf-8')
+
+
+def compressed_segments(tbl_path):
+    """
+    Returns the (cached) segment map of a compressed table. Only the headers
+    of the segments are read, and segments appended to the file since it was
+    cached are read on the next call.
+
+    :param tbl_path: The file path to the table
+    :return: A dict with the segments holding the rows of each block
+    ('blocks', lists of (first row id, row count, codec, column directory)
+    tuples keyed by block number, where the directory lists the (file offset,
+    compressed length, encoding) of each column), the number of rows
+    ('row_count'), the number of rows in superseded segments ('superseded')
+    and the number of bytes of the file read so far ('size')
+    """
+    stat = os.stat(tbl_path)
+    segment_map = segment_maps.get(tbl_path)
+    if segment_map is None or segment_map['inode'] != stat.st_ino or segment_map['size'] > stat.st_size:
+        segment_map = segment_maps[tbl_path] = {
+            'blocks': {},
+            'row_count': 0,
+            'superseded': 0,
+            'size': COMPRESSED_HEADER.size + len(compressed_read_header(tbl_path).encode('utf-8')),
+            'inode': stat.st_ino
+        }
+    if segment_map['size'] < stat.st_size:
+        block_rows = 1 << COMPRESSED_ZONE_SHIFT
+        with open(tbl_path, 'rb') as table_file:
+            offset = table_file.seek(segment_map['size'])
+            while True:
+                data = table_file.read(SEGMENT_HEADER.size)
+                if len(data) < SEGMENT_HEADER.size:
+                    break
+                first, count, length, codec, col_count = SEGMENT_HEADER.unpack(data)
+                end = offset + SEGMENT_HEADER.size + length
+                if end > stat.st_size:
+                    break  # a torn segment, which recovery cuts off
+                entries = table_file.read(SEGMENT_COLUMN.size * col_count)
+                directory = []
+                position = offset + SEGMENT_HEADER.size + len(entries)
+                for compressed_len, encoding in SEGMENT_COLUMN.iter_unpack(entries):
+                    directory.append((position, compressed_len, encoding))
+                    position += compressed_len
+                segments = segment_map['blocks'].setdefault(first >> COMPRESSED_ZONE_SHIFT, [])
+                if count == block_rows and segments:  # a full block supersedes its smaller segments
+                    segment_map['superseded'] += sum(segment[1] for segment in segments)
+                    segments.clear()
+                segments.append((first, count, codec, directory))
+                segment_map['row_count'] = max(segment_map['row_count'], first + count)
+                offset = table_file.seek(end)
+        segment_map['size'] = offset
+    return segment_map
+
+
+def segment_encode(col, values):
+    """
+    Encodes the values of a column of a segment: bools and columns of long
+    runs of equal values as (value, run length) pairs, ints without NULLs
+    (e.g. growing ids) as the differences between neighbours, strings with few
+    distinct values as codes into a dictionary of them, and any other values
+    as they are
+
+    :param col: The column (see `extract_model_from`)
+    :param values: The list of values
+    :return: An (encoding, data) tuple
+    """
+    runs = [[value, sum(1 for _ in run)] for value, run in itertools.groupby(values)]
+    if col['cast'] is cast_bool or len(runs) * RLE_RATIO <= len(values):
+        return ENCODING_RLE, marshal.dumps(runs)
+    if col['cast'] is int and None not in values:
+        try:
+            return ENCODING_DELTA, array.array('q', [values[0]] + [
+                value - previous for previous, value in zip(values, values[1:])]).tobytes()
+        except OverflowError:
+            pass  # the differences don't fit
+    if col['cast'] is str:
+        distinct = list(dict.fromkeys(values))
+        if len(distinct) * DICT_RATIO <= len(values):
+            codes = {value: code for code, value in enumerate(distinct)}
+            return ENCODING_DICT, marshal.dumps((distinct, array.array('H', [codes[value] for value in values]).tobytes()))
+    return ENCODING_PLAIN, marshal.dumps(values)
+
+
+def segment_decode(encoding, data):
+    """
+    Decodes the values of a column of a segment (see `segment_encode`)
+
+    :param encoding: The encoding of the column
+    :param data: The encoded values
+    :return: The list of values
+    """
+    if encoding == ENCODING_RLE:
+        return list(itertools.chain.from_iterable(itertools.repeat(value, count) for value, count in marshal.loads(data)))
+    if encoding == ENCODING_DELTA:
+        deltas = array.array('q')
+        deltas.frombytes(data)
+        return list(itertools.accumulate(deltas))
+    if encoding == ENCODING_DICT:
+        distinct, codes = marshal.loads(data)
+        code_array = array.array('H')
+        code_array.frombytes(codes)
+        return [distinct[code] for code in code_array]
+    return marshal.loads(data)
+
+
+def segment_write(table_file, first, rows, model, codec=SEGMENT_ZLIB):
+    """
+    Appends a segment to a compressed table file
+
+    :param table_file: The table file, opened for appending
+    :param first: The row id of the first row
+    :param rows: The list of rows (lists of typed values)
+    :param model: The table model (see `extract_model_from`)
+    :param codec: The codec the columns are compressed with
+    """
+    compress = SEGMENT_CODECS[codec][0]
+    entries = []
+    columns = []
+    for i, col in enumerate(model):
+        encoding, data = segment_encode(col, [row[i] for row in rows])
+        data = compress(data)
+        entries.append(SEGMENT_COLUMN.pack(len(data), encoding))
+        columns.append(data)
+    body = b''.join(entries + columns)
+    table_file.write(SEGMENT_HEADER.pack(first, len(rows), len(body), codec, len(model)) + body)
+
+
+def segment_read(table_file, segment, cols, model):
+    """
+    Reads and decompresses columns of a segment. Columns added to the table
+    after the segment was written read as their defaults.
+
+    :param table_file: The table file
+    :param segment: The segment (see `compressed_segments`)
+    :param cols: The column numbers to read
+    :param model: The table model (see `extract_model_from`)
+    :return: A dict mapping the column numbers to their lists of values
+    """
+    first, count, codec, directory = segment
+    decompress = SEGMENT_CODECS[codec][1]
+    columns = {}
+    for i in cols:
+        if i >= len(directory):
+            columns[i] = [model[i]['default']] * count
+            continue
+        offset, compressed_len, encoding = directory[i]
+        table_file.seek(offset)
+        columns[i] = segment_decode(encoding, decompress(table_file.read(compressed_len)))
+        count_scan(0, compressed_len)
+    return columns
+
+
+def segment_rows(columns, positions, first, row_len, dead):
+    """
+    Assembles rows from the decoded columns of a segment
+
+    :param columns: A dict mapping column numbers to their lists of values
+    (see `segment_read`)
+    :param positions: The positions of the rows in the segment
+    :param first: The row id of the first row of the segment
+    :param row_len: The number of columns of a row (the others are None)
+    :param dead: The row ids of the deleted rows
+    :return: A generator of (row id, row) tuples
+    """
+    columns = list(columns.items())
+    for pos in positions:
+        if first + pos in dead:
+            continue
+        row = [None] * row_len
+        for i, values in columns:
+            row[i] = values[pos]
+        yield first + pos, row
+
+
+def compressed_scan(tbl_path, model, cols=None, where=None, blocks=None):
+    """
+    Scans a compressed table segment by segment, decompressing the WHERE
+    column of each segment first and the other needed columns only if some
+    of its rows match
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param cols: The column numbers needed, or None for all of them (the
+    others are None in the rows)
+    :param where: The bound WHERE condition the rows must match, or None
+    :param blocks: The sorted numbers of the zone map blocks to scan (see
+    `zone_blocks`), or None to scan the whole table
+    :return: A generator of (row id, row) tuples
+    """
+    segment_map = compressed_segments(tbl_path)
+    dead = csv_tombstones(tbl_path)
+    needed = set(range(len(model)) if cols is None else cols)
+    if where is not None:
+        where_col, value, test = where['col'], where['value'], cond_func(where['operator'])
+        needed.discard(where_col)
+    scanned = 0
+    try:
+        with open(tbl_path, 'rb') as table_file:
+            for block in sorted(segment_map['blocks']) if blocks is None else blocks:
+                for segment in segment_map['blocks'].get(block, ()):
+                    scanned += segment[1]
+                    positions = range(segment[1])
+                    columns = {}
+                    if where is not None:
+                        columns = segment_read(table_file, segment, [where_col], model)
+                        positions = [pos for pos, lhs in enumerate(columns[where_col])
+                                     if lhs is not None and test(lhs, value)]
+                        if not positions:
+                            continue  # skip decompressing the other columns
+                    columns.update(segment_read(table_file, segment, needed, model))
+                    yield from segment_rows(columns, positions, segment[0], len(model), dead)
+    finally:
+        count_scan(scanned, 0)
+
+
+def compressed_fetch(tbl_path, model, rowids, cols=None):
+    """
+    Reads rows of a compressed table by row id. Row ids in ascending order
+    decompress each segment only once.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: An iterable of row ids
+    :param cols: The column numbers needed, or None for all of them (the
+    others are None in the rows)
+    :return: A generator of (row id, row) tuples
+    """
+    segment_map = compressed_segments(tbl_path)
+    dead = csv_tombstones(tbl_path)
+    needed = range(len(model)) if cols is None else cols
+    segment = columns = None
+    with open(tbl_path, 'rb') as table_file:
+        for rowid in rowids:
+            if segment is None or not segment[0] <= rowid < segment[0] + segment[1]:
+                segment = next((candidate for candidate in segment_map['blocks'].get(rowid >> COMPRESSED_ZONE_SHIFT, ())
+                                if candidate[0] <= rowid < candidate[0] + candidate[1]), None)
+                if segment is None:
+                    continue
+                columns = segment_read(table_file, segment, needed, model)
+            count_scan(1, 0)
+            yield from segment_rows(columns, [rowid - segment[0]], segment[0], len(model), dead)
+
+
+def compressed_insert(tbl_path, model, rows):
+    """
+    Appends rows to a compressed table, a segment per block they are added
+    to. Blocks which are full afterwards but consist of several segments get
+    a segment of all of their rows, which supersedes the others.
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rows: The list of rows (lists of typed values) to insert
+    :return: The list of row ids of the inserted rows
+    """
+    block_rows = 1 << COMPRESSED_ZONE_SHIFT
+    segment_map = compressed_segments(tbl_path)
+    start = segment_map['row_count']
+    with open(tbl_path, 'r+b') as table_file:
+        table_file.seek(segment_map['size'])
+        table_file.truncate()  # cut off a torn segment
+        rowid = start
+        while rowid < start + len(rows):
+            count = min(block_rows - rowid % block_rows, start + len(rows) - rowid)
+            segment_write(table_file, rowid, rows[rowid - start:rowid - start + count], model)
+            rowid += count
+
+    segment_map = compressed_segments(tbl_path)
+    for block in range(start >> COMPRESSED_ZONE_SHIFT, (start + len(rows)) >> COMPRESSED_ZONE_SHIFT):
+        segments = segment_map['blocks'][block]
+        if len(segments) > 1:
+            with open(tbl_path, 'rb') as table_file:
+                full_block = []
+                for segment in segments:
+                    columns = segment_read(table_file, segment, range(len(model)), model)
+                    full_block.extend(row for rowid, row in segment_rows(columns, range(segment[1]), 0, len(model), ()))
+            with open(tbl_path, 'ab') as table_file:
+                segment_write(table_file, block << COMPRESSED_ZONE_SHIFT, full_block, model)
+    return list(range(start, start + len(rows)))
+
+
+def compressed_update(tbl_path, model, changes):
+    """
+    Replaces rows of a compressed table by row id, appending their new
+    versions and tombstoning the old ones
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param changes: A dict mapping row ids to their new rows
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    """
+    rowids = sorted(changes)
+    new_rowids = compressed_insert(tbl_path, model, [changes[rowid] for rowid in rowids])
+    csv_add_tombstones(tbl_path, dict.fromkeys(rowids, 0))
+    return dict(zip(rowids, new_rowids))
+
+
+def compressed_delete(tbl_path, model, rowids):
+    """
+    Deletes rows of a compressed table by row id by tombstoning them
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :param rowids: A set of the row ids to delete
+    :return: A dict mapping the row ids of moved rows to their new row ids
+    (always empty)
+    """
+    csv_add_tombstones(tbl_path, dict.fromkeys(rowids, 0))
+    return {}
+
+
+def compressed_check_row(model, row):
+    """
+    Checks that a row can be stored in a compressed table (any row can)
+    """
+
+
+def compressed_garbage(tbl_path):
+    """
+    Returns the fraction of the rows of a compressed table which are deleted
+    """
+    return len(csv_tombstones(tbl_path)) / max(1, compressed_segments(tbl_path)['row_count'])
+
+
+def compressed_vacuum(tbl_path, model):
+    """
+    Writes the live rows of a compressed table to a new file, in a segment per
+    block compressed with lzma, which replaces the table, then drops its
+    tombstones
+
+    :param tbl_path: The file path to the table
+    :param model: The table model (see `extract_model_from`)
+    :return: None, as all row ids were reassigned
+    """
+    block_rows = 1 << COMPRESSED_ZONE_SHIFT
+    compressed_create(tbl_path + TMP_EXT, compressed_read_header(tbl_path))
+    with open(tbl_path + TMP_EXT, 'ab') as table_file:
+        rows = []
+        rowid = 0
+        for old_rowid, row in compressed_scan(tbl_path, model):
+            rows.append(row)
+            if len(rows) == block_rows:
+                segment_write(table_file, rowid, rows, model, SEGMENT_LZMA)
+                rowid += len(rows)
+                rows = []
+        if rows:
+            segment_write(table_file, rowid, rows, model, SEGMENT_LZMA)
+
+    # the tombstones are set aside first, so they are never applied to the
+    # new file (see `recover_files`)
+    tomb_path = tbl_path + TOMBSTONE_EXT
+    if os.path.exists(tomb_path):
+        os.replace(tomb_path, tomb_path + TMP_EXT)
+    replace_file(tbl_path + TMP_EXT, tbl_path)
+    if os.path.exists(tomb_path + TMP_EXT):
+        os.remove(tomb_path + TMP_EXT)
+    segment_maps.pop(tbl_path, None)
+    segment_maps.pop(tbl_path + TMP_EXT, None)
+    return None
+
+
+# B-tree index functions
+#
+# A secondary index is a persistent B+tree stored next to its table as
+# <table>.<index>.idx. Page 0 of an index file holds the file header (root
+# page, page count, and the indexed table and column); every other page holds
+# one node serialized with marshal. Leaves hold sorted (key, row id) entries
+# and are linked left to right for range lookups; internal nodes hold
+# separator entries and the page numbers of their children. NULL keys are not
+# indexed.
+
+class BTree:
+    """
+    Gives access to the B+tree of an index file. Nodes are read on demand and
+    kept for the lifetime of the tree, and only the nodes marked dirty are
+    written back by `flush`.
+    """
+
+    def __init__(self, idx_path, writable=False):
+        self.file = open(idx_path, 'r+b' if writable else 'rb')
+        header = self.file.read(PAGE_SIZE)
+        magic, version, page_size, self.root, self.page_count = INDEX_HEADER.unpack_from(header)
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or page_size != PAGE_SIZE:
+            raise ValueError('unsupported index file format')
+        self.table, self.column = marshal.loads(header[INDEX_HEADER.size:])
+        self.nodes = {}
+        self.dirty = set()
+
+    def read(self, page_no):
+        """
+        Returns the node stored on the given page as a [type, entries, link]
+        list, where link is the next leaf of a leaf and the list of children
+        of an internal node
+        """
+        node = self.nodes.get(page_no)
+        if node is None:
+            self.file.seek(page_no * PAGE_SIZE)
+            node = self.nodes[page_no] = marshal.loads(self.file.read(PAGE_SIZE))
+        return node
+
+    def write(self, page_no, node):
+        """
+        Stores a node on the given page (written back by `flush`)
+        """
+        self.nodes[page_no] = node
+        self.dirty.add(page_no)
+
+    def allocate(self):
+        """
+        Returns the page number of a new page at the end of the file
+        """
+        self.page_count += 1
+        self.dirty.add(0)  # the header holds the page count
+        return self.page_count - 1
+
+    def find_leaf(self, entry):
+        """
+        Descends from the root to the leaf where the given entry belongs
+
+        :return: A (leaf page number, path) tuple, where path is the list of
+        (page number, child index) pairs of the internal nodes passed
+        """
+        path = []
+        page_no = self.root
+        node = self.read(page_no)
+        while node[0] == INTERNAL_NODE:
+            child = bisect.bisect_right(node[1], entry)
+            path.append((page_no, child))
+            page_no = node[2][child]
+            node = self.read(page_no)
+        return page_no, path
+
+    def insert(self, key, rowid):
+        """
+        Inserts a (key, row id) entry, splitting the nodes that overflow
+        """
+        entry = (key, rowid)
+        page_no, path = self.find_leaf(entry)
+        node = self.read(page_no)
+        bisect.insort(node[1], entry)
+        self.write(page_no, node)
+
+        while len(marshal.dumps(node)) > PAGE_SIZE:
+            middle = len(node[1]) // 2
+            right_no = self.allocate()
+            if node[0] == LEAF_NODE:
+                right = [LEAF_NODE, node[1][middle:], node[2]]
+                separator = right[1][0]
+                node[1], node[2] = node[1][:middle], right_no
+            else:
+                right = [INTERNAL_NODE, node[1][middle + 1:], node[2][middle + 1:]]
+                separator = node[1][middle]
+                node[1], node[2] = node[1][:middle], node[2][:middle + 1]
+            self.write(right_no, right)
+
+            if not path:  # the root was split, so grow the tree by a level
+                self.root = self.allocate()
+                self.write(self.root, [INTERNAL_NODE, [separator], [page_no, right_no]])
+                break
+            page_no, child = path.pop()
+            node = self.read(page_no)
+            node[1].insert(child, separator)
+            node[2].insert(child + 1, right_no)
+            self.write(page_no, node)
+
+    def delete(self, key, rowid):
+        """
+        Deletes a (key, row id) entry. Nodes are allowed to underflow.
+        """
+        entry = (key, rowid)
+        page_no = self.find_leaf(entry)[0]
+        node = self.read(page_no)
+        i = bisect.bisect_left(node[1], entry)
+        if i < len(node[1]) and node[1][i] == entry:
+            del node[1][i]
+            self.write(page_no, node)
+
+    def range(self, lo=None, lo_inclusive=True, hi=None, hi_inclusive=True):
+        """
+        Looks up the row ids of all entries whose keys lie in a range. A bound
+        of None leaves that side of the range open.
+
+        :return: A generator of row ids in key order
+        """
+        if lo is None:
+            start = ()  # sorts before every entry
+        else:
+            start = (lo,) if lo_inclusive else (lo, float('inf'))
+        page_no = self.find_leaf(start)[0]
+        node = self.read(page_no)
+        i = bisect.bisect_left(node[1], start)
+        while True:
+            entries = node[1]
+            while i < len(entries):
+                key, rowid = entries[i]
+                if hi is not None and (key > hi or (key == hi and not hi_inclusive)):
+                    return
+                yield rowid
+                i += 1
+            if not node[2]:  # no next leaf
+                return
+            node = self.read(node[2])
+            i = 0
+
+    def flush(self):
+        """
+        Writes all dirty nodes (and the header) back to the file
+        """
+        for page_no in sorted(self.dirty):
+            if page_no == 0:
+                page = btree_header(self.root, self.page_count, self.table, self.column)
+            else:
+                page = marshal.dumps(self.nodes[page_no])
+            self.file.seek(page_no * PAGE_SIZE)
+            self.file.write(page.ljust(PAGE_SIZE, b'\0'))
+        self.dirty.clear()
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def btree_header(root, page_count, tbl_name, col_name):
+    """
+    Packs the file header of an index file
+
+    :return: The header page as bytes
+    """
+    header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, PAGE_SIZE, root, page_count)
+    return (header + marshal.dumps((tbl_name, col_name))).ljust(PAGE_SIZE, b'\0')
+
+
+def btree_build(idx_path, tbl_name, col_name, entries):
+    """
+    Writes a new index file holding the given entries, packing the B+tree
+    bottom-up (leaves first) rather than inserting entries one at a time
+
+    :param idx_path: The file path to the index
+    :param tbl_name: The name of the indexed table
+    :param col_name: The name of the indexed column
+    :param entries: A sorted list of (key, row id) entries
+    """
+    with open(idx_path + TMP_EXT, 'wb') as index_file:
+        index_file.write(bytes(PAGE_SIZE))  # the header is written last
+        page_count = 1
+
+        # pack the entries into leaves, remembering the first entry of each
+        level = []  # (first entry, page number) of each node of the level
+        node_entries, size = [], 0
+        for i, entry in enumerate(entries):
+            node_entries.append(entry)
+            size += len(marshal.dumps(entry))
+            if size >= INDEX_FILL or i == len(entries) - 1:
+                next_leaf = page_count + 1 if i < len(entries) - 1 else 0
+                index_file.write(marshal.dumps([LEAF_NODE, node_entries, next_leaf]).ljust(PAGE_SIZE, b'\0'))
+                level.append((node_entries[0], page_count))
+                page_count += 1
+                node_entries, size = [], 0
+        if not level:  # an empty index is a single empty leaf
+            index_file.write(marshal.dumps([LEAF_NODE, [], 0]).ljust(PAGE_SIZE, b'\0'))
+            level.append(((), page_count))
+            page_count += 1
+
+        # pack each level into internal nodes until a single root is left
+        while len(level) > 1:
+            upper_level = []
+            children, separators, size = [], [], 0
+            for i, (first_entry, page_no) in enumerate(level):
+                if children:
+                    separators.append(first_entry)
+                    size += len(marshal.dumps(first_entry)) + 5
+                children.append(page_no)
+                if size >= INDEX_FILL or i == len(level) - 1:
+                    index_file.write(marshal.dumps([INTERNAL_NODE, separators, children]).ljust(PAGE_SIZE, b'\0'))
+                    upper_level.append((level[i - len(children) + 1][0], page_count))
+                    page_count += 1
+                    children, separators, size = [], [], 0
+            level = upper_level
+
+        index_file.seek(0)
+        index_file.write(btree_header(level[0][1], page_count, tbl_name, col_name))
+    replace_file(idx_path + TMP_EXT, idx_path)
+
+
+def index_entries(table, col):
+    """
+    Collects the sorted (key, row id) entries of a column for an index
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param col: The index of the column in the model
+    :return: The sorted list of entries
+    """
+    entries = []
+    for rowid, row in table['engine']['scan'](table['path'], table['model']):
+        key = row[col]
+        if key is not None:
+            if len(marshal.dumps(key)) > MAX_INDEX_KEY:
+                raise ValueError('value is too long to be indexed')
+            entries.append((key, rowid))
+    entries.sort()
+    return entries
+
+
+def table_indexes(tbl_path):
+    """
+    Finds the indexes of a table
+
+    :param tbl_path: The file path to the table
+    :return: A list of dicts with the name, file path and column of each index
+    """
+    db_path, tbl_name = os.path.split(tbl_path)
+    prefix = tbl_name + '.'
+    indexes = []
+    for file_name in sorted(os.listdir(db_path)):
+        if file_name.startswith(prefix) and file_name.endswith(INDEX_EXT):
+            idx_path = os.path.join(db_path, file_name)
+            with open(idx_path, 'rb') as index_file:
+                col_name = marshal.loads(index_file.read(PAGE_SIZE)[INDEX_HEADER.size:])[1]
+            indexes.append({
+                'name': file_name[len(prefix):-len(INDEX_EXT)],
+                'path': idx_path,
+                'col_name': col_name
+            })
+    return indexes
+
+
+def maintain_indexes(table, changes):
+    """
+    Applies row changes to every index and the zone map of a table
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param changes: A list of (old row id, old row, new row id, new row)
+    tuples; the old parts are None for inserted rows and the new parts are
+    None for deleted rows
+    """
+    for index in table['indexes']:
+        col = table['col_index'][index['col_name']]
+        tree = BTree(index['path'], writable=True)
+        try:
+            for old_rowid, old_row, new_rowid, new_row in changes:
+                old_key = old_row[col] if old_row is not None else None
+                new_key = new_row[col] if new_row is not None else None
+                if old_rowid == new_rowid and old_key == new_key:
+                    continue
+                if old_key is not None:
+                    tree.delete(old_key, old_rowid)
+                if new_key is not None:
+                    if len(marshal.dumps(new_key)) > MAX_INDEX_KEY:
+                        raise ValueError('value is too long to be indexed')
+                    tree.insert(new_key, new_rowid)
+            tree.flush()
+        finally:
+            tree.close()
+    maintain_zone_map(table, changes)
+
+
+def rebuild_indexes(table):
+    """
+    Rebuilds every index and the zone map of a table from scratch (e.g.
+    after the table was rewritten and its row ids were reassigned)
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    """
+    for index in table['indexes']:
+        entries = index_entries(table, table['col_index'][index['col_name']])
+        btree_build(index['path'], table['name'], index['col_name'], entries)
+    rebuild_zone_map(table)
+
+
+# zone map functions
+#
+# A zone map keeps statistics about the rows of each block of a table: the
+# number of rows and, for each column, the smallest and largest value and the
+# number of NULLs. Scans skip the blocks whose statistics show that no row
+# can match the WHERE condition. A block is a range of row ids whose size
+# depends on the storage engine ('zone_shift'). Zone maps are stored as
+# <table>.zone and kept up to date with the indexes: a deleted row only
+# lowers the counts, so the smallest and largest values of a block are
+# bounds which are tightened when the zone map is rebuilt (e.g. by VACUUM).
+# Tables without a zone map (created before zone maps existed) get one the
+# next time they are vacuumed.
+
+def read_zone_map(tbl_path):
+    """
+    Reads the zone map of a table
+
+    :param tbl_path: The file path to the table
+    :return: A dict mapping block numbers to [row count, list of smallest
+    values, list of largest values, list of NULL counts] lists (one item per
+    column), or None if the table has no (readable) zone map
+    """
+    try:
+        with open(tbl_path + ZONE_EXT, 'rb') as zone_file:
+            return marshal.loads(zone_file.read())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+
+
+def write_zone_map(tbl_path, zones):
+    """
+    Replaces the zone map of a table. The file is overwritten in place: it is
+    only written between the BEGIN and DONE records of the write-ahead log
+    (see `wal_begin`), so a zone map torn by a crash is rebuilt on recovery.
+
+    :param tbl_path: The file path to the table
+    :param zones: The zone map (see `read_zone_map`)
+    """
+    zone_path = tbl_path + ZONE_EXT
+    with open(zone_path, 'r+b' if os.path.exists(zone_path) else 'wb') as zone_file:
+        zone_file.write(marshal.dumps(zones))
+        zone_file.truncate()
+
+
+def zone_add_row(zones, block, model, row):
+    """
+    Adds a row to the statistics of a block of a zone map
+
+    :param zones: The zone map (see `read_zone_map`)
+    :param block: The block number
+    :param model: The table model (see `extract_model_from`)
+    :param row: The row (list of typed values)
+    """
+    zone = zone_widen(zones, block, model)
+    zone[0] += 1
+    mins, maxs, nulls = zone[1], zone[2], zone[3]
+    for i, value in enumerate(row):
+        if value is None:
+            nulls[i] += 1
+        elif mins[i] is None:
+            mins[i] = maxs[i] = value
+        elif value < mins[i]:
+            mins[i] = value
+        elif value > maxs[i]:
+            maxs[i] = value
+
+
+def zone_widen(zones, block, model):
+    """
+    Returns the statistics of a block of a zone map, adding the block (or
+    columns added to the table since the block's rows were written, whose
+    values are the columns' defaults) as needed
+
+    :param zones: The zone map (see `read_zone_map`)
+    :param block: The block number
+    :param model: The table model (see `extract_model_from`)
+    :return: The [row count, smallest values, largest values, NULL counts]
+    list of the block
+    """
+    zone = zones.get(block)
+    if zone is None:
+        zone = zones[block] = [0, [], [], []]
+    for col in model[len(zone[1]):]:
+        zone[1].append(col['default'])
+        zone[2].append(col['default'])
+        zone[3].append(zone[0] if col['default'] is None else 0)
+    return zone
+
+
+def maintain_zone_map(table, changes):
+    """
+    Applies row changes to the zone map of a table
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param changes: A list of (old row id, old row, new row id, new row)
+    tuples (see `maintain_indexes`)
+    """
+    zones = read_zone_map(table['path'])
+    if zones is None:
+        return
+    shift, model = table['engine']['zone_shift'], table['model']
+    for old_rowid, old_row, new_rowid, new_row in changes:
+        if old_row is not None:
+            zone = zone_widen(zones, old_rowid >> shift, model)
+            zone[0] -= 1
+            for i, value in enumerate(old_row):
+                if value is None:
+                    zone[3][i] -= 1
+        if new_row is not None:
+            zone_add_row(zones, new_rowid >> shift, model, new_row)
+    write_zone_map(table['path'], zones)
+
+
+def rebuild_zone_map(table):
+    """
+    Builds the zone map of a table from scratch
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    """
+    zones = {}
+    shift = table['engine']['zone_shift']
+    for rowid, row in table['engine']['scan'](table['path'], table['model']):
+        zone_add_row(zones, rowid >> shift, table['model'], row)
+    write_zone_map(table['path'], zones)
+
+
+def zone_may_match(zone, default, where):
+    """
+    Determines whether any row of a block of a zone map can match a WHERE
+    condition
+
+    :param zone: The statistics of the block (see `read_zone_map`)
+    :param default: The default of the WHERE column
+    :param where: The bound WHERE condition (see `bind_condition`)
+    :return: False if no row can match, True otherwise
+    """
+    col, operator, value, key_range = where['col'], where['operator'], where['value'], where['key_range']
+    rows = zone[0]
+    if col >= len(zone[1]):
+        # the column was added after the block's rows were written
+        low, high, nulls = default, default, rows if default is None else 0
+    else:
+        low, high, nulls = zone[1][col], zone[2][col], zone[3][col]
+    if rows <= 0 or nulls >= rows:
+        return False  # no rows, or only NULLs (which never match)
+    if low is None:
+        return True
+    try:
+        if key_range is not None:
+            lo, lo_inclusive, hi, hi_inclusive = key_range  # None leaves a side of the range open
+            if lo is not None and (high < lo or (high == lo and not lo_inclusive)):
+                return False
+            if hi is not None and (low > hi or (low == hi and not hi_inclusive)):
+                return False
+            return True
+        if operator == 'in':
+            return any(low <= item <= high for item in value if item is not None)
+        if operator in ('<>', '!='):
+            return not low == high == value
+    except TypeError:
+        pass
+    return True
+
+
+def zone_blocks(table, where, zones=None):
+    """
+    Finds the blocks of a table which can hold rows matching a WHERE
+    condition
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    :param zones: The zone map of the table, if it was already read
+    :return: The sorted list of block numbers, or None if every block has to
+    be scanned
+    """
+    if where is None or where['value'] is None:
+        return None
+    if zones is None:
+        zones = read_zone_map(table['path'])
+    if zones is None:
+        return None
+    default = table['model'][where['col']]['default']
+    return sorted(block for block, zone in zones.items() if zone_may_match(zone, default, where))
+
+
+def check_row(table, row):
+    """
+    Checks that a row can be stored in a table and its indexes, so that
+    applying a logged row to the table can't fail
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param row: The row (list of typed values)
+    :raises DataError: if the row can't be stored
+    """
+    try:
+        table['engine']['check_row'](table['model'], row)
+    except ValueError as error:
+        raise DataError(str(error))
+    for index in table['indexes']:
+        key = row[table['col_index'][index['col_name']]]
+        if key is not None and len(marshal.dumps(key)) > MAX_INDEX_KEY:
+            raise DataError('value is too long to be indexed')
+
+
+def where_range(operator, value):
+    """
+    Translates a WHERE condition into the key range an index lookup needs
+
+    :param operator: The (lowercase) operator of the WHERE clause
+    :param value: The (cast) value the column is compared with (the pattern
+    of a LIKE)
+    :return: A (lo, lo inclusive, hi, hi inclusive) tuple, or None if the
+    condition can't be answered by a range lookup
+    """
+    return {
+        '=': lambda: (value, True, value, True),
+        '>': lambda: (value, False, None, True),
+        '>=': lambda: (value, True, None, True),
+        '<': lambda: (None, True, value, False),
+        '<=': lambda: (None, True, value, True),
+        'between': lambda: (value[0], True, value[1], True),
+        'like': lambda: like_range(value)
+    }.get(operator, lambda: None)()
+
+
+def matching_rows(table, where, cols=None):
+    """
+    Finds the rows of a table which match a (bound) WHERE condition, with the
+    writes logged for it (see `logged_rows`) and those of the open
+    transaction (if any) applied
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    to match every row
+    :param cols: The column numbers the caller needs, or None for all of them
+    (columns which aren't needed may be None)
+    :return: An iterator of (row id, row) tuples in table order
+    """
+    rows = logged_rows(table, where, cols)
+    if transaction is not None and table['path'] in transaction['tables']:
+        rows = merged_rows(rows, where, transaction['tables'][table['path']])
+    return rows if statement_stats is None else timed_rows(rows)
+
+
+def logged_writes(table):
+    """
+    Returns the writes logged for a table which weren't applied to it yet, as
+    the statement's database last read its write-ahead log (see `wal_read`)
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :return: The writes (see `wal_replay`), or None
+    """
+    log = wal_logs.get(os.path.basename(os.path.dirname(table['path'])))
+    writes = log['pending'].get(table['name']) if log is not None else None
+    return writes if writes and (writes['inserts'] or writes['changes'] or writes['deleted']) else None
+
+
+def logged_rows(table, where, cols=None):
+    """
+    Finds the rows of a table which match a (bound) WHERE condition: the
+    stored rows (see `stored_rows`) with the writes logged for the table
+    applied (see `merged_rows`)
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    to match every row
+    :param cols: The column numbers the caller needs, or None for all of them
+    :return: An iterator of (row id, row) tuples in table order
+    """
+    writes = logged_writes(table)
+    rows = stored_rows(table, where, cols)
+    return rows if writes is None else merged_rows(rows, where, writes)
+
+
+def logged_fetch(table, rowids, cols=None):
+    """
+    Reads rows of a table by row id, with the writes logged for the table
+    applied: deleted rows are left out, and changed and inserted rows are
+    read from the log
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param rowids: A sorted list of row ids
+    :param cols: The column numbers the caller needs, or None for all of them
+    :return: A generator of (row id, row) tuples
+    """
+    writes = logged_writes(table) or {'inserts': {}, 'changes': {}, 'deleted': ()}
+    stored = [rowid for rowid in rowids if rowid < WAL_ROWID and rowid not in writes['deleted']]
+    for rowid, row in table['engine']['fetch'](table['path'], table['model'], stored, cols):
+        yield rowid, writes['changes'].get(rowid, row)
+    for rowid in rowids:
+        if rowid in writes['inserts']:
+            yield rowid, writes['inserts'][rowid]
+
+
+def merged_rows(rows, where, writes):
+    """
+    Applies writes to the rows of a table which match a (bound) WHERE
+    condition: deleted rows are left out, changed rows are matched in their
+    new version and inserted rows follow the others. The changed and inserted
+    rows count as scanned, and their size in the log as read (see
+    `count_scan`).
+
+    :param rows: An iterable of the (row id, row) tuples of the matching rows
+    in table order
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    to match every row
+    :param writes: The writes (see `wal_replay` and `transaction_writes`)
+    :return: A generator of (row id, row) tuples in table order
+    """
+    predicate = where['predicate'] if where is not None else None
+    changes, deleted = writes['changes'], writes['deleted']
+    if statement_stats is not None:
+        written = list(changes.values()) + list(writes['inserts'].values())
+        count_scan(len(written), sum(len(marshal.dumps(row)) for row in written))
+    kept = ((rowid, row) for rowid, row in rows if rowid not in changes and rowid not in deleted)
+    changed = sorted((rowid, list(row)) for rowid, row in changes.items() if predicate is None or predicate(row))
+    for rowid, row in heapq.merge(kept, changed, key=lambda item: item[0]):
+        yield rowid, row
+    for rowid, row in writes['inserts'].items():
+        if predicate is None or predicate(row):
+            yield rowid, list(row)
+
+
+def stored_rows(table, where, cols=None):
+    """
+    Finds the rows stored in a table which match a (bound) WHERE condition.
+    When the WHERE column has an index and the operator allows it, the rows
+    are looked up in the index; otherwise the table is scanned through the
+    buffer pool (see `pool_scan`).
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    to match every row
+    :param cols: The column numbers the caller needs, or None for all of them
+    :return: A generator of (row id, row) tuples in table order
+    """
+    tbl_path, model, engine = table['path'], table['model'], table['engine']
+    index = where_index(table, where)
+    if index is not None:
+        tree = BTree(index['path'])
+        try:
+            rowids = sorted(tree.range(*where['key_range']))
+        finally:
+            tree.close()
+        predicate = where['predicate']
+        if cols is not None:
+            cols = sorted(set(cols) | {where['col']})  # the predicate needs the WHERE column
+        for rowid, row in engine['fetch'](tbl_path, model, rowids, cols):
+            if predicate(row):  # if WHERE condition applies
+                yield rowid, row
+        return
+
+    for rowid, row in pool_scan(table, cols, where):
+        yield rowid, row
+
+
+def where_index(table, where):
+    """
+    Finds the index the rows matching a (bound) WHERE condition are looked up
+    in (see `stored_rows`): one on the WHERE column, if the operator allows a
+    range lookup
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    :return: The index (dict, see `table_indexes`), or None
+    """
+    if where is not None and where['key_range'] is not None:
+        for index in table['indexes']:
+            if index['col_name'] == table['model'][where['col']]['col_name']:
+                return index
+    return None
+
+
+# buffer pool functions
+#
+# The buffer pool keeps the decoded rows of the zone map blocks scans read,
+# up to `cache_size` bytes (as estimated by `block_bytes`), evicting the
+# least recently used blocks first, so a hot table is decoded once rather
+# than by every statement. Each block is tagged with the version of its table
+# (see `table_version`) the statement read once it locked the table, which
+# every process writing to the table changes, and this process drops the
+# blocks of the tables it wrote to. The zone maps of the tables are kept
+# with their version too (see `pool_zone_map`). Tables without
+# a zone map or larger than the pool, CSV tables scanned in parallel, columnar
+# tables scanned with a WHERE condition (which is applied to chunks of the
+# encoded column, faster than to decoded rows) and the scans of the
+# statements writing to a table bypass the pool.
+
+def pool_scan(table, cols, where):
+    """
+    Scans a table through the buffer pool: the blocks which can hold
+    matching rows are read from the pool, and runs of blocks missing from it
+    are scanned by the storage engine, decoding every row, and added to it
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param cols: The column numbers needed, or None for all of them
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    to match every row
+    :return: A generator of (row id, row) tuples in table order
+    """
+    global cache_hits, cache_misses
+    tbl_path, model, engine = table['path'], table['model'], table['engine']
+    db_name = os.path.basename(os.path.dirname(tbl_path))
+    writing = held_locks.get((db_name, lock_byte(table['name'])))  # its blocks are dropped once written
+    filtered = where is not None and table['format'] == 'columnar'  # filters encoded chunks faster than rows
+    version = (table['version'], table['schema_version'])  # as read once the table was locked (see `locked_plan`)
+    zones = pool_zone_map(tbl_path, version) if not writing else None
+    blocks = zone_blocks(table, where, zones)
+    if zones is None or not cache_size or filtered or table_bytes(table, zones) > cache_size or (
+            table['format'] == 'csv' and parallel_workers > 1 and csv_scan_workers(tbl_path, blocks) > 1):
+        yield from engine['scan'](tbl_path, model, cols, where, blocks)
+        return
+
+    if blocks is None:
+        blocks = sorted(zones)
+    predicate = where['predicate'] if where is not None else None
+    shift = engine['zone_shift']
+    cached = [pool_get(tbl_path, block, version) for block in blocks]
+    k = 0
+    while k < len(blocks):
+        if cached[k] is not None:
+            cache_hits += 1
+            add_stat('cache_hits', 1)
+            count_scan(len(cached[k]), 0)
+            for rowid, row in cached[k]:
+                if predicate is None or predicate(row):
+                    yield rowid, list(row)  # the caller may change it
+            k += 1
+            continue
+
+        stop = k + 1
+        while stop < len(blocks) and cached[stop] is None:
+            stop += 1
+        cache_misses += stop - k
+        add_stat('cache_misses', stop - k)
+        block, rows = blocks[k], []
+        for rowid, row in engine['scan'](tbl_path, model, None, None, blocks[k:stop]):
+            if rowid >> shift != block:
+                pool_put(tbl_path, block, version, rows)
+                block, rows = rowid >> shift, []
+            rows.append((rowid, row))
+            if predicate is None or predicate(row):
+                yield rowid, list(row)
+        pool_put(tbl_path, block, version, rows)
+        k = stop
+
+
+def table_bytes(table, zones):
+    """
+    Estimates the size of a table from its file (or, for columnar and
+    compressed tables, from the row counts of its zone map)
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param zones: The zone map of the table (see `read_zone_map`)
+    :return: The number of bytes
+    """
+    if table['format'] in ('columnar', 'compressed'):
+        return sum(zone[0] for zone in zones.values()) * len(table['model']) * 8
+    return table['stat'][1]
+
+
+def block_bytes(rows):
+    """
+    Estimates the memory the decoded rows of a block take, from the rough
+    sizes of the Python objects of a sample of the rows
+
+    :param rows: The list of (row id, row) tuples
+    :return: The number of bytes
+    """
+    if not rows:
+        return 0
+    sample = rows[::max(1, len(rows) // 16)]
+    size = 0
+    for rowid, row in sample:
+        size += 120 + 8 * len(row)  # the tuple, the row id and the list
+        for value in row:
+            if isinstance(value, str):
+                size += 49 + len(value)
+            elif value is not None:
+                size += 24
+    return size * len(rows) // len(sample)
+
+
+def pool_get(tbl_path, block, version):
+    """
+    Looks up the rows of a block in the buffer pool, making it the most
+    recently used block
+
+    :param tbl_path: The file path to the table
+    :param block: The block number
+    :param version: The current version of the table (see `pool_scan`)
+    :return: The list of (row id, row) tuples, or None if the block isn't in
+    the pool or was cached from an older version of the table
+    """
+    entry = buffer_pool.get((tbl_path, block))
+    if entry is None or entry[0] != version:
+        return None
+    buffer_pool.move_to_end((tbl_path, block))
+    return entry[1]
+
+
+def pool_put(tbl_path, block, version, rows):
+    """
+    Adds the rows of a block to the buffer pool, evicting the least recently
+    used blocks until they fit
+
+    :param tbl_path: The file path to the table
+    :param block: The block number
+    :param version: The version of the table the rows were read from
+    :param rows: The list of (row id, row) tuples
+    """
+    global cache_used
+    size = block_bytes(rows)
+    if size > cache_size:
+        return
+    old = buffer_pool.pop((tbl_path, block), None)
+    if old is not None:
+        cache_used -= old[2]
+    buffer_pool[tbl_path, block] = (version, rows, size)
+    cache_used += size
+    while cache_used > cache_size:
+        cache_used -= buffer_pool.popitem(last=False)[1][2]
+
+
+def pool_zone_map(tbl_path, version):
+    """
+    Reads the zone map of a table for a scan through the buffer pool, reusing
+    the one read before while the table's version is the same
+
+    :param tbl_path: The file path to the table
+    :param version: The version of the table (see `pool_scan`)
+    :return: The zone map (see `read_zone_map`), or None
+    """
+    cached = zone_maps.get(tbl_path)
+    if cached is None or cached[0] != version:
+        cached = zone_maps[tbl_path] = (version, read_zone_map(tbl_path))
+    return cached[1]
+
+
+def pool_invalidate(tbl_path=None):
+    """
+    Drops the blocks of a table (or, for None, of every table) and its zone
+    map from the buffer pool
+    """
+    global cache_used
+    if tbl_path is None:
+        zone_maps.clear()
+    else:
+        zone_maps.pop(tbl_path, None)
+    for key in [key for key in buffer_pool if tbl_path is None or key[0] == tbl_path]:
+        cache_used -= buffer_pool.pop(key)[2]
+
+
+# query plan functions
+#
+# SELECT, INSERT, UPDATE and DELETE commands are compiled into plans: dicts
+# holding the statement's table (catalog entry), resolved column numbers and
+# pre-cast literals, plus the function that executes it. Literals written as
+# `?` become parameter slots which are filled in when a prepared statement is
+# executed. Plans are cached by their normalized statement text, so running
+# the same statement again skips parsing and planning, and a plan whose table
+# metadata changed is compiled again before it runs.
+
+def new_plan(action, query_string, table):
+    """
+    Starts a plan for a query command on a table
+
+    :param action: The (lowercase) query command, e.g. 'select'
+    :param query_string: The remaining query after the command keyword
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :return: The plan (dict)
+    """
+    return {
+        'action': action,
+        'query': query_string,
+        'table': table,
+        'tables': [table],  # every table the plan reads (e.g. the tables of a join)
+        'param_count': 0
+    }
+
+
+def plan_value(plan, col, value):
+    """
+    Compiles a literal of a statement into a value slot: the literal cast to
+    the data type of its column, or a parameter slot if it is a `?`
+
+    :param plan: The plan the literal belongs to
+    :param col: The model column (dict) of the literal
+    :param value: The raw literal
+    :return: A (is parameter, cast value or parameter number) tuple
+    """
+    if value == PARAMETER:
+        plan['param_count'] += 1
+        return True, plan['param_count'] - 1
+    return False, cast_value(col, value)
+
+
+def bind_value(col, slot, params):
+    """
+    Fills in a value slot (see `plan_value`)
+
+    :param col: The model column (dict) of the value
+    :param slot: The value slot
+    :param params: The list of raw parameter values
+    :return: The typed value
+    """
+    is_param, value = slot
+    return cast_value(col, params[value]) if is_param else value
+
+
+def compile_condition(plan, where_dict, table):
+    """
+    Compiles a parsed WHERE clause against a table of a plan
+
+    :param plan: The plan the WHERE clause belongs to
+    :param where_dict: The parsed WHERE clause (see `parse_where_clause`)
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :return: The condition (dict), or None if the column doesn't exist
+    """
+    col = table['col_index'].get(where_dict['key'])
+    if col is None:
+        return None
+    model_col = table['model'][col]
+    operator = where_dict['operator'].lower()
+    if operator == 'between':
+        # split on the AND outside of quotes
+        bounds, pos = [], 0
+        for match in BETWEEN_REGEX.finditer(where_dict['value']):
+            if match.group(1) is None:
+                bounds.append(where_dict['value'][pos:match.start()])
+                pos = match.end()
+        bounds.append(where_dict['value'][pos:])
+        if len(bounds) != 2:
+            raise ValueError('BETWEEN needs a value of the form "x AND y"')
+        value = [plan_value(plan, model_col, unquote(bound.strip())) for bound in bounds]
+    elif operator == 'in':
+        values = where_dict['value']
+        if len(values) < 2 or values[0] != '(' or values[-1] != ')':
+            raise ValueError('IN needs a list of values of the form "(x, y, ...)"')
+        value = [plan_value(plan, model_col, item) for item in parse_value_list(values[1:-1])]
+    else:
+        if operator == 'like' and model_col['cast'] is not str:
+            raise ValueError('LIKE needs a string column')
+        value = plan_value(plan, model_col, where_dict['value'])
+    return {'col': col, 'operator': operator, 'value': value}
+
+
+def bind_condition(table, condition, params):
+    """
+    Binds a compiled condition to its parameters, producing the comparison
+    value, a single predicate function of a row and the key range for an
+    index lookup
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param condition: The compiled condition (see `compile_condition`)
+    :param params: The list of raw parameter values
+    :return: The bound condition (dict)
+    """
+    col, operator = condition['col'], condition['operator']
+    model_col = table['model'][col]
+    if operator == 'between':
+        value = tuple(bind_value(model_col, slot, params) for slot in condition['value'])
+    elif operator == 'in':
+        value = frozenset(bind_value(model_col, slot, params) for slot in condition['value'])
+    else:
+        value = bind_value(model_col, condition['value'], params)
+    key_range = where_range(operator, value)
+    if operator == 'like':
+        value = compile_like(value)
+    test = cond_func(operator)
+
+    def predicate(row):
+        lhs = row[col]
+        return lhs is not None and test(lhs, value)
+
+    return {
+        'col': col,
+        'operator': operator,
+        'value': value,
+        'predicate': predicate,
+        'key_range': key_range
+    }
+
+
+def compile_like(pattern):
+    """
+    Compiles a LIKE pattern into a function of a string which returns a match
+    object if the string matches the pattern and None otherwise. A pattern
+    whose only wildcards are trailing '%'s just matches the start of the
+    string; other patterns are translated into a regular expression.
+
+    :param pattern: The LIKE pattern (case sensitive)
+    :return: The match function
+    """
+    pattern = re.sub('%+', '%', pattern)
+    prefix = pattern[:-1] if pattern.endswith('%') else None
+    if prefix is not None and not LIKE_WILDCARD_REGEX.search(prefix):  # e.g. 'Gizmo%'
+        return re.compile(re.escape(prefix)).match
+    regex = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern)
+    return re.compile(regex, re.S).fullmatch
+
+
+def like_range(pattern):
+    """
+    Translates a LIKE pattern into the key range of the strings which start
+    with the literal prefix of the pattern (e.g. 'Gi%o' into 'Gi' up to but
+    not including 'Gj')
+
+    :param pattern: The LIKE pattern
+    :return: A key range (see `where_range`), or None if the pattern starts
+    with a wildcard
+    """
+    wildcard = LIKE_WILDCARD_REGEX.search(pattern)
+    if wildcard is None:
+        return pattern, True, pattern, True  # no wildcards, so only the pattern itself matches
+    prefix = pattern[:wildcard.start()]
+    if not prefix:
+        return None
+    if prefix[-1] == chr(0x10ffff):  # no character follows it
+        return prefix, True, None, True
+    return prefix, True, prefix[:-1] + chr(ord(prefix[-1]) + 1), False
+
+
+def plan_where(plan, where_dict, table=None):
+    """
+    Compiles the WHERE clause of a plan. Conditions without parameters are
+    bound right away, so executing the plan doesn't need to bind them again.
+
+    :param plan: The plan the WHERE clause belongs to
+    :param where_dict: The parsed WHERE clause (see `parse_where_clause`)
+    :param table: The catalog entry of the table whose column the WHERE
+    clause tests, if it isn't the plan's table (e.g. in a join)
+    :return: Whether the column of the WHERE clause exists
+    """
+    param_count = plan['param_count']
+    plan['where_table'] = plan['table'] if table is None else table
+    plan['where'] = compile_condition(plan, where_dict, plan['where_table'])
+    if plan['where'] is None:
+        return False
+    plan['bound_where'] = None
+    if plan['param_count'] == param_count:
+        plan['bound_where'] = bind_condition(plan['where_table'], plan['where'], ())
+    return True
+
+
+def plan_bound_where(plan, params):
+    """
+    Returns the bound WHERE condition of a plan (None if it has none)
+    """
+    if plan.get('where') is None:
+        return None
+    return plan['bound_where'] or bind_condition(plan['where_table'], plan['where'], params)
+
+
+def execute_plan(plan, params=()):
+    """
+    Executes a plan, holding the locks on its tables (see `locked_plan`)
+
+    :param plan: The plan to execute
+    :param params: The list of raw parameter values
+    :return: The plan that was executed
+    :raises DatabaseError: if the plan can't be executed (see `Error`)
+    """
+    with locked_plan(plan) as plan:
+        if len(params) != plan['param_count']:
+            raise ProgrammingError('statement needs %i parameters but %i were supplied' % (plan['param_count'], len(params)))
+        try:
+            plan['execute'](plan, params)
+        except (ValueError, struct.error) as error:
+            raise ProgrammingError(str(error))
+    return plan
+
+
+@contextlib.contextmanager
+def locked_plan(plan):
+    """
+    Holds the locks a plan needs while it executes (see `plan_locks`). If the
+    metadata of one of the plan's tables changed since it was compiled (e.g.
+    by ALTER TABLE or CREATE INDEX), the plan is compiled again first.
+
+    :param plan: The plan to execute
+    :return: A context manager, whose value is the plan to execute
+    """
+    with plan_locks(plan):
+        if any(catalog_table(table['name'], fresh=True) is not table for table in plan['tables']):
+            started = time.perf_counter()
+            plan = plan_compilers[plan['action']](plan['query'])
+            add_stat('plan_time', time.perf_counter() - started)
+        yield plan
+
+
+def normalize_statement(statement):
+    """
+    Normalizes a statement for use as a plan cache key by collapsing all
+    whitespace outside of quotes and removing the trailing ';'
+
+    :param statement: The statement to normalize
+    :return: The normalized statement
+    """
+    statement = WHITESPACE_REGEX.sub(lambda match: match.group(1) or ' ', statement)
+    return statement.rstrip('; ').strip()
+
+
+def run_statement(statement):
+    """
+    Runs a query command. SELECT, INSERT, UPDATE and DELETE commands are
+    compiled into plans and kept in an LRU cache keyed by their normalized
+    text, so repeating a statement runs its cached plan directly.
+
+    :param statement: The statement (ending with ';') to run
+    :return: Whether the statement succeeded (its error is printed otherwise)
+    """
+    key = None
+    try:
+        key, plan = compile_statement(statement)
+        if plan is None:
+            return True
+        if plan['param_count']:
+            raise ProgrammingError('parameters (%s) can only be used in prepared statements' % PARAMETER)
+        cache_plan(key, execute_plan(plan))
+        return True
+    except Error as error:
+        if key is not None:
+            cache_plan(key, None)  # e.g. its table was dropped
+        print(error_message(error))
+        return False
+
+
+def report(message):
+    """
+    Prints the outcome of a statement (e.g. "Table t created."), unless the
+    connection running it doesn't echo its output (see `Connection`)
+
+    :param message: The message to print
+    """
+    if echo:
+        print(message)
+
+
+def compile_statement(statement):
+    """
+    Compiles a query command into a plan, or takes its plan from the plan
+    cache. Query commands which aren't compiled into plans (e.g. CREATE) are
+    run at once.
+
+    :param statement: The statement (ending with ';')
+    :return: A (plan cache key, plan) tuple, whose plan is None if the
+    statement was run or is invalid
+    """
+    started = time.perf_counter()
+    key = (active_database, normalize_statement(statement))
+    plan = plan_cache.get(key)
+    if plan is not None:
+        plan_cache.move_to_end(key)
+        add_stat('parse_time', time.perf_counter() - started)
+        return key, plan
+
+    # parse the input into groups
+    parsed_input = QUERY_COMMAND_REGEX.match(statement).groups()
+
+    # strip all elements which are None or ''
+    parsed_input = list(filter(lambda x: x is not None and x != '', parsed_input))
+
+    if parsed_input[0] == ';':
+        return key, None
+    action = parsed_input[0].lower()
+    if action not in plan_compilers:
+        if transaction is not None and action not in TRANSACTION_COMMANDS:
+            raise ProgrammingError('%s cannot be used inside a transaction' % action.upper())
+        add_stat('parse_time', time.perf_counter() - started)
+        query_string = parsed_input[1] if len(parsed_input) > 1 else ''
+        with contextlib.ExitStack() as stack:
+            if action in CHECKPOINT_COMMANDS and query_string.lower().split(None, 1)[:1] != ['database'] \
+                    and os.path.isdir(os.path.join(DB_DIR, active_database)):
+                # apply the logged writes first, holding the log until the
+                # schema changed so that no writes to the old one are logged
+                stack.enter_context(wal_lock(active_database))
+                wal_checkpoint()
+            query_commands[action](query_string)
+        return key, None
+    parsed = time.perf_counter()
+    add_stat('parse_time', parsed - started)
+    plan = plan_compilers[action](parsed_input[1])
+    add_stat('plan_time', time.perf_counter() - parsed)
+    return key, plan
+
+
+def cache_plan(key, plan):
+    """
+    Keeps the plan of a statement in the plan cache, evicting the least
+    recently used plan when the cache is full
+
+    :param key: The plan cache key of the statement (see `compile_statement`)
+    :param plan: The plan, or None to drop the statement's plan
+    """
+    if plan is None:
+        plan_cache.pop(key, None)
+    else:
+        plan_cache[key] = plan
+        if len(plan_cache) > PLAN_CACHE_SIZE:
+            plan_cache.popitem(last=False)  # evict the least recently used plan
+
+
+# statement statistics functions
+#
+# `.timer on` prints the wall clock and CPU time of each statement, and
+# `.stats on` its statistics (see STATEMENT_STATS): while a statement runs,
+# `statement_stats` holds them, the storage engines add the rows they scan
+# and the bytes they read to it, and the rows the engines produce and the
+# rows printed are timed. With .stats off, `statement_stats` is None and
+# nothing is counted or timed. `.profile` runs the next statement under
+# cProfile or tracemalloc.
+
+def run_measured(cursor, statement):
+    """
+    Runs a query command of the command prompt (see `print_statement`),
+    printing its run time while .timer is on and its statistics while .stats
+    is on, and profiling it if .profile asked for it
+
+    :param cursor: The cursor of the command prompt
+    :param statement: The statement (ending with ';') to run
+    :return: Whether the statement succeeded
+    """
+    global statement_stats, profile_next
+    profile, profile_next = profile_next, None
+    if stats_on:
+        statement_stats = dict.fromkeys([key for key, label in STATEMENT_STATS], 0)
+    if profile == 'cpu':
+        profiler = cProfile.Profile()
+        profiler.enable()
+    elif profile == 'memory':
+        tracemalloc.start()
+    started, times = time.perf_counter(), os.times()
+    try:
+        return print_statement(cursor, statement)
+    finally:
+        real = time.perf_counter() - started
+        user, system = [after - before for before, after in zip(times[:2], os.times()[:2])]
+        if profile == 'cpu':
+            profiler.disable()
+        elif profile == 'memory':
+            snapshot = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        if timer_on:
+            print('Run Time: real %.3f user %.6f sys %.6f' % (real, user, system))
+        if statement_stats is not None:
+            for key, label in STATEMENT_STATS:
+                value = statement_stats[key]
+                print('%-16s%s' % (label + ':', '%.6f s' % value if key.endswith('_time') else value))
+            statement_stats = None
+        if profile == 'cpu':
+            pstats.Stats(profiler).sort_stats('cumulative').print_stats(PROFILE_LINES)
+        elif profile == 'memory':
+            print('Peak memory: %i bytes' % peak)
+            for stat in snapshot.statistics('lineno')[:TRACEMALLOC_LINES]:
+                print(stat)
+
+
+def add_stat(key, value):
+    """
+    Adds to a statistic of the running statement while .stats is on
+
+    :param key: The key of the statistic (see STATEMENT_STATS)
+    :param value: The number (or seconds) to add
+    """
+    if statement_stats is not None:
+        statement_stats[key] += value
+
+
+def count_scan(rows, size):
+    """
+    Adds the rows a storage engine scanned and the bytes it read to the
+    statistics of the running statement while .stats is on
+
+    :param rows: The number of rows scanned
+    :param size: The number of bytes read
+    """
+    if statement_stats is not None:
+        statement_stats['rows_scanned'] += rows
+        statement_stats['bytes_read'] += size
+
+
+def timed_rows(rows):
+    """
+    Passes the rows a storage engine produces through, adding the time spent
+    producing them to the I/O time of the running statement
+
+    :param rows: An iterable of (row id, row) tuples
+    :return: A generator of the same tuples
+    """
+    rows = iter(rows)
+    clock = time.perf_counter
+    while True:
+        started = clock()
+        item = next(rows, None)
+        statement_stats['io_time'] += clock() - started
+        if item is None:
+            return
+        yield item
+
+
+def set_timer(setting):
+    """
+    Turns printing the run time of each statement on or off
+
+    setting -- 'on' or 'off'
+    """
+    global timer_on
+    if setting.lower() not in ('on', 'off'):
+        print('Error: the setting must be "on" or "off"')
+        return
+    timer_on = setting.lower() == 'on'
+
+
+def set_stats(setting):
+    """
+    Turns printing the statistics of each statement on or off
+
+    setting -- 'on' or 'off'
+    """
+    global stats_on
+    if setting.lower() not in ('on', 'off'):
+        print('Error: the setting must be "on" or "off"')
+        return
+    stats_on = setting.lower() == 'on'
+
+
+def set_profile(kind='cpu'):
+    """
+    Profiles the next statement: 'cpu' runs it under cProfile and prints the
+    functions it spent the most time in, 'memory' traces its allocations
+    with tracemalloc and prints its peak memory and the lines of code which
+    allocated the most
+
+    kind -- 'cpu' or 'memory'
+    """
+    global profile_next
+    if kind.lower() not in ('cpu', 'memory'):
+        print('Error: the profile must be "cpu" or "memory"')
+        return
+    profile_next = kind.lower()
+    print('The next statement will be profiled.')
+
+
+# locking functions
+#
+# Several processes can use the same databases. Each database has a lock
+# file, <database>/.lock, and every table a byte of it (picked by hashing its
+# name), which is locked with a POSIX record lock: shared by the statements
+# reading the table and exclusively by the ones writing to its files, so a
+# reader sees no write half done. Byte 0 locks the write-ahead log, which
+# every write to the database (and every checkpoint) takes before its table
+# locks, so writers can't deadlock. Statements which read several tables lock them in
+# the order of their bytes.
+#
+# Writes only append to the write-ahead log, so statements read the tables
+# without waiting for the log: they read the log's new records (see
+# `wal_read`), and the lock file's header counts the times the log was
+# emptied and the writes pending in it, so a process can tell when the
+# records it read are gone. It also keeps a version of each table, which
+# every exclusive lock on the table (only taken to apply the log to it, or
+# to change its schema) changes, so processes can tell whether the rows they
+# cached are still current (see `pool_scan`).
+# Locks are reentrant within a process; rewritten files are still written to
+# a temporary file and renamed (see `replace_file`), so a process which
+# opened a table before it was rewritten keeps reading the old version.
+
+def lock_file(db_name):
+    """
+    Returns the file descriptor of the lock file of a database, opening it on
+    first use (and again if the database was dropped and created since). While
+    this process holds a lock on the database, the file it locked is returned
+    without checking.
+
+    :param db_name: The name of the database
+    """
+    cached = lock_files.get(db_name)
+    if cached is not None and any(key[0] == db_name for key in held_locks):
+        return cached[1]
+    lock_path = os.path.join(DB_DIR, db_name, LOCK_FILE)
+    try:
+        inode = os.stat(lock_path).st_ino
+    except FileNotFoundError:
+        inode = None
+    cached = lock_files.get(db_name)
+    if cached is not None and cached[0] == inode:
+        return cached[1]
+    if cached is not None:
+        os.close(cached[1])  # only releases locks on the old file
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    lock_files[db_name] = (os.fstat(fd).st_ino, fd)
+    return fd
+
+
+def lock_byte(tbl_name):
+    """
+    Returns the byte of the lock file which locks a table (or, for None, the
+    write-ahead log)
+    """
+    if tbl_name is None:
+        return 0
+    return 1 + zlib.crc32(tbl_name.encode()) % LOCK_SLOTS
+
+
+@contextlib.contextmanager
+def table_lock(db_name, tbl_name, exclusive=False):
+    """
+    Holds a shared or exclusive lock on a table against other processes,
+    waiting for the processes holding a conflicting one. A shared lock this
+    process already holds is upgraded for the duration.
+
+    :param db_name: The name of the database
+    :param tbl_name: The name of the table (None locks the write-ahead log)
+    :param exclusive: Whether to lock the table exclusively
+    :return: A context manager, whose value is True if the lock was taken
+    rather than already held
+    """
+    key = (db_name, lock_byte(tbl_name))
+    held = held_locks.get(key)
+    if held is not None and (held or not exclusive):
+        yield False
+        return
+    fd = lock_file(db_name)
+    fcntl.lockf(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH, 1, key[1])
+    held_locks[key] = exclusive
+    if exclusive and tbl_name is not None:
+        table_changed(db_name, tbl_name)
+    try:
+        yield held is None
+    finally:
+        if exclusive and tbl_name is not None:
+            pool_invalidate(os.path.join(DB_DIR, db_name, tbl_name))  # it may have cached rows while writing
+        if held is None:
+            fcntl.lockf(fd, fcntl.LOCK_UN, 1, key[1])
+            del held_locks[key]
+        else:
+            fcntl.lockf(fd, fcntl.LOCK_SH, 1, key[1])  # back to the shared lock
+            held_locks[key] = held
+
+
+@contextlib.contextmanager
+def table_locks(db_name, tbl_names, exclusive=False):
+    """
+    Holds locks on several tables (see `table_lock`), taking them in the
+    order of their bytes
+
+    :param db_name: The name of the database
+    :param tbl_names: The names of the tables
+    :param exclusive: Whether to lock the tables exclusively
+    """
+    with contextlib.ExitStack() as stack:
+        for tbl_name in sorted(set(tbl_names), key=lock_byte):
+            stack.enter_context(table_lock(db_name, tbl_name, exclusive))
+        yield
+
+
+def table_version(db_name, tbl_name):
+    """
+    Returns the version of a table, which changes whenever a process locks
+    it exclusively (see `table_changed`). Tables whose names hash alike share
+    a version, so a write to one only looks like a write to the others.
+
+    :param db_name: The name of the database
+    :param tbl_name: The name of the table
+    :return: A (lock file inode, version) tuple, as the lock file is new if
+    the database was dropped and created since
+    """
+    fd = lock_file(db_name)
+    data = os.pread(fd, TABLE_VERSION.size, table_version_offset(tbl_name))
+    return lock_files[db_name][0], TABLE_VERSION.unpack(data)[0] if len(data) == TABLE_VERSION.size else 0
+
+
+def table_changed(db_name, tbl_name):
+    """
+    Changes the version of a table (see `table_version`) before it is written
+    to, so that the version changes even if the process crashes while
+    writing
+
+    :param db_name: The name of the database
+    :param tbl_name: The name of the table
+    """
+    version = table_version(db_name, tbl_name)[1]
+    os.pwrite(lock_file(db_name), TABLE_VERSION.pack(version + 1), table_version_offset(tbl_name))
+
+
+def table_version_offset(tbl_name):
+    """
+    Returns the offset of the version of a table in the lock file
+    """
+    return LOCK_HEADER.size + TABLE_VERSION.size * (zlib.crc32(tbl_name.encode()) % TABLE_VERSION_SLOTS)
+
+
+def wal_header(db_name):
+    """
+    Reads the number of times the write-ahead log of a database was emptied
+    (odd while it is being emptied, see `wal_truncate`) and of the rows
+    pending in it, as the last process to change it left them
+
+    :param db_name: The name of the database
+    :return: A (times emptied, pending rows) tuple
+    """
+    data = os.pread(lock_file(db_name), LOCK_HEADER.size, 0)
+    return LOCK_HEADER.unpack(data) if len(data) == LOCK_HEADER.size else (0, 0)
+
+
+@contextlib.contextmanager
+def wal_lock(db_name):
+    """
+    Holds the write-ahead log of a database, which every write to the
+    database takes before its table locks. The records other processes
+    appended to the log are read first (see `wal_read`), so this process's
+    records follow them; if one of them crashed while writing, the log is
+    recovered (see `wal_recover`).
+
+    :param db_name: The name of the database
+    """
+    with table_lock(db_name, None, exclusive=True) as taken:
+        if not taken:
+            yield
+            return
+        log = wal_read(db_name)
+        if log['epoch'] % 2 or log['started'] or os.fstat(log['file'].fileno()).st_size > log['size']:
+            wal_recover(db_name)
+        try:
+            yield
+        finally:
+            log = wal_logs.get(db_name)
+            if log is not None and log['changed']:
+                log['changed'] = False
+                log['file'].flush()
+                os.pwrite(lock_file(db_name), LOCK_HEADER.pack(log['epoch'], log['row_count']), 0)
+
+
+@contextlib.contextmanager
+def plan_locks(plan):
+    """
+    Holds the locks a plan needs while it executes: shared locks on its
+    tables, so that no checkpoint writes to them meanwhile, and for an
+    INSERT, UPDATE or DELETE the write-ahead log, which its writes go to.
+    The writes inside a transaction are only collected, so they lock like
+    reads. Either way, the plan sees the writes logged so far (see
+    `wal_read`).
+
+    :param plan: The plan (see `new_plan`)
+    """
+    tbl_names = [table['name'] for table in plan['tables']]
+    if plan['action'] == 'select' or transaction is not None:
+        with table_locks(active_database, tbl_names):
+            wal_read(active_database)
+            yield
+    else:
+        with wal_lock(active_database), table_locks(active_database, tbl_names):
+            yield
+
+
+# write-ahead log functions
+#
+# Every database has a write-ahead log, <database>/.wal. INSERT, UPDATE and
+# DELETE commands and COMMIT append their writes to the log (one record
+# each) instead of writing to the tables, and the log is fsynced in groups:
+# every 1000 rows or 0.5 seconds by default (see `set_wal_sync`), and by a
+# timer once the interval has passed without another write (see
+# `wal_flush`). So a write costs an append rather than rewriting a table
+# and its indexes, and it doesn't block the statements reading the table:
+# they read the table as the last checkpoint left it, with the logged
+# writes merged in (see `logged_rows`). The writes are applied to their
+# tables (a checkpoint) in one batch per table once WAL_CHECKPOINT_ROWS rows
+# are logged, before the schema changes (CHECKPOINT_COMMANDS) and on exit;
+# then the log is emptied.
+#
+# Each process reads the records the others appended before each statement
+# (see `wal_read`) and replays them into the writes pending per table (see
+# `wal_replay`). The rows inserted into the log are numbered from WAL_ROWID
+# on in the order they were logged, so every process gives them the same row
+# ids, and UPDATE and DELETE can refer to them before they are applied.
+#
+# Writes to the files of a table are bracketed by BEGIN and DONE records,
+# and the pages a paged table is about to be written are logged (and
+# fsynced) first. If a process crashes, the next one to hold the log (see
+# `wal_lock`) recovers the database by writing the logged pages of
+# interrupted writes again, or else undoing them (for CSV and compressed
+# tables, by cutting off what they appended) so that the logged writes
+# they applied are applied again, and rebuilding the indexes of the tables
+# involved.
+#
+# Each record is the length and CRC-32 of its body, its type and the body
+# serialized with marshal; a torn or corrupt record ends the log.
+
+def wal_open(db_name):
+    """
+    Returns the write-ahead log of a database, opening it on first use
+
+    :param db_name: The name of the database
+    :return: A dict with the log's database, path and file, the inode of the
+    lock file of the database when it was opened, the writes not
+    yet applied to their tables ('pending', keyed by table name, see
+    `wal_replay`) and the number of rows they logged, the writes to tables
+    begun but not done ('started'), the number of rows and time since the
+    log was last fsynced, and the size of the log and the times it was
+    emptied when this process last read it (see `wal_read`)
+    """
+    log = wal_logs.get(db_name)
+    if log is None:
+        lock_file(db_name)
+        wal_path = os.path.join(DB_DIR, db_name, WAL_FILE)
+        log = wal_logs[db_name] = {
+            'db_name': db_name,
+            'path': wal_path,
+            'file': open(wal_path, 'ab'),
+            'lock_inode': lock_files[db_name][0],
+            'pending': collections.OrderedDict(),
+            'row_count': 0,
+            'started': collections.OrderedDict(),  # (size, pages, applied writes) keyed by table (see `wal_begin`)
+            'unsynced': 0,
+            'synced': time.monotonic(),
+            'size': 0,
+            'epoch': None,
+            'changed': False  # whether the log was written to since it was taken
+        }
+    return log
+
+
+def wal_read(db_name):
+    """
+    Reads the records appended to the write-ahead log of a database since
+    this process last read it and replays them (see `wal_replay`). Doesn't
+    wait for the log: records are only ever appended to it, and a record
+    still being written is read the next time. If the log was emptied since
+    (or is being emptied, when everything in it was applied), what was read
+    before is dropped.
+
+    :param db_name: The name of the database
+    :return: The log (see `wal_open`)
+    """
+    log = wal_open(db_name)
+    lock_file(db_name)
+    if log['lock_inode'] != lock_files[db_name][0]:  # the database was dropped (and created again) since
+        wal_close(db_name)
+        log = wal_open(db_name)
+    while True:
+        epoch = wal_header(db_name)[0]
+        if epoch != log['epoch']:
+            log['pending'].clear()
+            log['started'].clear()
+            log['row_count'] = log['size'] = 0
+            log['epoch'] = epoch
+        size = os.fstat(log['file'].fileno()).st_size
+        if epoch % 2 or size <= log['size']:
+            return log
+        with open(log['path'], 'rb') as wal_file:
+            wal_file.seek(log['size'])
+            data = wal_file.read(size - log['size'])
+        if wal_header(db_name)[0] == epoch:
+            break  # else the log was emptied while it was read
+    end = 0
+    for record_type, body, end in wal_records(data):
+        wal_replay(log, record_type, body)
+    log['size'] += end
+    return log
+
+
+def wal_replay(log, record_type, body):
+    """
+    Brings the writes pending in a write-ahead log up to date with one of its
+    records. The writes to a table are a dict with the inserted rows
+    ('inserts', keyed by their row ids from WAL_ROWID on), the new versions
+    of changed stored rows ('changes', keyed by row id), the row ids of
+    deleted stored rows ('deleted') and the row id of the next inserted row.
+
+    :param log: The log (see `wal_open`)
+    :param record_type: The record type (e.g. WAL_WRITES)
+    :param body: The record body
+    """
+    if record_type == WAL_INSERT:
+        record_type, body = WAL_WRITES, ((body[0], [body[1]], [], []),)
+    if record_type == WAL_WRITES:
+        for tbl_name, inserts, changes, deleted in body:
+            writes = log['pending'].get(tbl_name)
+            if writes is None:
+                writes = log['pending'][tbl_name] = {
+                    'inserts': collections.OrderedDict(),
+                    'changes': {},
+                    'deleted': set(),
+                    'next_rowid': WAL_ROWID
+                }
+            for row in inserts:
+                writes['inserts'][writes['next_rowid']] = row
+                writes['next_rowid'] += 1
+            for rowid, row in changes:
+                if rowid >= WAL_ROWID:
+                    writes['inserts'][rowid] = row
+                else:
+                    writes['changes'][rowid] = row
+            for rowid in deleted:
+                if rowid >= WAL_ROWID:
+                    writes['inserts'].pop(rowid, None)
+                else:
+                    writes['changes'].pop(rowid, None)
+                    writes['deleted'].add(rowid)
+            log['row_count'] += len(inserts) + len(changes) + len(deleted)
+    elif record_type == WAL_BEGIN:
+        log['started'][body[0]] = (body[1], [], body[2] if len(body) > 2 else None)
+    elif record_type == WAL_PAGES and body[0] in log['started']:
+        log['started'][body[0]][1].extend(body[1])
+    elif record_type == WAL_DONE:
+        applied = log['started'].pop(body[0], (None, None, None))[2]
+        writes = log['pending'].get(body[0])
+        if writes is None or (len(body) > 1 and not body[1]):
+            return  # undone after a crash, so the writes are applied again
+        if applied == 'changes':
+            writes['changes'], writes['deleted'] = {}, set()
+        elif applied == 'inserts':
+            del log['pending'][body[0]]
+
+
+def wal_write(log, record_type, body):
+    """
+    Appends a record to a write-ahead log (without fsyncing it) and replays
+    it (see `wal_replay`), while the log is held (see `wal_lock`)
+
+    :param log: The log (see `wal_open`)
+    :param record_type: The record type (e.g. WAL_WRITES)
+    :param body: The record body (a tuple of marshal-able values)
+    """
+    data = marshal.dumps(body)
+    log['file'].write(WAL_RECORD.pack(len(data), zlib.crc32(data), record_type) + data)
+    log['size'] += WAL_RECORD.size + len(data)
+    log['changed'] = True
+    wal_replay(log, record_type, body)
+
+
+def wal_sync(log):
+    """
+    Forces the records of a write-ahead log to disk
+    """
+    log['file'].flush()
+    os.fsync(log['file'].fileno())
+    log['unsynced'] = 0
+    log['synced'] = time.monotonic()
+
+
+def wal_truncate(log):
+    """
+    Empties a write-ahead log once everything in it was applied. The lock
+    file counts the log as being emptied meanwhile, so that the processes
+    reading it (see `wal_read`) don't take the records written after it for
+    the ones they read before.
+    """
+    fd = lock_file(log['db_name'])
+    epoch = log['epoch'] | 1
+    os.pwrite(fd, LOCK_HEADER.pack(epoch, 0), 0)
+    log['file'].flush()
+    log['file'].truncate(0)
+    wal_sync(log)
+    log['epoch'] = epoch + 1
+    os.pwrite(fd, LOCK_HEADER.pack(log['epoch'], 0), 0)
+    log['pending'].clear()
+    log['started'].clear()
+    log['row_count'] = log['size'] = 0
+    log['changed'] = False
+
+
+def wal_records(data):
+    """
+    Parses the records of a write-ahead log, stopping at the first torn or
+    corrupt record
+
+    :param data: The contents of the log
+    :return: A generator of (record type, body, offset of the next record)
+    tuples
+    """
+    offset = 0
+    while offset + WAL_RECORD.size <= len(data):
+        length, crc, record_type = WAL_RECORD.unpack_from(data, offset)
+        body = data[offset + WAL_RECORD.size:offset + WAL_RECORD.size + length]
+        if len(body) < length or zlib.crc32(body) != crc:
+            return
+        offset += WAL_RECORD.size + length
+        yield record_type, marshal.loads(body), offset
+
+
+def wal_commit(writes):
+    """
+    Commits writes to tables of the active database by logging them in one
+    record, while the log is held (see `plan_locks`). The log is fsynced
+    once `wal_sync_rows` rows or `wal_sync_interval` seconds have passed
+    since it last was, or by the flush timer when no other write follows
+    (see `wal_flush`).
+
+    :param writes: A list of (table, inserted rows, changes, deleted row ids)
+    tuples, where changes is a dict mapping row ids to new rows
+    """
+    global wal_flush_timer
+    log = wal_open(active_database)
+    wal_write(log, WAL_WRITES, tuple((table['name'], inserts, sorted(changes.items()), sorted(deleted))
+                                     for table, inserts, changes, deleted in writes))
+    log['file'].flush()  # a crash of the program doesn't lose what the OS has
+    log['unsynced'] += sum(len(inserts) + len(changes) + len(deleted) for table, inserts, changes, deleted in writes)
+    if log['unsynced'] >= wal_sync_rows or time.monotonic() - log['synced'] >= wal_sync_interval:
+        wal_sync(log)
+    elif wal_flush_timer is None:
+        wal_flush_timer = threading.Timer(wal_sync_interval, wal_flush)
+        wal_flush_timer.daemon = True
+        wal_flush_timer.start()
+    if log['row_count'] >= WAL_CHECKPOINT_ROWS:
+        wal_checkpoint()
+
+
+def wal_flush():
+    """
+    Fsyncs the rows left unsynced in the write-ahead logs. Runs on the flush
+    timer `wal_commit` starts, once no statement is running (see
+    `Connection.session` and `serve_write`), and before the program exits.
+    """
+    global wal_flush_timer
+    with connection_lock:
+        wal_flush_timer = None
+        for log in list(wal_logs.values()):
+            if log['unsynced'] and not log['file'].closed:
+                wal_sync(log)
+
+
+def wal_begin(table, db_name=None, size=None, applied=None):
+    """
+    Logs that a table is about to be written to and journals the pages of
+    paged tables until `wal_end`
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param db_name: The name of the database (defaults to the table's)
+    :param size: The sizes of a CSV or compressed table and its tombstones
+    (or the row count of a columnar table) which are only appended to, so a
+    partial append can be cut off after a crash (see `wal_size`)
+    :param applied: Which of the writes logged for the table the write
+    applies: 'changes' (the changed and deleted rows) or 'inserts' (the
+    rest), or None
+    :return: The log (see `wal_open`)
+    """
+    global page_journal
+    log = wal_open(db_name or os.path.basename(os.path.dirname(table['path'])))
+    wal_write(log, WAL_BEGIN, (table['name'], size, applied))
+    wal_sync(log)
+
+    def journal(tbl_path, pages):
+        wal_write(log, WAL_PAGES, (table['name'], pages))
+        wal_sync(log)
+
+    page_journal = journal
+    return log
+
+
+def wal_end(log, table):
+    """
+    Logs that a table (and its indexes) were written to completely
+
+    :param log: The log (see `wal_begin`)
+    :param table: The catalog entry of the table (see `catalog_table`)
+    """
+    global page_journal
+    page_journal = None
+    fsync_file(table['path'])
+    if table['format'] == 'columnar':
+        columnar_sync(table['path'])
+    if os.path.exists(table['path'] + ZONE_EXT):
+        fsync_file(table['path'] + ZONE_EXT)
+    for index in table['indexes']:
+        fsync_file(index['path'])
+    catalog_touch(table)
+    wal_write(log, WAL_DONE, (table['name'], True))
+    log['file'].flush()  # readers of the table see the record once it is unlocked
+    if not log['row_count']:
+        wal_truncate(log)
+
+
+def wal_size(table):
+    """
+    Returns the sizes of a CSV or compressed table and its tombstones, the
+    row count of a columnar table or None for a paged table, to cut off what
+    an interrupted write appended to it (see `wal_begin`)
+    """
+    if table['format'] in ('csv', 'compressed'):
+        tomb_path = table['path'] + TOMBSTONE_EXT
+        return os.path.getsize(table['path']), os.path.getsize(tomb_path) if os.path.exists(tomb_path) else 0
+    if table['format'] == 'columnar':
+        return columnar_row_count(table['path'])
+    return None
+
+
+def wal_apply(table, rows, db_name=None, applied=None):
+    """
+    Inserts a batch of rows into a table and its indexes, bracketing the
+    write with BEGIN and DONE records (see `wal_begin`)
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param rows: The list of rows (lists of typed values) to insert
+    :param db_name: The name of the database (defaults to the table's)
+    :param applied: 'inserts' if they are the rows logged for the table
+    """
+    log = wal_begin(table, db_name, wal_size(table), applied)
+    try:
+        insert_rows(table, rows)
+    finally:
+        wal_end(log, table)
+
+
+def wal_change(table, writes, db_name=None):
+    """
+    Applies the changed and deleted rows logged for a table to it and its
+    indexes, bracketing the write with BEGIN and DONE records (see
+    `wal_begin`)
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param writes: The writes logged for the table (see `wal_replay`)
+    :param db_name: The name of the database (defaults to the table's)
+    """
+    rowids = sorted(set(writes['changes']) | writes['deleted'])
+    old_rows = dict(table['engine']['fetch'](table['path'], table['model'], rowids))
+    # the rows an interrupted checkpoint deleted already are left out (see `wal_recover`)
+    changes = {rowid: row for rowid, row in writes['changes'].items() if rowid in old_rows}
+    deleted = {rowid: old_rows[rowid] for rowid in writes['deleted'] if rowid in old_rows}
+    log = wal_begin(table, db_name, wal_size(table), 'changes')
+    try:
+        if changes:
+            update_rows(table, changes, old_rows)
+        if deleted:
+            delete_rows(table, deleted)
+    finally:
+        wal_end(log, table)
+
+
+def insert_rows(table, rows):
+    """
+    Inserts rows into a table and its indexes
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param rows: The list of rows (lists of typed values) to insert
+    """
+    rowids = table['engine']['insert'](table['path'], table['model'], rows)
+    maintain_indexes(table, [(None, None, rowid, row) for rowid, row in zip(rowids, rows)])
+
+
+def wal_checkpoint(db_name=None):
+    """
+    Applies the writes logged in the write-ahead log of a database to their
+    tables, in two batches per table (the changed and deleted rows, then the
+    inserted ones), then empties the log
+
+    :param db_name: The name of the database (defaults to the active one)
+    """
+    db_name = db_name or active_database
+    log = wal_logs.get(db_name)
+    if (log is None or not log['row_count']) and not wal_pending(db_name):
+        return  # neither this process nor another one has writes pending
+    with wal_lock(db_name):
+        log = wal_open(db_name)
+        if not log['row_count']:
+            return  # another process applied them
+        for tbl_name, writes in list(log['pending'].items()):
+            with table_lock(db_name, tbl_name, exclusive=True):
+                table = catalog_table(tbl_name, db_name, fresh=True)
+                if table is None:
+                    continue  # the table was dropped (after a crash)
+                changed = writes['changes'] or writes['deleted']
+                if changed:
+                    wal_change(table, writes, db_name)
+                if writes['inserts']:
+                    wal_apply(table, list(writes['inserts'].values()), db_name, 'inserts')
+                if changed:
+                    auto_vacuum(table)
+        wal_truncate(log)
+
+
+def wal_pending(db_name):
+    """
+    Returns the number of rows pending in the write-ahead log of a database
+    as the last process to hold it left them (see `wal_lock`), without
+    waiting for it
+    """
+    try:
+        return wal_header(db_name)[1]
+    except OSError:
+        return 0  # the database was dropped
+
+
+def wal_close(db_name):
+    """
+    Closes the write-ahead log of a database (e.g. before it is dropped)
+    without applying it
+    """
+    log = wal_logs.pop(db_name, None)
+    if log is not None:
+        log['file'].close()
+
+
+def wal_recover(db_name):
+    """
+    Recovers a database from its write-ahead log after a process crashed
+    while holding it (see `wal_lock`): a torn record at the end of the log is
+    cut off, the writes to tables it left begun are finished if their pages
+    were logged or else undone, and the indexes of the tables are rebuilt.
+    The logged writes an unfinished write applied are applied again: the
+    changed and deleted rows (which may have been written by several batches
+    of pages) are looked up again, so they are only changed once.
+
+    :param db_name: The name of the database
+    """
+    log = wal_open(db_name)
+    log['file'].flush()
+    log['file'].truncate(log['size'])
+    for tbl_name, (size, pages, applied) in list(log['started'].items()):
+        table = catalog_table(tbl_name, db_name)
+        if table is not None:
+            table_changed(db_name, tbl_name)  # others may have cached the rows the interrupted write left
+            if pages:
+                # the pages were logged before any of them was written, so the
+                # write can be finished
+                with open(table['path'], 'r+b') as table_file:
+                    for page_no, page in pages:
+                        table_file.seek(page_no * PAGE_SIZE)
+                        table_file.write(page)
+            elif size is not None and table['format'] == 'columnar':
+                columnar_truncate(table['path'], size)
+            elif size is not None:
+                size, tomb_size = size if isinstance(size, tuple) else (size, None)
+                with open(table['path'], 'r+b') as table_file:
+                    table_file.truncate(size)  # cut off a partially appended batch
+                if tomb_size is not None and os.path.exists(table['path'] + TOMBSTONE_EXT):
+                    with open(table['path'] + TOMBSTONE_EXT, 'r+b') as tomb_file:
+                        tomb_file.truncate(tomb_size)
+            catalog_invalidate(db_name, tbl_name)
+            table = catalog_table(tbl_name, db_name)
+            rebuild_indexes(table)
+        wal_write(log, WAL_DONE, (tbl_name, bool(pages) and applied != 'changes'))
+    if log['epoch'] % 2 or not log['row_count']:
+        wal_truncate(log)
+    else:
+        wal_sync(log)
+
+
+def recover_files(db_name):
+    """
+    Cleans up after table and index rewrites (see `replace_file`) which were
+    interrupted by a crash
+
+    :param db_name: The name of the database
+    """
+    db_path = os.path.join(DB_DIR, db_name)
+    file_names = set(os.listdir(db_path))
+    for file_name in sorted(file_names):
+        if not file_name.endswith(TMP_EXT):
+            continue
+        path = os.path.join(db_path, file_name)
+        if file_name.endswith(TOMBSTONE_EXT + TMP_EXT):
+            # tombstones set aside by VACUUM: they still apply if the table
+            # wasn't replaced yet
+            tbl_file_name = file_name[:-len(TOMBSTONE_EXT + TMP_EXT)]
+            if tbl_file_name + TMP_EXT in file_names:
+                os.replace(path, path[:-len(TMP_EXT)])
+                continue
+        os.remove(path)
+
+
+# dot-command functions
+
+def exit_program():
+    """
+    Exits the program
+    """
+    shut_down()
+    print('All done.')
+    quit()
+
+
+def shut_down():
+    """
+    Fsyncs the write-ahead logs and applies the rows left in them to their
+    tables, and stops the worker processes of parallel scans before the
+    program exits
+    """
+    wal_flush()  # the logged rows are durable even if applying them fails
+    for db_name in list(wal_logs):
+        wal_checkpoint(db_name)
+    if scan_pool is not None:
+        scan_pool.terminate()
+
+
+def print_help():
+    """
+    Prints all of the allowed dot-commands and their function
+    """
+    print('.cache_size [SIZE]     Keep up to SIZE (e.g. 256MB) of decoded table rows in memory')
+    print('.exit                  Exit this program')
+    print('.help                  Show this message')
+    print('.import FILE TABLE     Import the rows of a CSV or TSV file into TABLE')
+    print('.memory ROWS           Keep up to ROWS rows in memory when sorting or aggregating')
+    print('.parallel N            Scan large tables with N processes (1 to scan serially)')
+    print('.profile [cpu|memory]  Profile the time or the memory allocations of the next statement')
+    print('.stats on|off          Print the statistics of each statement')
+    print('.timer on|off          Print the run time of each statement')
+    print('.wal_sync [SECS [N]]   Fsync logged rows after SECS seconds (0 for every write) or N rows')
+
+
+def set_parallel(workers):
+    """
+    Sets the number of worker processes which scan large CSV tables (see
+    `csv_parallel_scan`)
+
+    workers -- the number of processes (1 turns parallel scans off)
+    """
+    global parallel_workers, scan_pool
+    if not workers.isdigit() or int(workers) < 1:
+        print('Error: the number of processes must be a positive integer')
+        return
+    if scan_pool is not None:
+        scan_pool.terminate()
+        scan_pool = None
+    parallel_workers = int(workers)
+    if parallel_workers == 1:
+        print('Parallel scans turned off.')
+    else:
+        print('Large tables will be scanned by %i processes.' % parallel_workers)
+
+
+def set_memory(rows):
+    """
+    Sets the number of rows (or groups) sorts and aggregations keep in
+    memory before they spill to temporary files (see `sort_rows` and
+    `hash_aggregate`)
+
+    rows -- the number of rows
+    """
+    global memory_rows
+    if not rows.isdigit() or int(rows) < 1:
+        print('Error: the number of rows must be a positive integer')
+        return
+    memory_rows = int(rows)
+    print('Sorts and aggregations will keep up to %i rows in memory.' % memory_rows)
+
+
+def set_cache_size(size=None):
+    """
+    Sets the memory the buffer pool keeps decoded table rows in (see
+    `pool_scan`), or prints its size, usage and hits and misses
+
+    size -- the number of bytes, optionally followed by KB, MB or GB (0 turns
+    the buffer pool off)
+    """
+    global cache_size
+    if size is None:
+        print('Cache size: %i bytes, %i used in %i blocks, %i hits, %i misses'
+              % (cache_size, cache_used, len(buffer_pool), cache_hits, cache_misses))
+        return
+    match = CACHE_SIZE_REGEX.match(size)
+    if match is None:
+        print('Error: the size must be a number of bytes, KB, MB or GB')
+        return
+    unit = (match.group(2) or 'b').lower()
+    cache_size = int(match.group(1)) << {'b': 0, 'kb': 10, 'mb': 20, 'gb': 30}[unit]
+    pool_invalidate()
+    if cache_size:
+        print('The buffer pool will keep up to %i bytes of rows.' % cache_size)
+    else:
+        print('Buffer pool turned off.')
+
+
+def set_wal_sync(interval=None, rows=None):
+    """
+    Sets how often the writes logged in the write-ahead logs are fsynced
+    (see `wal_commit`), or prints the current settings
+
+    interval -- the seconds after which the logged rows are fsynced, even if
+    no other write follows (0 fsyncs each write)
+    rows -- the number of logged rows after which they are fsynced
+    """
+    global wal_sync_interval, wal_sync_rows
+    if interval is None:
+        print('Logged rows are fsynced every %g seconds or %i rows.' % (wal_sync_interval, wal_sync_rows))
+        return
+    if WAL_SYNC_REGEX.match(interval) is None:
+        print('Error: the interval must be a number of seconds')
+        return
+    if rows is not None and (not rows.isdigit() or int(rows) < 1):
+        print('Error: the number of rows must be a positive integer')
+        return
+    wal_flush()  # rows logged so far don't wait for the new interval
+    wal_sync_interval = float(interval)
+    if rows is not None:
+        wal_sync_rows = int(rows)
+    print('Logged rows will be fsynced every %g seconds or %i rows.' % (wal_sync_interval, wal_sync_rows))
+
+
+def import_file(file_path, tbl_name):
+    """
+    Imports the rows of a CSV (or, if its first line holds a tab, TSV) file
+    into a table. The file is read in IMPORT_BUFFER byte chunks, and its rows
+    are cast to the data types of the table's columns and written
+    IMPORT_BATCH_ROWS at a time. A first row holding the column names of the
+    table is skipped.
+
+    file_path -- the path to the file to import
+    tbl_name -- the name of the table to import the rows into
+    """
+    tbl_name = tbl_name.lower()
+    if transaction is not None:
+        print('Error: .import cannot be used inside a transaction')
+        return
+    wal_checkpoint()  # logged rows go in before the imported ones
+    with wal_lock(active_database), table_lock(active_database, tbl_name, exclusive=True):
+        table = catalog_table(tbl_name, fresh=True)
+        if table is None:
+            print('!Failed to import into table %s because it does not exist.' % tbl_name)
+            return
+
+        model = table['model']
+        columns = table['columns']
+        col_names = [col_name.lower() for col_name in table['col_names']]
+        count = 0
+        try:
+            with open(file_path, 'r', newline='', buffering=IMPORT_BUFFER) as import_file:
+                delimiter = '\t' if '\t' in import_file.readline() else ','
+                import_file.seek(0)
+                reader = csv.reader(import_file, delimiter=delimiter)
+                batch = []
+                for fields in reader:
+                    if not fields or (reader.line_num == 1 and [f.strip().lower() for f in fields] == col_names):
+                        continue  # skip blank lines and the header row
+                    if len(fields) != len(columns):
+                        raise ValueError('line %i has %i values but table %s has %i columns'
+                                         % (reader.line_num, len(fields), tbl_name, len(columns)))
+                    try:
+                        row = [None] * len(model)  # dropped columns are stored as NULL
+                        for i, field in zip(columns, fields):
+                            row[i] = cast_value(model[i], field.strip())
+                        check_row(table, row)
+                    except (ValueError, DataError) as error:
+                        raise ValueError('line %i: %s' % (reader.line_num, error))
+                    batch.append(row)
+                    if len(batch) >= IMPORT_BATCH_ROWS:
+                        wal_apply(table, batch)
+                        count += len(batch)
+                        batch = []
+                if batch:
+                    wal_apply(table, batch)
+                    count += len(batch)
+        except OSError:
+            print('!Failed to import %s because it could not be read.' % file_path)
+            return
+        except (ValueError, csv.Error) as error:
+            print('Error: %s' % error)
+        if count == 1:
+            print('1 new record inserted.')
+        else:
+            print('%i new records inserted.' % count)
+
+
+# query command functions
+
+def create(query_string):
+    """
+    Initiates a CREATE command
+
+    queryString -- the remaining query after the CREATE keyword
+    """
+    resource_types = {
+        'database': create_database,
+        'table': create_table,
+        'index': create_index
+    }
+    try:
+        parsed_query = CREATE_REGEX.match(query_string).groups()
+        resource_type = parsed_query[0].lower()  # grab the resource keyword
+        query_string = parsed_query[1]  # save the remaining query
+
+        # call the appropriate function based on resource
+        resource_types[resource_type](query_string)
+    except AttributeError:
+        raise ProgrammingError('syntax error')
+
+
+def drop(query_string):
+    """
+    Initiates a DROP command
+
+    queryString -- the remaining query after the DROP keyword
+    """
+    resource_types = {
+        'database': drop_database,
+        'table': drop_table,
+        'index': drop_index,
+    }
+    try:
+        parsed_query = DROP_REGEX.match(query_string).groups()
+        resource_type = parsed_query[0].lower()  # grab the resource keyword
+        query_string = parsed_query[1]  # save the remaining query
+
+        # call the appropriate function based on resource
+        resource_types[resource_type](query_string)
+    except AttributeError:
+        raise ProgrammingError('syntax error')
+
+
+def use(query_string):
+    """
+    Initiates a USE command
+
+    query_string -- the remaining query after the USE keyword
+    """
+    global DB_DIR, active_database
+
+    match = USE_REGEX.match(query_string)  # match the query_string against the regex
+
+    if match is not None:
+        db_name = query_string  # for USE commands, the remaining query is the db name
+        db_path = os.path.join(DB_DIR, db_name)  # generate the file path to the db
+        if os.path.isdir(db_path):  # if the file path to the database exists
+            active_database = db_name
+            catalog_invalidate(db_name)  # start from fresh metadata
+            report('Using database %s.' % db_name)
+        else:
+            raise OperationalError('Failed to use database %s because it does not exist.' % db_name)
+    else:
+        raise ProgrammingError('syntax error')
+
+
+def select(query_string):
+    """
+    Initiates a SELECT command
+
+    query_string -- the remaining query after the SELECT keyword
+    """
+    execute_plan(plan_select(query_string))
+
+
+def plan_select(query_string):
+    """
+    Compiles a SELECT command into a plan
+
+    :param query_string: the remaining query after the SELECT keyword
+    :return: The plan
+    :raises DatabaseError: if the query is invalid (see `Error`)
+    """
+    match = SELECT_REGEX.match(query_string)
+    clauses = SELECT_CLAUSES_REGEX.match(query_string)
+    if match is None or clauses is None or clauses.group(1) != query_string:
+        # several tables, aliases, qualified column names, aggregates or GROUP BY
+        return plan_join_select(query_string)
+    try:
+        groups = match.groups()
+        columns = [col.strip() for col in groups[0].split(',')]
+        tbl_name = groups[1].strip().lower()  # grab table name and convert to lowercase
+        query_has_where_clause = groups[2] is not None and groups[3] is not None
+
+        table = catalog_table(tbl_name)
+        if table is None:
+            raise OperationalError('Failed to query table %s because it does not exist.' % tbl_name)
+
+        plan = new_plan('select', query_string, table)
+        col_index = table['col_index']  # maps column names to column numbers
+        cols_to_select = []
+
+        # figure out what column numbers to select given the query and the table model
+        if columns[0] != '*':  # if not selecting all columns
+            for col_name in columns:
+                if col_name in col_index:
+                    cols_to_select.append(col_index[col_name])
+        else:  # select all columns
+            cols_to_select = list(table['columns'])
+        plan['cols_to_select'] = cols_to_select
+
+        # the header row holds the column definitions (e.g. 'pid int')
+        plan['col_defs'] = ' | '.join([table['model'][i]['definition'] for i in cols_to_select])
+
+        # Using the key from the key/operator/value group from the WHERE clause
+        # of the query, find the column it relates to and compile the condition
+        plan['where'] = None
+        if query_has_where_clause:
+            where_dict = parse_where_clause(groups[3])
+            if not plan_where(plan, where_dict):
+                raise OperationalError('Failed to query table %s because column %s does not exist.'
+                                       % (tbl_name, where_dict['key']))
+
+        plan['execute'] = execute_select
+        return plan
+    except AttributeError:
+        raise ProgrammingError('syntax error')
+    except ValueError as error:
+        raise ProgrammingError(str(error))
+
+
+def execute_select(plan, params):
+    """
+    Executes a SELECT plan, printing the header and the selected rows
+
+    :param plan: The plan (see `plan_select` and `plan_join_select`)
+    :param params: The list of raw parameter values
+    """
+    rows = selected_rows(plan, params)
+    print(plan['col_defs'])
+    print_rows(rows)
+
+
+def selected_rows(plan, params):
+    """
+    Returns the rows a SELECT plan selects: the rows which match the WHERE
+    clause (or all of them), or the joined (or aggregated) rows of a plan on
+    several tables
+
+    :param plan: The plan (see `plan_select` and `plan_join_select`)
+    :param params: The list of raw parameter values
+    :return: An iterator of tuples of the selected columns
+    """
+    cols_to_select = plan['cols_to_select']
+    if 'sources' in plan:
+        rows = joined_select_rows(plan, params)
+    else:
+        rows = (row for rowid, row in matching_rows(plan['table'], plan_bound_where(plan, params), cols_to_select))
+    return map(column_getter(cols_to_select), rows)
+
+
+def column_getter(cols):
+    """
+    Returns a function which picks columns out of a row
+
+    :param cols: The column numbers
+    :return: The function, which returns a tuple of the columns
+    """
+    if len(cols) == 1:
+        col = cols[0]
+        return lambda row: (row[col],)
+    if not cols:
+        return lambda row: ()
+    return operator.itemgetter(*cols)
+
+
+def print_rows(rows):
+    """
+    Prints rows, timing the printing and counting the rows while .stats is on
+
+    :param rows: An iterable of tuples of the columns to print
+    """
+    if statement_stats is None:
+        for row in rows:
+            print(' | '.join(map(format_value, row)))
+        return
+    clock = time.perf_counter
+    for row in rows:
+        started = clock()
+        print(' | '.join(map(format_value, row)))
+        statement_stats['print_time'] += clock() - started
+        statement_stats['rows_returned'] += 1
+
+
+# join functions
+#
+# A SELECT from several tables joins them from left to right. The rows of a
+# join are the rows of its tables concatenated, so the columns of every table
+# have an offset in them. Each table after the first is joined to the rows
+# so far: an equality between their columns is answered by looking the rows
+# up in an index on the table's column, when the rows so far are few compared
+# to the table, or else by a hash join, which builds a hash table of the
+# smaller input (going by the zone map row counts) and streams the other one;
+# other conditions are answered by a nested loop. A WHERE condition on a
+# single column is applied to the scan of its table.
+
+def plan_join_select(query_string):
+    """
+    Compiles a SELECT command on several tables (or using table aliases,
+    qualified column names, aggregates, GROUP BY, ORDER BY or LIMIT) into a
+    plan, e.g. "* FROM Employee E, Sales S WHERE E.id = S.employeeID" or
+    "E.name, COUNT(*) FROM Employee E LEFT OUTER JOIN Sales S ON E.id =
+    S.employeeID GROUP BY E.name ORDER BY COUNT(*) DESC LIMIT 10"
+
+    :param query_string: the remaining query after the SELECT keyword
+    :return: The plan
+    :raises DatabaseError: if the query is invalid (see `Error`)
+    """
+    try:
+        clauses = SELECT_CLAUSES_REGEX.match(query_string).groups()
+        groups = JOIN_SELECT_REGEX.match(clauses[0]).groups()
+        columns = [col.strip() for col in groups[0].split(',')]
+        sources = parse_from_clause(groups[1])
+
+        plan = new_plan('select', query_string, sources[0]['table'])
+        plan['tables'] = [source['table'] for source in sources]
+        plan['sources'] = sources
+        for k, source in enumerate(sources):
+            if source['on'] is not None:
+                source['on'] = plan_join_condition(sources, k, parse_where_clause(source['on']))
+                if source['on']['right_source'] != k:
+                    raise ValueError('the ON condition of table %s has to use one of its columns' % source['alias'])
+
+        # a WHERE clause comparing the columns of two tables joins them (or
+        # filters the joined rows); one comparing a column with a value is
+        # applied to the scan of the column's table
+        plan['where'] = None
+        plan['row_filter'] = None
+        if groups[2] is not None:
+            where_dict = parse_where_clause(groups[2])
+            k, col = resolve_join_column(sources, where_dict['key'])
+            value_ref = WHERE_REGEX.match(groups[2]).group(3).strip()
+            if '\'' not in value_ref and '"' not in value_ref and join_column_exists(sources, value_ref):
+                condition = plan_join_condition(sources, len(sources) - 1, where_dict)
+                source = sources[condition['right_source']]
+                if source['on'] is None:
+                    source['on'] = condition  # e.g. FROM a x, b y WHERE x.id = y.id
+                else:
+                    plan['row_filter'] = condition
+            else:
+                plan_where(plan, dict(where_dict, key=sources[k]['table']['model'][col]['col_name']),
+                           sources[k]['table'])
+                plan['where_source'] = k
+                # NULL never matches the condition, so the rows a LEFT JOIN
+                # pads with NULLs for the table are left out anyway
+                sources[k]['outer'] = False
+
+        # resolve the selected columns to their tables and column numbers,
+        # and the selected aggregates to their numbers (with a table of None)
+        selected = []
+        aggregates = []
+        for col_ref in columns:
+            if col_ref == '*' or col_ref.endswith('.*'):
+                alias = col_ref[:-2].lower()
+                if alias and alias not in [source['alias'] for source in sources]:
+                    raise ValueError('table %s does not exist' % alias)
+                selected += [(k, col) for k, source in enumerate(sources) if alias in ('', source['alias'])
+                             for col in source['table']['columns']]
+            elif AGGREGATE_REGEX.match(col_ref):
+                selected.append((None, plan_aggregate(sources, aggregates, col_ref)))
+            else:
+                selected.append(resolve_join_column(sources, col_ref))
+        plan['col_defs'] = ' | '.join([aggregates[col]['definition'] if k is None else
+                                       sources[k]['table']['model'][col]['definition'] for k, col in selected])
+        order = []
+        if clauses[3] is not None:
+            for item in clauses[3].split(','):
+                col_ref, direction = ORDER_ITEM_REGEX.match(item.strip()).groups()
+                if AGGREGATE_REGEX.match(col_ref):
+                    order.append(((None, plan_aggregate(sources, aggregates, col_ref)), direction))
+                else:
+                    order.append((resolve_join_column(sources, col_ref), direction))
+        plan['aggregate'] = None
+        if aggregates or clauses[1] is not None or clauses[2] is not None:
+            plan_aggregation(plan, aggregates, clauses[1], clauses[2])
+        plan['cols_to_select'] = [output_column(plan, k, col) for k, col in selected]
+        plan['order'] = [(output_column(plan, k, col), (direction or '').lower() == 'desc')
+                         for (k, col), direction in order]
+        plan['limit'] = None if clauses[4] is None else plan_value(plan, ROW_COUNT, clauses[4])
+        plan['offset'] = None if clauses[5] is None else plan_value(plan, ROW_COUNT, clauses[5])
+
+        # the columns each table has to read
+        needed = [set() for source in sources]
+        for k, col in selected + [ref for ref, direction in order] + [
+                (aggregate['source'], aggregate['col']) for aggregate in aggregates]:
+            if k is not None:
+                needed[k].add(col)
+        if plan['aggregate'] is not None:
+            for k, col in plan['aggregate']['group_by']:
+                needed[k].add(col)
+        for condition in [source['on'] for source in sources] + [plan['row_filter']]:
+            if condition is not None:
+                needed[condition['left_source']].add(condition['left_col'])
+                needed[condition['right_source']].add(condition['right_col'])
+        if plan['where'] is not None:
+            needed[plan['where_source']].add(plan['where']['col'])
+        for source, cols in zip(sources, needed):
+            source['cols'] = sorted(cols)
+
+        plan['execute'] = execute_select
+        return plan
+    except AttributeError:
+        raise ProgrammingError('syntax error')
+    except ValueError as error:
+        raise ProgrammingError(str(error))
+
+
+def parse_from_clause(from_clause):
+    """
+    Parses the FROM clause of a SELECT command on several tables into the
+    list of its tables
+
+    :param from_clause: The FROM clause (e.g. "Employee E LEFT JOIN Sales S ON
+    E.id = S.employeeID")
+    :return: A list of dicts holding the catalog entry ('table'), alias,
+    offset of the columns in the joined rows, whether a LEFT JOIN keeps the
+    rows so far without a match ('outer') and the raw ON condition of each
+    table
+    :raises OperationalError: if a table doesn't exist
+    """
+    parts = JOIN_REGEX.split(from_clause.strip())
+    joins = [(None, None, parts[0])] + [tuple(parts[i:i + 3]) for i in range(1, len(parts), 3)]
+    sources = []
+    offset = 0
+    for comma, join_type, table_ref in joins:
+        on = None
+        if sources and comma is None:
+            table_ref, *on = JOIN_ON_REGEX.split(table_ref, 1)
+            if not on:
+                raise ValueError('JOIN %s needs an ON condition' % table_ref)
+            on = on[0]
+        tbl_name, alias = TABLE_REF_REGEX.match(table_ref).groups()
+        tbl_name = tbl_name.lower()
+        table = catalog_table(tbl_name)
+        if table is None:
+            raise OperationalError('Failed to query table %s because it does not exist.' % tbl_name)
+        alias = (alias or tbl_name).lower()
+        if alias in [source['alias'] for source in sources]:
+            raise ValueError('table %s is used twice without a different alias' % alias)
+        sources.append({
+            'table': table,
+            'alias': alias,
+            'offset': offset,
+            'outer': join_type is not None and join_type.lower().startswith('left'),
+            'on': on
+        })
+        offset += len(table['model'])
+    return sources
+
+
+def resolve_join_column(sources, col_ref):
+    """
+    Resolves a column of a join, either qualified by the alias of its table
+    (e.g. "E.id") or by its name only if just one of the tables has it
+
+    :param sources: The tables of the join (see `parse_from_clause`)
+    :param col_ref: The column reference
+    :return: A (table number, column number) tuple
+    """
+    alias, _, col_name = col_ref.rpartition('.')
+    matches = [(k, source['table']['col_index'][col_name]) for k, source in enumerate(sources)
+               if alias.lower() in ('', source['alias']) and col_name in source['table']['col_index']]
+    if not matches:
+        raise ValueError('column %s does not exist' % col_ref)
+    if len(matches) > 1:
+        raise ValueError('column %s is ambiguous' % col_ref)
+    return matches[0]
+
+
+def join_column_exists(sources, col_ref):
+    """
+    Determines whether a column reference names a column of a join (see
+    `resolve_join_column`)
+    """
+    try:
+        resolve_join_column(sources, col_ref)
+        return True
+    except ValueError:
+        return False
+
+
+def plan_join_condition(sources, k, where_dict):
+    """
+    Compiles a condition comparing the columns of two tables of a join (e.g.
+    the ON condition of a table)
+
+    :param sources: The tables of the join (see `parse_from_clause`)
+    :param k: The number of the last table the condition may use
+    :param where_dict: The parsed condition (see `parse_where_clause`)
+    :return: The condition (dict) comparing the column 'left_col' of an
+    earlier table 'left_source' with the column 'right_col' of the table
+    'right_source'
+    """
+    operator = where_dict['operator'].lower()
+    if operator not in REFLECTED_OPS:
+        raise ValueError('tables can only be joined on a comparison of their columns')
+    left_source, left_col = resolve_join_column(sources[:k + 1], where_dict['key'])
+    right_source, right_col = resolve_join_column(sources[:k + 1], where_dict['value'])
+    test = cond_func(operator)
+    if left_source > right_source:  # compare the earlier table's column with the later one's
+        left_source, left_col, right_source, right_col = right_source, right_col, left_source, left_col
+        test = swap_operands(test)
+    if left_source == right_source:
+        raise ValueError('a join condition has to compare the columns of two tables')
+    return {
+        'left_source': left_source,
+        'left_col': left_col,
+        'right_source': right_source,
+        'right_col': right_col,
+        'operator': operator,
+        'test': test
+    }
+
+
+def swap_operands(test):
+    """
+    Returns a condition function (see `cond_func`) with its operands swapped
+    """
+    return lambda x, y: test(y, x)
+
+
+def plan_aggregate(sources, aggregates, expression):
+    """
+    Compiles an aggregate of a SELECT command (e.g. "COUNT(*)" or
+    "AVG(S.price)"), reusing an identical one compiled before
+
+    :param sources: The tables of the query (see `parse_from_clause`)
+    :param aggregates: The list of the aggregates compiled so far
+    :param expression: The aggregate
+    :return: The number of the aggregate in the list
+    """
+    function, col_ref = AGGREGATE_REGEX.match(expression).groups()
+    function = function.lower()
+    k, col = None, None
+    if col_ref == '*':
+        if function != 'count':
+            raise ValueError('only COUNT can be applied to *')
+        data_type = 'int'
+    else:
+        k, col = resolve_join_column(sources, col_ref)
+        model_col = sources[k]['table']['model'][col]
+        data_type = model_col['definition'].split(' ', 1)[1]  # e.g. 'varchar(20)'
+        if function in ('sum', 'avg') and model_col['cast'] not in (int, float):
+            raise ValueError('%s needs a number column but %s is %s' % (function.upper(), col_ref, data_type))
+        if function == 'count':
+            data_type = 'int'
+        elif function == 'avg':
+            data_type = 'float'
+    aggregate = {
+        'function': function,
+        'source': k,
+        'col': col,
+        'definition': '%s(%s) %s' % (function.upper(), col_ref, data_type),
+        'cast': {'int': int, 'float': float}.get(data_type) or sources[k]['table']['model'][col]['cast']
+    }
+    for n, other in enumerate(aggregates):
+        if other['definition'] == aggregate['definition']:
+            return n
+    aggregates.append(aggregate)
+    return len(aggregates) - 1
+
+
+def plan_aggregation(plan, aggregates, group_by, having):
+    """
+    Compiles the aggregation of a SELECT command. The aggregated rows hold
+    the values of the GROUP BY columns followed by the aggregates.
+
+    :param plan: The plan (see `plan_join_select`)
+    :param aggregates: The aggregates (see `plan_aggregate`)
+    :param group_by: The GROUP BY clause, or None
+    :param having: The HAVING clause, or None
+    """
+    sources = plan['sources']
+    keys = []
+    if group_by is not None:
+        keys = [resolve_join_column(sources, col_ref.strip()) for col_ref in group_by.split(',')]
+    plan['aggregate'] = {'group_by': keys}
+    condition = None
+    if having is not None:
+        having_dict = parse_where_clause(having)
+        if AGGREGATE_REGEX.match(having_dict['key']):
+            k, col = None, plan_aggregate(sources, aggregates, having_dict['key'])
+            model_col = aggregates[col]
+        else:
+            k, col = resolve_join_column(sources, having_dict['key'])
+            model_col = sources[k]['table']['model'][col]
+        operator = having_dict['operator'].lower()
+        if operator not in REFLECTED_OPS:
+            raise ValueError('HAVING only supports comparisons')
+        condition = {
+            'col': output_column(plan, k, col),
+            'model_col': model_col,
+            'test': cond_func(operator),
+            'value': plan_value(plan, model_col, having_dict['value'])
+        }
+    plan['aggregate'].update({
+        'keys': [sources[k]['offset'] + col for k, col in keys],
+        'inputs': [None if aggregate['source'] is None else sources[aggregate['source']]['offset'] + aggregate['col']
+                   for aggregate in aggregates],
+        'functions': [aggregate['function'] for aggregate in aggregates],
+        'having': condition
+    })
+
+
+def output_column(plan, k, col):
+    """
+    Finds a column (or aggregate) in the rows a SELECT plan outputs: the
+    joined rows, or the aggregated rows if the plan aggregates (see
+    `plan_aggregation`)
+
+    :param plan: The plan (see `plan_join_select`)
+    :param k: The table number of the column, or None for an aggregate
+    :param col: The column number, or the number of the aggregate
+    :return: The column number in the output rows
+    """
+    sources, aggregate = plan['sources'], plan['aggregate']
+    if aggregate is None:
+        return sources[k]['offset'] + col
+    keys = aggregate['group_by']
+    if k is None:
+        return len(keys) + col
+    if (k, col) not in keys:
+        raise ValueError('column %s.%s has to be grouped by or used in an aggregate'
+                         % (sources[k]['alias'], sources[k]['table']['model'][col]['col_name']))
+    return keys.index((k, col))
+
+
+def joined_select_rows(plan, params):
+    """
+    Returns the joined (or aggregated) rows of a SELECT plan on several
+    tables (see `plan_join_select`), sorted and paged
+
+    :param plan: The plan (see `plan_join_select`)
+    :param params: The list of raw parameter values
+    :return: An iterator of the rows
+    """
+    limit = None if plan['limit'] is None else bind_value(ROW_COUNT, plan['limit'], params)
+    offset = 0 if plan['offset'] is None else bind_value(ROW_COUNT, plan['offset'], params)
+    if offset < 0 or limit is not None and limit < 0:
+        raise ValueError('LIMIT and OFFSET can\'t be negative')
+    stop = None if limit is None else offset + limit
+    rows = joined_rows(plan, params)
+    if plan['aggregate'] is not None:
+        rows = aggregate_rows(plan, rows, params)
+    if plan['order']:
+        rows = sort_rows(rows, plan['order'], stop)
+    if offset or stop is not None:
+        rows = itertools.islice(rows, offset, stop)  # stops reading the rows after the last one
+    return rows
+
+
+def sort_rows(rows, order, count=None):
+    """
+    Sorts rows by the columns of an ORDER BY clause (NULLs first, or last
+    when descending). If only the first `count` rows are needed and they fit
+    in memory, they are found with a heap; otherwise the rows are sorted in
+    runs of `memory_rows` rows, which are written to temporary files and
+    merged.
+
+    :param rows: An iterable of rows
+    :param order: A list of (column number, descending) tuples
+    :param count: The number of rows needed, or None for all of them
+    :return: An iterable of the sorted rows
+    """
+    reverse = all(descending for col, descending in order)
+    key = sort_key(order, reverse)
+    if count is not None and count <= memory_rows:
+        return (heapq.nlargest if reverse else heapq.nsmallest)(count, rows, key=key)
+    return external_sort(rows, key, reverse)
+
+
+def sort_key(order, reverse):
+    """
+    Compiles the sort key function of an ORDER BY clause
+
+    :param order: A list of (column number, descending) tuples
+    :param reverse: Whether the rows are sorted in reverse (so the columns
+    sorted in descending order are compared as they are)
+    :return: The key function of a row
+    """
+    if len(order) == 1:
+        col = order[0][0]
+        return lambda row: (row[col] is not None, row[col])
+    cols = [(col, descending != reverse) for col, descending in order]
+    return lambda row: tuple([Descending((row[col] is not None, row[col])) if flip else (row[col] is not None, row[col])
+                              for col, flip in cols])
+
+
+class Descending:
+    """
+    Wraps a sort key so that it sorts in descending order
+    """
+    __slots__ = ('key',)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        return other.key < self.key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+
+def external_sort(rows, key, reverse):
+    """
+    Sorts rows which may not fit in memory: runs of `memory_rows` rows are
+    sorted and written to temporary files, then merged
+
+    :param rows: An iterable of rows (of types marshal can serialize)
+    :param key: The sort key function (see `sort_key`)
+    :param reverse: Whether to sort in descending order
+    :return: A generator of the sorted rows
+    """
+    rows = iter(rows)
+    runs = []
+    try:
+        while True:
+            run = list(itertools.islice(rows, memory_rows))
+            run.sort(key=key, reverse=reverse)
+            if not runs and len(run) < memory_rows:  # everything fits in memory
+                yield from run
+                return
+            if not run:
+                break
+            run_file = tempfile.TemporaryFile()
+            runs.append(run_file)
+            for start in range(0, len(run), SPILL_BATCH):
+                spill_records(run_file, run[start:start + SPILL_BATCH])
+            run = None
+        for run_file in runs:
+            run_file.seek(0)
+        yield from heapq.merge(*[spilled_records(run_file) for run_file in runs], key=key, reverse=reverse)
+    finally:
+        for run_file in runs:
+            run_file.close()
+
+
+def joined_rows(plan, params):
+    """
+    Joins the tables of a SELECT plan (see `plan_join_select`)
+
+    :param plan: The plan
+    :param params: The list of raw parameter values
+    :return: A generator of the joined rows
+    """
+    sources = plan['sources']
+    where = plan_bound_where(plan, params)
+    wheres = [where if plan['where'] is not None and k == plan['where_source'] else None
+              for k in range(len(sources))]
+
+    rows = (row for rowid, row in matching_rows(sources[0]['table'], wheres[0], sources[0]['cols']))
+    estimate = estimate_rows(sources[0]['table'], wheres[0])
+    for k in range(1, len(sources)):
+        rows, estimate = join_rows(sources, k, rows, estimate, wheres[k])
+    row_filter = plan['row_filter']
+    for row in rows:
+        if row_filter is not None:
+            lhs = row[sources[row_filter['left_source']]['offset'] + row_filter['left_col']]
+            rhs = row[sources[row_filter['right_source']]['offset'] + row_filter['right_col']]
+            if lhs is None or rhs is None or not row_filter['test'](lhs, rhs):
+                continue
+        yield row
+
+
+def aggregate_rows(plan, rows, params):
+    """
+    Aggregates the joined rows of a SELECT plan (see `plan_aggregation`)
+
+    :param plan: The plan
+    :param rows: An iterable of the joined rows
+    :param params: The list of raw parameter values
+    :return: A generator of the aggregated rows which match the HAVING
+    condition
+    """
+    aggregate = plan['aggregate']
+    keys, inputs, functions = aggregate['keys'], aggregate['inputs'], aggregate['functions']
+    groups = None
+    count = zone_map_count(plan)
+    if count is not None:
+        groups = [((), [count] * len(functions))]
+    if groups is None:
+        groups = hash_aggregate(((tuple([row[i] for i in keys]), [True if i is None else row[i] for i in inputs])
+                                 for row in rows), functions)
+        if not keys:  # the aggregates of no rows at all are still one row
+            groups = itertools.chain(groups, [((), [AGGREGATE_FUNCS[function][0] for function in functions])])
+            groups = itertools.islice(groups, 1)
+
+    having = aggregate['having']
+    if having is not None:
+        value = bind_value(having['model_col'], having['value'], params)
+    finals = [AGGREGATE_FUNCS[function][2] for function in functions]
+    for key, states in groups:
+        row = list(key) + [state if final is None else final(state) for final, state in zip(finals, states)]
+        if having is not None:
+            lhs = row[having['col']]
+            if lhs is None or not having['test'](lhs, value):
+                continue
+        yield row
+
+
+def zone_map_count(plan):
+    """
+    Answers an aggregation which only counts all of the rows of a table (e.g.
+    COUNT(*) without GROUP BY or WHERE) from the table's zone map
+
+    :param plan: The SELECT plan (see `plan_aggregation`)
+    :return: The number of rows, or None if they have to be counted
+    """
+    aggregate = plan['aggregate']
+    if aggregate['keys'] or len(plan['sources']) > 1 or plan['where'] is not None or any(
+            i is not None for i in aggregate['inputs']):
+        return None
+    return table_row_count(plan['table'])
+
+
+def hash_aggregate(pairs, functions, depth=0):
+    """
+    Aggregates rows by hashing: the states of the aggregates of each group
+    are kept in a dict keyed by the group's values. Once `memory_rows`
+    groups are kept, the rows of new groups are spilled to one of
+    AGGREGATE_PARTITIONS temporary files by the hash of their key, and each
+    file is aggregated the same way afterwards.
+
+    :param pairs: An iterable of (group key, aggregate inputs) tuples, with
+    an input of True for COUNT(*)
+    :param functions: The names of the aggregate functions
+    :param depth: The number of times the rows were spilled already
+    :return: A generator of (group key, aggregate states) tuples
+    """
+    initial = [AGGREGATE_FUNCS[function][0] for function in functions]
+    steps = [AGGREGATE_FUNCS[function][1] for function in functions]
+    groups = {}
+    partitions = None
+    for key, values in pairs:
+        states = groups.get(key)
+        if states is None:
+            if len(groups) >= memory_rows and depth < AGGREGATE_MAX_DEPTH:
+                if partitions is None:
+                    partitions = [(tempfile.TemporaryFile(), []) for n in range(AGGREGATE_PARTITIONS)]
+                spill_file, spilled = partitions[hash((depth, key)) % AGGREGATE_PARTITIONS]
+                spilled.append((key, values))
+                if len(spilled) >= SPILL_BATCH:
+                    spill_records(spill_file, spilled)
+                continue
+            states = groups[key] = list(initial)
+        for n, value in enumerate(values):
+            if value is not None:  # NULLs are left out of aggregates
+                states[n] = steps[n](states[n], value)
+    yield from groups.items()
+    groups = None
+    for spill_file, spilled in partitions or ():
+        try:
+            spill_records(spill_file, spilled)
+            spill_file.seek(0)
+            yield from hash_aggregate(spilled_records(spill_file), functions, depth + 1)
+        finally:
+            spill_file.close()
+
+
+def spill_records(spill_file, records):
+    """
+    Appends a batch of records to a temporary file and empties the batch
+
+    :param spill_file: The temporary file
+    :param records: The list of records (of types marshal can serialize)
+    """
+    if records:
+        marshal.dump(records, spill_file)
+        records.clear()
+
+
+def spilled_records(spill_file):
+    """
+    Reads the records spilled to a temporary file back (see `spill_records`)
+
+    :param spill_file: The temporary file (read from its current position)
+    :return: A generator of the records
+    """
+    while True:
+        try:
+            yield from marshal.load(spill_file)
+        except EOFError:
+            return
+
+
+def table_row_count(table):
+    """
+    Counts the rows of a table from the row counts of its zone map, which
+    every write keeps up to date, and the rows logged for it
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :return: The number of rows, or None if the table has no zone map or
+    the open transaction wrote to it
+    """
+    if transaction is not None and table['path'] in transaction['tables']:
+        return None
+    zones = read_zone_map(table['path'])
+    if zones is None:
+        return None
+    writes = logged_writes(table)
+    logged = len(writes['inserts']) - len(writes['deleted']) if writes is not None else 0
+    return sum(zone[0] for zone in zones.values()) + logged
+
+
+def estimate_rows(table, where):
+    """
+    Estimates the number of rows of a table matching a (bound) WHERE
+    condition from the row counts of the blocks of its zone map which can
+    hold matching rows, assuming the rows logged for the table match as
+    often as the stored ones
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    :return: The estimated number of rows (infinite if the table has no zone
+    map)
+    """
+    zones = read_zone_map(table['path'])
+    if zones is None:
+        return float('inf')
+    blocks = zone_blocks(table, where)
+    total = sum(zone[0] for zone in zones.values())
+    if blocks is None:
+        estimate = total
+    else:
+        estimate = sum(zones[block][0] * zone_fraction(zones[block], where) for block in blocks)
+    writes = logged_writes(table)
+    if writes is not None:
+        estimate += len(writes['inserts']) * (estimate / total if total else 1)
+    return estimate
+
+
+def zone_fraction(zone, where):
+    """
+    Estimates the fraction of the rows of a block of a zone map which match
+    a range condition on a number column, assuming the values are spread
+    evenly between the smallest and largest value of the block
+
+    :param zone: The statistics of the block (see `read_zone_map`)
+    :param where: The bound WHERE condition (see `bind_condition`)
+    :return: The fraction (1 if it can't be estimated)
+    """
+    col = where['col']
+    if col >= len(zone[1]) or where['key_range'] is None or where['operator'] == '=':
+        return 1
+    low, high = zone[1][col], zone[2][col]
+    lo, hi = where['key_range'][0], where['key_range'][2]  # None leaves a side of the range open
+    lo = low if lo is None else lo
+    hi = high if hi is None else hi
+    if not all(isinstance(bound, (int, float)) for bound in (low, high, lo, hi)) or high == low:
+        return 1  # NULL or non-number bounds
+    return max(min(high, hi) - max(low, lo), 0) / (high - low)
+
+
+def join_rows(sources, k, rows, estimate, where):
+    """
+    Joins a table of a join to the joined rows of the tables before it,
+    choosing the join algorithm (see the comment on the join functions)
+
+    :param sources: The tables of the join (see `parse_from_clause`)
+    :param k: The number of the table to join
+    :param rows: An iterator of the joined rows of the tables before it
+    :param estimate: The estimated number of those rows
+    :param where: The bound WHERE condition on the table, or None
+    :return: An (iterator of joined rows, estimated number of rows) tuple
+    """
+    source = sources[k]
+    table, condition, outer = source['table'], source['on'], source['outer']
+    pad = [None] * len(table['model'])  # the columns of the table when a LEFT JOIN finds no match
+    method, index, estimate = join_method(sources, k, estimate, estimate_rows(table, where))
+    if condition is None:  # every combination of rows
+        right = (row for rowid, row in matching_rows(table, where, source['cols']))
+        return nested_loop_join(rows, right, None, None, None, False, pad), estimate
+
+    left_col = sources[condition['left_source']]['offset'] + condition['left_col']
+    right_col = condition['right_col']
+    if method == 'index':
+        return index_join(rows, source, index, where, left_col, outer, pad), estimate
+    right = (row for rowid, row in matching_rows(table, where, source['cols']))
+    if method == 'hash left':
+        return hash_join_left(rows, right, left_col, right_col), estimate
+    if method == 'hash':
+        return hash_join(rows, right, left_col, right_col, outer, pad), estimate
+    return nested_loop_join(rows, right, left_col, right_col, condition['test'], outer, pad), estimate
+
+
+def join_method(sources, k, estimate, table_estimate):
+    """
+    Chooses the algorithm which joins a table of a join to the joined rows of
+    the tables before it (see the comment on the join functions)
+
+    :param sources: The tables of the join (see `parse_from_clause`)
+    :param k: The number of the table to join
+    :param estimate: The estimated number of the joined rows so far
+    :param table_estimate: The estimated number of rows of the table
+    :return: A (method, index, estimated number of joined rows) tuple, the
+    method being 'index', 'hash' (a hash table of the table's rows), 'hash
+    left' (a hash table of the rows so far) or 'nested loop', and the index
+    the one an index join looks the rows up in
+    """
+    source = sources[k]
+    condition = source['on']
+    if condition is None:
+        return 'nested loop', None, estimate * table_estimate
+    if condition['operator'] != '=':
+        return 'nested loop', None, estimate
+    index = join_index(sources, condition)
+    if index is not None and estimate * INDEX_JOIN_RATIO <= table_estimate:
+        return 'index', index, estimate
+    if estimate < table_estimate and not source['outer']:
+        return 'hash left', None, table_estimate
+    return 'hash', None, max(estimate, table_estimate)
+
+
+def join_index(sources, condition):
+    """
+    Finds an index an equality join condition can look the rows of its
+    (right) table up in: one on the table's column, if the column's values
+    are of the same type as the ones looked up and the open transaction
+    didn't write to the table (the rows logged for it are matched by
+    `index_join`)
+
+    :param sources: The tables of the join (see `parse_from_clause`)
+    :param condition: The join condition (see `plan_join_condition`)
+    :return: The index (dict, see `table_indexes`), or None
+    """
+    table = sources[condition['right_source']]['table']
+    left_model = sources[condition['left_source']]['table']['model']
+    col = table['model'][condition['right_col']]
+    if left_model[condition['left_col']]['cast'] is not col['cast']:
+        return None
+    if transaction is not None and table['path'] in transaction['tables']:
+        return None
+    for index in table['indexes']:
+        if index['col_name'] == col['col_name']:
+            return index
+    return None
+
+
+def hash_join(left, right, left_col, right_col, outer, pad):
+    """
+    Joins two inputs on the equality of a column of each by building a hash
+    table of the right one and streaming the left one through it
+
+    :param left: An iterable of the left rows
+    :param right: An iterable of the right rows (the build side)
+    :param left_col: The column number of the left rows
+    :param right_col: The column number of the right rows
+    :param outer: Whether left rows without a match are joined to `pad`
+    :param pad: The right row of NULLs of a LEFT JOIN
+    :return: A generator of joined rows in the order of the left rows
+    """
+    buckets = {}
+    for row in right:
+        key = row[right_col]
+        if key is not None:  # NULL never matches
+            buckets.setdefault(key, []).append(row)
+    for row in left:
+        matches = buckets.get(row[left_col])
+        if matches is not None:
+            for match in matches:
+                yield row + match
+        elif outer:
+            yield row + pad
+
+
+def hash_join_left(left, right, left_col, right_col):
+    """
+    Joins two inputs on the equality of a column of each by building a hash
+    table of the left one and streaming the right one through it (see
+    `hash_join`). Only inner joins are built this way.
+
+    :return: A generator of joined rows in the order of the right rows
+    """
+    buckets = {}
+    for row in left:
+        key = row[left_col]
+        if key is not None:
+            buckets.setdefault(key, []).append(row)
+    for row in right:
+        for match in buckets.get(row[right_col], ()):
+            yield match + row
+
+
+def index_join(left, source, index, where, left_col, outer, pad):
+    """
+    Joins the rows so far to a table by looking up the matching rows in an
+    index on the table's join column, a batch of INDEX_JOIN_BATCH rows at a
+    time so the table is read once per batch in row id order. The stored
+    rows which writes logged for the table changed or deleted are left out,
+    and the logged versions of changed and inserted rows are matched by key.
+
+    :param left: An iterable of the rows so far
+    :param source: The table to join (see `parse_from_clause`)
+    :param index: The index on its join column (see `join_index`)
+    :param where: The bound WHERE condition on the table, or None
+    :param left_col: The column number of the rows so far to look up
+    :param outer: Whether rows without a match are joined to `pad`
+    :param pad: The right row of NULLs of a LEFT JOIN
+    :return: A generator of joined rows in the order of the rows so far
+    """
+    table = source['table']
+    writes = logged_writes(table)
+    replaced = set()  # the row ids of the stored rows the log changed or deleted
+    logged = {}  # key => the logged rows
+    if writes is not None:
+        col = table['col_index'][index['col_name']]
+        replaced = set(writes['changes']) | writes['deleted']
+        for rowid, row in itertools.chain(sorted(writes['changes'].items()), writes['inserts'].items()):
+            if row[col] is not None:
+                logged.setdefault(row[col], []).append(row)
+    tree = BTree(index['path'])
+    try:
+        left = iter(left)
+        while True:
+            batch = list(itertools.islice(left, INDEX_JOIN_BATCH))
+            if not batch:
+                return
+            rowids = {}  # key => row ids of the matching rows
+            for row in batch:
+                key = row[left_col]
+                if key is not None and key not in rowids:
+                    rowids[key] = list(tree.range(key, True, key, True))
+            fetched = table['engine']['fetch'](table['path'], table['model'], sorted(set(
+                itertools.chain.from_iterable(rowids.values())) - replaced), source['cols'])
+            fetched = dict(fetched if statement_stats is None else timed_rows(fetched))
+            for row in batch:
+                matched = False
+                key = row[left_col]
+                for match in itertools.chain((fetched.get(rowid) for rowid in rowids.get(key, ())),
+                                             logged.get(key, ())):
+                    if match is not None and (where is None or where['predicate'](match)):
+                        matched = True
+                        yield row + match
+                if outer and not matched:
+                    yield row + pad
+    finally:
+        tree.close()
+
+
+def nested_loop_join(left, right, left_col, right_col, test, outer, pad):
+    """
+    Joins two inputs by comparing every left row with every right row, for
+    join conditions other than equalities (or tables without any)
+
+    :param left: An iterable of the left rows
+    :param right: An iterable of the right rows, which are kept in memory
+    :param left_col: The column number of the left rows
+    :param right_col: The column number of the right rows
+    :param test: The comparison of the two columns (see `cond_func`), or None
+    to join every pair of rows
+    :param outer: Whether left rows without a match are joined to `pad`
+    :param pad: The right row of NULLs of a LEFT JOIN
+    :return: A generator of joined rows in the order of the left rows
+    """
+    right = list(right)
+    for row in left:
+        matched = False
+        key = None if test is None else row[left_col]
+        for match in right:
+            if test is None or key is not None and match[right_col] is not None and test(key, match[right_col]):
+                matched = True
+                yield row + match
+        if outer and not matched:
+            yield row + pad
+
+
+def insert(query_string):
+    """
+    Initiates an INSERT command
+
+    query_string -- the remaining query after the INSERT keyword
+    """
+    execute_plan(plan_insert(query_string))
+
+
+def parse_value_lists(values_str):
+    """
+    Splits the VALUES clause of an INSERT command into its value lists (e.g.
+    "(1, 'Gizmo'), (2, 'Widget')" into "1, 'Gizmo'" and "2, 'Widget'")
+
+    :param values_str: The VALUES clause
+    :return: The list of value lists, or None if the clause is malformed
+    """
+    value_lists = []
+    pos = 0
+    while True:
+        match = VALUE_LIST_REGEX.match(values_str, pos)
+        if match is None:
+            return None
+        value_lists.append(match.group(1))
+        pos = match.end()
+        if not match.group(2):  # no ',' after the list, so it was the last one
+            return value_lists
+
+
+def parse_value_list(values_str):
+    """
+    Parses a comma-delimited list of values (e.g. "1, 'Gizmo', 19.99")
+
+    :param values_str: The list of values
+    :return: The list of raw values
+    """
+    # split on the ',' outside of quotes and strip the quotes around values
+    values_lst = []
+    pos = 0
+    while True:
+        match = VALUE_REGEX.match(values_str, pos)
+        values_lst.append(unquote(match.group(1).strip()))  # strip surrounding whitespace
+        pos = match.end()
+        if not match.group(2):  # no ',' after the value, so it was the last one
+            return values_lst
+
+
+def plan_insert(query_string):
+    """
+    Compiles an INSERT command into a plan
+
+    :param query_string: the remaining query after the INSERT keyword
+    :return: The plan
+    :raises DatabaseError: if the query is invalid (see `Error`)
+    """
+    match = INSERT_REGEX.match(query_string)
+    if match is None:
+        raise ProgrammingError('syntax error')
+    groups = match.groups()
+    tbl_name = groups[0].lower()
+    value_lists = parse_value_lists(groups[1])
+    if value_lists is None:
+        raise ProgrammingError('syntax error')
+
+    table = catalog_table(tbl_name)
+    if table is None:
+        raise OperationalError('Failed to query table %s because it does not exist.' % tbl_name)
+
+    # The table model determines the data types to cast the values to
+    model = table['model']
+    columns = table['columns']
+    plan = new_plan('insert', query_string, table)
+    plan['rows'] = []
+    for values_str in value_lists:
+        values_lst = parse_value_list(values_str)
+        if len(values_lst) != len(columns):
+            raise OperationalError('Failed to insert into table %s because it has %i columns but %i values were supplied.'
+                                   % (tbl_name, len(columns), len(values_lst)))
+        try:
+            slots = [(False, None)] * len(model)  # dropped columns are stored as NULL
+            for i, value in zip(columns, values_lst):
+                slots[i] = plan_value(plan, model[i], value)
+            plan['rows'].append(slots)
+        except ValueError as error:
+            raise ProgrammingError(str(error))
+    plan['execute'] = execute_insert
+    return plan
+
+
+def execute_insert(plan, params):
+    """
+    Executes an INSERT plan
+
+    :param plan: The plan (see `plan_insert`)
+    :param params: The list of raw parameter values
+    :return: The number of rows inserted
+    """
+    return execute_insert_many(plan, [params])
+
+
+def execute_insert_many(plan, param_sets):
+    """
+    Executes an INSERT plan with each of several lists of parameter values,
+    inserting all of their rows at once
+
+    :param plan: The plan (see `plan_insert`)
+    :param param_sets: The lists of raw parameter values
+    :return: The number of rows inserted
+    """
+    table = plan['table']
+    rows = []
+    for params in param_sets:
+        for values in plan['rows']:
+            row = [bind_value(col, slot, params) for col, slot in zip(table['model'], values)]
+            check_row(table, row)
+            rows.append(row)
+    if transaction is not None:
+        transaction_insert(table, rows)
+    else:
+        wal_commit([(table, rows, {}, ())])  # the rows are applied to the table at the next checkpoint
+    if len(rows) == 1:
+        report('1 new record inserted.')
+    else:
+        report('%i new records inserted.' % len(rows))
+    return len(rows)
+
+
+def update(query_string):
+    """
+    Initiates an UPDATE command
+
+    query_string -- the remaining query after the UPDATE keyword
+    """
+    execute_plan(plan_update(query_string))
+
+
+def plan_update(query_string):
+    """
+    Compiles an UPDATE command into a plan
+
+    :param query_string: the remaining query after the UPDATE keyword
+    :return: The plan
+    :raises DatabaseError: if the query is invalid (see `Error`)
+    """
+    match = UPDATE_REGEX.match(query_string)
+    if match is None:
+        raise ProgrammingError('syntax error')
+    groups = match.groups()
+    tbl_name = groups[0].lower()
+    set_dicts = parse_kv_pair_str(groups[1])
+    where_dict = parse_where_clause(groups[2])
+
+    table = catalog_table(tbl_name)
+    if table is None:
+        raise OperationalError('Failed to query table %s because it does not exist.' % tbl_name)
+
+    plan = new_plan('update', query_string, table)
+    try:
+        # Using the key/value pairs given in the SET clause, find the column
+        # numbers they correspond to and cast the values to their data types
+        plan['sets'] = []
+        for set_dict in set_dicts:
+            col = table['col_index'].get(set_dict['key'])
+            if col is None:
+                raise OperationalError('Failed to update table %s because column %s does not exist.' % (tbl_name, set_dict['key']))
+            plan['sets'].append((col, plan_value(plan, table['model'][col], set_dict['value'])))
+
+        if not plan_where(plan, where_dict):
+            raise OperationalError('Failed to update table %s because column %s does not exist.' % (tbl_name, where_dict['key']))
+    except ValueError as error:
+        raise ProgrammingError(str(error))
+    plan['execute'] = execute_update
+    return plan
+
+
+def execute_update(plan, params):
+    """
+    Executes an UPDATE plan
+
+    :param plan: The plan (see `plan_update`)
+    :param params: The list of raw parameter values
+    :return: The number of rows modified
+    """
+    table = plan['table']
+    model = table['model']
+    sets = [(col, bind_value(model[col], slot, params)) for col, slot in plan['sets']]
+
+    # Update the rows which match the WHERE clause and columns defined by
+    # SET clause of the query.
+    changes = {}
+    old_rows = {}
+    for rowid, row in matching_rows(table, plan_bound_where(plan, params)):
+        old_rows[rowid] = row.copy()
+        for col, value in sets:
+            row[col] = value
+        check_row(table, row)
+        changes[rowid] = row
+
+    if changes and transaction is not None:
+        transaction_update(table, changes, old_rows)
+    elif changes:
+        wal_commit([(table, [], changes, ())])
+    report('%i records modified.' % len(changes))
+    return len(changes)
+
+
+def update_rows(table, changes, old_rows):
+    """
+    Replaces rows of a table and brings its indexes up to date
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param changes: A dict mapping row ids to their new rows
+    :param old_rows: A dict mapping row ids to their old rows
+    """
+    relocated = table['engine']['update'](table['path'], table['model'], changes)
+    if relocated is None:  # the row ids were reassigned
+        rebuild_indexes(table)
+    else:
+        maintain_indexes(table, [
+            (rowid, old_rows[rowid], relocated.get(rowid, rowid), row)
+            for rowid, row in changes.items()
+        ])
+
+
+def delete(query_string):
+    """
+    Initiates a DELETE command
+
+    :param query_string: the remaining query after the DELETE keyword
+    """
+    execute_plan(plan_delete(query_string))
+
+
+def plan_delete(query_string):
+    """
+    Compiles a DELETE command into a plan
+
+    :param query_string: the remaining query after the DELETE keyword
+    :return: The plan
+    :raises DatabaseError: if the query is invalid (see `Error`)
+    """
+    match = DELETE_REGEX.match(query_string)
+    if match is None:
+        raise ProgrammingError('syntax error')
+    groups = match.groups()
+    tbl_name = groups[0].lower()
+    where_dict = parse_where_clause(groups[1])
+
+    table = catalog_table(tbl_name)
+    if table is None:
+        raise OperationalError('Failed to query table %s because it does not exist.' % tbl_name)
+
+    plan = new_plan('delete', query_string, table)
+    try:
+        # Using the key from the key/operator/value group from the WHERE clause
+        # of the query, find the column it relates to and compile the condition
+        if not plan_where(plan, where_dict):
+            raise OperationalError('Failed to delete from table %s because column %s does not exist.'
+                                   % (tbl_name, where_dict['key']))
+    except ValueError as error:
+        raise ProgrammingError(str(error))
+    plan['execute'] = execute_delete
+    return plan
+
+
+def execute_delete(plan, params):
+    """
+    Executes a DELETE plan
+
+    :param plan: The plan (see `plan_delete`)
+    :param params: The list of raw parameter values
+    :return: The number of rows deleted
+    """
+    table = plan['table']
+
+    # Collect the rows which meet the WHERE condition
+    deleted = dict(matching_rows(table, plan_bound_where(plan, params)))
+
+    if deleted and transaction is not None:
+        transaction_delete(table, deleted)
+    elif deleted:
+        wal_commit([(table, [], {}, deleted)])
+    report('%i records deleted.' % len(deleted))
+    return len(deleted)
+
+
+def delete_rows(table, deleted):
+    """
+    Deletes rows of a table and brings its indexes up to date
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param deleted: A dict mapping the row ids of the rows to delete to the
+    rows
+    """
+    relocated = table['engine']['delete'](table['path'], table['model'], set(deleted))
+    if relocated is None:  # the row ids were reassigned
+        rebuild_indexes(table)
+    else:
+        maintain_indexes(table, [
+            (rowid, row, None, None) for rowid, row in deleted.items()
+        ])
+
+
+def prepare(query_string):
+    """
+    Initiates a PREPARE command, which compiles a SELECT, INSERT, UPDATE or
+    DELETE command (with `?` parameters) once for repeated execution
+
+    query_string -- the remaining query after the PREPARE keyword (e.g.
+    "name AS SELECT * FROM t WHERE pid = ?")
+    """
+    match = PREPARE_REGEX.match(query_string)
+    if match is None:
+        raise ProgrammingError('syntax error')
+    name, action, statement = match.groups()
+    prepared_statements[name.lower()] = plan_compilers[action.lower()](statement)
+    report('Statement %s prepared.' % name.lower())
+
+
+def execute(query_string):
+    """
+    Initiates an EXECUTE command, which runs a prepared statement
+
+    query_string -- the remaining query after the EXECUTE keyword (e.g.
+    "name (3, 'Gizmo')")
+    """
+    match = EXECUTE_REGEX.match(query_string)
+    if match is None:
+        raise ProgrammingError('syntax error')
+    name = match.group(1).lower()
+    params = parse_value_list(match.group(3)) if match.group(3) is not None else []
+    if params == ['']:  # "name ()"
+        params = []
+    plan = prepared_statements.get(name)
+    if plan is None:
+        raise OperationalError('Failed to execute statement %s because it does not exist.' % name)
+    prepared_statements[name] = execute_plan(plan, params)
+
+
+def deallocate(query_string):
+    """
+    Initiates a DEALLOCATE command, which removes a prepared statement
+
+    query_string -- the remaining query after the DEALLOCATE keyword
+    """
+    name = query_string.strip().lower()
+    if prepared_statements.pop(name, None) is not None:
+        report('Statement %s deallocated.' % name)
+    else:
+        raise OperationalError('Failed to deallocate statement %s because it does not exist.' % name)
+
+
+def explain(query_string):
+    """
+    Initiates an EXPLAIN command, which prints how a SELECT, INSERT, UPDATE
+    or DELETE command would be executed (see `explain_plan`) without running
+    it
+
+    query_string -- the remaining query after the EXPLAIN keyword
+    """
+    match = QUERY_COMMAND_REGEX.match(query_string)
+    action = match.group(1).lower() if match is not None and match.group(1) is not None else None
+    if action not in plan_compilers:
+        raise ProgrammingError('EXPLAIN needs a SELECT, INSERT, UPDATE or DELETE command')
+    plan = plan_compilers[action](match.group(2))
+    if plan['param_count']:
+        raise ProgrammingError('parameters (%s) can only be used in prepared statements' % PARAMETER)
+    wal_read(active_database)
+    try:
+        for line in explain_plan(plan):
+            report(line)
+    except ValueError as error:
+        raise ProgrammingError(str(error))
+
+
+def explain_plan(plan):
+    """
+    Describes how a plan would be executed: how each table is read (see
+    `explain_read`), how the tables of a join are joined, and how the rows
+    are aggregated, sorted and paged
+
+    :param plan: The plan (without parameters)
+    :return: The list of lines of the description
+    """
+    table = plan['table']
+    if plan['action'] == 'insert':
+        target = 'the write-ahead log' if transaction is None else 'the open transaction'
+        count = len(plan['rows'])
+        return ['INSERT INTO %s (%i row%s, into %s)' % (table['name'], count, '' if count == 1 else 's', target)]
+    where = plan_bound_where(plan, ())
+    if plan['action'] == 'update':
+        return [explain_read(table, table['name'], where), 'UPDATE %s' % table['name']]
+    if plan['action'] == 'delete':
+        return [explain_read(table, table['name'], where), 'DELETE FROM %s' % table['name']]
+    if 'sources' not in plan:
+        return [explain_read(table, table['name'], where)]
+
+    sources = plan['sources']
+    names = [source['table']['name'] if source['alias'] == source['table']['name'] else
+             '%s AS %s' % (source['table']['name'], source['alias']) for source in sources]
+    column_ref = lambda k, col: '%s.%s' % (sources[k]['alias'], sources[k]['table']['model'][col]['col_name'])
+    condition_ref = lambda condition: '%s %s %s' % (
+        column_ref(condition['left_source'], condition['left_col']), condition['operator'].upper(),
+        column_ref(condition['right_source'], condition['right_col']))
+    lines = []
+    aggregate = plan['aggregate']
+    count = None if aggregate is None else zone_map_count(plan)
+    if count is not None:
+        lines.append('COUNT ROWS OF %s FROM ITS ZONE MAP' % names[0])
+    else:
+        wheres = [where if plan['where'] is not None and k == plan['where_source'] else None
+                  for k in range(len(sources))]
+        lines.append(explain_read(sources[0]['table'], names[0], wheres[0]))
+        estimate = estimate_rows(sources[0]['table'], wheres[0])
+        for k in range(1, len(sources)):
+            source = sources[k]
+            method, index, estimate = join_method(sources, k, estimate, estimate_rows(source['table'], wheres[k]))
+            line = '%s JOIN %s' % ({'index': 'INDEX', 'hash': 'HASH', 'hash left': 'HASH',
+                                    'nested loop': 'NESTED LOOP'}[method], names[k])
+            if source['outer']:
+                line = 'LEFT ' + line
+            if source['on'] is not None:
+                line += ' ON %s' % condition_ref(source['on'])
+            if method == 'index':
+                lines.append('%s USING INDEX %s' % (line, index['name']))
+                continue
+            if method == 'hash':
+                line += ' (hash table of %s)' % source['alias']
+            elif method == 'hash left':
+                line += ' (hash table of the rows so far)'
+            lines += [line, '  ' + explain_read(source['table'], names[k], wheres[k])]
+        if plan['row_filter'] is not None:
+            lines.append('FILTER %s' % condition_ref(plan['row_filter']))
+        if aggregate is not None:
+            keys = [column_ref(k, col) for k, col in aggregate['group_by']]
+            lines.append('HASH AGGREGATE BY %s' % ', '.join(keys) if keys else 'AGGREGATE')
+    if aggregate is not None and aggregate['having'] is not None:
+        lines.append('FILTER HAVING')
+
+    limit = None if plan['limit'] is None else bind_value(ROW_COUNT, plan['limit'], ())
+    offset = 0 if plan['offset'] is None else bind_value(ROW_COUNT, plan['offset'], ())
+    stop = None if limit is None else offset + limit
+    if plan['order']:
+        if stop is not None and stop <= memory_rows:
+            lines.append('SORT (top %i rows in a heap)' % stop)
+        else:
+            lines.append('SORT (in runs of %i rows merged from temporary files)' % memory_rows)
+    if limit is not None:
+        lines.append('LIMIT %i' % limit)
+    if offset:
+        lines.append('OFFSET %i' % offset)
+    return lines
+
+
+def explain_read(table, name, where):
+    """
+    Describes how the rows of a table matching a WHERE condition are read
+    (see `matching_rows`), e.g. "SCAN cust (WHERE cid <, zone map: 3 of 29
+    blocks, 4 processes, ~2000 rows)"
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param name: The name the table is shown by
+    :param where: The bound WHERE condition (see `bind_condition`), or None
+    :return: The description
+    """
+    details = []
+    if where is not None:
+        details.append('WHERE %s %s' % (table['model'][where['col']]['col_name'], where['operator'].upper()))
+    index = where_index(table, where)
+    if index is not None:
+        line = 'SEARCH %s USING INDEX %s' % (name, index['name'])
+    else:
+        line = 'SCAN %s' % name
+        blocks = zone_blocks(table, where)
+        if blocks is not None:
+            details.append('zone map: %i of %i blocks' % (len(blocks), len(read_zone_map(table['path']))))
+        if table['format'] == 'csv':
+            workers = csv_scan_workers(table['path'], blocks)
+            if workers > 1:
+                details.append('%i processes' % workers)
+    estimate = estimate_rows(table, where)
+    if estimate != float('inf'):
+        details.append('~%i rows' % estimate)
+    if logged_writes(table) is not None:
+        details.append('merged with the write-ahead log')
+    if transaction is not None and table['path'] in transaction['tables']:
+        details.append('merged with the writes of the open transaction')
+    return '%s (%s)' % (line, ', '.join(details)) if details else line
+
+
+def alter(query_string):
+    """
+    Initiates a ALTER command
+
+    query_string -- the remaining query after the ALTER keyword
+    """
+    resource_types = {
+        'table': alter_table,
+    }
+    try:
+        parsed_query = ALTER_REGEX.match(query_string).groups()
+        resource_type = parsed_query[0].lower()  # grab the resource keyword
+        query_string = parsed_query[1]  # save the remaining query
+
+        # call the appropriate function based on resource
+        resource_types[resource_type](query_string)
+    except (AttributeError, IndexError):
+        raise ProgrammingError('syntax error')
+
+
+def alter_table(query_string):
+    """
+    Alters a table
+
+    query_string -- The remaining query after the ALTER TABLE keywords
+    """
+    operations = {
+        'add': alter_table_add_column,
+        'drop': alter_table_drop_column,
+        'rename': alter_table_rename_column
+    }
+    try:
+        groups = ALTER_TABLE_REGEX.match(query_string).groups()
+        tbl_name = groups[0]  # store the table name from the query
+        operation = groups[1].lower()  # store the operation (e.g ADD) from the query
+        column = groups[2]  # store the column from the query
+
+        with wal_lock(active_database), table_lock(active_database, tbl_name.lower(), exclusive=True):
+            table = catalog_table(tbl_name, fresh=True)
+
+            if table is not None:  # if the table exists
+                operations[operation](table, column)  # call the appropriate handler
+                report('Table %s modified' % tbl_name)
+            else:
+                raise OperationalError('Failed to query table %s because it does not exist.' % tbl_name)
+    except AttributeError:
+        raise ProgrammingError('syntax error')
+    except ValueError as error:
+        raise ProgrammingError(str(error))
+
+
+def alter_table_add_column(table, column):
+    """
+    Alters a table by adding the specified column (e.g. "qty int DEFAULT 0").
+    Only the schema changes: rows written before the column was added read it
+    as its default (or NULL).
+
+    table -- The catalog entry of the table (see `catalog_table`)
+    column -- The column to add to the table
+    """
+    column = column.strip()
+    match = COLUMN_DEFAULT_REGEX.match(column)
+    if match is not None:
+        default = re.sub('[\'"]', '', match.group(2).strip())  # strip away all quotes
+        if ',' in default:
+            raise ValueError('default values can\'t contain commas')
+        column = '%s DEFAULT %s' % (match.group(1), default)
+    col_name = column.split(' ', 1)[0]
+    if col_name in table['col_index']:
+        raise ValueError('column %s already exists' % col_name)
+    header = '%s,%s' % (table['header'], column)
+    extract_model_from(header)  # checks the new column
+    alter_table_schema(table, header)
+
+
+def alter_table_drop_column(table, column):
+    """
+    Alters a table by dropping the specified column. Only the schema
+    changes: the column keeps its place in the stored rows but can no longer
+    be queried, and the indexes on it are dropped.
+
+    table -- The catalog entry of the table (see `catalog_table`)
+    column -- The name of the column to drop
+    """
+    col = table['col_index'].get(column.strip())
+    if col is None:
+        raise ValueError('column %s does not exist' % column.strip())
+    if len(table['columns']) == 1:
+        raise ValueError('can\'t drop the only column of table %s' % table['name'])
+    for index in table['indexes']:
+        if index['col_name'] == table['model'][col]['col_name']:
+            os.remove(index['path'])
+    col_defs = table['header'].split(',')
+    col_defs[col] += ' DROPPED'
+    alter_table_schema(table, ','.join(col_defs))
+
+
+def alter_table_rename_column(table, column):
+    """
+    Alters a table by renaming a column (e.g. "pid TO product_id"), which
+    changes only the schema and the headers of the column's indexes
+
+    table -- The catalog entry of the table (see `catalog_table`)
+    column -- The old and new name of the column
+    """
+    match = RENAME_COLUMN_REGEX.match(column.strip())
+    if match is None:
+        raise ValueError('expected RENAME COLUMN <old name> TO <new name>')
+    old_name, new_name = match.groups()
+    col = table['col_index'].get(old_name)
+    if col is None:
+        raise ValueError('column %s does not exist' % old_name)
+    if new_name in table['col_index']:
+        raise ValueError('column %s already exists' % new_name)
+    for index in table['indexes']:
+        if index['col_name'] == old_name:
+            tree = BTree(index['path'], writable=True)
+            try:
+                tree.column = new_name
+                tree.dirty.add(0)  # the header holds the column name
+                tree.flush()
+            finally:
+                tree.close()
+    col_defs = table['header'].split(',')
+    col_defs[col] = new_name + col_defs[col][len(old_name):]
+    alter_table_schema(table, ','.join(col_defs))
+
+
+def alter_table_schema(table, header):
+    """
+    Stores the new header of an altered table as its next schema version
+
+    table -- The catalog entry of the table (see `catalog_table`)
+    header -- The new table header
+    """
+    try:
+        write_schema(table['path'], table['schema_version'] + 1, header)
+    finally:
+        catalog_invalidate(active_database, table['name'])  # the table header changed
+
+
+def create_database(db_name):
+    """
+    Creates a database with the given name
+
+    dbName -- the name of the database to create
+    """
+    global DB_DIR
+    db_path = os.path.join(DB_DIR, db_name)  # create the path to the new database
+
+    try:
+        os.mkdir(db_path)  # make a directory for the database
+        report('Database %s created.' % db_name)
+    except OSError:
+        raise OperationalError('Failed to create database %s because it already exists.' % db_name)
+
+
+def create_table(query_string):
+    """
+    Creates a table with the given name
+
+    query_string -- the remaining query string after CREATE TABLE keywords,
+    optionally ending with "USING <engine>" to choose the storage engine
+    """
+    global DB_DIR, active_database
+
+    groups = TABLE_REGEX.match(query_string).groups()
+    tbl_name = groups[0].lower()
+    engine_name = (groups[3] or DEFAULT_ENGINE).lower()
+    if engine_name not in storage_engines:
+        raise OperationalError('Failed to create table %s because storage engine %s does not exist.' % (tbl_name, engine_name))
+
+    try:
+        schema = groups[1]  # store the schema (i.e. the columns and their data types)
+        col_list = schema.split(',')  # split string up by column
+        col_list = [col.strip() for col in col_list]  # strip surrounding whitespace
+        col_str = join_l(col_list, ',')  # join list into string with sep ","
+
+        # binary engines need a valid model to encode rows with
+        if engine_name != 'csv':
+            extract_model_from(col_str)
+
+        # get the path to the active database
+        tbl_path = os.path.join(DB_DIR, active_database, tbl_name)
+        with wal_lock(active_database), table_lock(active_database, tbl_name, exclusive=True):
+            os.mknod(tbl_path)  # make a file in the active database directory
+            storage_engines[engine_name]['create'](tbl_path, col_str)
+            write_zone_map(tbl_path, {})
+            catalog_invalidate(active_database, tbl_name)
+
+        report('Table %s created.' % tbl_name)
+    except OSError:
+        raise OperationalError('Failed to create table %s because it already exists.' % tbl_name)
+    except IndexError:
+        raise ProgrammingError('syntax error near \'%s\'' % tbl_name)
+
+
+def create_index(query_string):
+    """
+    Creates a B-tree index on a column of a table and fills it with the
+    table's current rows
+
+    query_string -- the remaining query string after CREATE INDEX keywords
+    (e.g. "name ON table(col)")
+    """
+    global DB_DIR, active_database
+
+    groups = INDEX_REGEX.match(query_string).groups()
+    idx_name = groups[0].lower()
+    tbl_name = groups[1].lower()
+    col_name = groups[2]
+    with wal_lock(active_database), table_lock(active_database, tbl_name, exclusive=True):
+        table = catalog_table(tbl_name, fresh=True)
+
+        if table is None:
+            raise OperationalError('Failed to create index %s because table %s does not exist.' % (idx_name, tbl_name))
+        if find_index(idx_name) is not None:
+            raise OperationalError('Failed to create index %s because it already exists.' % idx_name)
+        if col_name not in table['col_index']:
+            raise OperationalError('Failed to create index %s because column %s does not exist.' % (idx_name, col_name))
+
+        try:
+            entries = index_entries(table, table['col_index'][col_name])
+            btree_build('%s.%s%s' % (table['path'], idx_name, INDEX_EXT), tbl_name, col_name, entries)
+            catalog_invalidate(active_database, tbl_name)  # the table has a new index
+            report('Index %s created.' % idx_name)
+        except ValueError as error:
+            raise ProgrammingError(str(error))
+
+
+def find_index(idx_name):
+    """
+    Finds the file of an index in the active database
+
+    :param idx_name: The name of the index
+    :return: The file path to the index, or None if it doesn't exist
+    """
+    global DB_DIR, active_database
+
+    db_path = os.path.join(DB_DIR, active_database)
+    suffix = '.%s%s' % (idx_name, INDEX_EXT)
+    for file_name in os.listdir(db_path):
+        if file_name.endswith(suffix) and '.' not in file_name[:-len(suffix)]:
+            return os.path.join(db_path, file_name)
+    return None
+
+
+def drop_database(db_name):
+    """
+    Drops a database with the given name
+
+    db_name -- the name of the database to drop
+    """
+    global DB_DIR
+
+    db_path = os.path.join(DB_DIR, db_name)  # create the path to the new database
+
+    try:
+        # recursively remove database (directory) and all tables (files)
+        with wal_lock(db_name):
+            wal_close(db_name)
+            for tbl_path in [path for path in table_maps if os.path.dirname(path) == db_path]:
+                del table_maps[tbl_path]
+            for tbl_path in {path for path, block in buffer_pool if os.path.dirname(path) == db_path}:
+                pool_invalidate(tbl_path)
+            shutil.rmtree(db_path)
+        os.close(lock_files.pop(db_name)[1])
+        catalog_invalidate(db_name)
+        report('Database %s deleted.' % db_name)
+    except OSError:
+        raise OperationalError('Failed to delete %s because it does not exist.' % db_name)
+
+
+def drop_table(tbl_name):
+    """
+    Drops a table with the given name
+
+    tbl_name -- the name of the table to drop
+    """
+    global DB_DIR, active_database
+
+    try:
+        # get the path to the active database
+        tbl_path = os.path.join(DB_DIR, active_database, tbl_name)
+        with wal_lock(active_database), table_lock(active_database, tbl_name, exclusive=True):
+            os.remove(tbl_path)  # remove the file from the active db directory
+
+            table_maps.pop(tbl_path, None)
+
+            # the table's indexes and tombstones (<table>.*) go with it
+            db_path = os.path.dirname(tbl_path)
+            for file_name in os.listdir(db_path):
+                if file_name.startswith(tbl_name + '.'):
+                    os.remove(os.path.join(db_path, file_name))
+            catalog_invalidate(active_database, tbl_name)
+
+        report('Table %s deleted.' % tbl_name)
+    except OSError:
+        raise OperationalError('Failed to delete table %s because it does not exist.' % tbl_name)
+
+
+def drop_index(idx_name):
+    """
+    Drops an index with the given name
+
+    idx_name -- the name of the index to drop
+    """
+    idx_name = idx_name.strip().lower()
+    idx_path = find_index(idx_name)
+    if idx_path is not None:
+        tbl_name = os.path.basename(idx_path).split('.')[0]  # index files are named <table>.<index>.idx
+        with wal_lock(active_database), table_lock(active_database, tbl_name, exclusive=True):
+            os.remove(idx_path)
+            catalog_invalidate(active_database, tbl_name)
+        report('Index %s deleted.' % idx_name)
+    else:
+        raise OperationalError('Failed to delete index %s because it does not exist.' % idx_name)
+
+
+def vacuum(query_string):
+    """
+    Initiates a VACUUM command, which reclaims the space of dead rows in a
+    table (or in every table of the active database when none is given)
+
+    query_string -- the remaining query after the VACUUM keyword (e.g. "t" or
+    "")
+    """
+    tbl_names = query_string.split()
+    if not tbl_names:
+        db_path = os.path.join(DB_DIR, active_database)
+        tbl_names = sorted(name for name in os.listdir(db_path) if '.' not in name)
+    elif len(tbl_names) > 1 or not USE_REGEX.match(tbl_names[0]):
+        raise ProgrammingError('syntax error')
+
+    for tbl_name in tbl_names:
+        tbl_name = tbl_name.lower()
+        with wal_lock(active_database), table_lock(active_database, tbl_name, exclusive=True):
+            table = catalog_table(tbl_name, fresh=True)
+            if table is None:
+                raise OperationalError('Failed to vacuum table %s because it does not exist.' % tbl_name)
+            vacuum_table(table)
+        report('Table %s vacuumed.' % tbl_name)
+
+
+def vacuum_table(table):
+    """
+    Vacuums a table and brings its indexes up to date
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    """
+    log = wal_begin(table)
+    try:
+        relocated = table['engine']['vacuum'](table['path'], table['model'])
+        if relocated is None:  # the row ids were reassigned
+            rebuild_indexes(table)
+        else:
+            rebuild_zone_map(table)  # tighten the bounds of the blocks
+    finally:
+        wal_end(log, table)
+
+
+def auto_vacuum(table):
+    """
+    Vacuums a table once dead rows take up AUTO_VACUUM_THRESHOLD of it
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    """
+    if table['engine']['garbage'](table['path']) >= AUTO_VACUUM_THRESHOLD:
+        vacuum_table(table)
+
+
+def begin(query_string):
+    """
+    Initiates a BEGIN command, which opens a transaction. Until it is
+    committed, the writes of INSERT, UPDATE and DELETE commands are collected
+    per table instead of being applied, and the commands of the transaction
+    see them.
+
+    query_string -- the remaining query after the BEGIN keyword (e.g. "" or
+    "TRANSACTION")
+    """
+    global transaction
+    if query_string.strip().lower() not in ('', 'transaction'):
+        raise ProgrammingError('syntax error')
+    elif transaction is not None:
+        raise ProgrammingError('a transaction is already open')
+    else:
+        transaction = {
+            'tables': collections.OrderedDict(),  # writes keyed by table path
+            'next_rowid': -1  # inserted rows get negative row ids until commit
+        }
+        report('Transaction started.')
+
+
+def commit(query_string):
+    """
+    Initiates a COMMIT command, which logs the writes of the open
+    transaction to all of its tables in one record (see `wal_commit`). No
+    locks are held between the statements of a transaction, so if another
+    one changed the rows it replaces or deletes (or the schema of a table it
+    writes) meanwhile, the transaction is rolled back instead (see
+    `transaction_conflict`).
+
+    query_string -- the remaining query after the COMMIT keyword
+    """
+    global transaction
+    if transaction is None:
+        raise ProgrammingError('no transaction is open')
+    tables, transaction = transaction['tables'], None
+    tbl_names = [writes['table']['name'] for writes in tables.values()]
+    with wal_lock(active_database), table_locks(active_database, tbl_names):
+        for writes in tables.values():
+            table = catalog_table(writes['table']['name'], fresh=True)
+            if transaction_conflict(writes, table):
+                raise OperationalError('Failed to commit transaction because table %s changed since it was read.'
+                                       % writes['table']['name'])
+            writes['table'] = table  # e.g. with an index created meanwhile
+        logged = [(writes['table'], list(writes['inserts'].values()), writes['changes'], writes['deleted'])
+                  for writes in tables.values() if writes['changes'] or writes['deleted'] or writes['inserts']]
+        if logged:
+            wal_commit(logged)
+    report('Transaction committed.')
+
+
+def rollback(query_string):
+    """
+    Initiates a ROLLBACK command, which discards the writes of the open
+    transaction
+
+    query_string -- the remaining query after the ROLLBACK keyword
+    """
+    global transaction
+    if transaction is None:
+        raise ProgrammingError('no transaction is open')
+    transaction = None
+    report('Transaction rolled back.')
+
+
+def transaction_conflict(writes, table):
+    """
+    Checks whether a table the open transaction writes to was changed by
+    another transaction since its rows were read: whether the table was
+    dropped or altered, or the rows the transaction replaces or deletes were
+    changed, deleted or moved (e.g. by VACUUM), including by the writes
+    logged for the table. Runs while the write-ahead log is held.
+
+    :param writes: The writes of the transaction to the table (see
+    `transaction_writes`)
+    :param table: The current catalog entry of the table, or None if it
+    doesn't exist
+    :return: Whether the writes conflict with the changes
+    """
+    if table is None or table['schema_version'] != writes['table']['schema_version'] \
+            or table['header'] != writes['table']['header']:
+        return True
+    read = dict(writes['old_rows'])
+    read.update(writes['deleted'])
+    if not read:
+        return False
+    try:
+        stored = dict(logged_fetch(table, sorted(read)))
+    except (ValueError, IndexError, struct.error):
+        return True  # e.g. a CSV row id which points into another row since VACUUM
+    return stored != read
+
+
+def transaction_writes(table):
+    """
+    Returns the writes of the open transaction to a table
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :return: A dict with the table, the inserted rows ('inserts', keyed by
+    their negative row ids), the new and old versions of changed rows
+    ('changes' and 'old_rows') and the deleted rows ('deleted'), all keyed
+    by row id
+    """
+    writes = transaction['tables'].get(table['path'])
+    if writes is None:
+        writes = transaction['tables'][table['path']] = {
+            'table': table,
+            'inserts': collections.OrderedDict(),
+            'changes': {},
+            'old_rows': {},
+            'deleted': {}
+        }
+    return writes
+
+
+def transaction_insert(table, rows):
+    """
+    Adds rows inserted into a table to the open transaction
+    """
+    writes = transaction_writes(table)
+    for row in rows:
+        writes['inserts'][transaction['next_rowid']] = row
+        transaction['next_rowid'] -= 1
+
+
+def transaction_update(table, changes, old_rows):
+    """
+    Adds rows of a table changed by an UPDATE to the open transaction
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param changes: A dict mapping row ids to their new rows
+    :param old_rows: A dict mapping row ids to their rows before the UPDATE
+    """
+    writes = transaction_writes(table)
+    for rowid, row in changes.items():
+        if rowid < 0:  # a row inserted by the transaction
+            writes['inserts'][rowid] = row
+        else:
+            writes['old_rows'].setdefault(rowid, old_rows[rowid])  # keep the stored version
+            writes['changes'][rowid] = row
+
+
+def transaction_delete(table, deleted):
+    """
+    Adds rows of a table deleted by a DELETE to the open transaction
+
+    :param table: The catalog entry of the table (see `catalog_table`)
+    :param deleted: A dict mapping the row ids of the deleted rows to the rows
+    """
+    writes = transaction_writes(table)
+    for rowid, row in deleted.items():
+        if rowid < 0:  # a row inserted by the transaction
+            del writes['inserts'][rowid]
+        else:
+            writes['changes'].pop(rowid, None)
+            writes['deleted'][rowid] = writes['old_rows'].pop(rowid, row)  # the stored version
+
+
+# library functions
+#
+# Programs can use the databases through a DB-API 2.0 (PEP 249) interface
+# instead of the command prompt: `connect` opens the directory the databases
+# are kept in, and the cursors of a connection run statements, binding their
+# `?` parameters to Python values, and return the rows of a SELECT as tuples
+# of typed values. Each connection has its own active database, transaction
+# and prepared statements, which are swapped into the globals while one of
+# its statements runs (see `Connection.session`), and the statements of all
+# connections run one at a time. Statements raise the errors below, which the
+# command prompt prints (see `error_message`), and only print their outcome
+# for connections which echo it (see `report`).
+#
+# A cursor reads the rows of a SELECT as they are fetched, a batch at a time,
+# and holds shared locks on the SELECT's tables until it has read them all
+# (or is closed). Running another statement first reads the rows the open
+# cursors have left into memory, so no statement writes to a table while a
+# cursor is still reading it. The command prompt is a client of a connection
+# which prints the output of its statements.
+
+class Warning(Exception):
+    """
+    Raised for important warnings (PEP 249 asks for it, but no statement
+    raises it)
+    """
+
+
+class Error(Exception):
+    """
+    The base class of the errors raised by statements, connections and
+    cursors
+    """
+
+
+class InterfaceError(Error):
+    """
+    Raised for errors in the use of the interface, e.g. of a closed cursor
+    """
+
+
+class DatabaseError(Error):
+    """
+    Raised for errors of the databases
+    """
+
+
+class DataError(DatabaseError):
+    """
+    Raised for values a table can't store, e.g. a line break in a string of a
+    CSV table (values which can't be cast to their column's data type raise a
+    ProgrammingError)
+    """
+
+
+class OperationalError(DatabaseError):
+    """
+    Raised when a statement fails, e.g. because its table doesn't exist
+    """
+
+
+class IntegrityError(DatabaseError):
+    """
+    Raised when a constraint fails (PEP 249 asks for it, but tables have no
+    constraints)
+    """
+
+
+class InternalError(DatabaseError):
+    """
+    Raised for internal errors (PEP 249 asks for it, but nothing raises it)
+    """
+
+
+class ProgrammingError(DatabaseError):
+    """
+    Raised for invalid statements (e.g. syntax errors) and parameters
+    """
+
+
+class NotSupportedError(DatabaseError):
+    """
+    Raised when a feature isn't supported, e.g. a second directory of
+    databases
+    """
+
+
+class TypeObject:
+    """
+    Compares equal to the type codes of the columns of a kind (e.g. STRING
+    to 'varchar(20)') in the description of a cursor
+    """
+
+    def __init__(self, *data_types):
+        self.data_types = data_types
+
+    def __eq__(self, type_code):
+        return type_code.split('(')[0].lower() in self.data_types
+
+    def __hash__(self):
+        return hash(self.data_types)
+
+
+STRING = TypeObject('varchar', 'char')
+NUMBER = TypeObject('int', 'float', 'double', 'bool', 'boolean')
+
+
+def connect(path=DB_DIR, autocommit=False):
+    """
+    Opens a connection to the databases kept in a directory, creating the
+    directory (and its 'main' database) if it doesn't exist. The connections
+    of a process can only use one directory at a time.
+
+    :param path: The directory of the databases
+    :param autocommit: Whether every statement is committed as it runs.
+    Otherwise INSERT, UPDATE and DELETE commands open a transaction, which
+    `Connection.commit` commits.
+    :return: The connection (see `Connection`)
+    :raises NotSupportedError: if connections are open to another directory
+    """
+    return Connection(path, autocommit)
+
+
+class Connection:
+    """
+    A connection to a directory of databases (see `connect`), which runs the
+    statements of its cursors with its own active database, transaction and
+    prepared statements. Used as a context manager, it commits when the
+    block succeeds and rolls back when it raises.
+    """
+
+    def __init__(self, path, autocommit=False, echo=False):
+        """
+        :param path: The directory of the databases
+        :param autocommit: Whether every statement is committed as it runs
+        :param echo: Whether statements print their outcome (as at the
+        command prompt)
+        """
+        self.autocommit = autocommit
+        self.echo = echo
+        self.active_database = INIT_DB
+        self.transaction = None
+        self.prepared = {}
+        self.cursors = weakref.WeakSet()
+        self.closed = False
+        with connection_lock:
+            open_directory(path)
+            connections.add(self)
+
+    @contextlib.contextmanager
+    def session(self):
+        """
+        Runs the statements of the connection: holds the connection lock and
+        swaps the connection's state into the globals (see
+        `activate_connection`), and back out afterwards
+        """
+        if self.closed:
+            raise InterfaceError('the connection is closed')
+        with connection_lock:
+            previous = session_owner
+            activate_connection(self)
+            try:
+                yield
+            finally:
+                activate_connection(previous)
+
+    def cursor(self):
+        """
+        :return: A new cursor of the connection (see `Cursor`)
+        """
+        if self.closed:
+            raise InterfaceError('the connection is closed')
+        cursor = Cursor(self)
+        self.cursors.add(cursor)
+        return cursor
+
+    def execute(self, operation, parameters=()):
+        """
+        Runs a statement on a new cursor (see `Cursor.execute`)
+
+        :return: The cursor
+        """
+        return self.cursor().execute(operation, parameters)
+
+    def executemany(self, operation, seq_of_parameters):
+        """
+        Runs a statement with each of several sets of parameters on a new
+        cursor (see `Cursor.executemany`)
+
+        :return: The cursor
+        """
+        return self.cursor().executemany(operation, seq_of_parameters)
+
+    def commit(self):
+        """
+        Commits the open transaction, if any
+        """
+        with self.session():
+            if transaction is not None:
+                self.execute('COMMIT')
+
+    def rollback(self):
+        """
+        Rolls the open transaction back, if any
+        """
+        with self.session():
+            if transaction is not None:
+                self.execute('ROLLBACK')
+
+    def close(self):
+        """
+        Closes the connection and its cursors, rolling the open transaction
+        back. Closing the last open connection applies the rows left in the
+        write-ahead logs to their tables.
+        """
+        if self.closed:
+            return
+        with connection_lock:
+            for cursor in list(self.cursors):
+                cursor.close()
+            self.rollback()
+            self.closed = True
+            connections.discard(self)
+            if not connections:
+                wal_flush()
+                for db_name in list(wal_logs):
+                    wal_checkpoint(db_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        elif not self.closed:
+            self.rollback()
+
+
+class Cursor:
+    """
+    Runs statements on a connection and fetches the rows of a SELECT (see
+    `Connection.cursor`)
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None  # a (name, type code, None, None, None, None, None) tuple per column of a SELECT
+        self.rowcount = -1  # the number of rows the last INSERT, UPDATE or DELETE wrote
+        self.arraysize = 1  # the number of rows fetchmany fetches by default
+        self.rows = None  # the generator of the rows left to read (see `locked_rows`)
+        self.buffer = collections.deque()  # the rows read but not fetched yet
+        self.closed = False
+
+    def execute(self, operation, parameters=()):
+        """
+        Runs a statement (the trailing ';' is optional)
+
+        :param operation: The statement
+        :param parameters: The values of its `?` parameters
+        :return: The cursor
+        :raises ProgrammingError: if the statement is invalid
+        :raises OperationalError: if the statement fails
+        """
+        self.run(operation, [parameters])
+        return self
+
+    def executemany(self, operation, seq_of_parameters):
+        """
+        Runs a statement once for each set of parameters. An INSERT inserts
+        the rows of all of them at once.
+
+        :param operation: The statement
+        :param seq_of_parameters: The sets of values of its `?` parameters
+        :return: The cursor
+        """
+        self.run(operation, list(seq_of_parameters))
+        return self
+
+    def run(self, operation, param_sets):
+        """
+        Runs a statement with sets of parameters
+
+        :param operation: The statement
+        :param param_sets: The lists of parameter values
+        """
+        if self.closed:
+            raise InterfaceError('the cursor is closed')
+        with self.connection.session():
+            self.reset()
+            drain_cursors()
+            statement = clean_statement(operation)
+            if not statement.endswith(';'):
+                statement += ';'
+            try:
+                self.dispatch(statement, [list(params) for params in param_sets])
+            except Error:
+                raise
+            except Exception:
+                raise ProgrammingError('syntax error')
+
+    def dispatch(self, statement, param_sets):
+        """
+        Runs a statement (see `compile_statement`), opening or committing the
+        transaction of a connection which doesn't autocommit around it
+
+        :param statement: The statement (ending with ';')
+        :param param_sets: The lists of parameter values
+        """
+        action = KEYWORD_REGEX.match(statement).group().lower()
+        if not self.connection.autocommit:
+            if transaction is None and action in ('insert', 'update', 'delete'):
+                begin('')
+            elif transaction is not None and action in query_commands and action not in TRANSACTION_COMMANDS \
+                    and action not in plan_compilers:
+                commit('')  # e.g. before CREATE TABLE, which can't be used inside a transaction
+        if action == 'execute':
+            match = EXECUTE_REGEX.match(QUERY_COMMAND_REGEX.match(statement).group(2))
+            if match is None:
+                raise ProgrammingError('syntax error')
+            name = match.group(1).lower()
+            if match.group(3) is not None:
+                if param_sets != [[]]:
+                    raise ProgrammingError('EXECUTE %s already has parameters' % name)
+                params = parse_value_list(match.group(3))
+                param_sets = [[] if params == [''] else params]  # "name ()"
+            plan = prepared_statements.get(name)
+            if plan is None:
+                raise OperationalError('Failed to execute statement %s because it does not exist.' % name)
+            prepared_statements[name] = self.run_plan(plan, param_sets)
+            return
+        if action not in plan_compilers and param_sets != [[]]:
+            raise ProgrammingError('parameters (%s) can only be used in SELECT, INSERT, UPDATE and DELETE' % PARAMETER)
+        key, plan = compile_statement(statement)
+        if plan is not None:
+            cache_plan(key, self.run_plan(plan, param_sets))
+
+    def run_plan(self, plan, param_sets):
+        """
+        Executes a plan with sets of parameters. A SELECT plan is executed
+        only up to its first row, which the cursor reads when it is fetched.
+
+        :param plan: The plan
+        :param param_sets: The lists of parameter values
+        :return: The plan that was executed
+        """
+        for params in param_sets:
+            if len(params) != plan['param_count']:
+                raise ProgrammingError('statement needs %i parameters but %i were supplied'
+                                       % (plan['param_count'], len(params)))
+        if plan['action'] == 'select':
+            if len(param_sets) != 1:
+                raise ProgrammingError('executemany can\'t run a SELECT')
+            rows = locked_rows(plan, param_sets[0])
+            try:
+                plan = next(rows)
+            except (ValueError, struct.error) as error:
+                raise ProgrammingError(str(error))
+            self.rows = rows
+            self.description = tuple(
+                tuple(col_def.split(' ', 1)) + (None,) * 5
+                for col_def in plan['col_defs'].split(' | ') if plan['cols_to_select'])
+            return plan
+        with locked_plan(plan) as plan:
+            try:
+                if plan['action'] == 'insert':
+                    self.rowcount = execute_insert_many(plan, param_sets)
+                else:
+                    self.rowcount = sum(plan['execute'](plan, params) for params in param_sets)
+            except (ValueError, struct.error) as error:
+                raise ProgrammingError(str(error))
+        return plan
+
+    def read_ahead(self, count=None):
+        """
+        Reads rows of the SELECT into the buffer
+
+        :param count: The number of rows to read, or None to read all of them
+        :raises ProgrammingError: if the last statement wasn't a SELECT, or
+        reading its rows failed
+        """
+        if self.description is None:
+            raise ProgrammingError('the cursor has no rows to fetch')
+        with self.connection.session():
+            if self.rows is None:
+                return  # all read (or read into the buffer by `drain_cursors`)
+            buffered = len(self.buffer)
+            try:
+                self.buffer.extend(itertools.islice(self.rows, count))
+            except (ValueError, struct.error) as error:
+                self.rows = None
+                raise ProgrammingError(str(error))
+            if count is None or len(self.buffer) - buffered < count:
+                self.rows = None  # all read, which released the locks
+
+    def fetchone(self):
+        """
+        :return: The next row of the SELECT (a tuple), or None if there are
+        no more
+        """
+        if not self.buffer:
+            self.read_ahead(FETCH_ROWS)
+        return self.buffer.popleft() if self.buffer else None
+
+    def fetchmany(self, size=None):
+        """
+        :param size: The number of rows to fetch (the arraysize by default)
+        :return: A list of the next rows of the SELECT (fewer than asked for
+        when there are no more)
+        """
+        size = self.arraysize if size is None else size
+        if len(self.buffer) < size:
+            self.read_ahead(max(size - len(self.buffer), FETCH_ROWS))
+        return [self.buffer.popleft() for i in range(min(size, len(self.buffer)))]
+
+    def fetchall(self):
+        """
+        :return: A list of the remaining rows of the SELECT
+        """
+        self.read_ahead()
+        rows = list(self.buffer)
+        self.buffer.clear()
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if not self.buffer:
+            self.read_ahead(FETCH_ROWS)
+            if not self.buffer:
+                raise StopIteration
+        return self.buffer.popleft()
+
+    def setinputsizes(self, sizes):
+        pass
+
+    def setoutputsize(self, size, column=None):
+        pass
+
+    def reset(self):
+        """
+        Drops the rows of the last statement, releasing the locks held for
+        them
+        """
+        if self.rows is not None:
+            with connection_lock:
+                self.rows.close()
+            self.rows = None
+        self.buffer.clear()
+        self.description = None
+        self.rowcount = -1
+
+    def close(self):
+        """
+        Closes the cursor
+        """
+        self.reset()
+        self.closed = True
+
+
+def open_directory(path):
+    """
+    Makes a directory the one the databases are kept in, creating it and
+    recovering its databases (see `init`) unless it already is. Closes the
+    write-ahead logs and lock files of the databases of the last one.
+
+    :param path: The directory
+    :raises NotSupportedError: if connections to another directory are open
+    """
+    global DB_DIR, open_dir
+    if open_dir is not None and os.path.abspath(path) == os.path.abspath(open_dir):
+        return
+    if connections:
+        raise NotSupportedError('connections to %s are open' % open_dir)
+    for db_name in list(wal_logs):
+        wal_checkpoint(db_name)
+        wal_close(db_name)
+    for inode, fd in lock_files.values():
+        os.close(fd)
+    lock_files.clear()
+    catalog.clear()
+    plan_cache.clear()
+    DB_DIR = path
+    init()
+    open_dir = path
+
+
+def activate_connection(connection):
+    """
+    Swaps the state of a connection (its active database, transaction,
+    prepared statements and whether it echoes) into the globals, after
+    storing the state they held in its connection
+
+    :param connection: The connection, or None to only store the state the
+    globals hold
+    """
+    global active_database, transaction, prepared_statements, session_owner, echo
+    if connection is session_owner:
+        return
+    if session_owner is not None:
+        session_owner.active_database = active_database
+        session_owner.transaction = transaction
+        session_owner.prepared = prepared_statements
+    if connection is not None:
+        active_database = connection.active_database
+        transaction = connection.transaction
+        prepared_statements = connection.prepared
+    echo = connection is None or connection.echo  # statements run outside of connections print their outcome
+    session_owner = connection
+
+
+def drain_cursors():
+    """
+    Reads the rows the cursors of every connection have left to read into
+    memory, which releases the locks they hold
+    """
+    for connection in list(connections):
+        for cursor in list(connection.cursors):
+            if cursor.rows is not None:
+                cursor.read_ahead()
+
+
+def locked_rows(plan, params):
+    """
+    Generates the rows a SELECT plan selects (see `selected_rows`), holding
+    the locks on its tables until the last one is read or the generator is
+    closed
+
+    :param plan: The plan
+    :param params: The list of parameter values
+    :return: A generator, which first yields the plan that was executed and
+    then the rows
+    """
+    with locked_plan(plan) as plan:
+        rows = selected_rows(plan, params)
+        yield plan
+        yield from rows
+
+
+def error_message(error):
+    """
+    Formats an error the way the command prompt prints it: "!Failed ..." for
+    statements which failed (e.g. on a table which doesn't exist), "ERROR:
+    ..." for invalid table headers and "Error: ..." for the rest
+
+    :param error: The error (see `Error`)
+    :return: The message to print
+    """
+    if isinstance(error, OperationalError):
+        return '!%s' % error
+    if type(error) is DatabaseError:
+        return 'ERROR: %s' % error
+    return 'Error: %s' % error
+
+
+def print_statement(cursor, statement):
+    """
+    Runs a statement of the command prompt on its cursor, whose connection
+    prints the outcome of statements, then prints the header and the rows of
+    a SELECT, or the error the statement raised
+
+    :param cursor: The cursor of the command prompt
+    :param statement: The statement (ending with ';') to run
+    :return: Whether the statement succeeded
+    """
+    try:
+        cursor.execute(statement)
+        if cursor.description is None:
+            return True
+        print(' | '.join([' '.join(column[:2]) for column in cursor.description]))
+        print_rows(cursor)
+    except Error as error:
+        print(error_message(error))
+        return False
+    return True
+
+
+# script functions
+#
+# Scripts (`-f FILE`, or statements piped to the standard input) run without
+# the command prompt: the script is read a large chunk at a time and split
+# into statements by regular expressions which skip the ';'s inside quotes
+# and comments (`--` to the end of the line, and `/* */`), so a statement is
+# scanned once however many lines it has. A line which starts with a '.'
+# (outside of a statement) is a dot-command.
+
+def script_statements(script):
+    """
+    Splits a script into its statements and dot-commands, reading it a chunk
+    at a time. Comments are left out of the statements, and the whitespace
+    outside of quotes is collapsed into single spaces. A statement left
+    without its ';' at the end of the script is completed.
+
+    :param script: The (text) file of the script
+    :return: A generator of (is dot-command, statement or dot-command) tuples
+    """
+    decoder = codecs.getincrementaldecoder(script.encoding)()
+    data = ''
+    pos = 0
+    end_of_script = False
+    while True:
+        pos = SCRIPT_SKIP_REGEX.match(data, pos).end()
+        if pos < len(data) and data[pos] == '.':
+            end = data.find('\n', pos)
+            if end != -1 or end_of_script:
+                end = len(data) if end == -1 else end
+                yield True, data[pos:end].strip()
+                pos = end
+                continue
+        elif pos < len(data):
+            match = SCRIPT_STATEMENT_REGEX.match(data, pos)
+            if match is not None:
+                yield False, clean_statement(match.group())
+                pos = match.end()
+                continue
+        if end_of_script:
+            break
+        # the rest of the data holds no complete statement: read on, at
+        # least as much again so that a long statement is only scanned a
+        # few times. read1 returns what has been written to a pipe so far
+        # rather than waiting for a full chunk, so a program which writes
+        # a statement and waits for its output gets it.
+        sys.stdout.flush()
+        chunk = script.buffer.read1(max(SCRIPT_CHUNK, len(data) - pos))
+        data, pos, end_of_script = data[pos:] + decoder.decode(chunk, not chunk), 0, not chunk
+    statement = clean_statement(data[pos:])
+    if statement:
+        yield False, statement + ';'
+
+
+def clean_statement(statement):
+    """
+    Leaves the comments out of a statement of a script and collapses the
+    whitespace (e.g. line breaks) outside of its quotes into single spaces.
+    A line break inside a literal becomes a space, as when the statement is
+    typed at the prompt (rows are stored one per line).
+
+    :param statement: The statement
+    :return: The cleaned statement
+    """
+    if '\n' in statement or '\r' in statement or '--' in statement or '/*' in statement:
+        statement = SCRIPT_CLEAN_REGEX.sub(clean_match, statement)
+    return statement.strip()
+
+
+def clean_match(match):
+    """
+    Returns the replacement of a match of SCRIPT_CLEAN_REGEX (see
+    `clean_statement`)
+    """
+    if match.group(1) is None:
+        return ' '
+    return LINE_BREAK_REGEX.sub(' ', match.group(1))
+
+
+def run_script(cursor, script, bail=False):
+    """
+    Runs the statements and dot-commands of a script (see
+    `script_statements`) as they are read, without prompting for them
+
+    :param cursor: The cursor of the command prompt
+    :param script: The file of the script
+    :param bail: Whether to stop at the first statement which fails
+    :return: Whether every statement succeeded (or the first failed one, if
+    bail is set)
+    """
+    succeeded = True
+    for is_dot_command, statement in script_statements(script):
+        if is_dot_command:
+            done = run_dot_command(statement)
+        else:
+            try:
+                done = run_measured(cursor, statement)
+            except Exception:
+                print('Error: syntax error')
+                done = False
+        if not done:
+            succeeded = False
+            if bail:
+                break
+    return succeeded
+
+
+def run_dot_command(user_input):
+    """
+    Runs a dot-command
+
+    :param user_input: The dot-command and its arguments (e.g. ".timer on")
+    :return: Whether the dot-command exists and took the arguments
+    """
+    try:
+        command, *args = user_input.split()
+        command = command.lower()  # make dot-command case insensitive
+        dot_commands[command](*args)  # try calling the dotCmds function keyed by the command
+        return True
+    except Error as error:
+        print(error_message(error))
+        return False
+    except (KeyError, TypeError):
+        error = 'Error: unknown command or invalid arguments:  "'
+        error += user_input[1:]  # strip off the '.'
+        error += '". Enter ".help" for help'
+        print(error)
+        return False
+
+
+# server functions
+#
+# `--serve` accepts client sessions over TCP or a Unix socket. A session
+# works like the command prompt: the client sends lines, the server answers
+# each complete statement with its output, and sends the prompt whenever it
+# waits for the next line. Each session has its own active database, open
+# transaction and prepared statements. Caches aren't shared between
+# processes: the writer thread has the server process's catalog, plan cache
+# and buffer pool, and each read worker has its own, which it keeps until the
+# tables' versions change (see `serve_read`).
+#
+# SELECT and EXPLAIN commands outside of a transaction run in a pool of read
+# worker processes, so they run concurrently. Every other statement runs on
+# a single writer thread, with the session's state swapped into the globals
+# for its duration, because the write-ahead log and page journal are shared.
+# Statements take locks first (see `LockTable`): they share SERVE_LOCK, which
+# statements changing the schema take exclusively. Writes only append to the
+# write-ahead log, and the workers read the writes logged so far with the
+# tables (see `logged_rows`), so reads don't wait for writes; a checkpoint
+# waits for the reads of the tables it writes through their file locks.
+
+class LockTable:
+    """
+    Grants shared and exclusive locks on keys (e.g. tables) to the statements
+    of server sessions. A statement gets all of its locks at once, and waits
+    for the statements before it which want conflicting locks.
+    """
+
+    def __init__(self):
+        self.holders = {}  # the number of shared holders of each key, or -1 if it is held exclusively
+        self.waiting = collections.deque()  # (shared keys, exclusive keys, future) of the waiting statements
+
+    def grantable(self, shared, exclusive, blocked_shared=(), blocked_exclusive=()):
+        """
+        Returns whether locks can be granted without conflicting with the
+        held ones or the ones wanted by the statements waiting before
+        """
+        return (all(self.holders.get(key, 0) >= 0 and key not in blocked_exclusive for key in shared) and
+                all(not self.holders.get(key, 0) and key not in blocked_shared and key not in blocked_exclusive
+                    for key in exclusive))
+
+    def grant(self, shared, exclusive):
+        for key in shared:
+            self.holders[key] = self.holders.get(key, 0) + 1
+        for key in exclusive:
+            self.holders[key] = -1
+
+    async def acquire(self, shared, exclusive):
+        """
+        Waits until the locks are granted
+        """
+        if not self.waiting and self.grantable(shared, exclusive):
+            self.grant(shared, exclusive)
+            return
+        waiter = (shared, exclusive, asyncio.get_event_loop().create_future())
+        self.waiting.append(waiter)
+        try:
+            await waiter[2]
+        except asyncio.CancelledError:
+            if waiter in self.waiting:
+                self.waiting.remove(waiter)
+            else:
+                self.release(shared, exclusive)  # granted as the session was cancelled
+            raise
+
+    def release(self, shared, exclusive):
+        """
+        Releases locks and grants the ones the waiting statements can now get
+        """
+        for key in shared:
+            self.holders[key] -= 1
+            if not self.holders[key]:
+                del self.holders[key]
+        for key in exclusive:
+            del self.holders[key]
+        blocked_shared, blocked_exclusive = set(), set()
+        for waiter in list(self.waiting):
+            shared, exclusive, future = waiter
+            if self.grantable(shared, exclusive, blocked_shared, blocked_exclusive):
+                self.waiting.remove(waiter)
+                self.grant(shared, exclusive)
+                future.set_result(None)
+            else:
+                blocked_shared.update(shared)
+                blocked_exclusive.update(exclusive)
+
+
+def statement_tables(action, query_string):
+    """
+    Finds the names of the tables a query command reads or writes from its
+    text, without looking them up
+
+    :param action: The (lowercase) query command, e.g. 'select'
+    :param query_string: The remaining query after the command keyword
+    :return: A list of the (lowercase) table names, or None if the command
+    isn't a SELECT, INSERT, UPDATE or DELETE or can't be parsed
+    """
+    if action == 'select':
+        match = JOIN_SELECT_REGEX.match(SELECT_CLAUSES_REGEX.match(query_string).group(1))
+        if match is None:
+            return None
+        parts = JOIN_REGEX.split(match.group(2).strip())
+        table_refs = [JOIN_ON_REGEX.split(table_ref, 1)[0] for table_ref in parts[::3]]
+        matches = [TABLE_REF_REGEX.match(table_ref) for table_ref in table_refs]
+        if None in matches:
+            return None
+        return [match.group(1).lower() for match in matches]
+    target_regex = {'insert': INSERT_REGEX, 'update': UPDATE_REGEX, 'delete': DELETE_REGEX}.get(action)
+    match = target_regex.match(query_string) if target_regex is not None else None
+    return [match.group(1).lower()] if match is not None else None
+
+
+def statement_locks(session, statement):
+    """
+    Determines where a statement of a server session runs and the locks it
+    takes (see `LockTable`)
+
+    :param session: The session (see `serve_session`)
+    :param statement: The statement (ending with ';')
+    :return: A (read, shared lock keys, exclusive lock keys) tuple, where read
+    is True if the statement runs in a read worker and the keys of tables are
+    (database, table name) tuples
+    """
+    db_name = session['active_database']
+    match = QUERY_COMMAND_REGEX.match(statement)
+    action = match.group(1).lower() if match is not None and match.group(1) is not None else None
+    query_string = match.group(2) if action is not None else ''
+    if session['transaction'] is not None:
+        # the writes of a transaction are collected until COMMIT logs them
+        return False, (SERVE_LOCK,), ()
+    if action in (None, 'use', 'prepare', 'deallocate', 'begin', 'rollback'):
+        return False, (SERVE_LOCK,), ()
+    read = action in ('select', 'explain')
+    try:
+        if action == 'explain':
+            match = QUERY_COMMAND_REGEX.match(query_string)
+            action, query_string = match.group(1).lower(), match.group(2)
+        tables = statement_tables(action, query_string)
+    except AttributeError:
+        tables = None
+    if action == 'execute':
+        match = EXECUTE_REGEX.match(query_string)
+        plan = session['prepared'].get(match.group(1).lower()) if match is not None else None
+        if plan is None:
+            return False, (SERVE_LOCK,), ()
+        # the prepared statement may have been prepared in another database
+        db_name = os.path.basename(os.path.dirname(plan['table']['path']))
+        action, tables = plan['action'], [table['name'] for table in plan['tables']]
+    if tables is None:
+        return False, (), (SERVE_LOCK,)
+    keys = tuple(sorted(set((db_name, tbl_name) for tbl_name in tables)))
+    return read, (SERVE_LOCK,) + keys, ()
+
+
+def serve_write(session, statement):
+    """
+    Runs a statement of a server session on the writer thread, with the
+    session's state swapped into the globals
+
+    :param session: The session (see `serve_session`)
+    :param statement: The statement (ending with ';')
+    :return: The output of the statement
+    """
+    global active_database, transaction, prepared_statements
+    active_database, transaction, prepared_statements = (
+        session['active_database'], session['transaction'], session['prepared'])
+    output = io.StringIO()
+    try:
+        with connection_lock, contextlib.redirect_stdout(output):  # not while the flush timer runs
+            try:
+                run_statement(statement)
+            except Exception:
+                print('Error: syntax error')
+    finally:
+        session['active_database'], session['transaction'], session['prepared'] = (
+            active_database, transaction, prepared_statements)
+    return output.getvalue()
+
+
+def serve_worker_init():
+    """
+    Prepares a read worker process of the server
+    """
+    global parallel_workers, scan_pool
+    # the server stops the workers once their reads are done (see `serve`)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    parallel_workers, scan_pool = 1, None
+    wal_logs.clear()  # each worker reads the write-ahead logs itself
+
+
+def serve_read(db_name, statement, tables):
+    """
+    Runs a SELECT or EXPLAIN command of a server session in a read worker
+    process. The worker keeps what it cached across reads, except for the
+    tables which were written to since it last read them (their versions
+    changed, see `table_version`), which it drops first.
+
+    :param db_name: The active database of the session
+    :param statement: The statement (ending with ';')
+    :param tables: The (database, table) tuples of the tables it reads
+    :return: The output of the statement
+    """
+    global active_database
+    for key in tables:
+        try:
+            version = table_version(*key)
+        except OSError:
+            version = None  # the database was dropped
+        if served_versions.get(key) != version:
+            catalog_forget(*key)
+            served_versions[key] = version
+    active_database = db_name
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        try:
+            run_statement(statement)
+        except Exception:
+            print('Error: syntax error')
+    return output.getvalue()
+
+
+def pool_result(pool, func, args):
+    """
+    Runs a function in a worker process of a pool
+
+    :return: A future of its result
+    """
+    loop = asyncio.get_event_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if future.done():
+            return  # the session was cancelled
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    pool.apply_async(func, args, callback=lambda result: loop.call_soon_threadsafe(resolve, result, None),
+                     error_callback=lambda error: loop.call_soon_threadsafe(resolve, None, error))
+    return future
+
+
+async def serve_statement(server, session, statement):
+    """
+    Runs a statement of a server session once it got its locks (see
+    `statement_locks`)
+
+    :param server: The server (see `serve`)
+    :param session: The session (see `serve_session`)
+    :param statement: The statement (ending with ';')
+    :return: The output of the statement
+    """
+    loop = asyncio.get_event_loop()
+    read, shared, exclusive = statement_locks(session, statement)
+    await server['locks'].acquire(shared, exclusive)
+    try:
+        if read:
+            tables = [key for key in shared if key != SERVE_LOCK]
+            return await pool_result(server['readers'], serve_read, (session['active_database'], statement, tables))
+        return await loop.run_in_executor(server['writer'], serve_write, session, statement)
+    finally:
+        server['locks'].release(shared, exclusive)
+
+
+async def serve_session(server, reader, writer):
+    """
+    Runs the session of a client of the server: reads its lines until they
+    complete a statement, like the command prompt does (see `main`), and
+    sends back the statement's output
+
+    :param server: The server (see `serve`)
+    :param reader: The stream reader of the client's connection
+    :param writer: The stream writer of the client's connection
+    """
+    session = {
+        'active_database': INIT_DB,
+        'transaction': None,  # the writes of the session's open transaction (see `begin`)
+        'prepared': {}  # the session's prepared statements
+    }
+    user_input = ''
+    try:
+        while True:
+            writer.write(SERVE_PROMPT.encode())
+            await writer.drain()
+            try:
+                line = await reader.readline()
+            except ValueError:
+                writer.write(b'Error: the line is longer than %d bytes\n' % SERVE_LINE_LIMIT)
+                break
+            if not line:
+                break  # the client disconnected
+            user_input = (user_input + line.decode(errors='replace')).strip()
+            if user_input[0:2] == '--':
+                user_input = ''  # ignore comments
+            if DOT_COMMAND_REGEX.match(user_input) is not None:
+                if user_input.split()[0].lower() == '.exit':
+                    writer.write(b'All done.\n')
+                    break
+                writer.write(('Error: only .exit can be used in a server session: "%s"\n' % user_input[1:]).encode())
+                user_input = ''
+            elif user_input[-1:] == ';':
+                output = await serve_statement(server, session, user_input)
+                writer.write(output.encode())
+                user_input = ''
+            elif user_input:
+                user_input += ' '
+        await writer.drain()
+    except ConnectionError:
+        pass  # the client disconnected; an open transaction is rolled back
+    finally:
+        writer.close()
+
+
+def serve(address, workers):
+    """
+    Serves client sessions until the server is interrupted
+
+    :param address: A TCP port, HOST:PORT, or the path of a Unix socket
+    (containing a '/')
+    :param workers: The number of read worker processes
+    """
+    server = {
+        'locks': LockTable(),
+        'readers': None,  # the pool of read worker processes
+        'writer': None  # the writer thread
+    }
+    loop = asyncio.get_event_loop()
+
+    def start_session(reader, writer):
+        return serve_session(server, reader, writer)
+
+    if '/' in address and os.path.exists(address):
+        print('!Failed to serve on %s because it already exists.' % address)
+        return
+    host, _, port = address.rpartition(':')
+    if '/' not in address and not port.isdigit():
+        print('!Failed to serve on %s because it is not a port or the path of a Unix socket.' % address)
+        return
+    try:
+        if '/' in address:
+            listener = loop.run_until_complete(asyncio.start_unix_server(start_session, path=address,
+                                                                         limit=SERVE_LINE_LIMIT))
+        else:
+            listener = loop.run_until_complete(asyncio.start_server(start_session, host or None, int(port),
+                                                                    limit=SERVE_LINE_LIMIT))
+    except OSError as error:
+        print('!Failed to serve on %s: %s' % (address, error))
+        return
+    # start the workers before the writer thread, so that they are forked from a single thread
+    server['readers'] = multiprocessing.Pool(workers, serve_worker_init)
+    server['writer'] = concurrent.futures.ThreadPoolExecutor(1)
+    loop.add_signal_handler(signal.SIGTERM, loop.stop)
+    print('Serving on %s with %d read workers.' % (address, workers))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    listener.close()
+    server['readers'].close()
+    server['readers'].join()
+    server['writer'].shutdown()
+    shut_down()
+    if '/' in address and os.path.exists(address):
+        os.remove(address)
+    print('All done.')
+
+
+# Storage Engine Dictionary (this maps storage engines to their table functions)
+
+storage_engines = {
+    'csv': {
+        'create': csv_create,
+        'read_header': csv_read_header,
+        'scan': csv_scan,
+        'fetch': csv_fetch,
+        'insert': csv_insert,
+        'update': csv_update,
+        'delete': csv_delete,
+        'check_row': csv_check_row,
+        'garbage': csv_garbage,
+        'vacuum': csv_vacuum,
+        'zone_shift': CSV_ZONE_SHIFT
+    },
+    'paged': {
+        'create': paged_create,
+        'read_header': paged_read_header,
+        'scan': paged_scan,
+        'fetch': paged_fetch,
+        'insert': paged_insert,
+        'update': paged_update,
+        'delete': paged_delete,
+        'check_row': paged_check_row,
+        'garbage': paged_garbage,
+        'vacuum': paged_vacuum,
+        'zone_shift': PAGED_ZONE_SHIFT
+    },
+    'columnar': {
+        'create': columnar_create,
+        'read_header': columnar_read_header,
+        'scan': columnar_scan,
+        'fetch': columnar_fetch,
+        'insert': columnar_insert,
+        'update': columnar_update,
+        'delete': columnar_delete,
+        'check_row': columnar_check_row,
+        'garbage': columnar_garbage,
+        'vacuum': columnar_vacuum,
+        'zone_shift': COLUMNAR_ZONE_SHIFT
+    },
+    'compressed': {
+        'create': compressed_create,
+        'read_header': compressed_read_header,
+        'scan': compressed_scan,
+        'fetch': compressed_fetch,
+        'insert': compressed_insert,
+        'update': compressed_update,
+        'delete': compressed_delete,
+        'check_row': compressed_check_row,
+        'garbage': compressed_garbage,
+        'vacuum': compressed_vacuum,
+        'zone_shift': COMPRESSED_ZONE_SHIFT
+    }
+}
+
+# Dot/Query Command Dictionaries (these map commands to their appropriate handler)
+
+dot_commands = {
+    '.cache_size': set_cache_size,
+    '.exit': exit_program,
+    '.help': print_help,
+    '.import': import_file,
+    '.memory': set_memory,
+    '.parallel': set_parallel,
+    '.profile': set_profile,
+    '.stats': set_stats,
+    '.timer': set_timer,
+    '.wal_sync': set_wal_sync
+}
+
+query_commands = {
+    'create': create,
+    'drop': drop,
+    'use': use,
+    'select': select,
+    'alter': alter,
+    'insert': insert,
+    'update': update,
+    'delete': delete,
+    'prepare': prepare,
+    'execute': execute,
+    'deallocate': deallocate,
+    'vacuum': vacuum,
+    'begin': begin,
+    'commit': commit,
+    'rollback': rollback,
+    'explain': explain
+}
+
+# maps the query commands which are compiled into plans to their compilers
+plan_compilers = {
+    'select': plan_select,
+    'insert': plan_insert,
+    'update': plan_update,
+    'delete': plan_delete
+}
+
+# Program start
+
+def main():
+    """
+    Runs the command prompt loop, a script with -f (or from the standard
+    input), or the server with --serve
+    """
+    global wal_sync_interval, wal_sync_rows
+    parser = argparse.ArgumentParser(description='A simple clone of sqlite.')
+    parser.add_argument('--serve', metavar='ADDRESS',
+                        help='serve client sessions on a TCP port, HOST:PORT or the path of a Unix socket')
+    parser.add_argument('--workers', metavar='N', type=int, default=os.cpu_count() or 1,
+                        help='the number of processes running the reads of the server (default: one per CPU)')
+    parser.add_argument('-f', '--file', metavar='FILE', type=argparse.FileType('r'),
+                        help='run the statements of a script instead of the command prompt (as for statements piped '
+                             'to the standard input)')
+    parser.add_argument('--bail', action='store_true', help='stop a script at the first statement which fails')
+    parser.add_argument('--wal-sync', metavar='SECS', type=float, default=WAL_SYNC_INTERVAL,
+                        help='fsync logged rows after SECS seconds, 0 for every write (default: %g, see .wal_sync)'
+                             % WAL_SYNC_INTERVAL)
+    parser.add_argument('--wal-sync-rows', metavar='N', type=int, default=WAL_SYNC_ROWS,
+                        help='fsync logged rows after N rows (default: %i)' % WAL_SYNC_ROWS)
+    args = parser.parse_args()
+    if args.wal_sync < 0 or args.wal_sync_rows < 1:
+        parser.error('--wal-sync must not be negative and --wal-sync-rows must be positive')
+    wal_sync_interval, wal_sync_rows = args.wal_sync, args.wal_sync_rows
+
+    if args.serve is not None:
+        init()  # create initial directory structure
+        serve(args.serve, max(args.workers, 1))
+        return
+
+    # the command prompt is a client of a connection which prints the output
+    # of its statements
+    cursor = Connection(DB_DIR, autocommit=True, echo=True).cursor()
+    if args.file is not None or not sys.stdin.isatty():
+        succeeded = run_script(cursor, args.file or sys.stdin, args.bail)
+        shut_down()
+        if not succeeded and args.bail:
+            raise SystemExit(1)
+        return
+
+    # The main command prompt loop
+    while True:
+        # reset our variables
+        user_input = ''
+        query_done = False
+        is_dot_command = False
+
+        while not query_done:
+            # always append prior user input for multi-line support
+            user_input += input('> ')
+
+            user_input = user_input.strip()  # strip all surrounding whitespace
+
+            # ignore comments
+            if user_input[0:2] == '--':
+                user_input = ''
+
+            # determine if the input is a dot-command
+            is_dot_command = DOT_COMMAND_REGEX.match(user_input) is not None
+
+            if is_dot_command:
+                break  # dot-commands aren't multi-line/multi-keyword, so bail
+            else:
+                # we're done collecting input if input is non-empty and last token is a ';'
+                user_input = user_input.strip()  # strip all leading and trailing whitespace
+                query_done = len(user_input) > 0 and user_input[-1] == ';'
+
+                # if no ';', but input is non-empty, append a ' ' to delimit further input
+                if not query_done and len(user_input) > 0:
+                    user_input += ' '
+
+        if is_dot_command:
+            run_dot_command(user_input)
+        else:
+            try:
+                run_measured(cursor, user_input)
+            except:
+                print('Error: syntax error')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# Transactions: two connections writing the same table
+#
+# Connection a updates and deletes rows in a transaction while connection b
+# (which autocommits) changes the table; a's COMMIT has to apply its writes
+# to the rows it read, or fail when they were changed meanwhile. Both use the
+# rest of the DB-API interface as well.
+
+import sqlite_clone
+
+a = sqlite_clone.connect('dbs')
+b = sqlite_clone.connect('dbs', autocommit=True)
+b.execute('CREATE DATABASE db_transaction')
+a.execute('USE db_transaction')
+b.execute('USE db_transaction')
+
+for engine in ('csv', 'paged', 'columnar', 'compressed'):
+    tbl_name = 'tbl_' + engine
+    b.execute('CREATE TABLE %s (a1 int, a2 varchar(20)) USING %s' % (tbl_name, engine))
+    b.executemany('INSERT INTO %s VALUES (?, ?)' % tbl_name, [(i, 'name%i' % i) for i in range(1, 21)])
+
+    # b changes other rows, which doesn't conflict with a
+    a.execute("UPDATE %s SET a2 = 'a' WHERE a1 = 10" % tbl_name)
+    b.execute("UPDATE %s SET a2 = 'b' WHERE a1 = 3" % tbl_name)
+    a.commit()
+
+    # b updates the row a updated
+    a.execute("UPDATE %s SET a2 = 'aa' WHERE a1 = 11" % tbl_name)
+    b.execute("UPDATE %s SET a2 = 'bb' WHERE a1 = 11" % tbl_name)
+    try:
+        a.commit()
+    except sqlite_clone.OperationalError as error:
+        print(error)
+
+    # b deletes the row a deletes
+    a.execute('DELETE FROM %s WHERE a1 = 12' % tbl_name)
+    b.execute('DELETE FROM %s WHERE a1 = 12' % tbl_name)
+    try:
+        a.commit()
+    except sqlite_clone.OperationalError as error:
+        print(error)
+
+    # b deletes a row and vacuums the table, which may move the rows a read
+    a.execute("UPDATE %s SET a2 = 'aaa' WHERE a1 = 13" % tbl_name)
+    b.execute('DELETE FROM %s WHERE a1 = 1' % tbl_name)
+    b.execute('VACUUM %s' % tbl_name)
+    try:
+        a.commit()
+    except sqlite_clone.OperationalError:
+        a.execute("UPDATE %s SET a2 = 'aaa' WHERE a1 = 13" % tbl_name)  # try again
+        a.commit()
+
+    print(sorted(b.execute('SELECT * FROM %s WHERE a1 BETWEEN 9 AND 14' % tbl_name).fetchall()))
+    print(b.execute('SELECT COUNT(*) FROM %s' % tbl_name).fetchone())
+
+# the DB-API interface: cursors bind parameters, describe the columns of a
+# SELECT, fetch its rows in batches and report the rows a write changed, the
+# connection commits or rolls back as a context manager, and failed
+# statements raise the DB-API exceptions
+print(sqlite_clone.apilevel, sqlite_clone.threadsafety, sqlite_clone.paramstyle)
+cursor = a.cursor()
+cursor.execute('CREATE TABLE Product (pid int, name varchar(20), price float, ok bool)')
+cursor.executemany('INSERT INTO Product VALUES (?, ?, ?, ?)',
+                   [(i, "it's %i" % i, i * 1.5, i % 2 == 0) for i in range(1, 11)])
+print(cursor.rowcount, b.execute('SELECT COUNT(*) FROM Product').fetchone())
+a.commit()
+print(b.execute('SELECT COUNT(*) FROM Product').fetchone())
+cursor.execute('SELECT pid, name, price, ok FROM Product WHERE price < ?', (9,))
+print([column[:2] for column in cursor.description])
+print(cursor.description[1][1] == sqlite_clone.STRING, cursor.description[1][1] == sqlite_clone.NUMBER)
+print(cursor.fetchone())
+cursor.arraysize = 2
+print(cursor.fetchmany())
+print(cursor.fetchall(), cursor.fetchone())
+print([pid for pid, name, price, ok in a.execute('SELECT * FROM Product WHERE pid IN (?, ?)', (9, 10))])
+cursor.execute('UPDATE Product SET price = ? WHERE ok = ?', (0.5, True))
+print(cursor.rowcount, a.execute('SELECT SUM(price) FROM Product').fetchone(),
+      b.execute('SELECT SUM(price) FROM Product').fetchone())
+a.rollback()
+print(a.execute('SELECT SUM(price) FROM Product').fetchone())
+with a:
+    a.execute('DELETE FROM Product WHERE pid > ?', (8,))
+try:
+    with a:
+        a.execute('DELETE FROM Product WHERE pid = 1')
+        a.execute('SELECT * FROM Nothing')
+except sqlite_clone.OperationalError as error:
+    print(type(error).__name__, error)
+print(b.execute('SELECT COUNT(*) FROM Product').fetchone())
+for operation, parameters in (('SELECT * FROM Product WHERE pid = ?', ()),
+                              ('SELEC * FROM Product', ()),
+                              ('INSERT INTO Product VALUES (?, ?, ?, ?)', (1, 'x', 'not a float', True)),
+                              ('INSERT INTO Product VALUES (?, ?, ?, ?)', (11, 'two\nlines', 1.5, True)),
+                              ('UPDATE Product SET name = ? WHERE pid = 2', ('two\rlines',))):
+    try:
+        a.execute(operation, parameters)
+    except sqlite_clone.Error as error:
+        print(type(error).__name__, error)
+try:
+    b.executemany('INSERT INTO Product VALUES (?, ?, ?, ?)', [(11, 'one line', 1.5, True), (12, 'two\nlines', 1.5, True)])
+except sqlite_clone.DataError as error:
+    print(type(error).__name__, error)
+sqlite_clone.wal_checkpoint('db_transaction')
+print(b.execute('SELECT pid, name FROM Product WHERE pid <= 2').fetchall())
+b.executemany('INSERT INTO Product VALUES (?, ?, ?, ?)', [(11, None, 1.5, True), (12, '', 3.0, False)])
+b.execute('UPDATE Product SET price = ? WHERE pid = 12', (4.5,))
+print(b.execute('SELECT pid, name FROM Product WHERE pid > 10').fetchall())
+sqlite_clone.wal_checkpoint('db_transaction')
+print(b.execute('SELECT pid, name FROM Product WHERE pid > 10').fetchall())
+b.execute('UPDATE Product SET price = ? WHERE pid > 10', (6.0,))
+sqlite_clone.wal_checkpoint('db_transaction')
+print(b.execute('SELECT pid, name, price FROM Product WHERE pid > 10').fetchall())
+cursor.close()
+try:
+    cursor.fetchone()
+except sqlite_clone.ProgrammingError as error:
+    print(type(error).__name__, error)
+
+b.execute('DROP DATABASE db_transaction')
+a.close()
+b.close()
+
+# Expected output
+#
+# Failed to commit transaction because table tbl_csv changed since it was read.
+# Failed to commit transaction because table tbl_csv changed since it was read.
+# [(9, 'name9'), (10, 'a'), (11, 'bb'), (13, 'aaa'), (14, 'name14')]
+# (18,)
+# Failed to commit transaction because table tbl_paged changed since it was read.
+# Failed to commit transaction because table tbl_paged changed since it was read.
+# [(9, 'name9'), (10, 'a'), (11, 'bb'), (13, 'aaa'), (14, 'name14')]
+# (18,)
+# Failed to commit transaction because table tbl_columnar changed since it was read.
+# Failed to commit transaction because table tbl_columnar changed since it was read.
+# [(9, 'name9'), (10, 'a'), (11, 'bb'), (13, 'aaa'), (14, 'name14')]
+# (18,)
+# Failed to commit transaction because table tbl_compressed changed since it was read.
+# Failed to commit transaction because table tbl_compressed changed since it was read.
+# [(9, 'name9'), (10, 'a'), (11, 'bb'), (13, 'aaa'), (14, 'name14')]
+# (18,)
+# 2.0 1 qmark
+# 10 (0,)
+# (10,)
+# [('pid', 'int'), ('name', 'varchar(20)'), ('price', 'float'), ('ok', 'bool')]
+# True False
+# (1, "it's 1", 1.5, False)
+# [(2, "it's 2", 3.0, True), (3, "it's 3", 4.5, False)]
+# [(4, "it's 4", 6.0, True), (5, "it's 5", 7.5, False)] None
+# [9, 10]
+# 5 (40.0,) (82.5,)
+# (82.5,)
+# OperationalError Failed to query table nothing because it does not exist.
+# (8,)
+# ProgrammingError statement needs 1 parameters but 0 were supplied
+# ProgrammingError syntax error
+# ProgrammingError could not convert string to float: 'not a float'
+# DataError column name of a CSV table cannot hold a line break
+# DataError column name of a CSV table cannot hold a line break
+# DataError column name of a CSV table cannot hold a line break
+# [(1, "it's 1"), (2, "it's 2")]
+# [(11, None), (12, '')]
+# [(11, None), (12, '')]
+# [(11, None, 6.0), (12, '', 6.0)]
+# ProgrammingError the cursor has no rows to fetch
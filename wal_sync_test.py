@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+# Write-ahead log: syncing the inserted rows
+#
+# Rows inserted into the write-ahead log are fsynced in groups; the rows the
+# last INSERT leaves unsynced are fsynced by a timer once the interval has
+# passed, and the rest when the last connection is closed.
+
+import time
+import sqlite_clone
+
+connection = sqlite_clone.connect('dbs', autocommit=True)
+connection.execute('CREATE DATABASE db_wal_sync')
+connection.execute('USE db_wal_sync')
+connection.execute('CREATE TABLE tbl_wal_sync (a1 int, a2 varchar(20))')
+sqlite_clone.set_wal_sync('0.2', '5')
+
+# fewer rows than a group: the timer syncs them
+connection.executemany('INSERT INTO tbl_wal_sync VALUES (?, ?)', [(i, 'name%i' % i) for i in range(1, 4)])
+log = sqlite_clone.wal_logs['db_wal_sync']
+print(log['unsynced'])
+time.sleep(0.5)
+print(log['unsynced'])
+
+# a full group is synced right away
+connection.executemany('INSERT INTO tbl_wal_sync VALUES (?, ?)', [(i, 'name%i' % i) for i in range(4, 9)])
+print(log['unsynced'])
+
+# 0 syncs every INSERT
+sqlite_clone.set_wal_sync('0')
+connection.execute("INSERT INTO tbl_wal_sync VALUES (9, 'name9')")
+print(log['unsynced'])
+
+print(connection.execute('SELECT COUNT(*) FROM tbl_wal_sync').fetchone())
+connection.execute('DROP DATABASE db_wal_sync')
+connection.close()
+
+# Expected output
+#
+# Logged rows will be fsynced every 0.2 seconds or 5 rows.
+# 3
+# 0
+# 0
+# Logged rows will be fsynced every 0 seconds or 5 rows.
+# 0
+# (9,)